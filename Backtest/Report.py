@@ -0,0 +1,146 @@
+from MockExchange.MatchingEngine import EPS
+
+
+class HedgeTracker:
+    """
+    Следит за нетто-экспозицией двух ног (позиция1 + позиция2 по одной монете).
+    Эпизод без хеджа начинается, когда ноги разошлись больше чем на tolerance,
+    и заканчивается, когда сошлись. Провал хеджа — эпизод длиннее grace_s
+    или не закрытый к концу прогона.
+    """
+
+    def __init__(self, venue1, venue2, symbol1: str, symbol2: str, clock, tolerance: float,
+                 grace_s: float = 1.0):
+        self.venue1 = venue1
+        self.venue2 = venue2
+        self.symbol1 = symbol1
+        self.symbol2 = symbol2
+        self.clock = clock
+        self.tolerance = tolerance
+        self.grace_s = grace_s
+        self.episodes = 0
+        self.failures = 0
+        self.unhedged_s = 0.0
+        self.max_unhedged_qty = 0.0
+        self.max_unhedged_notional = 0.0
+        self._since = None
+        venue1.engine.listeners.append(self._on_order_event)
+        venue2.engine.listeners.append(self._on_order_event)
+
+    def net(self) -> float:
+        return self.venue1.engine.position(self.symbol1).qty + self.venue2.engine.position(self.symbol2).qty
+
+    def _on_order_event(self, event: str, order, fill: dict):
+        if event != "fill":
+            return
+        net = abs(self.net())
+        now = self.clock.time()
+
+        if net > self.tolerance:
+            if self._since is None:
+                self._since = now
+                self.episodes += 1
+            self.max_unhedged_qty = max(self.max_unhedged_qty, net)
+            self.max_unhedged_notional = max(self.max_unhedged_notional, net * fill["price"])
+        elif self._since is not None:
+            self._close_episode(now)
+
+    def _close_episode(self, now: float):
+        duration = now - self._since
+        self.unhedged_s += duration
+        if duration > self.grace_s:
+            self.failures += 1
+        self._since = None
+
+    def finish(self):
+        """Конец прогона: открытый эпизод считается провалом"""
+        if self._since is not None:
+            self.unhedged_s += self.clock.time() - self._since
+            self.failures += 1
+            self._since = None
+
+    def summary(self) -> dict:
+        return {
+            "episodes": self.episodes,
+            "failures": self.failures,
+            "unhedged_s": round(self.unhedged_s, 3),
+            "max_unhedged_qty": self.max_unhedged_qty,
+            "max_unhedged_notional": round(self.max_unhedged_notional, 4),
+            "open_net_qty": self.net(),
+        }
+
+
+def venue_report(venue, symbol: str) -> dict:
+    """PnL, комиссии и доли исполнения ордеров одной биржи"""
+    engine = venue.engine
+    position = engine.position(symbol)
+    mark = engine.mark_price(symbol)
+
+    counts = {"limit": 0, "limit_filled": 0, "limit_partial": 0, "limit_unfilled": 0,
+              "market": 0, "fok": 0, "fok_filled": 0}
+    ordered_qty = filled_qty = 0.0
+    for order in engine.orders.values():
+        if order.symbol != symbol:
+            continue
+        ordered_qty += order.qty
+        filled_qty += order.filled
+        if order.is_market or order.tif == "IOC":
+            counts["market"] += 1
+        elif order.tif == "FOK":
+            counts["fok"] += 1
+            counts["fok_filled"] += order.status == "FILLED"
+        else:
+            counts["limit"] += 1
+            if order.status == "FILLED":
+                counts["limit_filled"] += 1
+            elif order.filled > EPS:
+                counts["limit_partial"] += 1
+            else:
+                counts["limit_unfilled"] += 1
+
+    realized = position.realized_pnl
+    unrealized = position.unrealized(mark)
+    return {
+        **counts,
+        "rejected": engine.stats["rejected"],
+        "limit_fill_rate": round(counts["limit_filled"] / counts["limit"], 4) if counts["limit"] else None,
+        "fok_fill_rate": round(counts["fok_filled"] / counts["fok"], 4) if counts["fok"] else None,
+        "qty_fill_rate": round(filled_qty / ordered_qty, 4) if ordered_qty else None,
+        "maker_fills": engine.stats["maker_fills"],
+        "fills": engine.stats["fills"],
+        "volume": round(engine.stats["volume"], 4),
+        "position": position.qty,
+        "mark": mark,
+        "realized_pnl": round(realized, 6),
+        "unrealized_pnl": round(unrealized, 6),
+        "fees": round(venue.fees, 6),
+        "funding_pnl": round(venue.funding_pnl, 6),
+        "net_pnl": round(realized + unrealized - venue.fees + venue.funding_pnl, 6),
+    }
+
+
+def print_report(report: dict):
+    run = report["run"]
+    print(f"\n📊 Бэктест {run['strategy']} {run['asset']}: {run['ticks']} снимков, "
+          f"{run['virtual_s']:.0f}s виртуального времени за {run['wall_s']:.1f}s "
+          f"(x{run['speedup']:.0f})")
+
+    for name in ("binance", "hyperliquid"):
+        venue = report[name]
+        print(f"  {name}:")
+        print(f"    limit {venue['limit']} (filled {venue['limit_filled']}, partial {venue['limit_partial']}, "
+              f"unfilled {venue['limit_unfilled']}) | market {venue['market']} | "
+              f"fok {venue['fok_filled']}/{venue['fok']} | rejected {venue['rejected']}")
+        print(f"    fill rate: limit={venue['limit_fill_rate']} fok={venue['fok_fill_rate']} "
+              f"qty={venue['qty_fill_rate']} | maker {venue['maker_fills']}/{venue['fills']}")
+        print(f"    PnL: realized={venue['realized_pnl']:.4f} unrealized={venue['unrealized_pnl']:.4f} "
+              f"fees={venue['fees']:.4f} funding={venue['funding_pnl']:.4f} → net={venue['net_pnl']:.4f} "
+              f"| позиция {venue['position']}")
+
+    hedge = report["hedge"]
+    print(f"  хедж: эпизодов {hedge['episodes']}, провалов {hedge['failures']}, "
+          f"без хеджа {hedge['unhedged_s']}s, макс. {hedge['max_unhedged_qty']} "
+          f"(${hedge['max_unhedged_notional']}), в конце {hedge['open_net_qty']}")
+    if report.get("strategy"):
+        print(f"  стратегия: {report['strategy']}")
+    print(f"💰 Итого net PnL: {report['net_pnl']:.4f}")
@@ -0,0 +1,614 @@
+import asyncio
+import random
+
+from Execution.FillEvents import bind_order, get_order_fill, track_order
+from MockExchange.MatchingEngine import BUY, SELL, EPS, OrderRejected, decimals_of
+
+
+def coin_of(symbol: str) -> str:
+    """ETHUSDT -> ETH, ETH -> ETH"""
+    symbol = symbol.upper()
+    return symbol[:-4] if symbol.endswith("USDT") else symbol
+
+
+class SimVenue:
+    """
+    Одна симулируемая биржа: движок сопоставления, задержки REST и user stream,
+    и хранилище ордеров в формате Dragonfly, которое читает SimInfoClient.
+
+    latency_ms — круговая задержка REST (половина до биржи, половина обратно),
+    ws_delay_ms — через сколько после исполнения отчет доходит до хранилища,
+    info_latency_ms — чтение из Dragonfly; без него цикл опроса без sleep не двигал бы часы.
+    """
+
+    def __init__(self, name: str, engine, latency_ms: float = 20.0, jitter_ms: float = 0.0,
+                 ws_delay_ms: float = 5.0, info_latency_ms: float = 0.5, seed: int = None):
+        self.name = name
+        self.engine = engine
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ws_delay_ms = ws_delay_ms
+        self.info_latency_ms = info_latency_ms
+        self.random = random.Random(seed)
+        self.orders = {}
+        self.fees = 0.0
+        self.funding_pnl = 0.0
+        self._order_seq = {}
+        engine.listeners.append(self._on_order_event)
+
+    def symbol(self, symbol: str) -> str:
+        """Символ книги в движке: Binance — ETHUSDT, Hyperliquid — ETH"""
+        coin = coin_of(symbol)
+        return coin + "USDT" if self.name == "binance" else coin
+
+    async def network_delay(self):
+        """Половина круговой задержки REST с разбросом jitter_ms"""
+        delay_ms = self.latency_ms / 2
+        if self.jitter_ms:
+            delay_ms += self.random.uniform(0, self.jitter_ms)
+        await asyncio.sleep(delay_ms / 1000)
+
+    async def info_delay(self):
+        await asyncio.sleep(self.info_latency_ms / 1000)
+
+    def save_order(self, order, status: str = None):
+        """То же, что save_order клиента в Dragonfly: исполненный объем не уменьшается"""
+        order_id = str(order.order_id)
+        record = self.orders.get(order_id)
+        now = self.engine.clock() / 1000
+        if record is None:
+            record = self.orders[order_id] = {
+                "orderId": order_id,
+                "fillSz": 0.0,
+                "price": float(order.price or 0.0),
+                "status": "NEW",
+                "origSz": float(order.qty),
+                "createdAt": now,
+                "updatedAt": now,
+            }
+        record["fillSz"] = max(record["fillSz"], float(order.filled))
+        if order.filled > EPS:
+            record["price"] = order.avg_price
+        record["status"] = status or order.status
+        record["updatedAt"] = now
+
+    def _on_order_event(self, event: str, order, fill: dict):
+        if fill is not None:
+            self.fees += fill["fee"]
+        # Отчет user stream приходит с задержкой; снимок состояния берется в момент события
+        seq = self._order_seq.get(order.order_id, 0) + 1
+        self._order_seq[order.order_id] = seq
+        snapshot = (order.filled, order.avg_price, order.status)
+        delay = self.ws_delay_ms / 1000
+        asyncio.get_running_loop().call_later(delay, self._apply_report, order, seq, snapshot)
+
+    def _apply_report(self, order, seq: int, snapshot: tuple):
+        record = self.orders.get(str(order.order_id))
+        filled, avg_price, status = snapshot
+        if record is None:
+            self.save_order(order)
+            record = self.orders[str(order.order_id)]
+        if seq < record.get("_seq", 0):
+            return
+        record["_seq"] = seq
+        record["fillSz"] = max(record["fillSz"], filled)
+        if filled > EPS:
+            record["price"] = avg_price
+        record["status"] = status
+        record["updatedAt"] = self.engine.clock() / 1000
+        # Как stamp_event в живом клиенте: отчет user stream будит ждущих исполнения,
+        # а clientOrderId в отчете привязывает ордер, если он пришел раньше ответа REST
+        if order.client_order_id:
+            state = bind_order(self.name, order.client_order_id, order.order_id)
+        else:
+            state = get_order_fill(self.name, order.order_id)
+        state.apply(filled, status)
+
+    def order_record(self, order_id) -> dict:
+        record = self.orders.get(str(order_id))
+        if record is None:
+            return None
+        return {key: value for key, value in record.items() if not key.startswith("_")}
+
+
+class SimExchangeClient:
+    """
+    Торговый клиент поверх SimVenue с интерфейсом AsyncBinanceWSClient / AsyncHyperliquidWSClient.
+    Подписки — пустые операции: книги в движок подает бэктест. Форматы ответов
+    задают наследники, чтобы стратегия видела то же, что и в живом режиме.
+
+    Символ принимается в любом виде (ETH или ETHUSDT) — в живом режиме ScalpStrategy
+    передает ETHUSDT, а клиенты ждут монету.
+    """
+
+    # modify задает новый остаток, а не полный объем (Hyperliquid)
+    MODIFY_SETS_REMAINING = False
+
+    def __init__(self, venue: SimVenue):
+        self.venue = venue
+        self.engine = venue.engine
+        self.running_orders = {}
+
+    # ============= СОЕДИНЕНИЕ И ПОДПИСКИ =============
+
+    async def connect_ws(self):
+        pass
+
+    async def subscribe_orderbook(self, symbol):
+        pass
+
+    async def subscribe_bbo(self, symbol):
+        pass
+
+    async def subscribe_mark_price(self, symbol):
+        pass
+
+    async def unsubscribe_orderbook(self, symbol):
+        pass
+
+    async def unsubscribe_bbo(self, symbol):
+        pass
+
+    async def subscribe_order(self, order_id: str):
+        self.running_orders[str(order_id)] = True
+
+    async def unsubscribe_order(self, order_id: str):
+        self.running_orders.pop(str(order_id), None)
+
+    async def close(self):
+        pass
+
+    # ============= ОБЩЕЕ =============
+
+    def _book(self, symbol: str):
+        return self.engine.books.get(self.venue.symbol(symbol)) or self.engine.add_symbol(self.venue.symbol(symbol))
+
+    def _round(self, symbol: str, qty: float, price: float = None):
+        book = self._book(symbol)
+        qty = round(qty, decimals_of(book.step_size))
+        if price is not None:
+            price = round(price, decimals_of(book.tick_size))
+        return qty, price
+
+    async def _submit(self, symbol: str, side: str, qty: float, price: float = None, tif: str = "GTC",
+                      reduce_only: bool = False, client_order_id: str = None):
+        """
+        REST запрос к движку: задержка туда, сопоставление, задержка обратно, запись в хранилище.
+        Клиентский id заводится в FillEvents до отправки, как в живых клиентах.
+        """
+        qty, price = self._round(symbol, qty, price)
+        client_order_id = track_order(self.venue.name, client_order_id)
+        await self.venue.network_delay()
+        order = self.engine.submit(self.venue.symbol(symbol), BUY if side.lower() in ("long", "buy") else SELL,
+                                   qty, price, tif, reduce_only, client_order_id)
+        await self.venue.network_delay()
+        bind_order(self.venue.name, client_order_id, order.order_id)
+        self.venue.save_order(order)
+        return order
+
+    async def place_limit_orders(self, symbol: str, side: str, levels: list, reduce_only: bool = False,
+                                 client_order_ids: list = None):
+        """
+        Пакет лимиток в формате place_limit_orders живых клиентов: один REST запрос —
+        одна круговая задержка на всю лестницу, части сопоставляются по порядку.
+        """
+        client_order_ids = [track_order(self.venue.name, client_order_id)
+                            for client_order_id in (client_order_ids or [None] * len(levels))]
+        await self.venue.network_delay()
+        orders = []
+        for (price, qty), client_order_id in zip(levels, client_order_ids):
+            qty, price = self._round(symbol, qty, price)
+            try:
+                orders.append(self.engine.submit(self.venue.symbol(symbol),
+                                                 BUY if side.lower() in ("long", "buy") else SELL,
+                                                 qty, price, "GTC", reduce_only, client_order_id))
+            except OrderRejected as e:
+                orders.append(e)
+        await self.venue.network_delay()
+
+        results = []
+        for (price, qty), client_order_id, order in zip(levels, client_order_ids, orders):
+            if isinstance(order, OrderRejected):
+                results.append({"error": str(order)})
+                continue
+            bind_order(self.venue.name, client_order_id, order.order_id)
+            self.venue.save_order(order)
+            self.running_orders[str(order.order_id)] = True
+            results.append({
+                "orderId": str(order.order_id),
+                "clientOrderId": client_order_id,
+                "symbol": symbol,
+                "price": price,
+                "qty": qty,
+                "status": "FILLED" if order.status == "FILLED" else "NEW"
+            })
+        return results
+
+    async def modify_order(self, symbol: str, order_id: str, side: str, price: float, qty: float,
+                           filled: float = 0.0, reduce_only: bool = False):
+        """
+        modify_order живых клиентов: одна круговая задержка, orderId сохраняется.
+        qty — полный объем; у Hyperliquid (MODIFY_SETS_REMAINING) биржа получает остаток qty - filled.
+        """
+        await self.venue.network_delay()
+        order = self.engine.get_order(order_id)
+        try:
+            if order is None:
+                raise OrderRejected("unknown_order", f"Order {order_id} does not exist")
+            total = order.filled + (qty - filled) if self.MODIFY_SETS_REMAINING else qty
+            total, price = self._round(symbol, total, price)
+            order = self.engine.amend(order_id, price, total)
+        except OrderRejected as e:
+            await self.venue.network_delay()
+            raise Exception(f"Ошибка изменения ордера: {e}")
+        await self.venue.network_delay()
+        self.venue.save_order(order)
+        return {
+            "orderId": str(order.order_id),
+            "clientOrderId": order.client_order_id,
+            "symbol": symbol,
+            "price": order.price,
+            "qty": order.qty,
+            "filledQty": order.filled,
+            "status": order.status
+        }
+
+    def _closing_side(self, symbol: str, side: str) -> str:
+        position = self.engine.position(self.venue.symbol(symbol))
+        if abs(position.qty) < EPS:
+            return side
+        return "short" if position.qty > 0 else "long"
+
+    async def cancel_order(self, symbol: str, order_id: str):
+        raise NotImplementedError
+
+    async def get_symbol_info(self, symbol: str):
+        await self.venue.network_delay()
+        book = self._book(symbol)
+        await self.venue.network_delay()
+        return {
+            "quantityPrecision": decimals_of(book.step_size),
+            "pricePrecision": decimals_of(book.tick_size),
+        }
+
+    async def get_tick_size(self, symbol: str) -> str:
+        return format(self._book(symbol).tick_size, ".5f")
+
+    async def set_leverage(self, symbol: str, leverage: int, margin_mode: str = "isolated", pos_side: str = None):
+        self.engine.position(self.venue.symbol(symbol)).leverage = leverage
+        return {"status": "success", "symbol": symbol, "leverage": leverage, "margin_mode": margin_mode}
+
+    async def get_funding_rate(self, symbol: str) -> float:
+        return self.engine.funding_rate
+
+    async def get_position_size(self, symbol: str, direction: str) -> float:
+        await self.venue.network_delay()
+        position = self.engine.position(self.venue.symbol(symbol))
+        await self.venue.network_delay()
+        if direction.lower() == "long" and position.qty > 0:
+            return abs(position.qty)
+        if direction.lower() == "short" and position.qty < 0:
+            return abs(position.qty)
+        return 0.0
+
+    async def place_fok_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
+        """Fill-or-Kill в формате AsyncHyperliquidWSClient.place_fok_order"""
+        try:
+            order = await self._submit(symbol, side, qty, price, tif="FOK", client_order_id=client_order_id)
+        except OrderRejected as e:
+            return {"success": False, "error": str(e)}
+
+        if order.status == "FILLED":
+            return {
+                "success": True,
+                "orderId": str(order.order_id),
+                "clientOrderId": order.client_order_id,
+                "status": "FILLED",
+                "filledQty": order.filled,
+                "avgPrice": order.avg_price
+            }
+        return {"success": False, "status": "REJECTED", "reason": "FOK_REJECTED"}
+
+
+    async def place_ioc_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
+        """Лимит IOC в формате place_ioc_order живых клиентов"""
+        try:
+            order = await self._submit(symbol, side, qty, price, tif="IOC", client_order_id=client_order_id)
+        except OrderRejected as e:
+            return {"success": False, "orderId": None, "status": "REJECTED", "filledQty": 0.0,
+                    "avgPrice": 0.0, "error": str(e)}
+        return {
+            "success": order.filled > EPS,
+            "orderId": str(order.order_id),
+            "clientOrderId": order.client_order_id,
+            "status": order.status,
+            "filledQty": order.filled,
+            "avgPrice": order.avg_price
+        }
+
+
+class SimBinanceClient(SimExchangeClient):
+    """Ответы в формате AsyncBinanceWSClient (REST /fapi/v1/order как есть)"""
+
+    @staticmethod
+    def _rest_order(order) -> dict:
+        return {
+            "orderId": order.order_id,
+            "clientOrderId": order.client_order_id,
+            "symbol": order.symbol,
+            "status": order.status,
+            "price": str(order.price or 0),
+            "avgPrice": str(order.avg_price),
+            "origQty": str(order.qty),
+            "executedQty": str(order.filled),
+            "side": order.side,
+            "type": "MARKET" if order.is_market else "LIMIT",
+            "reduceOnly": order.reduce_only,
+            "updateTime": order.updated_ms,
+        }
+
+    async def place_limit_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
+        try:
+            order = await self._submit(symbol, side, qty, price, client_order_id=client_order_id)
+        except OrderRejected as e:
+            raise Exception(f"Ошибка размещения ордера: {{'code': -4000, 'msg': '{e}'}}")
+        self.running_orders[str(order.order_id)] = True
+        return {"orderId": order.order_id, "clientOrderId": order.client_order_id, "symbol": order.symbol,
+                "qty": str(order.qty)}
+
+    async def _rest_submit(self, symbol: str, side: str, qty: float, price: float = None, reduce_only: bool = False,
+                           client_order_id: str = None):
+        try:
+            order = await self._submit(symbol, side, qty, price, reduce_only=reduce_only, client_order_id=client_order_id)
+        except OrderRejected as e:
+            code = -2022 if e.reason == "reduce_only" else -4000
+            return {"code": code, "msg": str(e)}
+        self.running_orders[str(order.order_id)] = True
+        return self._rest_order(order)
+
+    async def place_market_order(self, symbol: str, side: str, qty: float, client_order_id: str = None):
+        return await self._rest_submit(symbol, side, qty, client_order_id=client_order_id)
+
+    async def close_limit_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
+        return await self._rest_submit(symbol, side, qty, price, reduce_only=True, client_order_id=client_order_id)
+
+    async def close_market_order(self, symbol: str, side: str, qty: float, client_order_id: str = None):
+        return await self._rest_submit(symbol, side, qty, reduce_only=True, client_order_id=client_order_id)
+
+    async def cancel_order(self, symbol: str, order_id: str):
+        await self.venue.network_delay()
+        order = self.engine.get_order(order_id)
+        if order is None or not order.is_open:
+            await self.venue.network_delay()
+            return {"code": -2011, "msg": "Unknown order sent."}
+        self.engine.cancel(order_id)
+        await self.venue.network_delay()
+        await self.unsubscribe_order(order_id)
+        self.venue.save_order(order)
+        return self._rest_order(order)
+
+    async def get_order_status(self, symbol: str, order_id: str):
+        await self.venue.network_delay()
+        order = self.engine.get_order(order_id)
+        await self.venue.network_delay()
+        if order is None:
+            return {"code": -2013, "msg": "Order does not exist."}
+        self.venue.save_order(order)
+        return self._rest_order(order)
+
+    async def get_position_info(self, symbol: str):
+        await self.venue.network_delay()
+        full_symbol = self.venue.symbol(symbol)
+        position = self.engine.position(full_symbol)
+        await self.venue.network_delay()
+        if abs(position.qty) < EPS:
+            return None
+        return {
+            "symbol": full_symbol,
+            "avg_price": position.entry_price,
+            "size": abs(position.qty),
+            "side": "long" if position.qty > 0 else "short",
+            "unrealized_pnl": position.unrealized(self.engine.mark_price(full_symbol))
+        }
+
+
+class SimHyperliquidClient(SimExchangeClient):
+    """Ответы в формате AsyncHyperliquidWSClient"""
+
+    MODIFY_SETS_REMAINING = True
+
+    async def place_limit_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
+        side = "buy" if side.lower() in ("long", "buy") else "sell"
+        try:
+            order = await self._submit(symbol, side, qty, price, client_order_id=client_order_id)
+        except OrderRejected as e:
+            raise Exception(f"Order error: {e}")
+        self.running_orders[str(order.order_id)] = True
+        return {
+            "orderId": str(order.order_id),
+            "clientOrderId": order.client_order_id,
+            "symbol": symbol,
+            "side": side,
+            "price": price,
+            "qty": qty,
+            "status": "FILLED" if order.status == "FILLED" else "NEW"
+        }
+
+    async def place_market_order(self, symbol: str, side: str, qty: float, client_order_id: str = None):
+        side = "buy" if side.lower() in ("long", "buy") else "sell"
+        try:
+            order = await self._submit(symbol, side, qty, client_order_id=client_order_id)
+        except OrderRejected as e:
+            raise Exception(f"Order error: {e}")
+        return {
+            "orderId": str(order.order_id),
+            "clientOrderId": order.client_order_id,
+            "symbol": symbol,
+            "side": side,
+            "quantity": qty,
+            "status": "FILLED"
+        }
+
+    async def close_limit_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
+        side = "buy" if side.lower() in ("long", "buy") else "sell"
+        try:
+            order = await self._submit(symbol, side, qty, price, reduce_only=True, client_order_id=client_order_id)
+        except OrderRejected as e:
+            raise Exception(f"Order error: {e}")
+        return {
+            "orderId": str(order.order_id),
+            "clientOrderId": order.client_order_id,
+            "symbol": symbol,
+            "side": side,
+            "price": price,
+            "quantity": qty,
+            "status": "NEW",
+            "reduceOnly": True
+        }
+
+    async def close_market_order(self, symbol: str, side: str, qty: float, client_order_id: str = None):
+        # market_close SDK закрывает позицию независимо от переданной стороны
+        closing_side = self._closing_side(symbol, side)
+        try:
+            order = await self._submit(symbol, closing_side, qty, reduce_only=True, client_order_id=client_order_id)
+        except OrderRejected as e:
+            raise Exception(f"Order error: {e}")
+        return {
+            "orderId": str(order.order_id),
+            "clientOrderId": order.client_order_id,
+            "symbol": symbol,
+            "side": "buy" if closing_side == "long" else "sell",
+            "quantity": qty,
+            "status": "FILLED",
+            "reduceOnly": True
+        }
+
+    async def cancel_order(self, symbol: str, order_id: str):
+        await self.venue.network_delay()
+        order = self.engine.get_order(order_id)
+        if order is not None:
+            self.engine.cancel(order_id)
+        await self.venue.network_delay()
+        await self.unsubscribe_order(order_id)
+        if order is not None:
+            # Живой клиент пишет CANCELED независимо от того, успел ли ордер исполниться
+            self.venue.save_order(order, status="CANCELED")
+        return {"status": "canceled", "orderId": order_id}
+
+    async def get_order_status(self, symbol: str, order_id: str):
+        await self.venue.network_delay()
+        order = self.engine.get_order(order_id)
+        await self.venue.network_delay()
+        if order is None:
+            raise Exception(f"Order {order_id} not found")
+        self.venue.save_order(order)
+        return {
+            "orderId": order_id,
+            "symbol": symbol,
+            "fillSz": order.filled,
+            "origSz": order.qty,
+            "remainingSz": order.remaining
+        }
+
+    async def get_position_info(self, symbol: str):
+        await self.venue.network_delay()
+        position = self.engine.position(self.venue.symbol(symbol))
+        await self.venue.network_delay()
+        if abs(position.qty) < EPS:
+            return None
+        return {"avg_price": position.entry_price, "size": abs(position.qty)}
+
+
+class SimInfoClient:
+    """
+    InfoClient поверх движка и хранилища SimVenue: книги, BBO и funding в форматах
+    DragonFlyConnector, ордера — как их записал user stream (с задержкой ws_delay_ms).
+    """
+
+    def __init__(self, venue: SimVenue):
+        self.venue = venue
+        self.engine = venue.engine
+
+    def _age_ms(self, book) -> int:
+        return self.engine.clock() - book.ts_ms
+
+    async def get_orderbook(self, symbol: str, max_age_ms: int = None, depth: int = 10) -> dict:
+        await self.venue.info_delay()
+        book = self.engine.books.get(self.venue.symbol(symbol))
+        if book is None or not book.bids or (max_age_ms is not None and self._age_ms(book) > max_age_ms):
+            return {"bids": [], "asks": []}
+        bids, asks = self.engine.depth(book.symbol, 10)
+        return {
+            "bids": bids,
+            "asks": asks,
+            "seq": book.version,
+            "exchange_ts": book.ts_ms,
+            "local_ts": book.ts_ms,
+            "age_ms": self._age_ms(book),
+        }
+
+    async def get_bbo(self, symbol: str, max_age_ms: int = None) -> dict:
+        await self.venue.info_delay()
+        book = self.engine.books.get(self.venue.symbol(symbol))
+        if book is None or not book.bids or not book.asks:
+            return None
+        age_ms = self._age_ms(book)
+        if max_age_ms is not None and age_ms > max_age_ms:
+            return None
+        bids, asks = self.engine.depth(book.symbol, 1)
+        return {
+            "bid": bids[0][0],
+            "bid_qty": bids[0][1],
+            "ask": asks[0][0],
+            "ask_qty": asks[0][1],
+            "exchange_ts": book.ts_ms,
+            "local_ts": book.ts_ms,
+            "age_ms": age_ms,
+        }
+
+    async def get_funding(self, symbol: str) -> dict:
+        await self.venue.info_delay()
+        full_symbol = self.venue.symbol(symbol)
+        if full_symbol not in self.engine.books:
+            return None
+        mark = self.engine.mark_price(full_symbol)
+        return {
+            "mark": mark,
+            "rate": self.engine.funding_rate,
+            "interval_hours": 8.0 if self.venue.name == "binance" else 1.0,
+            "index": mark,
+            "next_funding_ts": 0,
+            "exchange_ts": self.engine.books[full_symbol].ts_ms,
+            "local_ts": self.engine.books[full_symbol].ts_ms,
+        }
+
+    async def get_mark(self, symbol: str) -> float:
+        funding = await self.get_funding(symbol)
+        return funding["mark"] if funding else None
+
+    async def get_order_status(self, order_id: str) -> dict:
+        await self.venue.info_delay()
+        return self.venue.order_record(order_id)
+
+    async def get_position(self, symbol: str) -> dict:
+        await self.venue.info_delay()
+        full_symbol = self.venue.symbol(symbol)
+        position = self.engine.position(full_symbol)
+        return {
+            "size": abs(position.qty),
+            "side": "long" if position.qty > 0 else "short" if position.qty < 0 else None,
+            "avg_price": position.entry_price,
+            "unrealized_pnl": position.unrealized(self.engine.mark_price(full_symbol)),
+        }
+
+    async def get_all_orders(self, active_only: bool = False) -> dict:
+        orders = {}
+        for order_id in self.venue.orders:
+            record = self.venue.order_record(order_id)
+            if active_only and record["status"] not in ("NEW", "PARTIALLY_FILLED"):
+                continue
+            orders[order_id] = record
+        return orders
+
+    async def delete_order(self, order_id: str) -> bool:
+        return self.venue.orders.pop(str(order_id), None) is not None
@@ -0,0 +1,93 @@
+import asyncio
+import contextlib
+import selectors
+import time
+
+
+class VirtualClock:
+    """
+    Виртуальные часы бэктеста в секундах эпохи. Время идет только тогда, когда
+    цикл событий простаивает до ближайшего таймера — asyncio.sleep(5) занимает 5
+    виртуальных секунд и ноль реальных.
+    """
+
+    def __init__(self, start: float = None):
+        self.now = time.time() if start is None else start
+
+    def time(self) -> float:
+        return self.now
+
+    def time_ns(self) -> int:
+        return int(self.now * 1e9)
+
+    def time_ms(self) -> int:
+        return int(self.now * 1000)
+
+    def advance(self, seconds: float):
+        if seconds > 0:
+            self.now += seconds
+
+    def sleep(self, seconds: float):
+        """Блокирующий time.sleep в бэктесте: цикл замирает, виртуальное время уходит вперед"""
+        self.advance(seconds)
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """
+    Селектор, который не ждет таймеры в реальном времени: если готового IO нет,
+    часы переводятся на timeout (до ближайшего таймера). timeout=None — таймеров нет,
+    ждем реальный IO (например, результат из executor).
+    """
+
+    def __init__(self, clock: VirtualClock):
+        super().__init__()
+        self._clock = clock
+
+    def select(self, timeout=None):
+        if timeout is None:
+            return super().select(None)
+        ready = super().select(0)
+        if not ready:
+            self._clock.advance(timeout)
+        return ready
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Цикл событий на виртуальных часах: loop.time() и таймеры считаются по clock"""
+
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        super().__init__(_VirtualSelector(clock))
+        # Секунды эпохи во float различают ~0.25 мкс: с меньшим разрешением таймер,
+        # до которого осталась ошибка округления, никогда не наступит
+        self._clock_resolution = 1e-6
+
+    def time(self) -> float:
+        return self.clock.now
+
+
+@contextlib.contextmanager
+def patched_time(clock: VirtualClock):
+    """
+    На время бэктеста time.time/time_ns/sleep модуля time идут от виртуальных часов:
+    стратегии меряют тайм-ауты через time.time(), и эти тайм-ауты должны совпадать
+    с виртуальными asyncio.sleep. perf_counter и monotonic остаются реальными.
+    """
+    original = time.time, time.time_ns, time.sleep
+    time.time, time.time_ns, time.sleep = clock.time, clock.time_ns, clock.sleep
+    try:
+        yield clock
+    finally:
+        time.time, time.time_ns, time.sleep = original
+
+
+def run_virtual(coro, clock: VirtualClock):
+    """Выполняет корутину на VirtualTimeLoop с подмененным модулем time"""
+    loop = VirtualTimeLoop(clock)
+    asyncio.set_event_loop(loop)
+    try:
+        with patched_time(clock):
+            return loop.run_until_complete(coro)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
@@ -0,0 +1,367 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+from Backtest.Report import HedgeTracker, print_report, venue_report
+from Backtest.SimClients import SimBinanceClient, SimHyperliquidClient, SimInfoClient, SimVenue
+from Backtest.VirtualTime import VirtualClock, run_virtual
+from MockExchange.BookFeed import recorded_books
+from MockExchange.MatchingEngine import MatchingEngine
+
+STRATEGIES = ("scalper", "longshort", "scalp")
+
+# Параметры симуляции (key=value в командной строке)
+BACKTEST_DEFAULTS = {
+    "asset": None,           # монета; по умолчанию первая, что есть в записи на обеих биржах
+    "config": None,          # JSON конфиг стратегии; недостающие поля берутся из DEFAULT_CONFIG
+    "latency_ms": 20.0,      # круговая задержка REST
+    "jitter_ms": 0.0,
+    "ws_delay_ms": 5.0,      # задержка отчета user stream до InfoClient
+    "info_latency_ms": 0.5,  # чтение InfoClient из Dragonfly
+    "maker_fee": None,       # None — комиссии площадки из VENUE_FEES
+    "taker_fee": None,
+    "funding_rate": 0.0001,  # ставка за интервал (Binance 8ч, Hyperliquid 1ч)
+    "hedge_grace_s": 1.0,    # дольше — эпизод без хеджа считается провалом
+    "tick_size": None,       # None — по записи (по умолчанию движка, если в ценах нет дробной части)
+    "step_size": None,
+    "seed": None,
+    "verbose": False,        # печатать вывод стратегии
+    "report": None,          # путь для JSON отчета
+}
+
+VENUE_FEES = {"binance": (0.0002, 0.0005), "hyperliquid": (0.00015, 0.00045)}
+FUNDING_INTERVAL_HOURS = {"binance": 8, "hyperliquid": 1}
+
+DEFAULT_CONFIG = {
+    "api_keys": {
+        "binance": {"api_key": "backtest", "api_secret": "backtest"},
+        "hyperliquid": {"api_key": "backtest"},
+    },
+    "trading_parameters": {
+        "margin": 100,
+        "leverage": 10,
+        "parts": 1,
+        "max_spread_percent": 0.9995,
+        "max_spread_close_percent": 0.9995,
+        "max_book_age_ms": 1000,
+        # Ручное подтверждение закрытия в Scalper.FindDeal бэктест не ждет
+        "confirm_close": False,
+    },
+    "scalp_parameters": {
+        "base_quantity": 0.01,
+        "target_profit_usd": 1.0,
+        "max_position_size": 0.1,
+        "min_quantity": 0.001,
+        "min_profit_per_unit": 0.5,
+        "max_book_age_ms": 500,
+    },
+}
+
+
+def _decimals(value: float) -> int:
+    text = repr(float(value))
+    if "e-" in text:
+        return int(text.split("e-")[1])
+    return len(text.split(".")[1].rstrip("0")) if "." in text else 0
+
+
+def scan_capture(path: str, asset: str = None, limit: int = 5000):
+    """
+    Первые limit снимков записи: монета (если не задана) и шаги цены/объема на каждой
+    бирже по максимуму знаков после запятой (в самой записи шагов нет).
+    :return: (asset, {venue: (tick_size, step_size)}); шаг None — знаков не нашлось
+    """
+    digits = {"binance": {}, "hyperliquid": {}}
+    for index, (_, venue, symbol, bids, asks, _) in enumerate(recorded_books(path)):
+        if index >= limit:
+            break
+        coin = symbol[:-4] if venue == "binance" and symbol.endswith("USDT") else symbol
+        price_digits, qty_digits = digits[venue].get(coin, (0, 0))
+        for price, qty in bids + asks:
+            price_digits = max(price_digits, _decimals(price))
+            qty_digits = max(qty_digits, _decimals(qty))
+        digits[venue][coin] = (min(price_digits, 8), min(qty_digits, 8))
+
+    if asset is None:
+        common = [coin for coin in digits["hyperliquid"] if coin in digits["binance"]]
+        asset = common[0] if common else None
+    if asset is None or asset not in digits["binance"] or asset not in digits["hyperliquid"]:
+        raise ValueError(f"В {path} нет книг {asset or 'одной монеты'} на обеих биржах")
+
+    increments = {}
+    for venue, coins in digits.items():
+        price_digits, qty_digits = coins[asset]
+        increments[venue] = (10 ** -price_digits if price_digits else None,
+                             10 ** -qty_digits if qty_digits else None)
+    return asset, increments
+
+
+def build_config(path: str = None, overrides: dict = None) -> dict:
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if path:
+        with open(path, 'r') as f:
+            user_config = json.load(f)
+        for section, values in user_config.items():
+            if isinstance(values, dict) and isinstance(config.get(section), dict):
+                config[section].update(values)
+            else:
+                config[section] = values
+        config["trading_parameters"]["confirm_close"] = False
+    for key, value in (overrides or {}).items():
+        section = "trading_parameters" if key in config["trading_parameters"] else "scalp_parameters"
+        config[section][key] = value
+    return config
+
+
+class Backtester:
+    """
+    Прогон настоящего класса стратегии (Scalper, LongShort, ScalpStrategy) по записанным
+    книгам. Биржи — MatchingEngine за SimBinanceClient/SimHyperliquidClient, InfoClients —
+    SimInfoClient; время виртуальное, так что часы записи проигрываются за секунды.
+
+    Стратегия работает, пока не кончится запись (или пока не завершится сама).
+    """
+
+    def __init__(self, capture: str, strategy: str, strategy_overrides: dict = None, **options):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия {strategy}; есть {', '.join(STRATEGIES)}")
+        self.capture = capture
+        self.strategy_name = strategy
+        self.options = {**BACKTEST_DEFAULTS, **options}
+        self.config = build_config(self.options["config"], strategy_overrides)
+        self.asset, increments = scan_capture(capture, self.options["asset"])
+
+        first_ns = next(recorded_books(capture))[0]
+        self.clock = VirtualClock(first_ns / 1e9)
+
+        self.venues = {}
+        steps = []
+        self.symbols = {"binance": self.asset + "USDT", "hyperliquid": self.asset}
+        for index, name in enumerate(("binance", "hyperliquid")):
+            maker_fee, taker_fee = VENUE_FEES[name]
+            engine = MatchingEngine(
+                maker_fee=maker_fee if self.options["maker_fee"] is None else self.options["maker_fee"],
+                taker_fee=taker_fee if self.options["taker_fee"] is None else self.options["taker_fee"],
+                funding_rate=self.options["funding_rate"],
+                clock=self.clock.time_ms,
+            )
+            tick_size, step_size = increments[name]
+            book = engine.add_symbol(self.symbols[name], self.options["tick_size"] or tick_size,
+                                     self.options["step_size"] or step_size)
+            steps.append(book.step_size)
+            seed = None if self.options["seed"] is None else self.options["seed"] + index
+            self.venues[name] = SimVenue(name, engine, self.options["latency_ms"], self.options["jitter_ms"],
+                                         self.options["ws_delay_ms"], self.options["info_latency_ms"], seed)
+
+        self.hedge = HedgeTracker(
+            self.venues["binance"], self.venues["hyperliquid"], self.symbols["binance"], self.symbols["hyperliquid"],
+            self.clock, tolerance=max(steps) / 2,
+            grace_s=self.options["hedge_grace_s"]
+        )
+        self.strategy = None
+        self.strategy_error = None
+        self.strategy_stats = None
+        self.ticks = 0
+        self._funding_slots = {}
+        self._books_ready = None
+
+    # ============= ЗАПИСЬ =============
+
+    async def _play(self):
+        """Подает снимки книг в движки в момент их записи по виртуальным часам"""
+        for recv_ns, venue, symbol, bids, asks, _ in recorded_books(self.capture):
+            if symbol != self.symbols[venue]:
+                continue
+            delay = recv_ns / 1e9 - self.clock.now
+            if delay > 0:
+                await asyncio.sleep(delay)
+            engine = self.venues[venue].engine
+            engine.set_book(symbol, bids, asks, ts_ms=self.clock.time_ms())
+            self._accrue_funding(venue)
+            self.ticks += 1
+            if not self._books_ready.is_set() and all(
+                    v.engine.books[self.symbols[name]].bids for name, v in self.venues.items()):
+                self._books_ready.set()
+
+    def _accrue_funding(self, name: str):
+        """Начисление funding на границе интервала: лонг платит при положительной ставке"""
+        interval_s = FUNDING_INTERVAL_HOURS[name] * 3600
+        slot = int(self.clock.now // interval_s)
+        previous = self._funding_slots.setdefault(name, slot)
+        if slot == previous:
+            return
+        self._funding_slots[name] = slot
+        venue = self.venues[name]
+        symbol = self.symbols[name]
+        position = venue.engine.position(symbol)
+        venue.funding_pnl -= position.qty * venue.engine.mark_price(symbol) * venue.engine.funding_rate
+
+    # ============= СТРАТЕГИИ =============
+
+    def _write_config(self) -> str:
+        handle, path = tempfile.mkstemp(prefix="backtest_", suffix=".json")
+        with os.fdopen(handle, 'w') as f:
+            json.dump(self.config, f)
+        return path
+
+    async def _run_strategy(self, config_path: str):
+        binance, hyperliquid = self.venues["binance"], self.venues["hyperliquid"]
+
+        if self.strategy_name == "scalper":
+            # Scalper берет ROI из Scalper/config/config.py — его папка должна идти раньше корня
+            sys.path.insert(0, os.path.join(ROOT, "Scalper"))
+            from Scalper import Scalper
+
+            self.strategy = Scalper(self.asset, config_path)
+            self.strategy.exchange1, self.strategy.exchange1Info = SimBinanceClient(binance), SimInfoClient(binance)
+            self.strategy.exchange2, self.strategy.exchange2Info = (SimHyperliquidClient(hyperliquid),
+                                                                    SimInfoClient(hyperliquid))
+            await self.strategy._setup_trading_parameters()
+            self.strategy.initialized = True
+            return await self.strategy.FindDeal()
+
+        if self.strategy_name == "longshort":
+            from logic.LongShort.LongShort import LongShort
+
+            self.strategy = LongShort("Binance", "Hyperliquid", False, self.asset, config_path)
+            self.strategy.exchange1WebSocket = SimBinanceClient(binance)
+            self.strategy.exchange1Info = SimInfoClient(binance)
+            self.strategy.exchange2WebSocket = SimHyperliquidClient(hyperliquid)
+            self.strategy.exchange2Info = SimInfoClient(hyperliquid)
+            return await self.strategy.findDeal()
+
+        from logic.Scalp.ScalpStrategy import ScalpStrategy
+
+        self.strategy = ScalpStrategy("Binance", "Hyperliquid", self.asset, config_path)
+        self.strategy.exchange1_ws, self.strategy.exchange1_info = SimBinanceClient(binance), SimInfoClient(binance)
+        self.strategy.exchange2_ws, self.strategy.exchange2_info = (SimHyperliquidClient(hyperliquid),
+                                                                    SimInfoClient(hyperliquid))
+        return await self.strategy.run_scalping()
+
+    @staticmethod
+    async def _stop(task: asyncio.Task):
+        """Отмена с повтором: голые except в стратегиях могут проглотить первый CancelledError"""
+        for _ in range(100):
+            if task.done():
+                return
+            task.cancel()
+            await asyncio.wait({task}, timeout=0.1)
+
+    async def _run(self):
+        self._books_ready = asyncio.Event()
+        config_path = self._write_config()
+        feed = asyncio.create_task(self._play())
+        strategy = None
+        try:
+            ready = asyncio.create_task(self._books_ready.wait())
+            await asyncio.wait({feed, ready}, return_when=asyncio.FIRST_COMPLETED)
+            if not self._books_ready.is_set():
+                raise ValueError(f"В {self.capture} нет книг {self.asset} на обеих биржах")
+
+            strategy = asyncio.create_task(self._run_strategy(config_path))
+            await asyncio.wait({feed, strategy}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (strategy, feed):
+                if task is not None:
+                    await self._stop(task)
+            if strategy is not None and not strategy.cancelled() and strategy.exception():
+                self.strategy_error = repr(strategy.exception())
+            # Статистика стратегии считает время через time.time — снимаем, пока часы виртуальные
+            if hasattr(self.strategy, "get_stats") and self.strategy.start_time:
+                self.strategy_stats = self.strategy.get_stats()
+
+            # Дочерние задачи стратегии (gather и т.п.) не должны пережить прогон
+            pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            os.remove(config_path)
+
+        self.hedge.finish()
+
+    def run(self) -> dict:
+        start_virtual = self.clock.now
+        start_wall = time.perf_counter()
+
+        quiet = not self.options["verbose"]
+        with contextlib.ExitStack() as stack:
+            if quiet:
+                devnull = stack.enter_context(open(os.devnull, 'w'))
+                stack.enter_context(contextlib.redirect_stdout(devnull))
+                logging.disable(logging.INFO)
+                stack.callback(logging.disable, logging.NOTSET)
+            run_virtual(self._run(), self.clock)
+
+        wall_s = time.perf_counter() - start_wall
+        virtual_s = self.clock.now - start_virtual
+        report = self.report(virtual_s, wall_s)
+
+        if self.options["report"]:
+            with open(self.options["report"], 'w') as f:
+                json.dump(report, f, indent=2)
+        return report
+
+    def report(self, virtual_s: float, wall_s: float) -> dict:
+        report = {
+            "run": {
+                "strategy": self.strategy_name,
+                "asset": self.asset,
+                "ticks": self.ticks,
+                "virtual_s": virtual_s,
+                "wall_s": wall_s,
+                "speedup": virtual_s / wall_s if wall_s > 0 else 0.0,
+                "options": {k: v for k, v in self.options.items() if k not in ("verbose", "report")},
+                "error": self.strategy_error,
+            },
+            "hedge": self.hedge.summary(),
+        }
+        for name, venue in self.venues.items():
+            report[name] = venue_report(venue, self.symbols[name])
+        report["net_pnl"] = round(sum(report[name]["net_pnl"] for name in self.venues), 6)
+        if self.strategy_stats:
+            report["strategy"] = self.strategy_stats
+        return report
+
+
+def run_backtest(capture: str, strategy: str, strategy_overrides: dict = None, **options) -> dict:
+    """Один прогон; для перебора параметров вызывается в цикле с разными overrides/options"""
+    return Backtester(capture, strategy, strategy_overrides, **options).run()
+
+
+def parse_options(args):
+    """key=value: параметры BACKTEST_DEFAULTS отдельно, остальное — поля trading_/scalp_parameters"""
+    options, overrides = {}, {}
+    strategy_keys = set(DEFAULT_CONFIG["trading_parameters"]) | set(DEFAULT_CONFIG["scalp_parameters"])
+    for arg in args:
+        key, _, raw = arg.partition("=")
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        if key in BACKTEST_DEFAULTS:
+            options[key] = value
+        elif key in strategy_keys:
+            overrides[key] = value
+        else:
+            raise ValueError(f"Неизвестный параметр {key}")
+    return options, overrides
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage:")
+        print(f"  python backtest.py capture.bin {{{'|'.join(STRATEGIES)}}} [key=value ...]")
+        print(f"  Симуляция: {', '.join(BACKTEST_DEFAULTS)}")
+        print(f"  Стратегия: {', '.join(DEFAULT_CONFIG['trading_parameters'])}, "
+              f"{', '.join(DEFAULT_CONFIG['scalp_parameters'])}")
+        sys.exit(1)
+
+    options, overrides = parse_options(sys.argv[3:])
+    print_report(run_backtest(sys.argv[1], sys.argv[2], overrides, **options))
@@ -0,0 +1,65 @@
+import json
+import os
+import platform
+import time
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+# Метрики, которые сравниваются с базовой линией
+COMPARED = ("p50_ms", "p99_ms", "p999_ms")
+
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def load_baseline(name: str):
+    path = baseline_path(name)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_baseline(name: str, stages: dict, meta: dict = None) -> str:
+    """stages — {stage: LatencyWindow.snapshot()}; рядом пишется окружение прогона"""
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = baseline_path(name)
+    with open(path, 'w') as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.node(),
+            "meta": meta or {},
+            "stages": stages,
+        }, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def compare(stages: dict, baseline: dict, tolerance: float = 0.2, min_delta_ms: float = 0.05) -> list:
+    """
+    Регрессии относительно базовой линии: метрика выросла больше чем на tolerance (доля)
+    и больше чем на min_delta_ms — шум в сотые доли миллисекунды регрессией не считается.
+
+    :return: [(stage, metric, baseline_ms, current_ms)]
+    """
+    regressions = []
+    for stage, current in stages.items():
+        base = baseline["stages"].get(stage)
+        if not base:
+            continue
+        for metric in COMPARED:
+            before, after = base.get(metric, 0.0), current.get(metric, 0.0)
+            if after > before * (1 + tolerance) and after - before > min_delta_ms:
+                regressions.append((stage, metric, before, after))
+    return regressions
+
+
+def print_table(stages: dict, baseline: dict = None):
+    print(f"  {'этап':<10}{'count':>8}{'avg':>10}{'p50':>10}{'p99':>10}{'p999':>10}{'max':>10}   (мс)")
+    for stage, s in stages.items():
+        line = (f"  {stage:<10}{s['count']:>8}{s['avg_ms']:>10.3f}{s['p50_ms']:>10.3f}"
+                f"{s['p99_ms']:>10.3f}{s['p999_ms']:>10.3f}{s['max_ms']:>10.3f}")
+        base = baseline["stages"].get(stage) if baseline else None
+        if base and base.get("p99_ms"):
+            line += f"   p99 {(s['p99_ms'] / base['p99_ms'] - 1) * 100:+.0f}% к базе"
+        print(line)
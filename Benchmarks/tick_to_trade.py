@@ -0,0 +1,287 @@
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+from Benchmarks.Baseline import compare, load_baseline, print_table, save_baseline
+from Monitoring.FeedLatency import receive_time
+from Monitoring.Metrics import LatencyWindow
+from Replay.FrameCapture import read_frames
+from Replay.replay import ReplayDriver
+
+# Этапы пути тик → ордер, в порядке прохождения
+STAGES = ("handle", "persist", "read", "decide", "order", "total")
+
+BENCH_DEFAULTS = {
+    "ticks": 2000,
+    "warmup": 200,
+    "asset": "ETH",
+    "mid": 3000.0,
+    "qty": 0.01,
+    # Лимитки ставятся на таком расстоянии от вершины книги, чтобы гарантированно не исполниться
+    "offset": 0.05,
+    "source": "synthetic",
+    "baseline": "tick_to_trade",
+    "save": 0,
+    "tolerance": 0.2,
+    "seed": 1,
+}
+
+
+def synthetic_frames(asset: str, mid: float, count: int, seed: int = None, levels: int = 10):
+    """
+    Кадры в формате захвата (key, frame): depth10 Binance и l2Book Hyperliquid по очереди,
+    mid — случайное блуждание по 1 bps.
+    """
+    rng = random.Random(seed)
+    symbol = asset.upper() + "USDT"
+    for i in range(count):
+        mid *= 1 + rng.gauss(0, 0.0001)
+        ts_ms = int(time.time() * 1000)
+        bids = [[round(mid * (1 - 0.0001 * (n + 1)), 2), round(rng.uniform(0.5, 5), 3)] for n in range(levels)]
+        asks = [[round(mid * (1 + 0.0001 * (n + 1)), 2), round(rng.uniform(0.5, 5), 3)] for n in range(levels)]
+        if i % 2 == 0:
+            yield f"binance:depth:{symbol}", json.dumps({
+                "e": "depthUpdate", "E": ts_ms, "s": symbol,
+                "b": [[str(p), str(q)] for p, q in bids],
+                "a": [[str(p), str(q)] for p, q in asks],
+            })
+        else:
+            yield "hyperliquid", json.dumps({"channel": "l2Book", "data": {
+                "coin": asset.upper(), "time": ts_ms,
+                "levels": [[{"px": str(p), "sz": str(q), "n": 1} for p, q in bids],
+                           [{"px": str(p), "sz": str(q), "n": 1} for p, q in asks]],
+            }})
+
+
+def captured_frames(path: str, asset: str, count: int):
+    """Кадры книг выбранной монеты из файла FrameRecorder, не больше count"""
+    symbol = asset.upper() + "USDT"
+    produced = 0
+    for _, key, frame in read_frames(path):
+        if produced >= count:
+            return
+        text = frame.decode("utf-8")
+        if key == f"binance:depth:{symbol}":
+            yield key, text
+            produced += 1
+        elif key == "hyperliquid" and '"l2Book"' in text and json.loads(text)["data"].get("coin") == asset.upper():
+            yield key, text
+            produced += 1
+
+
+def time_persist(client, window: LatencyWindow):
+    """Оборачивает db.save_orderbook клиента: запись книги в Dragonfly замеряется отдельно от разбора"""
+    save_orderbook = client.db.save_orderbook
+
+    async def timed(*args, **kwargs):
+        start = time.monotonic_ns()
+        try:
+            return await save_orderbook(*args, **kwargs)
+        finally:
+            window.observe(time.monotonic_ns() - start)
+
+    client.db.save_orderbook = timed
+
+
+class TickToTrade:
+    """
+    Путь одного тика, как в FindDeal: WS кадр → обработчик клиента (разбор + Dragonfly) →
+    чтение обеих книг через InfoClient → проверка спреда → лимитки на обе ноги (REST заглушек).
+    Ордера ставятся на каждом тике вне зависимости от решения, чтобы этап order был измерен всегда.
+    """
+
+    def __init__(self, options: dict):
+        self.options = options
+        self.asset = options["asset"].upper()
+        self.windows = {stage: LatencyWindow(size=options["ticks"]) for stage in STAGES}
+        self._persist = LatencyWindow(size=options["ticks"] * 2)
+        self.errors = 0
+        self.signals = 0
+
+    async def setup(self):
+        from eth_account import Account
+        from CexWsClients.AsyncBinanceWSClient import AsyncBinanceWSClient
+        from CexWsClients.AsyncHyperliquidWSClient import AsyncHyperliquidWSClient
+        from InfoClients.AsyncBinanceInfoClient import AsyncBinanceInfoClient
+        from InfoClients.AsyncHyperliquidInfoClient import AsyncHyperliquidInfoClient
+        from MockExchange.run_mock import MockExchanges
+        sys.path.insert(0, os.path.join(ROOT, "Scalper"))
+        from Scalper import MIN_SPREAD, find_spreads
+
+        self.min_spread = MIN_SPREAD
+        self.find_spreads = find_spreads
+
+        capture = None if self.options["source"] == "synthetic" else self.options["source"]
+        self.exchanges = MockExchanges(capture, symbols={self.asset: self.options["mid"]}, seed=self.options["seed"])
+        await self.exchanges.start(binance_port=0, hyperliquid_port=0, bybit_port=0, extended_port=0)
+
+        self.binance = AsyncBinanceWSClient("bench", "bench", rest_url=self.exchanges.binance.url,
+                                            ws_url=self.exchanges.binance.ws_url)
+        account = Account.create()
+        self.hyperliquid = AsyncHyperliquidWSClient(wallet=account, account_address=account.address,
+                                                    base_url=self.exchanges.hyperliquid.url)
+        self.binance_info = AsyncBinanceInfoClient(self.binance.db)
+        self.hyperliquid_info = AsyncHyperliquidInfoClient(self.hyperliquid.db)
+
+        time_persist(self.binance, self._persist)
+        time_persist(self.hyperliquid, self._persist)
+
+        # Обработчики берутся из ReplayDriver — ровно те же вызовы, что и при проигрывании захвата
+        self.driver = ReplayDriver(capture or "")
+        self.driver.attach_binance(self.binance)
+        self.driver.attach_hyperliquid(self.hyperliquid)
+
+        # Прогрев соединений и кеша точности символа, чтобы первый ордер не платил за них
+        await self.binance.connect_ws()
+        await self.binance.get_symbol_info(self.asset)
+        await self.hyperliquid.get_symbol_info(self.asset)
+
+    async def teardown(self):
+        for client in (self.binance, self.hyperliquid):
+            try:
+                await client.close()
+            except Exception as e:
+                print(f"⚠️ Ошибка закрытия {client.__class__.__name__}: {e}")
+        await self.exchanges.stop()
+
+    async def tick(self, key: str, frame: str, measure: bool) -> bool:
+        handler = self.driver._handler_for(key)
+        if handler is None:
+            return False
+
+        received = receive_time()
+        arrived = received[1]
+
+        await handler(key, frame, received)
+        handled = time.monotonic_ns()
+
+        book1, book2 = await asyncio.gather(self.binance_info.get_orderbook(self.asset),
+                                            self.hyperliquid_info.get_orderbook(self.asset))
+        read = time.monotonic_ns()
+        if not (book1["bids"] and book1["asks"] and book2["bids"] and book2["asks"]):
+            # Пока не пришла книга второй биржи — решать не из чего
+            return False
+
+        bid1, ask1 = float(book1["bids"][0][0]), float(book1["asks"][0][0])
+        bid2, ask2 = float(book2["bids"][0][0]), float(book2["asks"][0][0])
+        spread1, spread2 = self.find_spreads(bid1, ask1, bid2, ask2)
+        if spread1 > self.min_spread or spread2 > self.min_spread:
+            self.signals += 1
+        decided = time.monotonic_ns()
+
+        offset, qty = self.options["offset"], self.options["qty"]
+        results = await asyncio.gather(
+            self.binance.place_limit_order(self.asset, "long", round(bid1 * (1 - offset), 2), qty),
+            # Hyperliquid принимает цену не длиннее 5 значащих цифр
+            self.hyperliquid.place_limit_order(self.asset, "short", float(f"{ask2 * (1 + offset):.5g}"), qty),
+            return_exceptions=True)
+        ordered = time.monotonic_ns()
+
+        if measure:
+            self.windows["handle"].observe(handled - arrived)
+            self.windows["read"].observe(read - handled)
+            self.windows["decide"].observe(decided - read)
+            self.windows["order"].observe(ordered - decided)
+            self.windows["total"].observe(ordered - arrived)
+
+        await self._cancel(results)
+        return True
+
+    async def _cancel(self, results):
+        """Снимает выставленные лимитки вне замера, чтобы книга заглушки не копила ордера"""
+        binance_order, hyperliquid_order = results
+        if isinstance(binance_order, Exception) or isinstance(hyperliquid_order, Exception):
+            self.errors += 1
+        try:
+            if isinstance(binance_order, dict):
+                await self.binance.cancel_order(self.asset, str(binance_order["orderId"]))
+            if isinstance(hyperliquid_order, dict) and hyperliquid_order.get("orderId"):
+                await self.hyperliquid.cancel_order(self.asset, hyperliquid_order["orderId"])
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Ошибка отмены: {e}")
+
+    async def run(self) -> dict:
+        options = self.options
+        total = options["warmup"] + options["ticks"]
+        if options["source"] == "synthetic":
+            frames = synthetic_frames(self.asset, options["mid"], total, seed=options["seed"])
+        else:
+            frames = captured_frames(options["source"], self.asset, total)
+
+        await self.setup()
+        start = time.monotonic()
+        done = 0
+        try:
+            for key, frame in frames:
+                if done == options["warmup"]:
+                    self._persist.reset()
+                if await self.tick(key, frame, measure=done >= options["warmup"]):
+                    done += 1
+        finally:
+            await self.teardown()
+
+        stages = {stage: window.snapshot() for stage, window in self.windows.items()}
+        stages["persist"] = self._persist.snapshot()
+        return {
+            "stages": {stage: stages[stage] for stage in STAGES},
+            "ticks": max(0, done - options["warmup"]),
+            "signals": self.signals,
+            "errors": self.errors,
+            "seconds": time.monotonic() - start,
+        }
+
+
+def parse_options(args) -> dict:
+    options = dict(BENCH_DEFAULTS)
+    for arg in args:
+        key, _, value = arg.partition("=")
+        if key not in options:
+            raise ValueError(f"Неизвестный параметр {key}")
+        default = BENCH_DEFAULTS[key]
+        options[key] = type(default)(value) if not isinstance(default, str) else value
+    return options
+
+
+async def main(options: dict) -> int:
+    result = await TickToTrade(options).run()
+    baseline = load_baseline(options["baseline"])
+
+    print(f"\n⏱️ Tick-to-trade {options['asset']} ({options['source']}): {result['ticks']} тиков "
+          f"за {result['seconds']:.1f}s, сигналов {result['signals']}, ошибок {result['errors']}")
+    print_table(result["stages"], baseline)
+
+    if options["save"]:
+        meta = {key: options[key] for key in ("ticks", "warmup", "asset", "source")}
+        print(f"💾 Базовая линия сохранена: {save_baseline(options['baseline'], result['stages'], meta)}")
+        return 0
+    if baseline is None:
+        print(f"⚠️ Базовой линии {options['baseline']} нет — запустите с save=1")
+        return 0
+
+    regressions = compare(result["stages"], baseline, tolerance=options["tolerance"])
+    for stage, metric, before, after in regressions:
+        print(f"❌ Регрессия {stage} {metric}: {before:.3f} → {after:.3f} мс")
+    if not regressions:
+        print("✅ Регрессий относительно базовой линии нет")
+    return 1 if regressions else 0
+
+
+if sys.platform == "win32":
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        print("Usage:")
+        print("  python tick_to_trade.py [key=value ...]")
+        print("  python tick_to_trade.py ticks=5000 save=1")
+        print("  python tick_to_trade.py source=capture.bin asset=BTC tolerance=0.3")
+        print(f"Параметры: {', '.join(f'{k}={v}' for k, v in BENCH_DEFAULTS.items())}")
+        sys.exit(0)
+
+    sys.exit(asyncio.run(main(parse_options(sys.argv[1:]))))
@@ -1,23 +1,50 @@
 import asyncio
 import json
 import logging
+import os
 import time
 import zmq
 import hmac
 import hashlib
 import urllib.parse
+from contextlib import asynccontextmanager
 import aiohttp
 import websockets
-from DragonflyDb.DragonFlyConnector import DragonFlyConnector
+from DragonflyDb.DragonFlyConnector import FUNDING_MAX_AGE_MS, DragonFlyConnector
+from CexWsClients.RateLimitGovernor import CANCEL, INFO, ORDER, get_governor
+from CexWsClients.ServerTime import get_clock
+from Execution.FillEvents import bind_order, track_order
+from Monitoring.FeedLatency import receive_time, stamp_event
+from Monitoring.Telemetry import count_reconnect, instrument_zmq, traced_order
+from Replay.FrameCapture import get_env_recorder
 from binance import AsyncClient, BinanceSocketManager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Период финансирования USDT-M фьючерсов по умолчанию
+FUNDING_INTERVAL_HOURS = 8
+# Binance держит listen key 60 минут после последнего продления
+LISTEN_KEY_KEEPALIVE_SECONDS = 30 * 60
+# Соединение user stream рвется биржей через 24 часа — меняем его заранее
+USER_STREAM_ROTATE_SECONDS = 23 * 60 * 60
+USER_STREAM_HEARTBEAT_SECONDS = 20
+# Адреса USDT-M фьючерсов; переменные окружения позволяют направить клиента на MockExchange
+BINANCE_REST_URL = "https://fapi.binance.com"
+BINANCE_WS_URL = "wss://fstream.binance.com"
+# /fapi/v1/batchOrders принимает не больше 5 ордеров за запрос
+BATCH_ORDERS_LIMIT = 5
+# exchangeInfo тяжелый, а точности и фильтры меняются редко — переиспользуем ответ
+EXCHANGE_INFO_TTL_S = 300
+# Код ошибки Binance: timestamp подписанного запроса вне recvWindow
+TIMESTAMP_OUTSIDE_RECV_WINDOW = -1021
+
 class AsyncBinanceWSClient:
-    def __init__(self, api_key: str, api_secret: str):
+    def __init__(self, api_key: str, api_secret: str, rest_url: str = None, ws_url: str = None):
         self.api_key = api_key
         self.api_secret = api_secret
+        self.rest_url = rest_url or os.getenv("BINANCE_REST_URL", BINANCE_REST_URL)
+        self.ws_url = ws_url or os.getenv("BINANCE_WS_URL", BINANCE_WS_URL)
         self.client = None
         self.bm = None
         self.AsyncClient = AsyncClient
@@ -26,14 +53,27 @@ class AsyncBinanceWSClient:
         self.order_tasks = {}
         self.running_orderbooks = {}
         self.orderbook_tasks = {}
+        self.bbo_tasks = {}
+        self.mark_price_tasks = {}
+        self.capture = get_env_recorder()
         self.db = DragonFlyConnector("binance")
         context = zmq.Context()
         self.zmq_socket = context.socket(zmq.PUSH)
         self.zmq_socket.connect("tcp://127.0.0.1:5555")
+        self.zmq_socket = instrument_zmq(self.zmq_socket, "binance")
         self.session = None
+        # Общий на процесс регулятор веса REST: ордера и отмены вперед информационных запросов
+        self.limits = get_governor("binance")
+        # Часы сервера: timestamp и recvWindow подписанных запросов с поправкой на смещение
+        self.clock = get_clock("binance")
+        self._exchange_info_cache = None
         self._initialized = False
         self.listen_key = None
         self.user_stream_task = None
+        self.keepalive_task = None
+        self._user_ws = None
+        self.positions = {}
+        self.balances = {}
 
     def _sign_request(self, params):
         query_string = urllib.parse.urlencode(params)
@@ -44,6 +84,25 @@ class AsyncBinanceWSClient:
         ).hexdigest()
         return signature
 
+    @asynccontextmanager
+    async def _request(self, method: str, url: str, weight: int = 1, priority: str = INFO, orders: int = 0,
+                       **kwargs):
+        """
+        Запрос REST через регулятор веса Binance; подписанные параметры переподписываются после ожидания.
+        -1021 (timestamp вне recvWindow) — часы немедленно сверяются заново.
+        """
+        async with self.limits.request(self.session, method, url, weight, priority, orders,
+                                       sign=self._sign_request, **kwargs) as response:
+            if response.status == 400 and "signature" in (kwargs.get("params") or {}):
+                data = await response.json(content_type=None)
+                if isinstance(data, dict) and data.get("code") == TIMESTAMP_OUTSIDE_RECV_WINDOW:
+                    self.clock.resync()
+            yield response
+
+    async def _server_time(self) -> int:
+        async with self._request("GET", f"{self.rest_url}/fapi/v1/time") as response:
+            return (await response.json())["serverTime"]
+
     async def _create_session(self):
         """Создание aiohttp сессии с проверками"""
         try:
@@ -68,10 +127,13 @@ class AsyncBinanceWSClient:
             await self._create_session()
 
             if not self._initialized:
-                self.client = await self.AsyncClient.create(self.api_key, self.api_secret)
-                self.bm = self.BinanceSocketManager(self.client)
+                # python-binance всегда ходит на боевой API — с локальным адресом (mock) не создаем
+                if self.rest_url == BINANCE_REST_URL:
+                    self.client = await self.AsyncClient.create(self.api_key, self.api_secret)
+                    self.bm = self.BinanceSocketManager(self.client)
                 self._initialized = True
                 print(f"✅ Binance клиент инициализирован")
+                self.clock.start(self._server_time)
 
                 # Только после успешной инициализации запускаем user stream
                 await self._start_user_stream()
@@ -87,11 +149,11 @@ class AsyncBinanceWSClient:
         if self.session is None or self.session.closed:
             await self._create_session()
 
-        url = "https://fapi.binance.com/fapi/v1/listenKey"
+        url = f"{self.rest_url}/fapi/v1/listenKey"
         headers = {"X-MBX-APIKEY": self.api_key}
 
         try:
-            async with self.session.post(url, headers=headers) as resp:
+            async with self._request("POST", url, priority=ORDER, headers=headers) as resp:
                 data = await resp.json()
                 return data["listenKey"]
         except Exception as e:
@@ -100,71 +162,190 @@ class AsyncBinanceWSClient:
             await self._create_session()
             raise
 
+    async def _keepalive_listen_key(self) -> bool:
+        """Продлевает текущий listen key еще на 60 минут. False — ключ уже недействителен."""
+        if self.session is None or self.session.closed:
+            await self._create_session()
+
+        url = f"{self.rest_url}/fapi/v1/listenKey"
+        headers = {"X-MBX-APIKEY": self.api_key}
+
+        async with self._request("PUT", url, priority=ORDER, headers=headers) as resp:
+            data = await resp.json()
+            if resp.status != 200 or data.get("code"):
+                print(f"⚠️ Не удалось продлить listen key: {data}")
+                return False
+            return True
+
     async def _start_user_stream(self):
-        """Запуск user stream с проверками"""
+        """Запуск user stream и фонового продления listen key"""
         if self.user_stream_task and not self.user_stream_task.done():
             return
 
         print("🔄 Запуск user stream...")
+        self.user_stream_task = asyncio.create_task(self._user_stream_supervisor())
+        self.keepalive_task = asyncio.create_task(self._listen_key_keepalive_loop())
+
+    async def _open_user_stream(self):
+        if self.session is None or self.session.closed:
+            await self._create_session()
 
-        async def _user_stream_handler():
+        self.listen_key = await self._get_listen_key()
+        ws_url = f"{self.ws_url}/ws/{self.listen_key}"
+        ws = await self.session.ws_connect(ws_url, heartbeat=USER_STREAM_HEARTBEAT_SECONDS)
+        print(f"✅ Подключен к user stream {self.listen_key}")
+        return ws
+
+    async def _read_user_stream(self, ws):
+        """Читает сокет до разрыва или события listenKeyExpired"""
+        async for msg in ws:
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                received = receive_time()
+                self._capture_frame("binance:user", msg.data, received)
+                data = json.loads(msg.data)
+                if data.get("e") == "listenKeyExpired":
+                    print("⚠️ Listen key истек, переподключаемся")
+                    return
+                await self._handle_user_stream_message(data, received)
+            elif msg.type == aiohttp.WSMsgType.ERROR:
+                print(f"WebSocket error: {ws.exception()}")
+                return
+
+    async def _user_stream_supervisor(self):
+        """
+        Держит user stream живым. Соединение Binance живет не больше 24 часов,
+        поэтому раз в USER_STREAM_ROTATE_SECONDS открываем новый сокет и только
+        после этого закрываем старый — события в момент ротации не теряются
+        (дубликаты безопасны: save_order не уменьшает исполненный объем).
+        """
+        ws, reader = None, None
+        try:
             while True:
                 try:
-                    # Убеждаемся что сессия существует
-                    if self.session is None or self.session.closed:
-                        await self._create_session()
-
-                    self.listen_key = await self._get_listen_key()
-                    ws_url = f"wss://fstream.binance.com/ws/{self.listen_key}"
-
-                    print(f"✅ Подключен к user stream {self.listen_key}")
-
-                    async with self.session.ws_connect(ws_url) as ws:
-                        async for msg in ws:
-                            if msg.type == aiohttp.WSMsgType.TEXT:
-                                data = json.loads(msg.data)
-                                await self._handle_user_stream_message(data)
-                            elif msg.type == aiohttp.WSMsgType.ERROR:
-                                print(f"WebSocket error: {ws.exception()}")
-                                break
-
+                    new_ws = await self._open_user_stream()
                 except Exception as e:
                     print(f"Ошибка в user stream: {e}")
                     await asyncio.sleep(5)
+                    continue
+
+                new_reader = asyncio.create_task(self._read_user_stream(new_ws))
+                await self._close_user_stream(ws, reader)
+                ws, reader = new_ws, new_reader
+                self._user_ws = ws
 
-        self.user_stream_task = asyncio.create_task(_user_stream_handler())
+                try:
+                    await asyncio.wait_for(asyncio.shield(reader), timeout=USER_STREAM_ROTATE_SECONDS)
+                except asyncio.TimeoutError:
+                    print("🔄 Плановая ротация user stream")
+                    continue
+                except Exception as e:
+                    print(f"Ошибка в user stream: {e}")
 
-    async def _handle_user_stream_message(self, data):
-        """Обработка сообщений user stream"""
-        if data.get("e") == "executionReport":
-            order_id = str(data.get("i"))
+                # Сокет закрылся сам — поднимаем новый
+                count_reconnect("binance", "user")
+                await self._close_user_stream(ws, reader)
+                ws, reader = None, None
+                self._user_ws = None
+                await asyncio.sleep(1)
+        finally:
+            await self._close_user_stream(ws, reader)
 
-            if order_id in self.running_orders:
-                fill_qty = float(data.get("z", 0))
-                avg_price = float(data.get("ap", 0))
-                last_fill_price = float(data.get("L", 0))
-                order_status = data.get("X")
+    @staticmethod
+    async def _close_user_stream(ws, reader):
+        if reader and not reader.done():
+            reader.cancel()
+            try:
+                await reader
+            except asyncio.CancelledError:
+                pass
+        if ws and not ws.closed:
+            await ws.close()
 
-                print(
-                    f"[ORDER STATUS] {order_id}: {order_status} filled={fill_qty} avgPrice={avg_price} lastPrice={last_fill_price}")
+    async def _listen_key_keepalive_loop(self):
+        """Продлевает listen key; если ключ потерян — рвет сокет, супервизор получит новый"""
+        while True:
+            await asyncio.sleep(LISTEN_KEY_KEEPALIVE_SECONDS)
+            try:
+                alive = await self._keepalive_listen_key()
+            except Exception as e:
+                print(f"❌ Ошибка продления listen key: {e}")
+                alive = False
+
+            if not alive and self._user_ws and not self._user_ws.closed:
+                await self._user_ws.close()
+
+    async def _handle_user_stream_message(self, data, received):
+        """Обработка сообщений futures user stream"""
+        event = data.get("e")
+        if event == "ORDER_TRADE_UPDATE":
+            await self._handle_order_trade_update(data, received)
+        elif event == "ACCOUNT_UPDATE":
+            await self._handle_account_update(data)
+
+    async def _handle_order_trade_update(self, data, received):
+        """Ордер: накопленное исполнение и средняя цена сразу в Dragonfly и ZMQ"""
+        order = data.get("o", {})
+        order_id = str(order.get("i"))
+        fill_qty = float(order.get("z", 0))
+        avg_price = float(order.get("ap", 0))
+        last_fill_price = float(order.get("L", 0))
+        order_status = order.get("X")
+        price = avg_price if avg_price > 0 else last_fill_price
+
+        await self.db.save_order(
+            order_id=order_id,
+            fill_sz=fill_qty,
+            price=price,
+            status=order_status,
+            orig_sz=float(order.get("q", 0)) or None
+        )
+
+        self.zmq_socket.send_json(stamp_event("binance", "fill", {
+            "exchange": "binance",
+            "type": "order",
+            "orderId": order_id,
+            "clientOrderId": order.get("c"),
+            "symbol": order.get("s"),
+            "fillSz": fill_qty,
+            "lastFillSz": float(order.get("l", 0)),
+            "price": price,
+            "status": order_status
+        }, data.get("E"), received))
 
-                await self.db.save_order(
-                    order_id=order_id,
-                    fill_sz=fill_qty,
-                    price=avg_price if avg_price > 0 else last_fill_price
-                )
+        if order_id in self.running_orders:
+            print(f"[ORDER STATUS] {order_id}: {order_status} filled={fill_qty} avgPrice={avg_price} lastPrice={last_fill_price}")
+            if order_status in ["FILLED", "CANCELED", "EXPIRED"]:
+                await self.unsubscribe_order(order_id)
+
+    async def _handle_account_update(self, data):
+        """Балансы и позиции из ACCOUNT_UPDATE: кеш в памяти + Dragonfly"""
+        account = data.get("a", {})
+
+        for balance in account.get("B", []):
+            self.balances[balance["a"]] = {
+                "wallet": float(balance.get("wb", 0)),
+                "cross_wallet": float(balance.get("cw", 0)),
+            }
 
-                self.zmq_socket.send_json({
-                    "exchange": "binance",
-                    "type": "order",
-                    "orderId": order_id,
-                    "fillSz": fill_qty,
-                    "price": avg_price if avg_price > 0 else last_fill_price,
-                    "status": order_status
-                })
+        for raw in account.get("P", []):
+            amount = float(raw.get("pa", 0))
+            position = {
+                "symbol": raw["s"],
+                "size": abs(amount),
+                "side": "long" if amount > 0 else "short" if amount < 0 else None,
+                "avg_price": float(raw.get("ep", 0)),
+                "unrealized_pnl": float(raw.get("up", 0)),
+                "position_side": raw.get("ps"),
+                "update_time": data.get("T"),
+            }
+            self.positions[raw["s"]] = position
+            await self.db.save_position(raw["s"], position)
 
-                if order_status in ["FILLED", "CANCELED", "EXPIRED"]:
-                    await self.unsubscribe_order(order_id)
+            self.zmq_socket.send_json({
+                "exchange": "binance",
+                "type": "position",
+                **position
+            })
 
     async def subscribe_order(self, order_id: str):
         """Простая подписка на ордер"""
@@ -193,15 +374,15 @@ class AsyncBinanceWSClient:
         ws_symbol = full_symbol.lower()
 
         # Получаем начальный snapshot
-        url = f"https://fapi.binance.com/fapi/v1/depth?symbol={full_symbol}&limit=1000"
+        url = f"{self.rest_url}/fapi/v1/depth?symbol={full_symbol}&limit=1000"
 
         try:
-            async with self.session.get(url) as response:
+            async with self._request("GET", url, weight=20) as response:
                 if response.status == 200:
                     data = await response.json()
                     bids = [[float(p), float(q)] for p, q in data.get("bids", [])[:10]]
                     asks = [[float(p), float(q)] for p, q in data.get("asks", [])[:10]]
-                    await self.db.save_orderbook(full_symbol, bids, asks)
+                    await self.db.save_orderbook(full_symbol, bids, asks, exchange_ts=data.get("E"))
                     print(f"✅ Начальный ордербук {full_symbol}: bids={len(bids)}, asks={len(asks)}")
                 else:
                     print(f"❌ Ошибка получения ордербука {full_symbol}: {await response.text()}")
@@ -210,7 +391,7 @@ class AsyncBinanceWSClient:
             raise
 
         # Запускаем WebSocket для обновлений
-        ws_url = f"wss://fstream.binance.com/ws/{ws_symbol}@depth10@100ms"
+        ws_url = f"{self.ws_url}/ws/{ws_symbol}@depth10@100ms"
         self.running_orderbooks[full_symbol] = True
         self.orderbook_tasks[full_symbol] = asyncio.create_task(self._listen(full_symbol, ws_url))
 
@@ -222,24 +403,119 @@ class AsyncBinanceWSClient:
                     async for msg in ws:
                         if not self.running_orderbooks.get(save_symbol):
                             break
+                        received = receive_time()
+                        self._capture_frame(f"binance:depth:{save_symbol}", msg, received)
                         try:
-                            data = json.loads(msg)
-                            bids = [[float(p), float(q)] for p, q in data.get("b", [])[:10]]
-                            asks = [[float(p), float(q)] for p, q in data.get("a", [])[:10]]
-                            if bids and asks:
-                                await self.db.save_orderbook(save_symbol, bids, asks)
-                                self.zmq_socket.send_json({
-                                    "exchange": "binance",
-                                    "coin": save_symbol,
-                                    "bids": bids,
-                                    "asks": asks,
-                                })
+                            await self._handle_depth_message(save_symbol, msg, received)
                         except Exception as e:
                             print(f"Ошибка обработки сообщения {save_symbol}: {e}")
             except Exception as e:
                 print(f"Ошибка WebSocket {save_symbol}: {e}")
+                count_reconnect("binance", "depth")
                 await asyncio.sleep(1)
 
+    async def _handle_depth_message(self, save_symbol, msg, received):
+        data = json.loads(msg)
+        bids = [[float(p), float(q)] for p, q in data.get("b", [])[:10]]
+        asks = [[float(p), float(q)] for p, q in data.get("a", [])[:10]]
+        if bids and asks:
+            await self.db.save_orderbook(save_symbol, bids, asks, exchange_ts=data.get("E"))
+            self.zmq_socket.send_json(stamp_event("binance", "book", {
+                "exchange": "binance",
+                "coin": save_symbol,
+                "bids": bids,
+                "asks": asks,
+            }, data.get("E"), received))
+
+    async def subscribe_bbo(self, symbol):
+        """
+        Подписка на bookTicker — лучший bid/ask в реальном времени без троттлинга.
+        Глубина продолжает идти отдельным, более медленным потоком depth10@100ms.
+        """
+        full_symbol = symbol.upper() if symbol.endswith("USDT") else (symbol + "USDT").upper()
+        if full_symbol in self.bbo_tasks and not self.bbo_tasks[full_symbol].done():
+            return
+
+        ws_url = f"{self.ws_url}/ws/{full_symbol.lower()}@bookTicker"
+        self.bbo_tasks[full_symbol] = asyncio.create_task(
+            self._listen_stream(full_symbol, ws_url, "bbo", self._handle_bbo_message)
+        )
+
+    async def subscribe_mark_price(self, symbol):
+        """Подписка на markPrice@1s: mark/index price и текущая ставка funding в кеш"""
+        full_symbol = symbol.upper() if symbol.endswith("USDT") else (symbol + "USDT").upper()
+        if full_symbol in self.mark_price_tasks and not self.mark_price_tasks[full_symbol].done():
+            return
+
+        ws_url = f"{self.ws_url}/ws/{full_symbol.lower()}@markPrice@1s"
+        self.mark_price_tasks[full_symbol] = asyncio.create_task(
+            self._listen_stream(full_symbol, ws_url, "mark", self._handle_mark_price_message)
+        )
+
+    async def _listen_stream(self, save_symbol, url, stream, handler):
+        """WebSocket слушатель одного потока символа (bookTicker, markPrice) до отмены задачи"""
+        while True:
+            try:
+                async with websockets.connect(url) as ws:
+                    async for msg in ws:
+                        received = receive_time()
+                        self._capture_frame(f"binance:{stream}:{save_symbol}", msg, received)
+                        try:
+                            await handler(save_symbol, msg, received)
+                        except Exception as e:
+                            print(f"Ошибка обработки {stream} {save_symbol}: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Ошибка WebSocket {stream} {save_symbol}: {e}")
+                count_reconnect("binance", stream)
+                await asyncio.sleep(1)
+
+    async def _handle_bbo_message(self, save_symbol, msg, received):
+        data = json.loads(msg)
+        bid, bid_qty = float(data["b"]), float(data["B"])
+        ask, ask_qty = float(data["a"]), float(data["A"])
+        await self.db.save_bbo(save_symbol, bid, bid_qty, ask, ask_qty, exchange_ts=data.get("E"))
+        self.zmq_socket.send_json(stamp_event("binance", "bbo", {
+            "exchange": "binance",
+            "type": "bbo",
+            "coin": save_symbol,
+            "bid": bid,
+            "bidQty": bid_qty,
+            "ask": ask,
+            "askQty": ask_qty,
+        }, data.get("E"), received))
+
+    async def _handle_mark_price_message(self, save_symbol, msg, received):
+        data = json.loads(msg)
+        await self.db.save_funding(
+            save_symbol,
+            mark=float(data["p"]),
+            funding_rate=float(data["r"] or 0),
+            interval_hours=FUNDING_INTERVAL_HOURS,
+            index_price=float(data.get("i") or 0),
+            next_funding_ts=data.get("T"),
+            exchange_ts=data.get("E")
+        )
+
+    def enable_capture(self, recorder):
+        """Пишет все сырые WS кадры клиента в FrameRecorder (см. Replay/FrameCapture.py)"""
+        self.capture = recorder
+
+    def _capture_frame(self, key, frame, received):
+        if self.capture is not None:
+            self.capture.record(key, frame, received[0])
+
+    async def unsubscribe_bbo(self, symbol: str):
+        full_symbol = symbol.upper() if symbol.endswith("USDT") else (symbol + "USDT").upper()
+        task = self.bbo_tasks.pop(full_symbol, None)
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
     async def unsubscribe_orderbook(self, symbol: str):
         """Отписка от ордербука"""
         symbol = symbol.lower()
@@ -263,42 +539,106 @@ class AsyncBinanceWSClient:
                 except asyncio.CancelledError:
                     print(f"Task for {symbol} cancelled")
 
-        if self.user_stream_task and not self.user_stream_task.done():
-            self.user_stream_task.cancel()
+        for symbol in list(self.bbo_tasks.keys()):
+            await self.unsubscribe_bbo(symbol)
+
+        for task in self.mark_price_tasks.values():
+            if not task.done():
+                task.cancel()
+
+        await self.clock.stop()
+
+        for task in (self.keepalive_task, self.user_stream_task):
+            if task and not task.done():
+                task.cancel()
+        if self._user_ws and not self._user_ws.closed:
+            await self._user_ws.close()
 
         if self.session and not self.session.closed:
             await self.session.close()
         if self.client:
             await self.client.close_connection()
 
+    async def _exchange_info(self) -> dict:
+        """exchangeInfo из кеша, раз в EXCHANGE_INFO_TTL_S — заново с биржи"""
+        cached = self._exchange_info_cache
+        if cached is not None and time.monotonic() - cached[0] < EXCHANGE_INFO_TTL_S:
+            return cached[1]
+
+        url = f"{self.rest_url}/fapi/v1/exchangeInfo"
+        async with self._request("GET", url) as response:
+            data = await response.json()
+        if "symbols" in data:
+            self._exchange_info_cache = (time.monotonic(), data)
+        return data
+
     async def _get_symbol_precision(self, symbol: str):
         """Получение precision с проверкой сессии"""
         if self.session is None or self.session.closed:
             await self._create_session()
 
         full_symbol = symbol.upper() + "USDT"
-        url_info = f"https://fapi.binance.com/fapi/v1/exchangeInfo"
-
-        async with self.session.get(url_info) as response:
-            data = await response.json()
-            for s in data['symbols']:
-                if s['symbol'] == full_symbol:
-                    return s['quantityPrecision'], s['pricePrecision']
-            raise ValueError(f"Symbol {full_symbol} not found")
+        data = await self._exchange_info()
+        for s in data['symbols']:
+            if s['symbol'] == full_symbol:
+                return s['quantityPrecision'], s['pricePrecision']
+        raise ValueError(f"Symbol {full_symbol} not found")
 
     # ============= ОСТАЛЬНЫЕ МЕТОДЫ С ПРОВЕРКОЙ СЕССИИ =============
 
-    async def place_limit_order(self, symbol: str, side: str, price: float, qty: float):
+    @traced_order("binance")
+    async def place_limit_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
+        await self.connect_ws()
+        full_symbol = symbol.upper() + "USDT"
+        client_order_id = track_order("binance", client_order_id)
+
+        qty_prec, price_prec = await self._get_symbol_precision(symbol)
+
+        params = {
+            "symbol": full_symbol,
+            "side": "BUY" if side.lower() == "long" else "SELL",
+            "type": "LIMIT",
+            "quantity": round(qty, qty_prec),
+            "price": round(price, price_prec),
+            "timeInForce": "GTC",
+            "newClientOrderId": client_order_id,
+            **self.clock.stamp()
+        }
+        params["signature"] = self._sign_request(params)
+        headers = {"X-MBX-APIKEY": self.api_key}
+        url = f"{self.rest_url}/fapi/v1/order"
+
+        async with self._request("POST", url, priority=ORDER, orders=1, params=params, headers=headers) as response:
+            result = await response.json()
+
+            if "orderId" not in result:
+                raise Exception(f"Ошибка размещения ордера: {result}")
+
+            order_id = str(result["orderId"])
+            bind_order("binance", client_order_id, order_id)
+            self.running_orders[order_id] = True
+
+            await self.db.save_order(
+                order_id=order_id,
+                fill_sz=float(result.get("executedQty", 0)),
+                price=float(result.get("avgPrice", 0)) if float(result.get("avgPrice", 0)) > 0 else float(
+                    result.get("price", 0)),
+                status=result.get("status"),
+                orig_sz=float(result.get("origQty", 0)) or None
+            )
+
             return {
                 "orderId": result['orderId'],
+                "clientOrderId": client_order_id,
                 "symbol": result['symbol'],
                 "qty": result['origQty']
             }
 
-    async def place_market_order(self, symbol: str, side: str, qty: float):
+    @traced_order("binance")
+    async def place_market_order(self, symbol: str, side: str, qty: float, client_order_id: str = None):
         await self.connect_ws()
         full_symbol = symbol.upper() + "USDT"
-        timestamp = int(time.time() * 1000)
+        client_order_id = track_order("binance", client_order_id)
 
         qty_prec, _ = await self._get_symbol_precision(symbol)
 
@@ -307,32 +647,216 @@ class AsyncBinanceWSClient:
             "side": "BUY" if side.lower() == "long" else "SELL",
             "type": "MARKET",
             "quantity": round(qty, qty_prec),
-            "timestamp": timestamp
+            "newClientOrderId": client_order_id,
+            **self.clock.stamp()
         }
         params["signature"] = self._sign_request(params)
         headers = {"X-MBX-APIKEY": self.api_key}
-        url = f"https://fapi.binance.com/fapi/v1/order"
+        url = f"{self.rest_url}/fapi/v1/order"
 
-        async with self.session.post(url, params=params, headers=headers) as response:
+        async with self._request("POST", url, priority=ORDER, orders=1, params=params, headers=headers) as response:
             result = await response.json()
 
             if "orderId" in result:
                 order_id = str(result["orderId"])
+                bind_order("binance", client_order_id, order_id)
                 self.running_orders[order_id] = True
 
                 await self.db.save_order(
                     order_id=order_id,
                     fill_sz=float(result.get("executedQty", 0)),
                     price=float(result.get("avgPrice", 0)) if float(result.get("avgPrice", 0)) > 0 else float(
-                        result.get("price", 0))
+                        result.get("price", 0)),
+                    status=result.get("status"),
+                    orig_sz=float(result.get("origQty", 0)) or None
                 )
 
             return result
 
-    async def close_limit_order(self, symbol: str, side: str, price: float, qty: float):
+    @traced_order("binance")
+    async def place_ioc_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
+        """
+        Лимит IOC: исполняется сразу, насколько хватает книги по цене, остаток снимается.
+        newOrderRespType=RESULT — ответ приходит уже с итоговым исполнением.
+        """
         await self.connect_ws()
         full_symbol = symbol.upper() + "USDT"
-        timestamp = int(time.time() * 1000)
+        client_order_id = track_order("binance", client_order_id)
+
+        qty_prec, price_prec = await self._get_symbol_precision(symbol)
+
+        params = {
+            "symbol": full_symbol,
+            "side": "BUY" if side.lower() == "long" else "SELL",
+            "type": "LIMIT",
+            "quantity": round(qty, qty_prec),
+            "price": round(price, price_prec),
+            "timeInForce": "IOC",
+            "newOrderRespType": "RESULT",
+            "newClientOrderId": client_order_id,
+            **self.clock.stamp()
+        }
+        params["signature"] = self._sign_request(params)
+        headers = {"X-MBX-APIKEY": self.api_key}
+        url = f"{self.rest_url}/fapi/v1/order"
+
+        async with self._request("POST", url, priority=ORDER, orders=1, params=params, headers=headers) as response:
+            result = await response.json()
+
+            if "orderId" not in result:
+                raise Exception(f"Ошибка размещения IOC ордера: {result}")
+
+            order_id = str(result["orderId"])
+            bind_order("binance", client_order_id, order_id)
+            filled = float(result.get("executedQty", 0))
+            avg_price = float(result.get("avgPrice", 0)) or float(result.get("price", 0))
+
+            await self.db.save_order(
+                order_id=order_id,
+                fill_sz=filled,
+                price=avg_price,
+                status=result.get("status"),
+                orig_sz=float(result.get("origQty", 0)) or None
+            )
+
+            return {
+                "success": filled > 0,
+                "orderId": order_id,
+                "clientOrderId": client_order_id,
+                "status": result.get("status"),
+                "filledQty": filled,
+                "avgPrice": avg_price
+            }
+
+    @traced_order("binance")
+    async def place_limit_orders(self, symbol: str, side: str, levels: list, reduce_only: bool = False,
+                                 client_order_ids: list = None):
+        """
+        Несколько GTC лимиток одной стороны через /fapi/v1/batchOrders: levels — [(price, qty), ...],
+        по BATCH_ORDERS_LIMIT в запросе, пачки уходят параллельно. client_order_ids — клиентские id
+        по levels (без них генерируются). Возвращает список по levels:
+        {"orderId", "clientOrderId", "symbol", "qty", "status"} или {"error": ...} для отклоненной части.
+        """
+        await self.connect_ws()
+        full_symbol = symbol.upper() + "USDT"
+        qty_prec, price_prec = await self._get_symbol_precision(symbol)
+
+        client_order_ids = [track_order("binance", client_order_id)
+                            for client_order_id in (client_order_ids or [None] * len(levels))]
+
+        orders = []
+        for (price, qty), client_order_id in zip(levels, client_order_ids):
+            order = {
+                "symbol": full_symbol,
+                "side": "BUY" if side.lower() == "long" else "SELL",
+                "type": "LIMIT",
+                "quantity": str(round(qty, qty_prec)),
+                "price": str(round(price, price_prec)),
+                "timeInForce": "GTC",
+                "newClientOrderId": client_order_id
+            }
+            if reduce_only:
+                order["reduceOnly"] = "true"
+            orders.append(order)
+
+        chunks = [orders[i:i + BATCH_ORDERS_LIMIT] for i in range(0, len(orders), BATCH_ORDERS_LIMIT)]
+        responses = await asyncio.gather(*(self._post_batch(chunk) for chunk in chunks))
+
+        results = []
+        for result, client_order_id in zip((item for response in responses for item in response), client_order_ids):
+            if "orderId" not in result:
+                results.append({"error": result})
+                continue
+
+            order_id = str(result["orderId"])
+            bind_order("binance", client_order_id, order_id)
+            self.running_orders[order_id] = True
+            await self.db.save_order(
+                order_id=order_id,
+                fill_sz=float(result.get("executedQty", 0)),
+                price=float(result.get("avgPrice", 0)) if float(result.get("avgPrice", 0)) > 0 else float(
+                    result.get("price", 0)),
+                status=result.get("status"),
+                orig_sz=float(result.get("origQty", 0)) or None
+            )
+            results.append({
+                "orderId": result["orderId"],
+                "clientOrderId": client_order_id,
+                "symbol": result["symbol"],
+                "qty": result["origQty"],
+                "status": result.get("status")
+            })
+        return results
+
+    async def _post_batch(self, orders: list) -> list:
+        params = {
+            "batchOrders": json.dumps(orders, separators=(",", ":")),
+            **self.clock.stamp()
+        }
+        params["signature"] = self._sign_request(params)
+        headers = {"X-MBX-APIKEY": self.api_key}
+        url = f"{self.rest_url}/fapi/v1/batchOrders"
+
+        async with self._request("POST", url, weight=5, priority=ORDER, orders=len(orders),
+                                       params=params, headers=headers) as response:
+            result = await response.json()
+            if not isinstance(result, list):
+                # Ошибка всего запроса (подпись, лимит) — каждая часть пачки отклонена
+                return [result] * len(orders)
+            return result
+
+    @traced_order("binance")
+    async def modify_order(self, symbol: str, order_id: str, side: str, price: float, qty: float,
+                           filled: float = 0.0, reduce_only: bool = False):
+        """
+        Перестановка стоящей лимитки одним запросом (PUT /fapi/v1/order), orderId сохраняется.
+        qty — полный объем ордера вместе с исполненным: Binance сам вычитает executedQty.
+        filled и reduce_only — для общего интерфейса с Hyperliquid, reduceOnly Binance сохраняет сам.
+        """
+        await self.connect_ws()
+        full_symbol = symbol.upper() + "USDT"
+        qty_prec, price_prec = await self._get_symbol_precision(symbol)
+
+        params = {
+            "orderId": order_id,
+            "symbol": full_symbol,
+            "side": "BUY" if side.lower() == "long" else "SELL",
+            "quantity": round(qty, qty_prec),
+            "price": round(price, price_prec),
+            **self.clock.stamp()
+        }
+        params["signature"] = self._sign_request(params)
+        headers = {"X-MBX-APIKEY": self.api_key}
+        url = f"{self.rest_url}/fapi/v1/order"
+
+        async with self._request("PUT", url, priority=ORDER, orders=1, params=params, headers=headers) as response:
+            result = await response.json()
+
+            if "orderId" not in result:
+                raise Exception(f"Ошибка изменения ордера: {result}")
+
+            await self.db.save_order(
+                order_id=str(result["orderId"]),
+                fill_sz=float(result.get("executedQty", 0)),
+                price=float(result.get("price", 0)),
+                status=result.get("status"),
+                orig_sz=float(result.get("origQty", 0)) or None
+            )
+
+            return {
+                "orderId": result["orderId"],
+                "symbol": result["symbol"],
+                "price": float(result.get("price", 0)),
+                "qty": result["origQty"],
+                "filledQty": float(result.get("executedQty", 0)),
+                "status": result.get("status")
+            }
+
+    @traced_order("binance")
+    async def close_limit_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
+        await self.connect_ws()
+        full_symbol = symbol.upper() + "USDT"
+        client_order_id = track_order("binance", client_order_id)
 
         qty_prec, price_prec = await self._get_symbol_precision(symbol)
 
@@ -344,32 +868,37 @@ class AsyncBinanceWSClient:
             "price": round(price, price_prec),
             "timeInForce": "GTC",
             "reduceOnly": "true",
-            "timestamp": timestamp
+            "newClientOrderId": client_order_id,
+            **self.clock.stamp()
         }
         params["signature"] = self._sign_request(params)
         headers = {"X-MBX-APIKEY": self.api_key}
-        url = f"https://fapi.binance.com/fapi/v1/order"
+        url = f"{self.rest_url}/fapi/v1/order"
 
-        async with self.session.post(url, params=params, headers=headers) as response:
+        async with self._request("POST", url, priority=ORDER, orders=1, params=params, headers=headers) as response:
             result = await response.json()
 
             if "orderId" in result:
                 order_id = str(result["orderId"])
+                bind_order("binance", client_order_id, order_id)
                 self.running_orders[order_id] = True
 
                 await self.db.save_order(
                     order_id=order_id,
                     fill_sz=float(result.get("executedQty", 0)),
                     price=float(result.get("avgPrice", 0)) if float(result.get("avgPrice", 0)) > 0 else float(
-                        result.get("price", 0))
+                        result.get("price", 0)),
+                    status=result.get("status"),
+                    orig_sz=float(result.get("origQty", 0)) or None
                 )
 
             return result
 
-    async def close_market_order(self, symbol: str, side: str, qty: float):
+    @traced_order("binance")
+    async def close_market_order(self, symbol: str, side: str, qty: float, client_order_id: str = None):
         await self.connect_ws()
         full_symbol = symbol.upper() + "USDT"
-        timestamp = int(time.time() * 1000)
+        client_order_id = track_order("binance", client_order_id)
 
         qty_prec, _ = await self._get_symbol_precision(symbol)
 
@@ -379,24 +908,28 @@ class AsyncBinanceWSClient:
             "type": "MARKET",
             "quantity": round(qty, qty_prec),
             "reduceOnly": "true",
-            "timestamp": timestamp
+            "newClientOrderId": client_order_id,
+            **self.clock.stamp()
         }
         params["signature"] = self._sign_request(params)
         headers = {"X-MBX-APIKEY": self.api_key}
-        url = f"https://fapi.binance.com/fapi/v1/order"
+        url = f"{self.rest_url}/fapi/v1/order"
 
-        async with self.session.post(url, params=params, headers=headers) as response:
+        async with self._request("POST", url, priority=ORDER, orders=1, params=params, headers=headers) as response:
             result = await response.json()
 
             if "orderId" in result:
                 order_id = str(result["orderId"])
+                bind_order("binance", client_order_id, order_id)
                 self.running_orders[order_id] = True
 
                 await self.db.save_order(
                     order_id=order_id,
                     fill_sz=float(result.get("executedQty", 0)),
                     price=float(result.get("avgPrice", 0)) if float(result.get("avgPrice", 0)) > 0 else float(
-                        result.get("price", 0))
+                        result.get("price", 0)),
+                    status=result.get("status"),
+                    orig_sz=float(result.get("origQty", 0)) or None
                 )
 
             return result
@@ -407,28 +940,25 @@ class AsyncBinanceWSClient:
         params = {
             "symbol": full_symbol,
             "leverage": leverage,
-            "timestamp": int(time.time() * 1000)
+            **self.clock.stamp()
         }
         params["signature"] = self._sign_request(params)
         headers = {"X-MBX-APIKEY": self.api_key}
-        url = f"https://fapi.binance.com/fapi/v1/leverage"
+        url = f"{self.rest_url}/fapi/v1/leverage"
 
-        async with self.session.post(url, params=params, headers=headers) as response:
+        async with self._request("POST", url, params=params, headers=headers) as response:
             return await response.json()
 
     async def get_symbol_info(self, symbol: str):
         await self.connect_ws()
-        url = f"https://fapi.binance.com/fapi/v1/exchangeInfo"
-
-        async with self.session.get(url) as response:
-            data = await response.json()
-            for s in data['symbols']:
-                if s['symbol'] == symbol.upper() + "USDT":
-                    return {
-                        'quantityPrecision': s['quantityPrecision'],
-                        'pricePrecision': s['pricePrecision']
-                    }
-            raise ValueError(f"Symbol {symbol} not found")
+        data = await self._exchange_info()
+        for s in data['symbols']:
+            if s['symbol'] == symbol.upper() + "USDT":
+                return {
+                    'quantityPrecision': s['quantityPrecision'],
+                    'pricePrecision': s['pricePrecision']
+                }
+        raise ValueError(f"Symbol {symbol} not found")
 
     async def get_order_status(self, symbol: str, order_id: str):
         await self.connect_ws()
@@ -436,13 +966,13 @@ class AsyncBinanceWSClient:
         params = {
             "symbol": full_symbol,
             "orderId": order_id,
-            "timestamp": int(time.time() * 1000)
+            **self.clock.stamp()
         }
         params['signature'] = self._sign_request(params)
         headers = {"X-MBX-APIKEY": self.api_key}
-        url = f"https://fapi.binance.com/fapi/v1/order"
+        url = f"{self.rest_url}/fapi/v1/order"
 
-        async with self.session.get(url, params=params, headers=headers) as response:
+        async with self._request("GET", url, params=params, headers=headers) as response:
             result = await response.json()
 
             if "orderId" in result:
@@ -450,49 +980,64 @@ class AsyncBinanceWSClient:
                     order_id=str(result["orderId"]),
                     fill_sz=float(result.get("executedQty", 0)),
                     price=float(result.get("avgPrice", 0)) if float(result.get("avgPrice", 0)) > 0 else float(
-                        result.get("price", 0))
+                        result.get("price", 0)),
+                    status=result.get("status"),
+                    orig_sz=float(result.get("origQty", 0)) or None
                 )
 
             return result
 
+    @traced_order("binance")
     async def cancel_order(self, symbol: str, order_id: str):
         await self.connect_ws()
         full_symbol = symbol.upper() + "USDT"
         params = {
             "symbol": full_symbol,
             "orderId": order_id,
-            "timestamp": int(time.time() * 1000)
+            **self.clock.stamp()
         }
         params['signature'] = self._sign_request(params)
         headers = {"X-MBX-APIKEY": self.api_key}
-        url = f"https://fapi.binance.com/fapi/v1/order"
+        url = f"{self.rest_url}/fapi/v1/order"
 
-        async with self.session.delete(url, params=params, headers=headers) as response:
+        async with self._request("DELETE", url, priority=CANCEL, params=params, headers=headers) as response:
             result = await response.json()
             await self.unsubscribe_order(order_id)
+
+            if "orderId" in result:
+                await self.db.save_order(
+                    order_id=str(result["orderId"]),
+                    fill_sz=float(result.get("executedQty", 0)),
+                    price=float(result.get("avgPrice", 0)),
+                    status=result.get("status", "CANCELED")
+                )
+
             return result
 
     async def get_tick_size(self, symbol: str) -> str:
         await self.connect_ws()
         full_symbol = symbol.upper() + "USDT"
-        url = f"https://fapi.binance.com/fapi/v1/exchangeInfo"
-
-        async with self.session.get(url) as response:
-            data = await response.json()
-            for s in data['symbols']:
-                if s['symbol'] == full_symbol:
-                    for f in s['filters']:
-                        if f['filterType'] == 'PRICE_FILTER':
-                            return format(float(f['tickSize']), ".5f")
-            raise ValueError(f"Tick size for {symbol} not found")
+        data = await self._exchange_info()
+        for s in data['symbols']:
+            if s['symbol'] == full_symbol:
+                for f in s['filters']:
+                    if f['filterType'] == 'PRICE_FILTER':
+                        return format(float(f['tickSize']), ".5f")
+        raise ValueError(f"Tick size for {symbol} not found")
 
     async def get_funding_rate(self, symbol: str) -> float:
-        await self.connect_ws()
         full_symbol = symbol.upper() + "USDT"
-        url = f"https://fapi.binance.com/fapi/v1/premiumIndex"
+        # При активной подписке markPrice@1s ставка уже в кеше — без REST; если поток встал,
+        # кеш старше FUNDING_MAX_AGE_MS не отдается и ставка читается из premiumIndex
+        funding = await self.db.get_funding(full_symbol, max_age_ms=FUNDING_MAX_AGE_MS)
+        if funding:
+            return funding["rate"]
+
+        await self.connect_ws()
+        url = f"{self.rest_url}/fapi/v1/premiumIndex"
         params = {"symbol": full_symbol}
 
-        async with self.session.get(url, params=params) as response:
+        async with self._request("GET", url, params=params) as response:
             data = await response.json()
             return float(data['lastFundingRate'])
 
@@ -503,13 +1048,13 @@ class AsyncBinanceWSClient:
             endpoint = "/fapi/v2/positionRisk"
             params = {
                 "symbol": full_symbol,
-                "timestamp": int(time.time() * 1000)
+                **self.clock.stamp()
             }
             params["signature"] = self._sign_request(params)
             headers = {"X-MBX-APIKEY": self.api_key}
-            url = f"https://fapi.binance.com{endpoint}"
+            url = f"{self.rest_url}{endpoint}"
 
-            async with self.session.get(url, params=params, headers=headers) as response:
+            async with self._request("GET", url, weight=5, params=params, headers=headers) as response:
                 data = await response.json()
                 if response.status == 200 and isinstance(data, list):
                     for pos in data:
@@ -528,14 +1073,16 @@ class AsyncBinanceWSClient:
         full_symbol = symbol.upper() + "USDT"
 
         params = {
-            "timestamp": int(time.time() * 1000)
+            **self.clock.stamp()
         }
         params["signature"] = self._sign_request(params)
         headers = {"X-MBX-APIKEY": self.api_key}
 
         try:
-            async with self.session.get(
-                    "https://fapi.binance.com/fapi/v2/positionRisk",
+            async with self._request(
+                    "GET",
+                    f"{self.rest_url}/fapi/v2/positionRisk",
+                    weight=5,
                     params=params,
                     headers=headers
             ) as response:
@@ -3,51 +3,96 @@ import hmac
 import sys
 import asyncio
 import json
-import time
+import os
 
 import aiohttp
 import websockets
 import zmq
 from DragonflyDb.DragonFlyConnector import DragonFlyConnector
+from Execution.FillEvents import bind_order, track_order
+from CexWsClients.RateLimitGovernor import CANCEL, ORDER, get_governor
+from CexWsClients.ServerTime import get_clock
+from Monitoring.FeedLatency import receive_time, stamp_event
+from Monitoring.Telemetry import count_reconnect, instrument_zmq, traced_order
+from Replay.FrameCapture import get_env_recorder
 
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
+# Адреса Bybit v5; переменные окружения позволяют направить клиента на MockExchange
+BYBIT_REST_URL = "https://api.bybit.com"
+BYBIT_WS_URL = "wss://stream.bybit.com"
+# retCode Bybit: timestamp запроса вне recv_window
+TIMESTAMP_OUTSIDE_RECV_WINDOW = 10002
+
 class AsyncBybitWSClient:
-    def __init__(self, api_key: str, api_secret: str):
-        self.url = "wss://stream.bybit.com/v5/public/linear"
-        self.private_url = "wss://stream.bybit.com/v5/private"
+    def __init__(self, api_key: str, api_secret: str, rest_url: str = None, ws_url: str = None):
+        self.rest_url = rest_url or os.getenv("BYBIT_REST_URL", BYBIT_REST_URL)
+        ws_url = ws_url or os.getenv("BYBIT_WS_URL", BYBIT_WS_URL)
+        self.url = f"{ws_url}/v5/public/linear"
+        self.private_url = f"{ws_url}/v5/private"
         self.db = DragonFlyConnector("bybit")
+        self.limits = get_governor("bybit")
+        self.clock = get_clock("bybit")
         self.api_key = api_key
         self.api_secret = api_secret
         context = zmq.Context()
         self.zmq_socket = context.socket(zmq.PUSH)
         self.zmq_socket.connect("tcp://127.0.0.1:5555")
+        self.zmq_socket = instrument_zmq(self.zmq_socket, "bybit")
         self.running_orders = {}
+        self.execution_task = None
+        # Ордера, отправленные одновременно, не должны открыть по своему приватному сокету
+        self._private_lock = asyncio.Lock()
         self.public_ws = None
         self.private_ws = None
+        self.capture = get_env_recorder()
 
     async def connect_ws(self):
+        self.clock.start(self._server_time)
         if self.public_ws is None:
             self.public_ws = await websockets.connect(self.url)
 
-        if self.private_ws is None:
-            self.private_ws = await websockets.connect(self.private_url)
-            timestamp = str(int(time.time() * 1000))
-            sign_payload = f"{self.api_key}{timestamp}"
-            signature = hmac.new(self.api_secret.encode(), sign_payload.encode(), hashlib.sha256).hexdigest()
+        await self._connect_private()
+
+    async def _connect_private(self):
+        """
+        Приватный сокет: auth и одна подписка на execution по всему аккаунту. Подписка
+        оформляется до отправки ордеров — исполнение, пришедшее раньше ответа REST, не теряется.
+        """
+        if self.private_ws is not None:
+            return
+        async with self._private_lock:
+            if self.private_ws is None:
+                await self._open_private()
+
+    async def _open_private(self):
+        ws = await websockets.connect(self.private_url)
+        timestamp = str(self.clock.now_ms())
+        sign_payload = f"{self.api_key}{timestamp}"
+        signature = hmac.new(self.api_secret.encode(), sign_payload.encode(), hashlib.sha256).hexdigest()
 
-            auth_msg = {
-                "op": "auth",
-                "args": [self.api_key, timestamp, signature]
-            }
+        auth_msg = {
+            "op": "auth",
+            "args": [self.api_key, timestamp, signature]
+        }
 
-            await self.private_ws.send(json.dumps(auth_msg))
-            auth_resp = json.loads(await self.private_ws.recv())
+        await ws.send(json.dumps(auth_msg))
+        auth_resp = json.loads(await ws.recv())
 
-            if not auth_resp.get("success", False):
-                print(f"[Bybit] Auth failed: {auth_resp}")
-                self.private_ws = None
+        if not auth_resp.get("success", False):
+            print(f"[Bybit] Auth failed: {auth_resp}")
+            await ws.close()
+            return
+
+        await ws.send(json.dumps({"op": "subscribe", "args": ["execution"]}))
+        sub_resp = json.loads(await ws.recv())
+        if not sub_resp.get("success", False):
+            print(f"[Bybit] Subscribe execution failed: {sub_resp}")
+
+        self.private_ws = ws
+        if self.execution_task is None or self.execution_task.done():
+            self.execution_task = asyncio.create_task(self._listen_executions())
 
     async def subscribe_orderbook(self, symbol):
         symbol+='USDT'
@@ -55,82 +100,118 @@ class AsyncBybitWSClient:
         async with websockets.connect(self.url) as ws:
             await ws.send(json.dumps({"op": "subscribe", "args": [topic]}))
             while True:
-                msg = json.loads(await ws.recv())
-                data = msg.get("data", {})
-                bids = data.get("b", [])[:10]
-                asks = data.get("a", [])[:10]
-                await self.db.save_orderbook(symbol, bids, asks)
-                self.zmq_socket.send_json({
-                    "exchange": "bybit",
-                    "coin": symbol,
-                    "bids": bids,
-                    "asks": asks
-                })
-
-    async def subscribe_order(self, symbol, order_id: str):
-        self.running_orders[order_id] = True
-        symbol+='USDT'
-        api_key = self.api_key
-        api_secret = self.api_secret
-        timestamp = str(int(time.time() * 1000))
-        sign_payload = f"{api_key}{timestamp}"
-        signature = hmac.new(api_secret.encode(), sign_payload.encode(), hashlib.sha256).hexdigest()
-
-        auth_msg = {
-            "op": "auth",
-            "args": [api_key, timestamp, signature]
-        }
-
-        topic = f"execution.{symbol}"
-        sub_msg = {
-            "op": "subscribe",
-            "args": [topic]
-        }
-
-        async with websockets.connect(self.private_url) as ws:
-            await ws.send(json.dumps(auth_msg))
-            auth_resp = json.loads(await ws.recv())
-            if not auth_resp.get("success"):
-                print(f"[Bybit] Auth failed: {auth_resp}")
-                return
-
-            await ws.send(json.dumps(sub_msg))
-
-            while self.running_orders.get(order_id, False):
+                raw = await ws.recv()
+                received = receive_time()
+                if self.capture is not None:
+                    self.capture.record(f"bybit:book:{symbol}", raw, received[0])
+                await self._handle_orderbook_message(symbol, raw, received)
+
+    async def _handle_orderbook_message(self, symbol, raw, received):
+        msg = json.loads(raw)
+        data = msg.get("data", {})
+        bids = data.get("b", [])[:10]
+        asks = data.get("a", [])[:10]
+        await self.db.save_orderbook(symbol, bids, asks, exchange_ts=msg.get("ts"))
+        self.zmq_socket.send_json(stamp_event("bybit", "book", {
+            "exchange": "bybit",
+            "coin": symbol,
+            "bids": bids,
+            "asks": asks
+        }, msg.get("ts"), received))
+
+    def enable_capture(self, recorder):
+        """Пишет сырые кадры ордербука в FrameRecorder (см. Replay/FrameCapture.py)"""
+        self.capture = recorder
+
+    async def _listen_executions(self):
+        """Исполнения всех ордеров аккаунта; в FillEvents ордер находится по orderLinkId или orderId"""
+        while True:
+            if self.private_ws is None:
                 try:
-                    msg = json.loads(await ws.recv())
-                    if msg.get("topic", "") == topic:
-                        data = msg.get("data", [])
-                        if not isinstance(data, list):
-                            data = [data]
-
-                        for entry in data:
-                            if entry.get("orderId") == order_id:
-                                fill_sz = float(entry.get("cumExecQty", 0))
-                                price = float(entry.get("price", 0))
-
-                                await self.db.save_order(order_id, fill_sz, price)
-                                self.zmq_socket.send_json({
-                                    "exchange": "bybit",
-                                    "order_id": order_id,
-                                    "fill_sz": fill_sz
-                                })
-
+                    await self._connect_private()
                 except Exception as e:
-                    print(f"[Bybit] WS error: {e}")
+                    print(f"[Bybit] Private WS reconnect failed: {e}")
+                if self.private_ws is None:
                     await asyncio.sleep(1)
+                    continue
+            try:
+                raw = await self.private_ws.recv()
+                received = receive_time()
+                msg = json.loads(raw)
+                if msg.get("topic", "").startswith("execution"):
+                    await self._handle_executions(msg, received)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[Bybit] WS error: {e}")
+                count_reconnect("bybit", "private")
+                self.private_ws = None
+                await asyncio.sleep(1)
+
+    async def _handle_executions(self, msg: dict, received: tuple):
+        data = msg.get("data", [])
+        if not isinstance(data, list):
+            data = [data]
+
+        for entry in data:
+            order_id = entry.get("orderId")
+            if not order_id:
+                continue
+            # execution несет объем одного исполнения; накопленный — cumExecQty или qty - leavesQty
+            leaves = entry.get("leavesQty")
+            cum = entry.get("cumExecQty")
+            if cum is not None:
+                fill_sz = float(cum)
+            else:
+                fill_sz = float(entry.get("qty") or 0) - float(leaves or 0)
+            price = float(entry.get("price", 0))
+            status = "FILLED" if leaves is not None and float(leaves) == 0 else None
+
+            await self.db.save_order(order_id, fill_sz, price, status)
+            if status:
+                self.running_orders.pop(order_id, None)
+            self.zmq_socket.send_json(stamp_event("bybit", "fill", {
+                "exchange": "bybit",
+                "order_id": order_id,
+                "clientOrderId": entry.get("orderLinkId"),
+                "fill_sz": fill_sz,
+                "status": status
+            }, entry.get("execTime") or msg.get("creationTime"), received))
+
+    async def subscribe_order(self, symbol, order_id: str):
+        """Исполнения идут общей подпиской execution — ордер только отмечается отслеживаемым"""
+        self.running_orders[order_id] = True
+        await self._connect_private()
 
     async def unsubscribe_order(self, order_id: str):
             self.running_orders.pop(order_id, None)
             await self.db.delete_order(order_id)
 
+    def _watch_order(self, symbol: str, order_id: str):
+        """Отмечает ордер отслеживаемым; его исполнения придут в общую подписку execution"""
+        self.running_orders[order_id] = True
+
+    async def close(self):
+        """Останавливает слушатели ордеров и закрывает WS соединения"""
+        self.running_orders.clear()
+        if self.execution_task is not None:
+            self.execution_task.cancel()
+            await asyncio.gather(self.execution_task, return_exceptions=True)
+            self.execution_task = None
+        for ws in (self.public_ws, self.private_ws):
+            if ws is not None:
+                await ws.close()
+        self.public_ws = None
+        self.private_ws = None
+        await self.clock.stop()
+
     def _sign(self, params: dict) -> str:
         ordered_params = sorted(params.items())
         query_string = "&".join(f"{k}={v}" for k, v in ordered_params)
         return hmac.new(self.api_secret.encode(), query_string.encode(), hashlib.sha256).hexdigest()
 
     def _auth_params(self) -> dict:
-        ts = str(int(time.time() * 1000))
+        ts = str(self.clock.now_ms())
         params = {
             "apiKey": self.api_key,
             "timestamp": ts
@@ -139,8 +220,8 @@ class AsyncBybitWSClient:
         return params
 
     def _auth_headers(self, body: dict = None) -> dict:
-        ts = str(int(time.time() * 1000))
-        recv_window = "5000"
+        ts = str(self.clock.now_ms())
+        recv_window = str(self.clock.recv_window_ms())
         body_str = json.dumps(body) if body else ""
         sign_payload = ts + self.api_key + recv_window + body_str
         sign = hmac.new(self.api_secret.encode(), sign_payload.encode(), hashlib.sha256).hexdigest()
@@ -152,51 +233,77 @@ class AsyncBybitWSClient:
             "Content-Type": "application/json"
         }
 
-    async def place_limit_order(self, symbol: str, side: str, price: float, qty: float):
-        url = "https://api.bybit.com/v5/order/create"
+    def _check_clock(self, data: dict):
+        """Биржа отвергла timestamp — часы сверяются заново, не дожидаясь интервала"""
+        if isinstance(data, dict) and data.get("retCode") == TIMESTAMP_OUTSIDE_RECV_WINDOW:
+            self.clock.resync()
+
+    async def _server_time(self) -> float:
+        async with aiohttp.ClientSession() as session:
+            async with self.limits.request(session, "GET", f"{self.rest_url}/v5/market/time") as resp:
+                data = await resp.json()
+                return int(data["result"]["timeNano"]) / 1e6
+
+    @traced_order("bybit")
+    async def place_limit_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
+        url = f"{self.rest_url}/v5/order/create"
+        client_order_id = track_order("bybit", client_order_id)
+        await self._connect_private()
         payload = {
             "category": "linear",
             "symbol": symbol.upper() + "USDT",
             "side": "Buy" if side.lower() == "long" else "Sell",
             "orderType": "Limit",
             "qty": str(qty),
+            "orderLinkId": client_order_id,
             "price": str(price),
             "timeInForce": "GTC"
         }
         headers = self._auth_headers(payload)
         async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload) as resp:
+            async with self.limits.request(session, "POST", url, priority=ORDER, orders=1,
+                                           headers=headers, json=payload) as resp:
                 data = await resp.json()
+                self._check_clock(data)
                 order_id = data.get("result", {}).get("orderId")
                 if not order_id:
                     raise RuntimeError(f"Bybit не вернул orderId: {data}")
-                await self.subscribe_order(symbol, order_id)
-                return {"orderId": order_id, "qty": qty}
-
-    async def close_limit_order(self, symbol: str, side: str, price: float, qty: float):
-        url = "https://api.bybit.com/v5/order/create"
+                bind_order("bybit", client_order_id, order_id)
+                self._watch_order(symbol, order_id)
+                return {"orderId": order_id, "clientOrderId": client_order_id, "qty": qty}
+
+    @traced_order("bybit")
+    async def close_limit_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
+        url = f"{self.rest_url}/v5/order/create"
+        client_order_id = track_order("bybit", client_order_id)
+        await self._connect_private()
         payload = {
             "category": "linear",
             "symbol": symbol.upper() + "USDT",
             "side": "Buy" if side.lower() == "long" else "Sell",
             "orderType": "Limit",
             "qty": str(qty),
+            "orderLinkId": client_order_id,
             "price": str(price),
             "timeInForce": "GTC",
             "reduceOnly": True
         }
         headers = self._auth_headers(payload)
         async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload) as resp:
+            async with self.limits.request(session, "POST", url, priority=ORDER, orders=1,
+                                           headers=headers, json=payload) as resp:
                 data = await resp.json()
+                self._check_clock(data)
                 order_id = data.get("result", {}).get("orderId")
                 if not order_id:
                     raise RuntimeError(f"Bybit не вернул orderId при close_limit_order: {data}")
-                await self.subscribe_order(symbol, order_id)
-                return {"orderId": order_id, "qty": qty}
+                bind_order("bybit", client_order_id, order_id)
+                self._watch_order(symbol, order_id)
+                return {"orderId": order_id, "clientOrderId": client_order_id, "qty": qty}
 
+    @traced_order("bybit")
     async def cancel_order(self, symbol: str, order_id: str):
-        url = "https://api.bybit.com/v5/order/cancel"
+        url = f"{self.rest_url}/v5/order/cancel"
         payload = {
             "category": "linear",
             "symbol": symbol.upper() + "USDT",
@@ -204,15 +311,17 @@ class AsyncBybitWSClient:
         }
         headers = self._auth_headers(payload)
         async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload) as resp:
+            async with self.limits.request(session, "POST", url, priority=CANCEL,
+                                           headers=headers, json=payload) as resp:
                 data = await resp.json()
+                self._check_clock(data)
                 if data.get("retCode") == 0:
                     await self.db.delete_order(order_id)
                     return True
                 return False
 
     async def set_leverage(self, symbol: str, leverage: int, margin_mode: str = "isolated", pos_side: str = None):
-        url = "https://api.bybit.com/v5/position/set-leverage"
+        url = f"{self.rest_url}/v5/position/set-leverage"
         payload = {
             "category": "linear",
             "symbol": symbol.upper() + "USDT",
@@ -221,52 +330,66 @@ class AsyncBybitWSClient:
         }
         headers = self._auth_headers(payload)
         async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload) as resp:
+            async with self.limits.request(session, "POST", url, headers=headers, json=payload) as resp:
                 await resp.json()
                 return {"status": "success", "symbol": symbol, "leverage": leverage}
 
 
-    async def place_market_order(self, symbol: str, side: str, qty: float):
-        url = "https://api.bybit.com/v5/order/create"
+    @traced_order("bybit")
+    async def place_market_order(self, symbol: str, side: str, qty: float, client_order_id: str = None):
+        url = f"{self.rest_url}/v5/order/create"
+        client_order_id = track_order("bybit", client_order_id)
+        await self._connect_private()
         headers = self._auth_headers()
         payload = {
             "symbol": symbol.upper() + "USDT",
             "side": "Buy" if side.lower() == "long" else "Sell",
             "orderType": "Market",
-            "qty": str(qty)
+            "qty": str(qty),
+            "orderLinkId": client_order_id
         }
         async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload) as resp:
+            async with self.limits.request(session, "POST", url, priority=ORDER, orders=1,
+                                           headers=headers, json=payload) as resp:
                 data = await resp.json()
+                self._check_clock(data)
                 order_id = data.get("result", {}).get("orderId")
                 if not order_id:
                     raise RuntimeError(f"Bybit не вернул orderId: {data}")
-                await self.subscribe_order(symbol, order_id)
-                return {"orderId": order_id, "qty": qty}
-
-    async def close_market_order(self, symbol: str, side: str, qty: float):
-        url = "https://api.bybit.com/v5/order/create"
+                bind_order("bybit", client_order_id, order_id)
+                self._watch_order(symbol, order_id)
+                return {"orderId": order_id, "clientOrderId": client_order_id, "qty": qty}
+
+    @traced_order("bybit")
+    async def close_market_order(self, symbol: str, side: str, qty: float, client_order_id: str = None):
+        url = f"{self.rest_url}/v5/order/create"
+        client_order_id = track_order("bybit", client_order_id)
+        await self._connect_private()
         headers = self._auth_headers()
         payload = {
             "symbol": symbol.upper() + "USDT",
             "side": "Buy" if side.lower() == "long" else "Sell",
             "orderType": "Market",
             "qty": str(qty),
+            "orderLinkId": client_order_id,
             "reduceOnly": True
         }
         async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload) as resp:
+            async with self.limits.request(session, "POST", url, priority=ORDER, orders=1,
+                                           headers=headers, json=payload) as resp:
                 data = await resp.json()
+                self._check_clock(data)
                 order_id = data.get("result", {}).get("orderId")
                 if not order_id:
                     raise RuntimeError(f"Bybit не вернул orderId при close_market_order: {data}")
-                await self.subscribe_order(symbol, order_id)
-                return {"orderId": order_id, "qty": qty}
+                bind_order("bybit", client_order_id, order_id)
+                self._watch_order(symbol, order_id)
+                return {"orderId": order_id, "clientOrderId": client_order_id, "qty": qty}
 
     async def get_symbol_info(self, symbol: str):
-        url = f"https://api.bybit.com/v5/market/instruments-info?category=linear&symbol={symbol.upper()}USDT"
+        url = f"{self.rest_url}/v5/market/instruments-info?category=linear&symbol={symbol.upper()}USDT"
         async with aiohttp.ClientSession() as session:
-            async with session.get(url) as resp:
+            async with self.limits.request(session, "GET", url) as resp:
                 data = await resp.json()
                 info = data["result"]["list"][0]
                 return {
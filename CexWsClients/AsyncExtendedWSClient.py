@@ -14,33 +14,48 @@ from datetime import datetime
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from DragonflyDb.DragonFlyConnector import DragonFlyConnector
+from CexWsClients.RateLimitGovernor import INFO, ORDER, get_governor
+from CexWsClients.ServerTime import get_clock
+from Execution.FillEvents import bind_order, track_order
+from Monitoring.FeedLatency import receive_time, stamp_event
+from Monitoring.Telemetry import count_reconnect, instrument_zmq, traced_order
+from Replay.FrameCapture import get_env_recorder
 import logging
+from urllib.parse import urlparse
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Адреса Extended; переменные окружения позволяют направить клиента на MockExchange
+EXTENDED_API_URL = "https://api.extended.com"
+EXTENDED_WS_URL = "wss://stream.extended.com/ws"
+
+
 class AsyncExtendedWSClient:
-    def __init__(self, api_key: str, api_secret: str, base_url: str = "https://api.extended.com"):
+    def __init__(self, api_key: str, api_secret: str, base_url: str = None, ws_url: str = None):
         self.api_key = api_key
         self.api_secret = api_secret
-        self.base_url = base_url
-        self.ws_url = "wss://stream.extended.com/ws"
+        self.base_url = base_url or os.getenv("EXTENDED_API_URL", EXTENDED_API_URL)
+        self.ws_url = ws_url or os.getenv("EXTENDED_WS_URL", EXTENDED_WS_URL)
         self.session = None
         self.ws_connection = None
         self.subscription_handlers = {}
         self.running_orders = {}
         self.db = DragonFlyConnector("extended")
+        self.clock = get_clock("extended")
 
         # ZMQ setup
         context = zmq.Context()
         self.zmq_socket = context.socket(zmq.PUSH)
         self.zmq_socket.connect("tcp://127.0.0.1:5555")
+        self.zmq_socket = instrument_zmq(self.zmq_socket, "extended")
 
         self._listener_started = False
         self._user_stream_key = None
         self.listen_task = None
         self._connection_available = None
+        self.capture = get_env_recorder()
 
     @classmethod
     def from_credentials(cls, api_key: str, api_secret: str):
@@ -49,9 +64,8 @@ class AsyncExtendedWSClient:
     def _check_connection_available(self) -> bool:
         """Проверяет доступность сервера"""
         try:
-            # Извлекаем hostname из URL
-            hostname = self.ws_url.replace("wss://", "").replace("ws://", "").split("/")[0]
-            socket.getaddrinfo(hostname, None)
+            # Извлекаем hostname из URL (без порта — иначе getaddrinfo не разрешит адрес заглушки)
+            socket.getaddrinfo(urlparse(self.ws_url).hostname, None)
             return True
         except (socket.gaierror, socket.timeout, OSError):
             return False
@@ -71,8 +85,9 @@ class AsyncExtendedWSClient:
             timeout = aiohttp.ClientTimeout(total=10, connect=5)
             self.session = aiohttp.ClientSession(timeout=timeout)
 
-    async def _make_request(self, method: str, endpoint: str, params: Dict = None, signed: bool = False):
-        """Выполняет HTTP запрос с проверкой доступности"""
+    async def _make_request(self, method: str, endpoint: str, params: Dict = None, signed: bool = False,
+                            priority: str = INFO):
+        """Выполняет HTTP запрос с проверкой доступности через регулятор лимитов Extended"""
         if self._connection_available is False:
             raise Exception("Extended API недоступен")
 
@@ -82,17 +97,22 @@ class AsyncExtendedWSClient:
         headers = {'X-API-KEY': self.api_key}
 
         if signed and params:
-            params['timestamp'] = int(time.time() * 1000)
+            params.update(self.clock.stamp())
             params['signature'] = self._sign_request(params)
 
         try:
-            async with self.session.request(method, url, params=params, headers=headers) as resp:
+            async with get_governor("extended").request(self.session, method, url, priority=priority,
+                                                        sign=self._sign_request, params=params,
+                                                        headers=headers) as resp:
                 return await resp.json()
         except aiohttp.ClientError as e:
             logger.error(f"❌ HTTP запрос failed: {e}")
             self._connection_available = False
             raise
 
+    async def _server_time(self) -> int:
+        return (await self._make_request('GET', '/api/v1/time'))['serverTime']
+
     async def connect_ws(self):
         """Подключается к WebSocket с проверкой доступности"""
         # Проверяем доступность только один раз
@@ -106,6 +126,8 @@ class AsyncExtendedWSClient:
         if self.ws_connection is None:
             await self._connect_websocket()
 
+        self.clock.start(self._server_time)
+
         if not self._listener_started:
             try:
                 # Получаем ключ для user stream
@@ -160,8 +182,11 @@ class AsyncExtendedWSClient:
         while self.ws_connection and not self.ws_connection.closed:
             try:
                 message = await asyncio.wait_for(self.ws_connection.recv(), timeout=30)
+                received = receive_time()
+                if self.capture is not None:
+                    self.capture.record("extended", message, received[0])
                 data = json.loads(message)
-                await self._handle_websocket_message(data)
+                await self._handle_websocket_message(data, received)
 
             except asyncio.TimeoutError:
                 # Ping для поддержания соединения
@@ -170,14 +195,20 @@ class AsyncExtendedWSClient:
 
             except websockets.exceptions.ConnectionClosed:
                 logger.warning("🔌 Extended WebSocket соединение закрыто")
+                count_reconnect("extended", "ws")
                 break
 
             except Exception as e:
                 logger.error(f"❌ Ошибка в Extended слушателе: {e}")
                 await asyncio.sleep(1)
 
-    async def _handle_websocket_message(self, data: Dict):
+    def enable_capture(self, recorder):
+        """Пишет все сырые WS кадры клиента в FrameRecorder (см. Replay/FrameCapture.py)"""
+        self.capture = recorder
+
+    async def _handle_websocket_message(self, data: Dict, received: tuple = None):
         """Обрабатывает WebSocket сообщения"""
+        received = received or receive_time()
         event_type = data.get('e')
 
         if event_type == 'executionReport':
@@ -192,17 +223,19 @@ class AsyncExtendedWSClient:
                 await self.db.save_order(
                     order_id=order_id,
                     fill_sz=filled_qty,
-                    price=price
+                    price=price,
+                    status=status
                 )
 
-                self.zmq_socket.send_json({
+                self.zmq_socket.send_json(stamp_event("extended", "fill", {
                     "exchange": "extended",
                     "type": "fill",
                     "orderId": order_id,
+                    "clientOrderId": data.get('c'),
                     "fillSz": filled_qty,
                     "price": price,
                     "status": status
-                })
+                }, data.get('E'), received))
 
                 if status in ['FILLED', 'CANCELED', 'REJECTED']:
                     self.running_orders.pop(order_id, None)
@@ -213,14 +246,14 @@ class AsyncExtendedWSClient:
                 bids = [[float(b[0]), float(b[1])] for b in data.get('b', [])][:10]
                 asks = [[float(a[0]), float(a[1])] for a in data.get('a', [])][:10]
 
-                await self.db.save_orderbook(symbol, bids, asks)
+                await self.db.save_orderbook(symbol, bids, asks, exchange_ts=data.get('E'))
 
-                self.zmq_socket.send_json({
+                self.zmq_socket.send_json(stamp_event("extended", "book", {
                     "exchange": "extended",
                     "coin": symbol,
                     "bids": bids,
                     "asks": asks
-                })
+                }, data.get('E'), received))
 
     async def subscribe_orderbook(self, symbol: str):
         """Подписка на ордербук"""
@@ -245,32 +278,37 @@ class AsyncExtendedWSClient:
             logger.error(f"❌ Ошибка подписки Extended на {symbol}: {e}")
             return False
 
-    async def place_limit_order(self, symbol: str, side: str, price: float, qty: float):
+    @traced_order("extended")
+    async def place_limit_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
         """Размещает лимитный ордер"""
         if not self._connection_available:
             raise Exception("Extended недоступен")
 
+        client_order_id = track_order("extended", client_order_id)
         params = {
             'symbol': symbol,
             'side': side.upper(),
             'type': 'LIMIT',
             'timeInForce': 'GTC',
             'quantity': qty,
-            'price': price
+            'price': price,
+            'newClientOrderId': client_order_id
         }
 
-        data = await self._make_request('POST', '/api/v1/order', params, signed=True)
+        data = await self._make_request('POST', '/api/v1/order', params, signed=True, priority=ORDER)
         order_id = str(data.get('orderId'))
+        bind_order("extended", client_order_id, order_id)
 
         logger.info(f"📤 Extended placed limit {side} {symbol} {price}@{qty}, orderId={order_id}")
 
         self.running_orders[order_id] = True
-        await self.db.save_order(order_id=order_id, fill_sz=0.0, price=price)
+        await self.db.save_order(order_id=order_id, fill_sz=0.0, price=price, status="NEW")
 
         self.zmq_socket.send_json({
             "exchange": "extended",
             "type": "order",
             "orderId": order_id,
+            "clientOrderId": client_order_id,
             "fillSz": 0.0,
             "price": price,
             "status": "NEW"
@@ -278,6 +316,7 @@ class AsyncExtendedWSClient:
 
         return {
             "orderId": order_id,
+            "clientOrderId": client_order_id,
             "symbol": symbol,
             "side": side,
             "price": price,
@@ -286,11 +325,13 @@ class AsyncExtendedWSClient:
         }
 
     # Остальные методы остаются без изменений, но добавляем проверку доступности
+    @traced_order("extended")
     async def place_market_order(self, symbol: str, side: str, qty: float):
         if not self._connection_available:
             raise Exception("Extended недоступен")
         # ... остальная логика
 
+    @traced_order("extended")
     async def cancel_order(self, symbol: str, order_id: str):
         if not self._connection_available:
             raise Exception("Extended недоступен")
@@ -312,6 +353,8 @@ class AsyncExtendedWSClient:
             if self.ws_connection and not self.ws_connection.closed:
                 await self.ws_connection.close()
 
+            await self.clock.stop()
+
             if self.session:
                 await self.session.close()
 
@@ -19,43 +19,55 @@ from eth_account.messages import encode_defunct
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from DragonflyDb.DragonFlyConnector import DragonFlyConnector
+from CexWsClients.HyperliquidSubscriptionManager import HyperliquidSubscriptionManager
+from CexWsClients.RateLimitGovernor import CANCEL, INFO, ORDER, get_governor
+from Execution.FillEvents import bind_order, get_order_fill, track_order
+from Monitoring.FeedLatency import receive_time, stamp_event
+from Monitoring.Telemetry import count_reconnect, instrument_zmq, traced_order
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# meta (вес 20) меняется редко — переиспользуем ответ
+META_TTL_S = 300
+# Вес запросов info: l2Book, orderStatus, clearinghouseState — 2, остальные (meta) — 20
+INFO_WEIGHT_LIGHT = 2
+INFO_WEIGHT_HEAVY = 20
+
 
 class AsyncHyperliquidWSClient:
-    def __init__(self, wallet: LocalAccount, account_address: str, base_url=MAINNET_API_URL):
+    def __init__(self, wallet: LocalAccount, account_address: str, base_url: str = None):
         self.wallet = wallet
         self.account_address = account_address
-        self.exchange = Exchange(wallet=wallet, base_url=base_url, account_address=account_address)
+        # HYPERLIQUID_API_URL позволяет направить клиента на MockExchange; WS адрес выводится из REST
+        self.base_url = base_url or os.getenv("HYPERLIQUID_API_URL", MAINNET_API_URL)
+        self._exchange = None
         self._loop = asyncio.get_event_loop() if asyncio.get_event_loop().is_running() else None
-        self.ws_url = "wss://api.hyperliquid.xyz/ws"
+        self.ws_url = self.base_url.replace("https://", "wss://").replace("http://", "ws://") + "/ws"
         self.private_key = None
-        self.ws_connection = None
-        self.subscription_handlers = {}
+        # Желаемый набор подписок; восстанавливается после переподключения
+        self.subscriptions = HyperliquidSubscriptionManager(self.ws_url, self._handle_websocket_message)
         self.running = False
         self.orderbook_tasks = {}
-        self.listen_task = None
         self._orderbook_cache = {}
         self.db = DragonFlyConnector("hyperliquid")
         context = zmq.Context()
         self.zmq_socket = context.socket(zmq.PUSH)
         self.zmq_socket.connect("tcp://127.0.0.1:5555")
+        self.zmq_socket = instrument_zmq(self.zmq_socket, "hyperliquid")
         self.running_orders = {}
+        # Общий на процесс регулятор веса REST (1200 в минуту на IP): ордера и отмены вперед info
+        self.limits = get_governor("hyperliquid")
+        self._meta_cache = None
         self._listener_started = False
-        self._user_fills_subscribed = False
         self.ws_response_queue = asyncio.Queue()
 
     async def connect_ws(self):
         """Подключается к WebSocket и запускает слушатель"""
-        if self.ws_connection is None:
-            await self._connect_websocket()
-
         # Запускаем слушатель сообщений, если еще не запущен
         if not self._listener_started:
-            self.listen_task = asyncio.create_task(self._listen_for_websocket_messages())
+            await self.subscriptions.start()
             self._listener_started = True
             logger.info("🎧 WebSocket слушатель запущен")
 
@@ -64,16 +76,9 @@ class AsyncHyperliquidWSClient:
 
     async def _subscribe_to_user_fills(self):
         """Автоматическая подписка на UserFills при подключении"""
-        if not self._user_fills_subscribed:
-            subscription_msg = {
-                "method": "subscribe",
-                "subscription": {
-                    "type": "userFills",
-                    "user": self.account_address
-                }
-            }
-            await self.ws_connection.send(json.dumps(subscription_msg))
-            self._user_fills_subscribed = True
+        subscription = {"type": "userFills", "user": self.account_address}
+        if not self.subscriptions.is_subscribed(subscription):
+            await self.subscriptions.subscribe(subscription)
             logger.info(f"📡 Автоподписка на userFills для {self.account_address}")
 
     async def subscribe_order(self, order_id: str):
@@ -85,53 +90,10 @@ class AsyncHyperliquidWSClient:
         self.running_orders[order_id] = True
         logger.info(f"🔔 Отслеживание ордера {order_id}")
 
-    async def _listen_for_websocket_messages(self):
-        """Основной слушатель WebSocket сообщений"""
-        logger.info("🔊 Запуск WebSocket слушателя...")
-
-        while not self._is_connection_closed():
-            try:
-                # Получаем сообщение с таймаутом
-                message = await asyncio.wait_for(self.ws_connection.recv(), timeout=30)
-                data = json.loads(message)
-
-                logger.debug(f"📨 Получено WS сообщение: {data}")
-
-                # Обрабатываем разные типы сообщений
-                await self._handle_websocket_message(data)
-
-            except asyncio.TimeoutError:
-                # Отправляем ping для поддержания соединения
-                try:
-                    await self.ws_connection.send(json.dumps({"type": "ping"}))
-                    logger.debug("📡 Ping отправлен")
-                except Exception as e:
-                    logger.error(f"❌ Ошибка отправки ping: {e}")
-                    break
-
-            except websockets.exceptions.ConnectionClosed:
-                logger.warning("🔌 WebSocket соединение закрыто")
-                break
-
-            except json.JSONDecodeError as e:
-                logger.error(f"❌ Ошибка парсинга JSON: {e}")
-                continue
-
-            except Exception as e:
-                logger.error(f"❌ Ошибка в WebSocket слушателе: {e}")
-                await asyncio.sleep(1)
-                continue
-
-        logger.info("🔇 WebSocket слушатель остановлен")
-
-    async def _handle_websocket_message(self, data: Dict):
+    async def _handle_websocket_message(self, data: Dict, received: tuple = None):
         """Обрабатывает входящие WebSocket сообщения"""
+        received = received or receive_time()
         try:
-            # Ping/Pong
-            if data.get("type") == "ping":
-                await self.ws_connection.send(json.dumps({"type": "pong"}))
-                return
-
             # Ответы на запросы (с ID)
             if "id" in data:
                 await self.ws_response_queue.put(json.dumps(data))
@@ -141,7 +103,13 @@ class AsyncHyperliquidWSClient:
             channel = data.get("channel")
 
             if channel == "userFills":
-                await self._process_fill_event(data)
+                await self._process_fill_event(data, received)
+
+            elif channel == "activeAssetCtx":
+                await self._process_asset_ctx(data["data"])
+
+            elif channel == "bbo":
+                await self._process_bbo_event(data["data"], received)
 
             elif channel == "l2Book":
                 coin = data["data"].get("coin")
@@ -153,28 +121,56 @@ class AsyncHyperliquidWSClient:
                     bids = [[float(b["px"]), float(b["sz"])] for b in raw_bids]
                     asks = [[float(a["px"]), float(a["sz"])] for a in raw_asks]
 
-                    await self.db.save_orderbook(coin, bids, asks)
+                    await self.db.save_orderbook(coin, bids, asks, exchange_ts=data["data"].get("time"))
 
-                    self.zmq_socket.send_json({
+                    self.zmq_socket.send_json(stamp_event("hyperliquid", "book", {
                         "exchange": "hyperliquid",
                         "coin": coin,
                         "bids": bids,
                         "asks": asks
-                    })
+                    }, data["data"].get("time"), received))
 
         except Exception as e:
             logger.error(f"❌ Ошибка обработки WebSocket сообщения: {e}")
 
+    @property
+    def exchange(self) -> Exchange:
+        """
+        SDK клиент создается при первом обращении: Exchange() сразу запрашивает meta по REST,
+        а для обработки WS кадров (например, при replay) сеть не нужна.
+        """
+        if self._exchange is None:
+            self._exchange = Exchange(wallet=self.wallet, base_url=self.base_url, account_address=self.account_address)
+        return self._exchange
+
+    def enable_capture(self, recorder):
+        """Пишет все сырые WS кадры клиента в FrameRecorder (см. Replay/FrameCapture.py)"""
+        self.subscriptions.capture = recorder
+
     @classmethod
-    def from_key(cls, private_key: str):
+    def from_key(cls, private_key: str, base_url: str = None):
         from eth_account import Account
         account = Account.from_key(private_key)
-        return cls(wallet=account, account_address=account.address)
+        return cls(wallet=account, account_address=account.address, base_url=base_url)
+
+    async def _rest(self, func, *args, weight: int = 1, priority: str = INFO):
+        """Синхронный вызов SDK в executor после ожидания токенов регулятора"""
+        await self.limits.acquire(weight, priority)
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _meta(self) -> dict:
+        """meta из кеша, раз в META_TTL_S — заново с биржи"""
+        cached = self._meta_cache
+        if cached is not None and time.monotonic() - cached[0] < META_TTL_S:
+            return cached[1]
+        meta = await self._rest(self.exchange.info.meta, weight=INFO_WEIGHT_HEAVY)
+        self._meta_cache = (time.monotonic(), meta)
+        return meta
 
     async def _get_asset_index(self, symbol: str) -> int:
         """Получает индекс актива по символу из мета-информации."""
         try:
-            meta = await asyncio.get_running_loop().run_in_executor(None, self.exchange.info.meta)
+            meta = await self._meta()
             universe = meta.get("universe", [])
             for i, asset in enumerate(universe):
                 if asset["name"] == symbol:
@@ -188,7 +184,7 @@ class AsyncHyperliquidWSClient:
         """Получает минимальный шаг изменения цены (tick size) для символа"""
         try:
             # Получаем meta информацию
-            meta = await asyncio.get_running_loop().run_in_executor(None, self.exchange.info.meta)
+            meta = await self._meta()
             universe = meta.get("universe", [])
 
             # Ищем asset по символу
@@ -225,7 +221,7 @@ class AsyncHyperliquidWSClient:
         pricePrecision = кол-во знаков после запятой первого bid
         """
         # 1) лупаем meta
-        meta = await asyncio.get_running_loop().run_in_executor(None, self.exchange.info.meta)
+        meta = await self._meta()
         universe = meta.get("universe", [])
         asset = next((a for a in universe if a["name"] == symbol), None)
         if not asset:
@@ -246,7 +242,7 @@ class AsyncHyperliquidWSClient:
 
     async def get_orderbook(self, symbol: str, depth: int = 10) -> Dict[str, List[List[float]]]:
         # получаем уровни: [[биды],[аски]]
-        ob = await asyncio.get_running_loop().run_in_executor(None, self.exchange.info.l2_snapshot, symbol)
+        ob = await self._rest(self.exchange.info.l2_snapshot, symbol, weight=INFO_WEIGHT_LIGHT)
         levels = ob.get("levels", [])
         bids_lv = levels[0] if len(levels) >= 1 else []
         asks_lv = levels[1] if len(levels) >= 2 else []
@@ -254,149 +250,217 @@ class AsyncHyperliquidWSClient:
         asks = [[float(l["px"]), float(l["sz"])] for l in asks_lv[:depth]]
         return {"bids": bids, "asks": asks}
 
-    async def place_limit_order(self, symbol: str, side: str, price: float, qty: float):
+    @staticmethod
+    def _order_status(status: dict, qty: float, price: float):
+        """
+        Разбирает статус ордера из ответа order/bulk_orders: (order_id, fill_sz, avg_price, status)
+        или None, если ордер отклонен.
+        """
+        if not isinstance(status, dict):
+            return None
+        if status.get('filled'):
+            filled = status['filled']
+            return str(filled.get('oid')), float(filled.get('totalSz', qty)), float(filled.get('avgPx', price)), "FILLED"
+        if 'resting' in status:
+            return str(status['resting'].get('oid')), 0.0, price, "NEW"
+        return None
+
+    @staticmethod
+    def _reject(client_order_id: str, status) -> str:
+        """Ордер отклонен биржей: текст ошибки, ждущие исполнения по cloid сразу получают REJECTED"""
+        get_order_fill("hyperliquid", client_order_id).apply(0.0, "REJECTED")
+        error = status.get('error', status) if isinstance(status, dict) else status
+        logger.error(f"❌ Ордер {client_order_id} отклонен: {error}")
+        return str(error)
+
+    async def _record_order(self, order_id: str, fill_sz: float, price: float, status: str, qty: float,
+                            client_order_id: str = None, reduce_only: bool = False):
+        """
+        Единая запись ордера по ответу REST: привязка к клиентскому id в FillEvents,
+        отслеживание, Dragonfly и ZMQ
+        """
+        if client_order_id:
+            bind_order("hyperliquid", client_order_id, order_id)
+        if status == "NEW":
+            self.running_orders[order_id] = True
+        await self.db.save_order(order_id=order_id, fill_sz=fill_sz, price=price, status=status, orig_sz=qty)
+
+        event = {
+            "exchange": "hyperliquid",
+            "type": "fill" if status == "FILLED" else "order",
+            "orderId": order_id,
+            "clientOrderId": client_order_id,
+            "fillSz": fill_sz,
+            "price": price,
+            "status": status
+        }
+        if reduce_only:
+            event["reduceOnly"] = True
+        self.zmq_socket.send_json(event)
+
+    async def _send_limit(self, symbol: str, side: str, price: float, qty: float, reduce_only: bool,
+                          client_order_id: str = None) -> dict:
+        """GTC лимитка (открывающая или reduce_only) с cloid; общий путь place/close_limit_order"""
+        is_buy = side.lower() in ('long', 'buy')
+        side = 'buy' if is_buy else 'sell'
+        order_type: OrderType = {"limit": {"tif": "Gtc"}}
+        client_order_id = track_order("hyperliquid", client_order_id)
+
+        data = await self._rest(self.exchange.order, symbol, is_buy, qty, price, order_type, reduce_only,
+                                Cloid.from_str(client_order_id), priority=ORDER)
+
+        logger.info(f"📤 Placed {'close ' if reduce_only else ''}limit {side} {symbol} {price}@{qty}")
+        logger.info(f"📋 Order response: {data}")
+
+        statuses = data.get('response', {}).get('data', {}).get('statuses', [])
+        parsed = self._order_status(statuses[0], qty, price) if statuses else None
+        order_id, status, error = None, "REJECTED", None
+        if parsed:
+            order_id, fill_sz, avg_price, status = parsed
+            if status == "FILLED":
+                logger.info(f"✅ Ордер {order_id} сразу исполнен: {fill_sz}@{avg_price}")
+            else:
+                logger.info(f"⏳ Ордер {order_id} размещен и ожидает исполнения")
+            await self._record_order(order_id, fill_sz, avg_price, status, qty, client_order_id, reduce_only)
+        else:
+            error = self._reject(client_order_id, statuses[0] if statuses else data.get('response', data))
+
+        result = {
+            "orderId": order_id,
+            "clientOrderId": client_order_id,
+            "symbol": symbol,
+            "side": side,
+            "price": price,
+            "qty": qty,
+            "status": status
+        }
+        if error is not None:
+            result["error"] = error
+        if reduce_only:
+            result["quantity"] = qty
+            result["reduceOnly"] = True
+        return result
+
+    @traced_order("hyperliquid")
+    async def place_limit_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
         """Размещает лимитный ордер через REST API"""
         try:
-            if side.lower() == 'long':
-                side = 'buy'
-            elif side.lower() == 'short':
-                side = 'sell'
-
-            is_buy = side.lower() == "buy"
-            order_type: OrderType = {"limit": {"tif": "Gtc"}}
-
-            # Отправляем ордер через REST
-            data = await asyncio.get_running_loop().run_in_executor(
-                None, self.exchange.order, symbol, is_buy, qty, price, order_type
-            )
-
-            logger.info(f"📤 Placed limit {side} {symbol} {price}@{qty}")
-            logger.info(f"📋 Order response: {data}")
-
-            # Извлекаем order ID из ответа
-            statuses = data.get('response', {}).get('data', {}).get('statuses', [])
-            order_id = None
-
-            if statuses:
-                first = statuses[0]
-                if 'filled' in first and first['filled']:
-                    order_id = str(first['filled'].get('oid'))
-                    # Ордер уже исполнен
-                    fill_sz = float(first['filled'].get('totalSz', qty))
-                    avg_price = float(first['filled'].get('avgPx', price))
+            return await self._send_limit(symbol, side, price, qty, False, client_order_id)
+        except Exception as e:
+            logger.error(f"❌ Ошибка размещения лимитного ордера: {e}")
+            raise
 
-                    logger.info(f"✅ Ордер {order_id} сразу исполнен: {fill_sz}@{avg_price}")
+    @traced_order("hyperliquid")
+    async def place_limit_orders(self, symbol: str, side: str, levels: list, reduce_only: bool = False,
+                                 client_order_ids: list = None):
+        """
+        Несколько GTC лимиток одной стороны одним действием order (bulk_orders SDK):
+        levels — [(price, qty), ...], client_order_ids — cloid по levels (без них генерируются).
+        Возвращает список по levels в формате place_limit_order или {"error": ...} для отклоненной части.
+        """
+        if side.lower() == 'long':
+            side = 'buy'
+        elif side.lower() == 'short':
+            side = 'sell'
+        is_buy = side.lower() == "buy"
+        order_type: OrderType = {"limit": {"tif": "Gtc"}}
+        client_order_ids = [track_order("hyperliquid", client_order_id)
+                            for client_order_id in (client_order_ids or [None] * len(levels))]
+
+        requests = [{
+            "coin": symbol,
+            "is_buy": is_buy,
+            "sz": qty,
+            "limit_px": price,
+            "order_type": order_type,
+            "reduce_only": reduce_only,
+            "cloid": Cloid.from_str(client_order_id)
+        } for (price, qty), client_order_id in zip(levels, client_order_ids)]
 
-                    # Сохраняем в БД как исполненный
-                    await self.db.save_order(
-                        order_id=order_id,
-                        fill_sz=fill_sz,
-                        price=avg_price
-                    )
+        try:
+            # Действие с n ордерами весит 1 + n // 40
+            data = await self._rest(self.exchange.bulk_orders, requests, weight=1 + len(requests) // 40,
+                                    priority=ORDER)
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетного размещения ордеров: {e}")
+            raise
 
-                    # Отправляем через ZMQ
-                    self.zmq_socket.send_json({
-                        "exchange": "hyperliquid",
-                        "type": "fill",
-                        "orderId": order_id,
-                        "fillSz": fill_sz,
-                        "price": avg_price,
-                        "status": "FILLED"
-                    })
-
-                elif 'resting' in first:
-                    order_id = str(first['resting'].get('oid'))
-                    logger.info(f"⏳ Ордер {order_id} размещен и ожидает исполнения")
-
-                    # УБИРАЕМ подписку - UserFills уже активен
-                    # await self.subscribe_order(order_id)
-
-                    # Просто добавляем в отслеживаемые
-                    self.running_orders[order_id] = True
-
-                    # Сохраняем в БД
-                    await self.db.save_order(
-                        order_id=order_id,
-                        fill_sz=0.0,
-                        price=price
-                    )
-
-                    # Отправляем через ZMQ
-                    self.zmq_socket.send_json({
-                        "exchange": "hyperliquid",
-                        "type": "order",
-                        "orderId": order_id,
-                        "fillSz": 0.0,
-                        "price": price,
-                        "status": "NEW"
-                    })
+        logger.info(f"📤 Placed {len(levels)} limit {side} {symbol}: {levels}")
+        if data.get("status") != "ok":
+            return [{"clientOrderId": client_order_id, "status": "REJECTED",
+                     "error": self._reject(client_order_id, data.get("response", data))}
+                    for client_order_id in client_order_ids]
+
+        statuses = data.get('response', {}).get('data', {}).get('statuses', [])
+        results = []
+        for (price, qty), client_order_id, status in zip(levels, client_order_ids, statuses):
+            parsed = self._order_status(status, qty, price)
+            if parsed is None:
+                results.append({"clientOrderId": client_order_id, "status": "REJECTED",
+                                "error": self._reject(client_order_id, status)})
+                continue
 
-            return {
+            order_id, fill_sz, avg_price, order_status = parsed
+            await self._record_order(order_id, fill_sz, avg_price, order_status, qty, client_order_id, reduce_only)
+            results.append({
                 "orderId": order_id,
+                "clientOrderId": client_order_id,
                 "symbol": symbol,
                 "side": side,
                 "price": price,
                 "qty": qty,
-                "status": "FILLED" if statuses and 'filled' in statuses[0] else "NEW"
-            }
-
-        except Exception as e:
-            logger.error(f"❌ Ошибка размещения лимитного ордера: {e}")
-            raise
-
-    async def place_market_order(self, symbol: str, side: str, qty: float):
+                "status": order_status
+            })
+        return results
+
+    async def _send_market(self, symbol: str, side: str, qty: float, reduce_only: bool,
+                           client_order_id: str = None) -> dict:
+        """Маркет через market_open/market_close SDK с cloid; общий путь place/close_market_order"""
+        is_buy = side.lower() in ('long', 'buy')
+        client_order_id = track_order("hyperliquid", client_order_id)
+        cloid = Cloid.from_str(client_order_id)
+
+        # SDK перед маркетом читает all_mids (вес 2), затем отправляет ордер
+        if reduce_only:
+            data = await self._rest(lambda: self.exchange.market_close(symbol, qty, cloid=cloid),
+                                    weight=1 + INFO_WEIGHT_LIGHT, priority=ORDER)
+        else:
+            data = await self._rest(lambda: self.exchange.market_open(symbol, is_buy, qty, cloid=cloid),
+                                    weight=1 + INFO_WEIGHT_LIGHT, priority=ORDER)
+
+        logger.info(f"📤 Placed {'close ' if reduce_only else ''}market {side} {symbol} {qty}")
+        logger.info(f"📋 Market order response: {data}")
+
+        statuses = data.get('response', {}).get('data', {}).get('statuses', []) if isinstance(data, dict) else []
+        # Маркет обычно исполняется сразу; точная цена придет в userFills
+        parsed = self._order_status(statuses[0], qty, 0.0) if statuses else None
+        order_id = parsed[0] if parsed else None
+        if order_id:
+            _, fill_sz, avg_price, _ = parsed
+            await self._record_order(order_id, fill_sz or qty, avg_price, "FILLED", qty, client_order_id, reduce_only)
+            return {"orderId": order_id, "clientOrderId": client_order_id, "symbol": symbol, "quantity": qty,
+                    "status": "FILLED"}
+        error = self._reject(client_order_id, statuses[0] if statuses else data)
+        return {"orderId": None, "clientOrderId": client_order_id, "symbol": symbol, "quantity": qty,
+                "status": "REJECTED", "error": error}
+
+    @traced_order("hyperliquid")
+    async def place_market_order(self, symbol: str, side: str, qty: float, client_order_id: str = None):
         """Размещает маркет ордер через REST API"""
         try:
             if side.lower() == 'long':
                 side = 'buy'
             elif side.lower() == 'short':
                 side = 'sell'
-
-            is_buy = side.lower() == "buy"
-
-            # Отправляем маркет ордер через REST
-            data = await asyncio.get_running_loop().run_in_executor(
-                None, self.exchange.market_open, symbol, is_buy, qty
-            )
-
-            logger.info(f"📤 Placed market {side} {symbol} {qty}")
-            logger.info(f"📋 Market order response: {data}")
-
-            order_id = str(data.get("oid", data.get("orderId", "")))
-
-            if order_id:
-                # Подписываемся на обновления ордера
-                await self.subscribe_order(order_id)
-
-                # Сохраняем в БД
-                await self.db.save_order(
-                    order_id=order_id,
-                    fill_sz=qty,  # Маркет ордер обычно заполняется сразу
-                    price=0.0  # Цена будет получена из fills
-                )
-
-                # Отправляем через ZMQ
-                self.zmq_socket.send_json({
-                    "exchange": "hyperliquid",
-                    "type": "order",
-                    "orderId": order_id,
-                    "fillSz": qty,
-                    "price": 0.0,
-                    "status": "FILLED"
-                })
-
-            return {
-                "orderId": order_id,
-                "symbol": symbol,
-                "side": side,
-                "quantity": qty,
-                "status": "FILLED"
-            }
+            result = await self._send_market(symbol, side, qty, False, client_order_id)
+            result["side"] = side
+            return result
 
         except Exception as e:
             logger.error(f"❌ Ошибка размещения маркет ордера: {e}")
             raise
-    async def place_fok_order(self, symbol: str, side: str, price: float, qty: float):
+    @traced_order("hyperliquid")
+    async def place_fok_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
         """Fill-or-Kill ордер для Hyperliquid"""
         try:
             if side.lower() in ['long', 'buy']:
@@ -405,10 +469,10 @@ class AsyncHyperliquidWSClient:
                 is_buy = False
 
             order_type: OrderType = {"limit": {"tif": "Fok"}}
+            client_order_id = track_order("hyperliquid", client_order_id)
 
-            data = await asyncio.get_running_loop().run_in_executor(
-                None, self.exchange.order, symbol, is_buy, qty, price, order_type
-            )
+            data = await self._rest(self.exchange.order, symbol, is_buy, qty, price, order_type, False,
+                                    Cloid.from_str(client_order_id), priority=ORDER)
 
             statuses = data.get('response', {}).get('data', {}).get('statuses', [])
 
@@ -419,10 +483,12 @@ class AsyncHyperliquidWSClient:
                     order_id = str(first['filled'].get('oid'))
                     fill_sz = float(first['filled'].get('totalSz', qty))
                     avg_price = float(first['filled'].get('avgPx', price))
+                    bind_order("hyperliquid", client_order_id, order_id)
 
                     return {
                         "success": True,
                         "orderId": order_id,
+                        "clientOrderId": client_order_id,
                         "status": "FILLED",
                         "filledQty": fill_sz,
                         "avgPrice": avg_price
@@ -446,94 +512,50 @@ class AsyncHyperliquidWSClient:
                 "error": str(e)
             }
 
-    async def close_limit_order(self, symbol: str, side: str, price: float, qty: float):
-        """Размещает закрывающий лимитный ордер (reduce_only) через REST API"""
-        try:
-            if side.lower() == 'long':
-                side = 'buy'
-            elif side.lower() == 'short':
-                side = 'sell'
-
-            is_buy = side.lower() == "buy"
-            order_type: OrderType = {"limit": {"tif": "Gtc"}}
-
-            # Отправляем закрывающий ордер через REST (reduce_only = True)
-            data = await asyncio.get_running_loop().run_in_executor(
-                None, self.exchange.order, symbol, is_buy, qty, price, order_type, True
-            )
-
-            logger.info(f"Placed close limit {side} {symbol} {price}@{qty}")
-
-            # Извлекаем order ID из ответа
-            statuses = data.get('response', {}).get('data', {}).get('statuses', [])
-            order_id = None
-
-            if statuses:
-                first = statuses[0]
-                if 'filled' in first and first['filled']:
-                    order_id = str(first['filled'].get('oid'))
-                    # Ордер уже исполнен
-                    fill_sz = float(first['filled'].get('totalSz', qty))
-                    avg_price = float(first['filled'].get('avgPx', price))
-
-                    logger.info(f"✅ Закрывающий ордер {order_id} сразу исполнен: {fill_sz}@{avg_price}")
-
-                    # Сохраняем в БД
-                    await self.db.save_order(
-                        order_id=order_id,
-                        fill_sz=fill_sz,
-                        price=avg_price
-                    )
-
-                    # Отправляем через ZMQ
-                    self.zmq_socket.send_json({
-                        "exchange": "hyperliquid",
-                        "type": "fill",
-                        "orderId": order_id,
-                        "fillSz": fill_sz,
-                        "price": avg_price,
-                        "status": "FILLED",
-                        "reduceOnly": True
-                    })
-
-                elif 'resting' in first:
-                    order_id = str(first['resting'].get('oid'))
-                    logger.info(f"⏳ Закрывающий ордер {order_id} размещен и ожидает исполнения")
-
-                    # УБИРАЕМ подписку - UserFills уже активен
-                    # await self.subscribe_order(order_id)
-
-                    # Просто добавляем в отслеживаемые
-                    self.running_orders[order_id] = True
-
-                    # Сохраняем в БД
-                    await self.db.save_order(
-                        order_id=order_id,
-                        fill_sz=0.0,
-                        price=price
-                    )
-
-                    # Отправляем через ZMQ
-                    self.zmq_socket.send_json({
-                        "exchange": "hyperliquid",
-                        "type": "order",
-                        "orderId": order_id,
-                        "fillSz": 0.0,
-                        "price": price,
-                        "status": "NEW",
-                        "reduceOnly": True
-                    })
-
+    @traced_order("hyperliquid")
+    async def place_ioc_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
+        """Лимит IOC: исполняется сразу по цене не хуже price, остаток снимается биржей"""
+        is_buy = side.lower() in ['long', 'buy']
+        order_type: OrderType = {"limit": {"tif": "Ioc"}}
+        client_order_id = track_order("hyperliquid", client_order_id)
+
+        data = await self._rest(self.exchange.order, symbol, is_buy, qty, price, order_type, False,
+                                Cloid.from_str(client_order_id), priority=ORDER)
+
+        statuses = data.get('response', {}).get('data', {}).get('statuses', []) if isinstance(data, dict) else []
+        first = statuses[0] if statuses else {}
+
+        if first.get('filled'):
+            order_id = str(first['filled'].get('oid'))
+            fill_sz = float(first['filled'].get('totalSz', 0))
+            avg_price = float(first['filled'].get('avgPx', price))
+            await self._record_order(order_id, fill_sz, avg_price, "FILLED" if fill_sz >= qty else "CANCELED", qty,
+                                     client_order_id)
             return {
+                "success": True,
                 "orderId": order_id,
-                "symbol": symbol,
-                "side": side,
-                "price": price,
-                "quantity": qty,
-                "status": "FILLED" if statuses and 'filled' in statuses[0] else "NEW",
-                "reduceOnly": True
+                "clientOrderId": client_order_id,
+                "status": "FILLED" if fill_sz >= qty else "PARTIALLY_FILLED",
+                "filledQty": fill_sz,
+                "avgPrice": avg_price
             }
 
+        # Ничего не исполнилось — Hyperliquid возвращает error вместо oid
+        logger.info(f"⏭️ IOC {symbol} {price}@{qty} не исполнен: {first.get('error', data)}")
+        return {
+            "success": False,
+            "orderId": None,
+            "clientOrderId": client_order_id,
+            "status": "EXPIRED",
+            "filledQty": 0.0,
+            "avgPrice": 0.0
+        }
+
+    @traced_order("hyperliquid")
+    async def close_limit_order(self, symbol: str, side: str, price: float, qty: float, client_order_id: str = None):
+        """Размещает закрывающий лимитный ордер (reduce_only) через REST API"""
+        try:
+            return await self._send_limit(symbol, side, price, qty, True, client_order_id)
         except Exception as e:
             logger.error(f"Ошибка размещения закрывающего лимитного ордера: {e}")
             raise
@@ -543,20 +565,8 @@ class AsyncHyperliquidWSClient:
         if order_id in self.running_orders:
             return
 
-        await self._connect_websocket()
-
         # Подписываемся на user fills для получения обновлений по ордерам
-        if not self._user_fills_subscribed:
-            subscription_msg = {
-                "method": "subscribe",
-                "subscription": {
-                    "type": "userFills",
-                    "user": self.account_address
-                }
-            }
-            await self.ws_connection.send(json.dumps(subscription_msg))
-            self._user_fills_subscribed = True
-            logger.info(f"📡 Подписка на userFills для {self.account_address}")
+        await self.connect_ws()
 
         self.running_orders[order_id] = True
         logger.info(f"🔔 Подписка на ордер {order_id}")
@@ -569,43 +579,137 @@ class AsyncHyperliquidWSClient:
     async def subscribe_orderbook(self, symbol: str):
         """Подписывается на поток ордербука"""
         await self.connect_ws()
-        subscription_id = f"orderbook_{symbol}"
-        if subscription_id in self.subscription_handlers:
+        subscription = {"type": "l2Book", "coin": symbol}
+        if self.subscriptions.is_subscribed(subscription):
             return
 
-        sub_msg = {
-            "method": "subscribe",
-            "subscription": {"type": "l2Book", "coin": symbol}
-        }
-        await self.ws_connection.send(json.dumps(sub_msg))
-        self.subscription_handlers[subscription_id] = lambda data: None
+        await self.subscriptions.subscribe(subscription)
         logger.info(f"📡 Подписка на ордербук {symbol}")
 
+    async def subscribe_bbo(self, symbol: str):
+        """Подписывается на поток лучшего bid/ask (идет чаще, чем l2Book)"""
+        await self.connect_ws()
+        subscription = {"type": "bbo", "coin": symbol}
+        if self.subscriptions.is_subscribed(subscription):
+            return
+
+        await self.subscriptions.subscribe(subscription)
+        logger.info(f"📡 Подписка на BBO {symbol}")
+
+    async def subscribe_mark_price(self, symbol: str):
+        """Подписка на activeAssetCtx: mark/oracle price и ставка funding (часовая)"""
+        await self.connect_ws()
+        await self.subscriptions.subscribe({"type": "activeAssetCtx", "coin": symbol})
+
+    async def _process_asset_ctx(self, data: Dict):
+        coin = data.get("coin")
+        ctx = data.get("ctx") or {}
+        if not coin or "markPx" not in ctx:
+            return
+
+        # Funding на Hyperliquid начисляется каждый час, в начале часа
+        next_funding_ts = (int(time.time()) // 3600 + 1) * 3600 * 1000
+        await self.db.save_funding(
+            coin,
+            mark=float(ctx["markPx"]),
+            funding_rate=float(ctx.get("funding", 0)),
+            interval_hours=1,
+            index_price=float(ctx.get("oraclePx") or 0),
+            next_funding_ts=next_funding_ts
+        )
+
+    async def unsubscribe_bbo(self, symbol: str):
+        await self.subscriptions.unsubscribe({"type": "bbo", "coin": symbol})
+
+    async def _process_bbo_event(self, data: Dict, received: tuple):
+        coin = data.get("coin")
+        bid_level, ask_level = (data.get("bbo") or [None, None])[:2]
+        # Сторона книги может быть пустой — такой BBO не сохраняем
+        if not coin or not bid_level or not ask_level:
+            return
+
+        bid, bid_qty = float(bid_level["px"]), float(bid_level["sz"])
+        ask, ask_qty = float(ask_level["px"]), float(ask_level["sz"])
+        await self.db.save_bbo(coin, bid, bid_qty, ask, ask_qty, exchange_ts=data.get("time"))
+
+        self.zmq_socket.send_json(stamp_event("hyperliquid", "bbo", {
+            "exchange": "hyperliquid",
+            "type": "bbo",
+            "coin": coin,
+            "bid": bid,
+            "bidQty": bid_qty,
+            "ask": ask,
+            "askQty": ask_qty
+        }, data.get("time"), received))
+
     async def unsubscribe_orderbook(self, symbol: str):
         """Отписывается от потока ордербука"""
-        await self.connect_ws()
-        subscription_id = f"orderbook_{symbol}"
-        if subscription_id not in self.subscription_handlers:
+        subscription = {"type": "l2Book", "coin": symbol}
+        if not self.subscriptions.is_subscribed(subscription):
             return
 
-        unsub_msg = {
-            "method": "unsubscribe",
-            "subscription": {"type": "l2Book", "coin": symbol}
-        }
-        await self.ws_connection.send(json.dumps(unsub_msg))
-        self.subscription_handlers.pop(subscription_id, None)
+        await self.subscriptions.unsubscribe(subscription)
         self._orderbook_cache.pop(symbol, None)
         logger.info(f"🔕 Отписка от ордербука {symbol}")
 
+    @traced_order("hyperliquid")
+    async def modify_order(self, symbol: str, order_id: str, side: str, price: float, qty: float,
+                           filled: float = 0.0, reduce_only: bool = False):
+        """
+        Перестановка стоящей лимитки одним действием batchModify (modify_order SDK).
+        qty — полный объем ордера, filled — уже исполненная часть: Hyperliquid принимает
+        в modify новый остаток. Если биржа выдала ордеру новый oid, возвращается он.
+        """
+        if side.lower() in ('long', 'buy'):
+            side = 'buy'
+        else:
+            side = 'sell'
+        order_type: OrderType = {"limit": {"tif": "Gtc"}}
+        remaining = qty - filled
+
+        data = await self._rest(self.exchange.modify_order, int(order_id), symbol, side == "buy", remaining, price,
+                                order_type, reduce_only, priority=ORDER)
+        if data.get("status") != "ok":
+            raise Exception(f"Ошибка изменения ордера: {data}")
+
+        statuses = data.get('response', {}).get('data', {}).get('statuses', [])
+        status = statuses[0] if statuses else {}
+        if isinstance(status, dict) and 'error' in status:
+            raise Exception(f"Ошибка изменения ордера: {status['error']}")
+
+        new_id, order_status = str(order_id), "NEW"
+        if isinstance(status, dict) and 'resting' in status:
+            new_id = str(status['resting'].get('oid', order_id))
+        elif isinstance(status, dict) and status.get('filled'):
+            new_id = str(status['filled'].get('oid', order_id))
+            order_status = "FILLED"
+
+        if new_id != str(order_id):
+            self.running_orders.pop(str(order_id), None)
+        if order_status != "FILLED":
+            self.running_orders[new_id] = True
+        await self.db.save_order(order_id=new_id, fill_sz=qty if order_status == "FILLED" else filled,
+                                 price=price, status=order_status, orig_sz=qty)
+
+        logger.info(f"✏️ Modified {order_id} -> {new_id}: {side} {symbol} {price}@{remaining}")
+        return {
+            "orderId": new_id,
+            "symbol": symbol,
+            "price": price,
+            "qty": qty,
+            "filledQty": qty if order_status == "FILLED" else filled,
+            "status": order_status
+        }
+
+    @traced_order("hyperliquid")
     async def cancel_order(self, symbol: str, order_id: str):
         """Отменяет ордер"""
         try:
-            await asyncio.get_running_loop().run_in_executor(
-                None, self.exchange.cancel, symbol, int(order_id)
-            )
+            await self._rest(self.exchange.cancel, symbol, int(order_id), priority=CANCEL)
 
             # Отписываемся от ордера при отмене
             await self.unsubscribe_order(order_id)
+            await self.db.save_order(order_id=str(order_id), fill_sz=0.0, price=0.0, status="CANCELED")
 
             logger.info(f"❌ Canceled {order_id} on {symbol}")
             return {"status": "canceled", "orderId": order_id}
@@ -617,9 +721,8 @@ class AsyncHyperliquidWSClient:
     async def get_order_status(self, symbol: str, order_id: str):
         """Получает статус ордера"""
         try:
-            data = await asyncio.get_running_loop().run_in_executor(
-                None, self.exchange.info.query_order_by_oid, self.account_address, int(order_id)
-            )
+            data = await self._rest(self.exchange.info.query_order_by_oid, self.account_address, int(order_id),
+                                    weight=INFO_WEIGHT_LIGHT)
 
             sz = float(data['order']['order']['sz'])
             origSz = float(data['order']['order']['origSz'])
@@ -629,7 +732,9 @@ class AsyncHyperliquidWSClient:
             await self.db.save_order(
                 order_id=order_id,
                 fill_sz=fillSz,
-                price=float(data['order']['order'].get('limitPx', 0))
+                price=float(data['order']['order'].get('limitPx', 0)),
+                status=str(data['order'].get('status', '')).upper() or None,
+                orig_sz=origSz
             )
 
             return {
@@ -644,7 +749,7 @@ class AsyncHyperliquidWSClient:
             logger.error(f"❌ Ошибка получения статуса ордера: {e}")
             raise
 
-    async def _process_fill_event(self, data: Dict):
+    async def _process_fill_event(self, data: Dict, received: tuple):
         """Обрабатывает события заполнения ордеров"""
         try:
             # Правильно извлекаем массив fills из структуры данных
@@ -655,6 +760,12 @@ class AsyncHyperliquidWSClient:
                 logger.warning(f"⚠️ data не является словарем: {data_content}")
                 return
 
+            # Каждая (пере)подписка на userFills присылает снимок недавних исполнений — они уже
+            # учтены по живым событиям, повторная обработка удвоила бы исполнение ордеров
+            if data_content.get("isSnapshot"):
+                logger.debug("💰 Пропускаем снимок userFills после подписки")
+                return
+
             fills = data_content.get("fills", [])
 
             if not isinstance(fills, list):
@@ -664,7 +775,8 @@ class AsyncHyperliquidWSClient:
             logger.info(f"💰 Обработка {len(fills)} fill событий")
 
             # Логируем структуру данных для отладки
-            logger.debug(f"💰 Fill data structure: {fills}")
+            # Ленивое форматирование: список fill не превращается в строку, пока DEBUG выключен
+            logger.debug("💰 Fill data structure: %s", fills)
 
             for fill in fills:
                 # Проверяем, что fill является словарем
@@ -686,23 +798,27 @@ class AsyncHyperliquidWSClient:
 
                 logger.info(f"💰 [FILL] Order {order_id}: {coin} {side} filled={fill_sz} price={price}")
 
-                # Всегда сохраняем в БД (не только для отслеживаемых ордеров)
-                await self.db.save_order(
+                # Всегда сохраняем в БД (не только для отслеживаемых ордеров).
+                # fill — одно исполнение, копим его в хэше ордера, дубли отсекаются по tid
+                await self.db.update_order_fill(
                     order_id=order_id,
                     fill_sz=fill_sz,
-                    price=price
+                    price=price,
+                    trade_id=str(fill.get("tid", "")) or None
                 )
 
                 # Отправляем через ZMQ
-                self.zmq_socket.send_json({
+                self.zmq_socket.send_json(stamp_event("hyperliquid", "fill", {
                     "exchange": "hyperliquid",
                     "type": "fill",
                     "orderId": order_id,
+                    "clientOrderId": fill.get("cloid"),
+                    "tradeId": fill.get("tid"),
                     "fillSz": fill_sz,
                     "price": price,
                     "coin": coin,
                     "side": side
-                })
+                }, fill.get("time"), received))
 
                 # Если ордер в списке отслеживаемых, дополнительно логируем
                 if order_id in self.running_orders:
@@ -715,42 +831,9 @@ class AsyncHyperliquidWSClient:
             import traceback
             logger.error(f"❌ Traceback: {traceback.format_exc()}")
 
-    async def _connect_websocket(self):
-        max_retries = 5
-        retry_delay = 2
-        for attempt in range(max_retries):
-            try:
-                if self._is_connection_closed():
-                    self.ws_connection = await websockets.connect(
-                        self.ws_url,
-                        ping_interval=20,
-                        ping_timeout=10,
-                        close_timeout=10
-                    )
-                    logger.info("🔌 WebSocket connection established")
-                return self.ws_connection
-            except Exception as e:
-                logger.error(f"❌ WebSocket connection failed (attempt {attempt + 1}): {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(retry_delay)
-                else:
-                    raise Exception("Failed to connect to WebSocket after retries")
-
-    def _is_connection_closed(self):
-        """Проверяет, закрыто ли WebSocket соединение"""
-        if self.ws_connection is None:
-            return True
-        try:
-            if hasattr(self.ws_connection, 'closed'):
-                return self.ws_connection.closed
-            elif hasattr(self.ws_connection, 'state'):
-                return self.ws_connection.state.name in ['CLOSED', 'CLOSING']
-            elif hasattr(self.ws_connection, 'close_code'):
-                return self.ws_connection.close_code is not None
-            else:
-                return False
-        except:
-            return True
+    def get_subscription_stats(self) -> dict:
+        """Сокеты, число подписок и время их восстановления после разрыва"""
+        return self.subscriptions.stats()
 
     async def close(self):
         """Правильно закрываем все соединения"""
@@ -759,17 +842,8 @@ class AsyncHyperliquidWSClient:
             self.running_orders.clear()
             self._listener_started = False
 
-            # Отменяем задачу слушателя
-            if self.listen_task and not self.listen_task.done():
-                self.listen_task.cancel()
-                try:
-                    await self.listen_task
-                except asyncio.CancelledError:
-                    pass
-
-            # Закрываем WebSocket соединение
-            if self.ws_connection and not self._is_connection_closed():
-                await self.ws_connection.close()
+            # Закрываем все WebSocket соединения менеджера подписок
+            await self.subscriptions.close()
 
             # Закрываем ZMQ socket
             if hasattr(self, 'zmq_socket'):
@@ -788,72 +862,8 @@ class AsyncHyperliquidWSClient:
         await self.close()
 
     # Остальные методы остаются без изменений...
-    async def close_limit_order(self, symbol: str, side: str, price: float, qty: float):
-        """Размещает закрывающий лимитный ордер (reduce_only) через REST API"""
-        try:
-            if side.lower() == 'long':
-                side = 'buy'
-            elif side.lower() == 'short':
-                side = 'sell'
-
-            is_buy = side.lower() == "buy"
-            order_type: OrderType = {"limit": {"tif": "Gtc"}}
-
-            # Отправляем закрывающий ордер через REST (reduce_only = True)
-            data = await asyncio.get_running_loop().run_in_executor(
-                None, self.exchange.order, symbol, is_buy, qty, price, order_type, True
-            )
-
-            logger.info(f"Placed close limit {side} {symbol} {price}@{qty}")
-
-            # Извлекаем order ID из ответа
-            statuses = data.get('response', {}).get('data', {}).get('statuses', [])
-            order_id = None
-
-            if statuses:
-                first = statuses[0]
-                if 'filled' in first and first['filled']:
-                    order_id = str(first['filled'].get('oid'))
-                elif 'resting' in first:
-                    order_id = str(first['resting'].get('oid'))
-
-            if order_id:
-                # Подписываемся на обновления ордера
-                await self.subscribe_order(order_id)
-
-                # Сохраняем в БД
-                await self.db.save_order(
-                    order_id=order_id,
-                    fill_sz=0.0,
-                    price=price
-                )
-
-                # Отправляем через ZMQ
-                self.zmq_socket.send_json({
-                    "exchange": "hyperliquid",
-                    "type": "order",
-                    "orderId": order_id,
-                    "fillSz": 0.0,
-                    "price": price,
-                    "status": "NEW",
-                    "reduceOnly": True
-                })
-
-            return {
-                "orderId": order_id,
-                "symbol": symbol,
-                "side": side,
-                "price": price,
-                "quantity": qty,
-                "status": "NEW",
-                "reduceOnly": True
-            }
-
-        except Exception as e:
-            logger.error(f"Ошибка размещения закрывающего лимитного ордера: {e}")
-            raise
-
-    async def close_market_order(self, symbol: str, side: str, qty: float):
+    @traced_order("hyperliquid")
+    async def close_market_order(self, symbol: str, side: str, qty: float, client_order_id: str = None):
         """Размещает закрывающий маркет ордер (reduce_only) через REST API"""
         try:
             if side.lower() == 'long':
@@ -863,47 +873,10 @@ class AsyncHyperliquidWSClient:
 
             # Для закрытия позиции нужно торговать в противоположном направлении
             opposite_side = "sell" if side.lower() == "buy" else "buy"
-            is_buy = opposite_side.lower() == "buy"
-
-            # Отправляем закрывающий маркет ордер через REST
-            data = await asyncio.get_running_loop().run_in_executor(
-                None, self.exchange.market_close, symbol, qty
-            )
-
-            logger.info(f"Placed close market {side} {symbol} {qty}")
-
-            order_id = str(data.get("oid", data.get("orderId", "")))
-
-            if order_id:
-                # Подписываемся на обновления ордера
-                await self.subscribe_order(order_id)
-
-                # Сохраняем в БД
-                await self.db.save_order(
-                    order_id=order_id,
-                    fill_sz=qty,
-                    price=0.0
-                )
-
-                # Отправляем через ZMQ
-                self.zmq_socket.send_json({
-                    "exchange": "hyperliquid",
-                    "type": "order",
-                    "orderId": order_id,
-                    "fillSz": qty,
-                    "price": 0.0,
-                    "status": "FILLED",
-                    "reduceOnly": True
-                })
-
-            return {
-                "orderId": order_id,
-                "symbol": symbol,
-                "side": opposite_side,
-                "quantity": qty,
-                "status": "FILLED",
-                "reduceOnly": True
-            }
+            result = await self._send_market(symbol, opposite_side, qty, True, client_order_id)
+            result["side"] = opposite_side
+            result["reduceOnly"] = True
+            return result
 
         except Exception as e:
             logger.error(f"Ошибка размещения закрывающего маркет ордера: {e}")
@@ -913,13 +886,7 @@ class AsyncHyperliquidWSClient:
         """Устанавливает плечо"""
         try:
             is_cross = (margin_mode == "cross")
-            await asyncio.get_running_loop().run_in_executor(
-                None,
-                self.exchange.update_leverage,
-                symbol,
-                leverage,
-                is_cross,
-            )
+            await self._rest(self.exchange.update_leverage, symbol, leverage, is_cross)
 
             logger.info(f"Leverage set: {symbol} x{leverage} ({margin_mode})")
             return {
@@ -937,9 +904,7 @@ class AsyncHyperliquidWSClient:
         """Получает размер позиции"""
         try:
             # Получаем позиции через REST API
-            data = await asyncio.get_running_loop().run_in_executor(
-                None, self.exchange.info.user_state, self.account_address
-            )
+            data = await self._rest(self.exchange.info.user_state, self.account_address, weight=INFO_WEIGHT_LIGHT)
 
             # Ищем позицию по символу
             asset_positions = data.get('assetPositions', [])
@@ -963,9 +928,7 @@ class AsyncHyperliquidWSClient:
             return 0.0
 
     async def get_position_info(self, symbol: str):
-        data = await asyncio.get_running_loop().run_in_executor(
-            None, self.exchange.info.user_state, self.account_address
-        )
+        data = await self._rest(self.exchange.info.user_state, self.account_address, weight=INFO_WEIGHT_LIGHT)
 
         for pos in data.get('assetPositions', []):
             if pos['position']['coin'] == symbol:
@@ -1,7 +1,11 @@
 import asyncio
+import os
 import sys
 import time
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from Monitoring.Metrics import LatencyWindow
+
 
 async def check_client(client):
     """Проверяет клиент вызывая все функции по порядку"""
@@ -58,8 +62,253 @@ async def run_checks():
     except Exception as e:
         print(f"Ошибка импорта: {e}")
 
+async def run_mock_checks():
+    """Те же проверки против локальных заглушек бирж (MockExchange) — без реальных ордеров"""
+    from MockExchange.run_mock import MockExchanges
+
+    exchanges = MockExchanges(seed=1)
+    await exchanges.start(binance_port=0, hyperliquid_port=0, bybit_port=0, extended_port=0)
+    try:
+        factories = mock_client_factories(exchanges)
+        # subscribe_orderbook Bybit слушает поток в самом вызове и не возвращается — проверяем
+        # только клиенты, у которых все функции списка запрос-ответ
+        for venue in ("binance", "hyperliquid"):
+            await check_client(factories[venue]())
+    finally:
+        await exchanges.stop()
+
+
+def mock_client_factories(exchanges) -> dict:
+    """Фабрики клиентов всех бирж, направленных на запущенные MockExchanges"""
+    from eth_account import Account
+    from AsyncBinanceWSClient import AsyncBinanceWSClient
+    from AsyncBybitWSClient import AsyncBybitWSClient
+    from AsyncExtendedWSClient import AsyncExtendedWSClient
+    from AsyncHyperliquidWSClient import AsyncHyperliquidWSClient
+
+    def hyperliquid():
+        account = Account.create()
+        return AsyncHyperliquidWSClient(wallet=account, account_address=account.address,
+                                        base_url=exchanges.hyperliquid.url)
+
+    return {
+        "binance": lambda: AsyncBinanceWSClient("mock", "mock", rest_url=exchanges.binance.url,
+                                                ws_url=exchanges.binance.ws_url),
+        "hyperliquid": hyperliquid,
+        "bybit": lambda: AsyncBybitWSClient("mock", "mock", rest_url=exchanges.bybit.url,
+                                            ws_url=exchanges.bybit.ws_url),
+        "extended": lambda: AsyncExtendedWSClient("mock", "mock", base_url=exchanges.extended.url,
+                                                  ws_url=exchanges.extended.ws_url + "/ws"),
+    }
+
+
+# ============= ПРОФИЛИРОВАНИЕ =============
+
+PROFILE_DEFAULTS = {
+    "runs": 100,         # вызовов каждого метода на прогретом клиенте
+    "concurrency": 10,   # одновременных вызовов
+    "cold": 3,           # новых клиентов для замера первого (холодного) вызова
+    "clients": "binance,hyperliquid,bybit,extended",
+    "asset": "BTC",
+    # Лимитки ставятся на таком расстоянии от mid, чтобы не исполниться
+    "offset": 0.05,
+}
+
+# Только методы запрос-ответ: подписки живут до отмены и временем ответа не меряются
+PROFILE_METHODS = ("get_symbol_info", "get_tick_size", "set_leverage", "get_funding_rate",
+                   "get_position_size", "place_limit_order", "cancel_order")
+
+
+class ClientProfiler:
+    """
+    Профиль задержек методов клиента против MockExchanges.
+
+    cold: на каждом из options["cold"] новых клиентов мерится connect_ws и первый вызов
+    каждого метода — в него входят создание HTTP сессий, рукопожатия и загрузка метаданных.
+    warm: на одном прогретом клиенте каждый метод вызывается runs раз не более чем
+    по concurrency одновременно; кроме распределения задержек считается пропускная способность.
+    Ордера ставятся далеко от mid и снимаются этапом cancel_order.
+    """
+
+    def __init__(self, exchanges, options: dict):
+        self.exchanges = exchanges
+        self.options = options
+        self.factories = mock_client_factories(exchanges)
+        asset = options["asset"].upper()
+        # Символ, которым оперирует клиент, и книга движка заглушки, от которой считается цена
+        self.symbols = {
+            "binance": (asset, exchanges.binance_engine, asset + "USDT"),
+            "hyperliquid": (asset, exchanges.hyperliquid_engine, asset),
+            "bybit": (asset, exchanges.bybit_engine, asset + "USDT"),
+            "extended": (f"{asset}-USD", exchanges.extended_engine, f"{asset}-USD"),
+        }
+
+    def _args(self, venue: str, method: str, order_ids: list) -> list:
+        symbol, engine, engine_symbol = self.symbols[venue]
+        if method == "set_leverage":
+            return [symbol, 10]
+        if method == "get_position_size":
+            return [symbol, "long"]
+        if method == "place_limit_order":
+            price = float(f"{engine.mark_price(engine_symbol) * (1 - self.options['offset']):.5g}")
+            return [symbol, "long", price, engine.books[engine_symbol].step_size]
+        if method == "cancel_order":
+            return [symbol, order_ids.pop()]
+        return [symbol]
+
+    @staticmethod
+    async def _call(window, errors: dict, method: str, func, args):
+        start = time.perf_counter_ns()
+        try:
+            result = await func(*args)
+        except Exception as e:
+            errors.setdefault(method, [0, str(e)[:80]])[0] += 1
+            return None
+        window.observe(time.perf_counter_ns() - start)
+        return result
+
+    @staticmethod
+    def _order_id(result):
+        return str(result["orderId"]) if isinstance(result, dict) and result.get("orderId") else None
+
+    @staticmethod
+    async def _close(client):
+        if hasattr(client, "close"):
+            try:
+                await client.close()
+            except Exception as e:
+                print(f"⚠️ Ошибка закрытия {client.__class__.__name__}: {e}")
+
+    def _methods(self, client) -> list:
+        return [method for method in PROFILE_METHODS if hasattr(client, method)]
+
+    async def _cold(self, venue: str, result: dict):
+        for _ in range(self.options["cold"]):
+            client = self.factories[venue]()
+            try:
+                await self._call(result["cold"]["connect_ws"], result["errors"], "connect_ws",
+                                 client.connect_ws, [])
+                order_ids = []
+                for method in self._methods(client):
+                    if method == "cancel_order" and not order_ids:
+                        continue
+                    response = await self._call(result["cold"][method], result["errors"], method,
+                                                getattr(client, method), self._args(venue, method, order_ids))
+                    order_id = self._order_id(response) if method == "place_limit_order" else None
+                    if order_id:
+                        order_ids.append(order_id)
+            finally:
+                await self._close(client)
+
+    async def _warm(self, venue: str, result: dict):
+        client = self.factories[venue]()
+        semaphore = asyncio.Semaphore(self.options["concurrency"])
+        order_ids = []
+
+        async def limited(window, method):
+            async with semaphore:
+                args = self._args(venue, method, order_ids)
+                response = await self._call(window, result["errors"], method, getattr(client, method), args)
+                if method == "place_limit_order" and self._order_id(response):
+                    order_ids.append(self._order_id(response))
+
+        try:
+            await client.connect_ws()
+            for method in self._methods(client):
+                if method == "cancel_order":
+                    # Каждая отмена снимает ордер, поставленный этапом place_limit_order
+                    runs = len(order_ids)
+                else:
+                    # Прогревочный вызов вне замера
+                    await limited(LatencyWindow(), method)
+                    runs = self.options["runs"]
+                window = result["warm"][method]
+                start = time.perf_counter()
+                await asyncio.gather(*(limited(window, method) for _ in range(runs)))
+                elapsed = time.perf_counter() - start
+                result["throughput"][method] = window.count / elapsed if elapsed and window.count else 0.0
+        finally:
+            await self._close(client)
+
+    async def profile(self, venue: str) -> dict:
+        print(f"🚀 Профилирование {venue}")
+        result = {
+            "cold": {method: LatencyWindow() for method in ("connect_ws",) + PROFILE_METHODS},
+            "warm": {method: LatencyWindow(size=max(self.options["runs"], 1)) for method in PROFILE_METHODS},
+            "throughput": {},
+            "errors": {},
+        }
+        await self._cold(venue, result)
+        await self._warm(venue, result)
+        return {
+            "cold": {m: w.snapshot() for m, w in result["cold"].items() if w.count},
+            "warm": {m: w.snapshot() for m, w in result["warm"].items() if w.count},
+            "throughput": result["throughput"],
+            "errors": result["errors"],
+        }
+
+
+def print_profiles(profiles: dict, options: dict):
+    venues = list(profiles)
+    width = 24
+    methods = ("connect_ws",) + PROFILE_METHODS
+
+    print(f"\n📊 warm: p50/p99 мс и вызовов/с (runs={options['runs']}, concurrency={options['concurrency']})")
+    print(f"  {'метод':<20}" + "".join(f"{venue:>{width}}" for venue in venues))
+    for method in PROFILE_METHODS:
+        cells = []
+        for venue in venues:
+            s = profiles[venue]["warm"].get(method)
+            rps = profiles[venue]["throughput"].get(method, 0.0)
+            cells.append(f"{s['p50_ms']:.2f}/{s['p99_ms']:.2f} {rps:.0f}/s" if s else "—")
+        print(f"  {method:<20}" + "".join(f"{cell:>{width}}" for cell in cells))
+
+    print(f"\n🧊 cold: первый вызов на новом клиенте, p50/max мс (клиентов: {options['cold']})")
+    print(f"  {'метод':<20}" + "".join(f"{venue:>{width}}" for venue in venues))
+    for method in methods:
+        cells = []
+        for venue in venues:
+            s = profiles[venue]["cold"].get(method)
+            cells.append(f"{s['p50_ms']:.2f}/{s['max_ms']:.2f}" if s else "—")
+        print(f"  {method:<20}" + "".join(f"{cell:>{width}}" for cell in cells))
+
+    for venue in venues:
+        for method, (count, error) in profiles[venue]["errors"].items():
+            print(f"❌ {venue}.{method}: {count} ошибок, первая: {error}")
+
+
+def parse_profile_options(args) -> dict:
+    options = dict(PROFILE_DEFAULTS)
+    for arg in args:
+        key, _, value = arg.partition("=")
+        if key not in options:
+            raise ValueError(f"Неизвестный параметр {key}")
+        options[key] = type(PROFILE_DEFAULTS[key])(value)
+    return options
+
+
+async def run_profile(options: dict):
+    """Профиль задержек и пропускной способности клиентов всех бирж на локальных заглушках"""
+    from MockExchange.run_mock import MockExchanges
+
+    exchanges = MockExchanges(symbols={options["asset"].upper(): 50000.0}, seed=1)
+    await exchanges.start(binance_port=0, hyperliquid_port=0, bybit_port=0, extended_port=0)
+    try:
+        profiler = ClientProfiler(exchanges, options)
+        profiles = {}
+        for venue in options["clients"].split(","):
+            profiles[venue] = await profiler.profile(venue)
+    finally:
+        await exchanges.stop()
+    print_profiles(profiles, options)
+    return profiles
+
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 if __name__ == "__main__":
-    asyncio.run(run_checks())
\ No newline at end of file
+    # python ClientTester.py profile [runs=100 concurrency=10 cold=3 clients=binance,bybit asset=BTC]
+    if sys.argv[1:2] == ["profile"]:
+        asyncio.run(run_profile(parse_profile_options(sys.argv[2:])))
+    else:
+        asyncio.run(run_mock_checks() if "mock" in sys.argv[1:] else run_checks())
\ No newline at end of file
@@ -0,0 +1,233 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import websockets
+
+from Monitoring.FeedLatency import receive_time
+from Monitoring.Metrics import LatencyWindow
+from Monitoring.Telemetry import count_reconnect
+from Replay.FrameCapture import get_env_recorder
+
+logger = logging.getLogger(__name__)
+
+# Hyperliquid ограничивает число подписок на IP; на один сокет кладем не больше этого,
+# дальше открывается следующий сокет
+MAX_SUBSCRIPTIONS_PER_SOCKET = 50
+RECV_TIMEOUT_SECONDS = 30
+RECONNECT_DELAY_MIN = 0.5
+RECONNECT_DELAY_MAX = 10.0
+
+
+def subscription_key(subscription: dict) -> str:
+    """Канонический ключ подписки: {"type": "l2Book", "coin": "ETH"} -> 'coin=ETH|type=l2Book'"""
+    return "|".join(f"{field}={subscription[field]}" for field in sorted(subscription))
+
+
+class _Shard:
+    """Один WebSocket и закрепленные за ним подписки"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.ws = None
+        self.task: Optional[asyncio.Task] = None
+        self.subscriptions: Dict[str, dict] = {}
+        self.connected = asyncio.Event()
+        self.reconnects = 0
+        self.disconnected_at: Optional[int] = None
+        self.pending_acks = 0
+        self.last_resubscribe_ms: Optional[float] = None
+
+
+class HyperliquidSubscriptionManager:
+    """
+    Хранит желаемый набор подписок и держит его на бирже.
+
+    Все подписки мультиплексируются в один сокет, пока не достигнут
+    max_per_socket — после этого открывается следующий. После разрыва сокет
+    переподключается и заново отправляет свои подписки; время от разрыва до
+    подтверждения всех подписок пишется в resubscribe_latency.
+    """
+
+    def __init__(self, ws_url: str, on_message: Callable[[dict, tuple], Awaitable[None]],
+                 max_per_socket: int = MAX_SUBSCRIPTIONS_PER_SOCKET):
+        self.ws_url = ws_url
+        self.on_message = on_message
+        self.max_per_socket = max_per_socket
+        self.shards: List[_Shard] = []
+        self._owner: Dict[str, _Shard] = {}
+        self.resubscribe_latency = LatencyWindow(size=256)
+        self._running = False
+        # FrameRecorder для записи сырых кадров (None — запись выключена)
+        self.capture = get_env_recorder()
+
+    async def start(self, timeout: float = 30):
+        """Открывает первый сокет и ждет подключения"""
+        self._running = True
+        if not self.shards:
+            self._add_shard()
+        for shard in self.shards:
+            if shard.task is None or shard.task.done():
+                shard.task = asyncio.create_task(self._run_shard(shard))
+        try:
+            await asyncio.wait_for(self.shards[0].connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise Exception("Failed to connect to WebSocket after retries")
+
+    def is_subscribed(self, subscription: dict) -> bool:
+        return subscription_key(subscription) in self._owner
+
+    async def subscribe(self, subscription: dict):
+        """Добавляет подписку в желаемый набор; если сокет сейчас поднят — отправляет сразу"""
+        key = subscription_key(subscription)
+        if key in self._owner:
+            return
+
+        shard = next((s for s in self.shards if len(s.subscriptions) < self.max_per_socket), None)
+        if shard is None:
+            shard = self._add_shard()
+
+        shard.subscriptions[key] = subscription
+        self._owner[key] = shard
+        if shard.connected.is_set():
+            await self._send(shard, {"method": "subscribe", "subscription": subscription})
+
+    async def unsubscribe(self, subscription: dict):
+        key = subscription_key(subscription)
+        shard = self._owner.pop(key, None)
+        if shard is None:
+            return
+
+        shard.subscriptions.pop(key, None)
+        if shard.connected.is_set():
+            await self._send(shard, {"method": "unsubscribe", "subscription": subscription})
+
+    def _add_shard(self) -> _Shard:
+        shard = _Shard(len(self.shards))
+        self.shards.append(shard)
+        if self._running:
+            shard.task = asyncio.create_task(self._run_shard(shard))
+        return shard
+
+    @staticmethod
+    async def _send(shard: _Shard, message: dict):
+        try:
+            await shard.ws.send(json.dumps(message))
+        except websockets.exceptions.ConnectionClosed:
+            # Подписка уже в желаемом наборе — уйдет при переподключении
+            pass
+
+    async def _run_shard(self, shard: _Shard):
+        delay = RECONNECT_DELAY_MIN
+        while self._running:
+            try:
+                shard.ws = await websockets.connect(
+                    self.ws_url,
+                    ping_interval=20,
+                    ping_timeout=10,
+                    close_timeout=10
+                )
+            except Exception as e:
+                logger.error(f"❌ WebSocket #{shard.index} connection failed: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_DELAY_MAX)
+                continue
+
+            delay = RECONNECT_DELAY_MIN
+            if shard.disconnected_at is None:
+                shard.disconnected_at = time.perf_counter_ns()
+            logger.info(f"🔌 WebSocket #{shard.index} connected, восстанавливаем {len(shard.subscriptions)} подписок")
+
+            subscriptions = list(shard.subscriptions.values())
+            shard.pending_acks = len(subscriptions)
+            shard.connected.set()
+            for subscription in subscriptions:
+                await self._send(shard, {"method": "subscribe", "subscription": subscription})
+            if not subscriptions:
+                self._record_resubscribed(shard)
+
+            await self._read(shard)
+
+            shard.connected.clear()
+            shard.disconnected_at = time.perf_counter_ns()
+            shard.reconnects += 1
+            count_reconnect("hyperliquid", f"shard{shard.index}")
+            logger.warning(f"🔌 WebSocket #{shard.index} отключен, переподключение")
+
+    async def _read(self, shard: _Shard):
+        ws = shard.ws
+        while self._running:
+            try:
+                message = await asyncio.wait_for(ws.recv(), timeout=RECV_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                try:
+                    await ws.send(json.dumps({"method": "ping"}))
+                except Exception as e:
+                    logger.error(f"❌ Ошибка отправки ping: {e}")
+                    return
+                continue
+            except websockets.exceptions.ConnectionClosed:
+                return
+
+            received = receive_time()
+            if self.capture is not None:
+                self.capture.record("hyperliquid", message, received[0])
+            try:
+                data = json.loads(message)
+            except json.JSONDecodeError as e:
+                logger.error(f"❌ Ошибка парсинга JSON: {e}")
+                continue
+
+            channel = data.get("channel")
+            if channel == "pong":
+                continue
+            if channel == "subscriptionResponse" and shard.pending_acks > 0:
+                shard.pending_acks -= 1
+                if shard.pending_acks == 0:
+                    self._record_resubscribed(shard)
+
+            try:
+                await self.on_message(data, received)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки WebSocket сообщения: {e}")
+
+    def _record_resubscribed(self, shard: _Shard):
+        if shard.disconnected_at is None:
+            return
+        elapsed_ns = time.perf_counter_ns() - shard.disconnected_at
+        shard.disconnected_at = None
+        shard.last_resubscribe_ms = elapsed_ns / 1e6
+        self.resubscribe_latency.observe(elapsed_ns)
+        logger.info(f"📡 WebSocket #{shard.index}: подписки восстановлены за {shard.last_resubscribe_ms:.1f} мс")
+
+    def stats(self) -> dict:
+        """Состояние сокетов и время восстановления подписок"""
+        return {
+            "subscriptions": len(self._owner),
+            "resubscribe": self.resubscribe_latency.snapshot(),
+            "sockets": [
+                {
+                    "index": shard.index,
+                    "connected": shard.connected.is_set(),
+                    "subscriptions": len(shard.subscriptions),
+                    "reconnects": shard.reconnects,
+                    "last_resubscribe_ms": shard.last_resubscribe_ms,
+                }
+                for shard in self.shards
+            ],
+        }
+
+    async def close(self):
+        self._running = False
+        for shard in self.shards:
+            if shard.task and not shard.task.done():
+                shard.task.cancel()
+                try:
+                    await shard.task
+                except asyncio.CancelledError:
+                    pass
+            if shard.ws is not None:
+                await shard.ws.close()
+            shard.connected.clear()
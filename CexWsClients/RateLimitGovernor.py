@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import os
+import time
+
+from CexWsClients.ServerTime import get_clock
+from Monitoring.Metrics import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+# Какую долю официального лимита занимаем сами — остаток на ручные запросы и расхождение окон
+RATE_LIMIT_SAFETY = float(os.getenv("RATE_LIMIT_SAFETY", "0.8"))
+# Доля корзины, которую информационные запросы не трогают: она остается ордерам и отменам
+INFO_RESERVE = float(os.getenv("RATE_LIMIT_INFO_RESERVE", "0.25"))
+# Дольше не ждем токенов подряд — перепроверяем корзину (ее мог пополнить заголовок ответа)
+MAX_SLEEP_S = 0.25
+
+# Классы приоритета: отмена снижает риск и идет первой, затем ордера, затем все остальное
+CANCEL = "cancel"
+ORDER = "order"
+INFO = "info"
+PRIORITIES = (CANCEL, ORDER, INFO)
+
+# Официальные лимиты: (вес за окно, окно в секундах, ордеров за окно, окно ордеров)
+#   binance     — REQUEST_WEIGHT 2400/мин и ORDERS 1200/мин (фьючерсы, на IP и аккаунт)
+#   hyperliquid — 1200 веса в минуту на IP; действие exchange весит 1 + n/40, info 2–20
+#   bybit       — 600 запросов за 5 с на IP; создание ордеров ~10/с на аккаунт
+#   extended    — 1000 запросов в минуту
+VENUE_LIMITS = {
+    "binance": (2400, 60, 1200, 60),
+    "hyperliquid": (1200, 60, None, None),
+    "bybit": (600, 5, 10, 1),
+    "extended": (1000, 60, None, None),
+}
+
+
+class TokenBucket:
+    """Корзина токенов: capacity за window секунд, пополняется непрерывно"""
+
+    __slots__ = ("capacity", "rate", "tokens", "_updated")
+
+    def __init__(self, capacity: float, window_s: float):
+        self.capacity = capacity
+        self.rate = capacity / window_s
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def refill(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return self.tokens
+
+    def prime(self, used: float):
+        """Биржа сообщила израсходованное в ее окне — свободного не больше, чем осталось там"""
+        self.refill()
+        self.tokens = min(self.tokens, self.capacity - used)
+
+    def wait_time(self, amount: float, floor: float = 0.0) -> float:
+        return max(amount + floor - self.tokens, 0.0) / self.rate
+
+
+class RateLimitGovernor:
+    """
+    Общий регулятор REST запросов одной биржи: корзина веса и (где биржа считает ордера
+    отдельно) корзина ордеров. Корзины сверяются с заголовками ответов биржи, 429/418
+    с Retry-After блокируют все запросы до указанного времени.
+
+    Приоритеты: пока ждет отмена, ордер не берет токены, пока ждет ордер — информационный
+    запрос. Информационные запросы к тому же не опускают корзину ниже INFO_RESERVE.
+    """
+
+    def __init__(self, venue: str, weight_limit: int, window_s: float, order_limit: int = None,
+                 order_window_s: float = None, safety: float = RATE_LIMIT_SAFETY):
+        self.venue = venue
+        self.weight_limit = weight_limit
+        self.order_limit = order_limit
+        self.weight = TokenBucket(weight_limit * safety, window_s)
+        self.orders = TokenBucket(order_limit * safety, order_window_s) if order_limit else None
+        self.blocked_until = 0.0
+        self._waiting = {priority: 0 for priority in PRIORITIES}
+        # Статистика: ожидание токенов по приоритетам, сколько запросов ждали, отказы биржи
+        self.waits = {priority: LatencyWindow(512) for priority in PRIORITIES}
+        self.requests = {priority: 0 for priority in PRIORITIES}
+        self.throttled = {priority: 0 for priority in PRIORITIES}
+        self.rejections = 0
+        self.used_weight = None
+        self.used_orders = None
+
+    def _preempted(self, priority: str) -> bool:
+        for other in PRIORITIES:
+            if other == priority:
+                return False
+            if self._waiting[other]:
+                return True
+        return False
+
+    def _wait_time(self, weight: float, orders: int, priority: str):
+        """Сколько ждать до запроса; 0 — можно сейчас"""
+        now = time.monotonic()
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self._preempted(priority):
+            return 0.001
+        floor = self.weight.capacity * INFO_RESERVE if priority == INFO else 0.0
+        self.weight.refill()
+        delay = self.weight.wait_time(weight, floor)
+        if orders and self.orders is not None:
+            self.orders.refill()
+            delay = max(delay, self.orders.wait_time(orders))
+        return delay
+
+    async def acquire(self, weight: float = 1, priority: str = INFO, orders: int = 0) -> bool:
+        """
+        Ждет токенов для запроса весом weight (orders — сколько ордеров он создает).
+        True — запрос ждал: подписанные параметры пора обновить.
+        """
+        self.requests[priority] += 1
+        delay = self._wait_time(weight, orders, priority)
+        waited = delay > 0
+        if waited:
+            started = time.monotonic_ns()
+            self.throttled[priority] += 1
+            self._waiting[priority] += 1
+            try:
+                while delay > 0:
+                    await asyncio.sleep(min(delay, MAX_SLEEP_S))
+                    delay = self._wait_time(weight, orders, priority)
+            finally:
+                self._waiting[priority] -= 1
+            self.waits[priority].observe(time.monotonic_ns() - started)
+        self.weight.tokens -= weight
+        if orders and self.orders is not None:
+            self.orders.tokens -= orders
+        return waited
+
+    def observe(self, status: int, headers, orders: int = 0):
+        """Сверка по ответу: израсходованный вес/ордера из заголовков и блокировка по 429/418"""
+        used = _float(headers.get("X-MBX-USED-WEIGHT-1M"))
+        if used is not None:
+            self.used_weight = used
+            self.weight.prime(used)
+        if self.orders is not None:
+            used_orders = _float(headers.get("X-MBX-ORDER-COUNT-1M"))
+            if used_orders is None and orders:
+                # Bybit отдает лимит и остаток того эндпоинта, куда ушел запрос, — для ордеров это их лимит
+                limit, remaining = _float(headers.get("X-Bapi-Limit")), _float(headers.get("X-Bapi-Limit-Status"))
+                if limit is not None and remaining is not None:
+                    used_orders = limit - remaining
+            if used_orders is not None:
+                self.used_orders = used_orders
+                self.orders.prime(used_orders)
+
+        if status in (418, 429):
+            self.rejections += 1
+            retry_after = _float(headers.get("Retry-After")) or 1.0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.weight.tokens = min(self.weight.tokens, 0.0)
+            logger.warning(f"🚦 {self.venue}: лимит запросов превышен ({status}), пауза {retry_after:.1f} с")
+
+    def request(self, session, method: str, url: str, weight: float = 1, priority: str = INFO,
+                orders: int = 0, sign=None, **kwargs):
+        """
+        async with governor.request(session, "GET", url, weight=5) as response — запрос aiohttp,
+        который сначала ждет токенов, а по ответу сверяет корзину с заголовками биржи.
+        sign — подпись клиента: если запрос ждал, timestamp и signature в params пересчитываются,
+        иначе подпись могла бы выйти за recvWindow.
+        """
+        return _GovernedRequest(self, session, method, url, weight, priority, orders, sign, kwargs)
+
+    def snapshot(self) -> dict:
+        return {
+            "tokens": round(self.weight.refill(), 2),
+            "capacity": self.weight.capacity,
+            "order_tokens": round(self.orders.refill(), 2) if self.orders is not None else None,
+            "used_weight": self.used_weight,
+            "used_orders": self.used_orders,
+            "blocked_s": round(max(self.blocked_until - time.monotonic(), 0.0), 3),
+            "rejections": self.rejections,
+            "requests": dict(self.requests),
+            "throttled": dict(self.throttled),
+            "waits": {priority: window.snapshot() for priority, window in self.waits.items()},
+        }
+
+
+class _GovernedRequest:
+    __slots__ = ("governor", "session", "method", "url", "weight", "priority", "orders", "sign", "kwargs",
+                 "_context")
+
+    def __init__(self, governor, session, method, url, weight, priority, orders, sign, kwargs):
+        self.governor = governor
+        self.session = session
+        self.method = method
+        self.url = url
+        self.weight = weight
+        self.priority = priority
+        self.orders = orders
+        self.sign = sign
+        self.kwargs = kwargs
+        self._context = None
+
+    async def __aenter__(self):
+        waited = await self.governor.acquire(self.weight, self.priority, self.orders)
+        params = self.kwargs.get("params")
+        if waited and self.sign is not None and params and "signature" in params:
+            params.pop("signature")
+            params["timestamp"] = get_clock(self.governor.venue).now_ms()
+            params["signature"] = self.sign(params)
+        self._context = self.session.request(self.method, self.url, **self.kwargs)
+        response = await self._context.__aenter__()
+        self.governor.observe(response.status, response.headers, self.orders)
+        return response
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return await self._context.__aexit__(exc_type, exc_val, exc_tb)
+
+
+def _float(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+_governors = {}
+
+
+def get_governor(venue: str) -> RateLimitGovernor:
+    """Регулятор биржи — один на процесс, общий для всех клиентов этой биржи"""
+    governor = _governors.get(venue)
+    if governor is None:
+        weight_limit, window_s, order_limit, order_window_s = VENUE_LIMITS.get(venue, (1200, 60, None, None))
+        governor = _governors[venue] = RateLimitGovernor(venue, weight_limit, window_s, order_limit, order_window_s)
+    return governor
+
+
+def get_rate_limit_stats() -> dict:
+    """Состояние корзин и задержки по приоритетам: {venue: snapshot}"""
+    return {venue: governor.snapshot() for venue, governor in _governors.items()}
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Как часто сверяем часы с биржей
+TIME_SYNC_INTERVAL_S = float(os.getenv("TIME_SYNC_INTERVAL_S", "30"))
+# Замеров подряд за одну сверку: смещение берется по замеру с наименьшим RTT
+TIME_SYNC_BURST = 3
+# Сколько последних замеров помним — по ним выбирается лучший и оценивается худший RTT
+TIME_SYNC_SAMPLES = 12
+# Границы recvWindow: узкое окно не дает исполниться запросу, застрявшему в сети,
+# но должно покрывать худший RTT и погрешность смещения
+RECV_WINDOW_MIN_MS = int(os.getenv("RECV_WINDOW_MIN_MS", "1000"))
+RECV_WINDOW_MAX_MS = int(os.getenv("RECV_WINDOW_MAX_MS", "5000"))
+RECV_WINDOW_MARGIN_MS = 250
+
+
+class ServerClock:
+    """
+    Часы биржи: смещение server - local и RTT по запросу серверного времени.
+
+    Смещение считается от середины запроса (t0 + t1) / 2, погрешность — половина RTT,
+    поэтому из последних замеров берется замер с наименьшим RTT. Подписанные запросы
+    берут timestamp из now_ms() и recvWindow из recv_window_ms(); до первой сверки
+    смещение 0, окно RECV_WINDOW_MAX_MS — как без синхронизации.
+    """
+
+    def __init__(self, venue: str):
+        self.venue = venue
+        self.offset_ms = 0.0
+        self.rtt_ms = None
+        self.synced_at = None
+        self.syncs = 0
+        self.failures = 0
+        self.resyncs = 0
+        self._samples = deque(maxlen=TIME_SYNC_SAMPLES)
+        self._fetch = None
+        self._task = None
+        self._wake = None
+
+    def now_ms(self) -> int:
+        """Текущее время биржи в мс — timestamp подписанного запроса"""
+        return int(time.time() * 1000 + self.offset_ms)
+
+    def recv_window_ms(self) -> int:
+        if not self._samples:
+            return RECV_WINDOW_MAX_MS
+        worst_rtt = max(rtt for _, rtt in self._samples)
+        window = 2 * worst_rtt + RECV_WINDOW_MARGIN_MS
+        return int(min(max(window, RECV_WINDOW_MIN_MS), RECV_WINDOW_MAX_MS))
+
+    def stamp(self) -> dict:
+        """timestamp и recvWindow для параметров подписанного запроса"""
+        return {"timestamp": self.now_ms(), "recvWindow": self.recv_window_ms()}
+
+    def observe(self, sent_ms: float, server_ms: float, received_ms: float, rtt_ms: float = None):
+        """Замер: локальное время отправки и получения ответа и время сервера из ответа"""
+        rtt_ms = received_ms - sent_ms if rtt_ms is None else rtt_ms
+        self._samples.append((server_ms - (sent_ms + received_ms) / 2, rtt_ms))
+        self.offset_ms, self.rtt_ms = min(self._samples, key=lambda sample: sample[1])
+        self.synced_at = time.time()
+        self.syncs += 1
+
+    async def sync(self, fetch=None) -> bool:
+        """Сверка: TIME_SYNC_BURST запросов fetch() -> время сервера в мс. False — биржа не ответила"""
+        fetch = fetch or self._fetch
+        try:
+            for _ in range(TIME_SYNC_BURST):
+                started = time.monotonic()
+                sent_ms = time.time() * 1000
+                server_ms = await fetch()
+                received_ms = time.time() * 1000
+                self.observe(sent_ms, float(server_ms), received_ms, (time.monotonic() - started) * 1000)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"⏱️ {self.venue}: не удалось сверить время: {e}")
+            return False
+        return True
+
+    def start(self, fetch):
+        """Запускает фоновую сверку; повторный вызов при живой задаче ничего не делает"""
+        self._fetch = fetch
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def resync(self):
+        """Биржа отвергла timestamp — сверяемся сразу, не дожидаясь интервала"""
+        self.resyncs += 1
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            if await self.sync():
+                logger.info(f"⏱️ {self.venue}: смещение {self.offset_ms:+.1f} мс, RTT {self.rtt_ms:.1f} мс, "
+                            f"recvWindow {self.recv_window_ms()} мс")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), TIME_SYNC_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def snapshot(self) -> dict:
+        return {
+            "offset_ms": round(self.offset_ms, 3),
+            "rtt_ms": round(self.rtt_ms, 3) if self.rtt_ms is not None else None,
+            "recv_window_ms": self.recv_window_ms(),
+            "age_s": round(time.time() - self.synced_at, 1) if self.synced_at else None,
+            "syncs": self.syncs,
+            "failures": self.failures,
+            "resyncs": self.resyncs,
+        }
+
+
+_clocks = {}
+
+
+def get_clock(venue: str) -> ServerClock:
+    """Часы биржи — одни на процесс, общие для всех клиентов и регулятора запросов этой биржи"""
+    clock = _clocks.get(venue)
+    if clock is None:
+        clock = _clocks[venue] = ServerClock(venue)
+    return clock
+
+
+def get_time_sync_stats() -> dict:
+    """Смещение и RTT по биржам: {venue: snapshot}"""
+    return {venue: clock.snapshot() for venue, clock in _clocks.items()}
@@ -1,59 +1,428 @@
 import asyncio
-import redis.asyncio as aioredis
 import json
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from DragonflyDb.DragonFlyPool import DRAGONFLY_CONFIG, get_shared_client
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_ORDER_STATUSES = {"FILLED", "CANCELED", "CANCELLED", "EXPIRED", "REJECTED"}
+
+# Сколько живет запись ордера после перехода в терминальный статус
+ORDER_TTL_SECONDS = 3600
+# Версия хранения ордеров (1 — хэши + индекс). Отметка {exchange}OrdersVersion ставится после
+# переноса старых записей; пока ее нет, коннектор мигрирует ключи до первого чтения или записи
+ORDER_STORAGE_VERSION = "1"
+
+# Числовые поля хэша ордера
+ORDER_FLOAT_FIELDS = ("fillSz", "fillSzWs", "price", "origSz", "createdAt", "updatedAt")
+POSITION_FLOAT_FIELDS = ("size", "avg_price", "unrealized_pnl")
+
+# Последний BBO в памяти процесса: {(exchange, coin): bbo}. Если WS клиент и стратегия
+# живут в одном процессе, get_bbo обходится без обращения к Dragonfly.
+_BBO_SLOTS = {}
+# То же для mark price / funding: {(exchange, coin): funding}
+_FUNDING_SLOTS = {}
+# markPrice@1s / activeAssetCtx обновляют ставку раз в секунды: старше — поток встал,
+# get_funding отдает None, и вызывающий идет в REST
+FUNDING_MAX_AGE_MS = 10_000
+# HASH funding без обновлений удаляется — после рестарта без подписки не читается вечно
+FUNDING_TTL_SECONDS = 300
+
+# KEYS: ордер, индекс, активные
+# ARGV: orderId, fillSz, price, status, origSz, now, ttl, terminal(1/0)
+# fillSz только растет (кумулятивные отчеты бирж монотонны), price > 0 перезаписывает.
+# Уже терминальный ордер нетерминальное сохранение не возвращает в активные, не снимает ему TTL
+# и не меняет статус: ответ REST (NEW) может прийти позже исполнения из user stream (FILLED).
+SAVE_ORDER_LUA = """
+local key = KEYS[1]
+if redis.call('EXISTS', key) == 0 then
+    redis.call('HSET', key, 'orderId', ARGV[1], 'fillSz', 0, 'price', 0, 'createdAt', ARGV[6])
+end
+local stored = string.upper(redis.call('HGET', key, 'status') or '')
+local stored_terminal = stored == 'FILLED' or stored == 'EXPIRED' or stored == 'REJECTED'
+    or stored == 'CANCELLED' or string.sub(stored, -8) == 'CANCELED'
+local fill = tonumber(ARGV[2])
+if fill > tonumber(redis.call('HGET', key, 'fillSz') or '0') then
+    redis.call('HSET', key, 'fillSz', ARGV[2])
+end
+if tonumber(ARGV[3]) > 0 then
+    redis.call('HSET', key, 'price', ARGV[3])
+end
+if ARGV[4] ~= '' and (ARGV[8] == '1' or not stored_terminal) then
+    redis.call('HSET', key, 'status', ARGV[4])
+end
+if ARGV[5] ~= '' then
+    redis.call('HSET', key, 'origSz', ARGV[5])
+end
+redis.call('HSET', key, 'updatedAt', ARGV[6])
+redis.call('ZADD', KEYS[2], ARGV[6], ARGV[1])
+if ARGV[8] == '1' then
+    redis.call('SREM', KEYS[3], ARGV[1])
+    if tonumber(ARGV[7]) > 0 then
+        redis.call('EXPIRE', key, ARGV[7])
+    end
+elseif not stored_terminal then
+    redis.call('SADD', KEYS[3], ARGV[1])
+    redis.call('PERSIST', key)
+end
+return 1
+"""
+
+# KEYS: ордер, индекс, активные, обработанные tradeId
+# ARGV: orderId, sz, px, now, ttl, tradeId
+# Добавляет одно исполнение: сумма исполнений копится в fillSzWs (price — их VWAP), а fillSz —
+# max(кумулятив REST, fillSzWs): исполнение, уже учтенное в отчете REST, не прибавляется второй раз.
+# Дубли по tradeId игнорируются, терминальный статус не понижается, хэш, созданный
+# исполнением (ордер неизвестен или уже истек), получает TTL.
+ADD_ORDER_FILL_LUA = """
+local key = KEYS[1]
+local ttl = tonumber(ARGV[5])
+if ARGV[6] ~= '' then
+    if redis.call('SADD', KEYS[4], ARGV[6]) == 0 then
+        return 0
+    end
+    if ttl > 0 then
+        redis.call('EXPIRE', KEYS[4], ttl)
+    end
+end
+local created = redis.call('EXISTS', key) == 0
+if created then
+    redis.call('HSET', key, 'orderId', ARGV[1], 'fillSz', 0, 'price', 0, 'createdAt', ARGV[4])
+end
+local rest_fill = tonumber(redis.call('HGET', key, 'fillSz') or '0')
+local ws_fill = tonumber(redis.call('HGET', key, 'fillSzWs') or '0')
+local avg = tonumber(redis.call('HGET', key, 'price') or '0')
+local orig = tonumber(redis.call('HGET', key, 'origSz') or '')
+local status = string.upper(redis.call('HGET', key, 'status') or '')
+local terminal = status == 'FILLED' or status == 'EXPIRED' or status == 'REJECTED'
+    or status == 'CANCELLED' or string.sub(status, -8) == 'CANCELED'
+local sz = tonumber(ARGV[2])
+local px = tonumber(ARGV[3])
+if orig and orig > 0 and ws_fill + sz > orig then
+    sz = orig - ws_fill
+end
+if sz > 0 then
+    local new_fill = tonumber(redis.call('HINCRBYFLOAT', key, 'fillSzWs', sz))
+    if ws_fill > 0 then
+        avg = (avg * ws_fill + px * sz) / new_fill
+    else
+        avg = px
+    end
+    redis.call('HSET', key, 'price', tostring(avg))
+    ws_fill = new_fill
+end
+local fill = math.max(rest_fill, ws_fill)
+redis.call('HSET', key, 'fillSz', tostring(fill), 'updatedAt', ARGV[4])
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[1])
+if terminal then
+    redis.call('SREM', KEYS[3], ARGV[1])
+elseif orig and orig > 0 and fill >= orig then
+    redis.call('HSET', key, 'status', 'FILLED')
+    redis.call('SREM', KEYS[3], ARGV[1])
+    if ttl > 0 then
+        redis.call('EXPIRE', key, ttl)
+    end
+else
+    redis.call('HSET', key, 'status', 'PARTIALLY_FILLED')
+    redis.call('SADD', KEYS[3], ARGV[1])
+end
+if created and ttl > 0 then
+    redis.call('EXPIRE', key, ttl)
+end
+return 1
+"""
+
+
+def is_terminal_status(status: str) -> bool:
+    if not status:
+        return False
+    status = status.upper()
+    # Hyperliquid: marginCanceled, reduceOnlyCanceled и т.п.
+    return status in TERMINAL_ORDER_STATUSES or status.endswith("CANCELED")
+
+
+def _parse_order(raw: dict):
+    if not raw:
+        return None
+    order = dict(raw)
+    for field in ORDER_FLOAT_FIELDS:
+        if field in order:
+            order[field] = float(order[field])
+    return order
 
 
 class DragonFlyConnector:
-    def __init__(self, exchange: str):
+    def __init__(self, exchange: str, order_ttl: int = ORDER_TTL_SECONDS, book_notify: str = None):
         self.exchange = exchange.lower()
-        self.db = aioredis.Redis(
-            host='localhost',
-            port=6379,
-            password='strongpassword',
-            decode_responses=True
-        )
+        self.order_ttl = order_ttl
+        # None - только запись; "pubsub" - PUBLISH в канал; "stream" - XADD в capped stream
+        self.book_notify = book_notify or DRAGONFLY_CONFIG["book_notify"]
+        self.book_stream_maxlen = DRAGONFLY_CONFIG["book_stream_maxlen"]
+        # Общий на процесс клиент: все коннекторы делят один пул соединений
+        self.db = get_shared_client()
+        self._save_order_script = self.db.register_script(SAVE_ORDER_LUA)
+        self._add_order_fill_script = self.db.register_script(ADD_ORDER_FILL_LUA)
+        self._index_ready = False
+        self._index_migration = None
 
     def _order_key(self, order_id: str) -> str:
         return f"{self.exchange}Orders:{order_id}"
 
+    def _orders_index_key(self) -> str:
+        # Не попадает под шаблон {exchange}Orders:* — индекс не путается с ордерами
+        return f"{self.exchange}OrdersIndex"
+
+    def _orders_version_key(self) -> str:
+        return f"{self.exchange}OrdersVersion"
+
+    def _orders_active_key(self) -> str:
+        return f"{self.exchange}OrdersActive"
+
+    def _order_trades_key(self, order_id: str) -> str:
+        return f"{self.exchange}OrderTrades:{order_id}"
+
+    def _position_key(self, symbol: str) -> str:
+        return f"{self.exchange}Position:{symbol}"
+
     def _orderbook_bids_key(self, coin: str) -> str:
         return f"ob:{self.exchange}:{coin}:bids"
 
     def _orderbook_asks_key(self, coin: str) -> str:
         return f"ob:{self.exchange}:{coin}:asks"
 
+    def _orderbook_meta_key(self, coin: str) -> str:
+        return f"ob:{self.exchange}:{coin}:meta"
+
+    def _bbo_key(self, coin: str) -> str:
+        return f"bbo:{self.exchange}:{coin}"
+
+    def _funding_key(self, coin: str) -> str:
+        return f"funding:{self.exchange}:{coin}"
+
+    def _orderbook_channel(self, coin: str) -> str:
+        return f"obupd:{self.exchange}:{coin}"
+
+    def _orderbook_stream_key(self, coin: str) -> str:
+        return f"obstream:{self.exchange}:{coin}"
+
     async def get(self, key: str):
         return await self.db.get(key)
 
     # === ORDER ===
-    async def save_order(self, order_id: str, fill_sz: float, price: float):
-        value = {
-            "orderId": order_id,
-            "fillSz": fill_sz,
-            "price": price
-        }
-        await self.db.set(self._order_key(order_id), json.dumps(value))
+    async def save_order(self, order_id: str, fill_sz: float, price: float, status: str = None,
+                         orig_sz: float = None):
+        """
+        Атомарно обновляет хэш ордера кумулятивным состоянием от биржи.
+        Терминальный ордер получает TTL и убирается из активных.
+        """
+        order_id = str(order_id)
+        await self._ensure_order_index()
+        await self._save_order_script(
+            keys=[self._order_key(order_id), self._orders_index_key(), self._orders_active_key()],
+            args=[
+                order_id, fill_sz or 0, price or 0, status or "", orig_sz or "",
+                time.time(), self.order_ttl, 1 if is_terminal_status(status) else 0
+            ]
+        )
+
+    def _index_order(self, pipe, order_id: str, status: str = None):
+        """Добавляет команды обновления индекса в pipeline"""
+        pipe.zadd(self._orders_index_key(), {order_id: time.time()})
+        if is_terminal_status(status):
+            pipe.srem(self._orders_active_key(), order_id)
+        else:
+            pipe.sadd(self._orders_active_key(), order_id)
 
     async def delete_order(self, order_id: str):
-        await self.db.delete(self._order_key(order_id))
+        await self._ensure_order_index()
+        pipe = self.db.pipeline(transaction=False)
+        pipe.delete(self._order_key(order_id), self._order_trades_key(order_id))
+        pipe.zrem(self._orders_index_key(), order_id)
+        pipe.srem(self._orders_active_key(), order_id)
+        await pipe.execute()
 
     async def get_order(self, order_id: str):
-        value = await self.db.get(self._order_key(order_id))
-        return json.loads(value) if value else None
-
-    async def update_order_fill(self, order_id: str, fill_sz: float, price: float):
-        value = {
-            "orderId": order_id,
-            "fillSz": fill_sz,
-            "price": price
-        }
-        await self.db.set(self._order_key(order_id), json.dumps(value))
+        await self._ensure_order_index()
+        return _parse_order(await self.db.hgetall(self._order_key(order_id)))
+
+    async def update_order_fill(self, order_id: str, fill_sz: float, price: float, trade_id: str = None):
+        """
+        Добавляет одно исполнение (не кумулятивное) к ордеру: сумма исполнений копится в fillSzWs,
+        fillSz = max(кумулятив REST, fillSzWs), price — средневзвешенная по исполнениям.
+        Повторная доставка того же trade_id игнорируется.
+        """
+        order_id = str(order_id)
+        await self._ensure_order_index()
+        await self._add_order_fill_script(
+            keys=[
+                self._order_key(order_id), self._orders_index_key(),
+                self._orders_active_key(), self._order_trades_key(order_id)
+            ],
+            args=[order_id, fill_sz, price, time.time(), self.order_ttl, trade_id or ""]
+        )
+
+    async def get_all_orders(self, active_only: bool = False) -> dict:
+        """
+        Получает ордера биржи через индекс одним pipeline HGETALL вместо KEYS + GET на каждый ключ.
+
+        :param active_only: Вернуть только ордера в нетерминальном статусе.
+        :return: Словарь {order_id: данные ордера}.
+        """
+        await self._ensure_order_index()
+        if active_only:
+            order_ids = list(await self.db.smembers(self._orders_active_key()))
+        else:
+            order_ids = await self.db.zrange(self._orders_index_key(), 0, -1)
+
+        if not order_ids:
+            return {}
+
+        pipe = self.db.pipeline(transaction=False)
+        for order_id in order_ids:
+            pipe.hgetall(self._order_key(order_id))
+        values = await pipe.execute()
+
+        orders = {}
+        stale = []
+        for order_id, value in zip(order_ids, values):
+            if value:
+                orders[order_id] = _parse_order(value)
+            else:
+                stale.append(order_id)
+
+        # Ключ ордера истек по TTL или удален мимо коннектора — чистим индекс
+        if stale:
+            pipe = self.db.pipeline(transaction=False)
+            pipe.zrem(self._orders_index_key(), *stale)
+            pipe.srem(self._orders_active_key(), *stale)
+            await pipe.execute()
+
+        return orders
+
+    async def rebuild_order_index(self, batch_size: int = 500) -> int:
+        """
+        Перестраивает индекс ордеров по существующим ключам через SCAN (без блокирующего KEYS).
+        Записи старого формата (JSON строкой через SET) переводятся в хэш.
+
+        :return: Количество проиндексированных ордеров.
+        """
+        prefix = self._order_key("")
+        indexed = 0
+        batch = []
+
+        async def _flush(keys):
+            pipe = self.db.pipeline(transaction=False)
+            for key in keys:
+                pipe.type(key)
+            types = await pipe.execute()
+
+            pipe = self.db.pipeline(transaction=False)
+            for key, key_type in zip(keys, types):
+                if key_type == "hash":
+                    pipe.hmget(key, "orderId", "status")
+                elif key_type == "string":
+                    pipe.get(key)
+                else:
+                    # Ключ истек между SCAN и TYPE — команда-заглушка держит ответы по порядку
+                    pipe.exists(key)
+            values = await pipe.execute()
+
+            pipe = self.db.pipeline(transaction=False)
+            count = 0
+            now = time.time()
+            for key, key_type, value in zip(keys, types, values):
+                if key_type == "hash":
+                    order_id, status = value
+                elif key_type == "string" and value:
+                    try:
+                        legacy = json.loads(value)
+                    except ValueError:
+                        continue
+                    order_id = str(legacy.get("orderId") or key[len(prefix):])
+                    status = legacy.get("status")
+                    mapping = {"orderId": order_id, "fillSz": legacy.get("fillSz") or 0,
+                               "price": legacy.get("price") or 0, "createdAt": now, "updatedAt": now}
+                    if status:
+                        mapping["status"] = status
+                    if legacy.get("origSz"):
+                        mapping["origSz"] = legacy["origSz"]
+                    pipe.delete(key)
+                    pipe.hset(key, mapping=mapping)
+                    if is_terminal_status(status) and self.order_ttl > 0:
+                        pipe.expire(key, self.order_ttl)
+                else:
+                    continue
+                if not order_id:
+                    continue
+                self._index_order(pipe, order_id, status)
+                count += 1
+            await pipe.execute()
+            return count
+
+        async for key in self.db.scan_iter(match=f"{prefix}*", count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                indexed += await _flush(batch)
+                batch = []
+
+        if batch:
+            indexed += await _flush(batch)
+
+        return indexed
+
+    async def _ensure_order_index(self):
+        """
+        Перед первым чтением или записью ордеров: записи, сделанные до индекса (в том числе
+        JSON строки — на них HGETALL и скрипты падают с WRONGTYPE), переводятся в хэши и
+        индексируются. Миграция выполняется, пока в Dragonfly нет отметки версии хранения,
+        — наличие самого индекса ни о чем не говорит: его создает первый же save_order.
+        """
+        if self._index_ready:
+            return
+        # Одновременные первые вызовы ждут одну миграцию; после сбоя следующий вызов повторяет ее
+        task = self._index_migration
+        if task is None or task.done():
+            task = self._index_migration = asyncio.ensure_future(self._migrate_order_index())
+        await task
+
+    async def _migrate_order_index(self):
+        if await self.db.get(self._orders_version_key()) != ORDER_STORAGE_VERSION:
+            indexed = await self.rebuild_order_index()
+            await self.db.set(self._orders_version_key(), ORDER_STORAGE_VERSION)
+            logger.info(f"🗂️ {self.exchange}: хранение ордеров v{ORDER_STORAGE_VERSION}, "
+                        f"проиндексировано {indexed} ордеров")
+        self._index_ready = True
 
     # === ORDERBOOK - HASH OPTIMIZED ===
-    async def save_orderbook(self, coin: str, bids: list, asks: list):
-        """Сохраняет ордербук в HASH структуре - фиксированные 10+10 записей"""
+    async def save_position(self, symbol: str, position: dict):
+        """Сохраняет позицию из user stream как HASH (None пишется пустой строкой)"""
+        mapping = {field: "" if value is None else value for field, value in position.items()}
+        await self.db.hset(self._position_key(symbol), mapping=mapping)
+
+    async def get_position(self, symbol: str):
+        raw = await self.db.hgetall(self._position_key(symbol))
+        if not raw:
+            return None
+        position = {field: value or None for field, value in raw.items()}
+        for field in POSITION_FLOAT_FIELDS:
+            if position.get(field) is not None:
+                position[field] = float(position[field])
+        return position
+
+    async def save_orderbook(self, coin: str, bids: list, asks: list, exchange_ts: int = None):
+        """
+        Сохраняет ордербук в HASH структуре - фиксированные 10+10 записей.
+        В том же pipeline обновляется meta: seq (счетчик обновлений), ets (мс биржи), lts (мс записи).
+        """
         bids_key = self._orderbook_bids_key(coin)
         asks_key = self._orderbook_asks_key(coin)
+        meta_key = self._orderbook_meta_key(coin)
+        local_ts = int(time.time() * 1000)
 
         pipe = self.db.pipeline()
 
@@ -71,21 +440,216 @@ class DragonFlyConnector:
             else:
                 pipe.hset(asks_key, str(i), "0:0")
 
+        pipe.hincrby(meta_key, "seq", 1)
+        pipe.hset(meta_key, mapping={"ets": int(exchange_ts or 0), "lts": local_ts})
+
+        # Оповещение читателей в том же round trip
+        if self.book_notify:
+            self._notify_orderbook(pipe, coin, bids, asks, local_ts)
+
         await pipe.execute()
 
-    async def get_orderbook(self, coin: str):
-        """Получает ордербук из HASH структуры"""
-        bids_key = self._orderbook_bids_key(coin)
-        asks_key = self._orderbook_asks_key(coin)
+    def _notify_orderbook(self, pipe, coin: str, bids: list, asks: list, ts_ms: int):
+        """Добавляет в pipeline оповещение с лучшими ценами: "bid:ask:ts_ms" """
+        best_bid = bids[0][0] if bids else 0
+        best_ask = asks[0][0] if asks else 0
 
-        bids_raw, asks_raw = await asyncio.gather(
-            self.db.hgetall(bids_key),
-            self.db.hgetall(asks_key)
-        )
+        if self.book_notify == "pubsub":
+            pipe.publish(self._orderbook_channel(coin), f"{best_bid}:{best_ask}:{ts_ms}")
+        elif self.book_notify == "stream":
+            pipe.xadd(
+                self._orderbook_stream_key(coin),
+                {"b": best_bid, "a": best_ask, "t": ts_ms},
+                maxlen=self.book_stream_maxlen,
+                approximate=True
+            )
+
+    @staticmethod
+    def _parse_notification(payload: str) -> dict:
+        bid, ask, ts_ms = payload.split(":")
+        return {"bid": float(bid), "ask": float(ask), "ts": int(ts_ms)}
+
+    async def subscribe_orderbook_updates(self, coins: list):
+        """
+        Асинхронный генератор оповещений об обновлении ордербуков (режим "pubsub").
+        Отдает (coin, {"bid", "ask", "ts"}) сразу после записи книги.
+        """
+        channels = {self._orderbook_channel(coin): coin for coin in coins}
+        pubsub = self.db.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(*channels)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                coin = channels.get(message["channel"])
+                if coin:
+                    yield coin, self._parse_notification(message["data"])
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose() if hasattr(pubsub, "aclose") else await pubsub.close()
+
+    async def read_orderbook_stream(self, coins: list, last_ids: dict = None, block_ms: int = 1000):
+        """
+        Асинхронный генератор по capped stream обновлений (режим "stream").
+        В отличие от pubsub, читатель может догнать пропущенное, передав last_ids {coin: id}.
+        Отдает (coin, stream_id, {"bid", "ask", "ts"}).
+        """
+        streams = {self._orderbook_stream_key(coin): (last_ids or {}).get(coin, "$") for coin in coins}
+        coin_by_key = {self._orderbook_stream_key(coin): coin for coin in coins}
+
+        while True:
+            response = await self.db.xread(streams, block=block_ms)
+            if not response:
+                continue
+            # RESP2 отдает список [key, entries], RESP3 - словарь {key: [entries]}
+            if isinstance(response, dict):
+                items = [(key, value[0] if value else []) for key, value in response.items()]
+            else:
+                items = response
+            for key, entries in items:
+                for stream_id, fields in entries:
+                    streams[key] = stream_id
+                    yield coin_by_key[key], stream_id, {
+                        "bid": float(fields["b"]),
+                        "ask": float(fields["a"]),
+                        "ts": int(fields["t"]),
+                    }
+
+    async def wait_for_orderbook_update(self, coin: str, timeout: float = None):
+        """
+        Ждет следующего обновления книги монеты вместо опроса с фиксированным интервалом.
+        Возвращает {"bid", "ask", "ts"} или None по таймауту.
+        """
+        async def _next():
+            if self.book_notify == "stream":
+                updates = self.read_orderbook_stream([coin])
+            else:
+                updates = self.subscribe_orderbook_updates([coin])
+            try:
+                item = await updates.__anext__()
+            finally:
+                await updates.aclose()
+            return item[-1]
+
+        try:
+            return await asyncio.wait_for(_next(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def save_bbo(self, coin: str, bid: float, bid_qty: float, ask: float, ask_qty: float,
+                       exchange_ts: int = None):
+        """Сохраняет лучший bid/ask одной командой HSET и в слот процесса"""
+        bbo = {
+            "bid": bid,
+            "bid_qty": bid_qty,
+            "ask": ask,
+            "ask_qty": ask_qty,
+            "exchange_ts": int(exchange_ts or 0),
+            "local_ts": int(time.time() * 1000),
+        }
+        _BBO_SLOTS[(self.exchange, coin)] = bbo
+        await self.db.hset(self._bbo_key(coin), mapping={
+            "b": bid, "bq": bid_qty, "a": ask, "aq": ask_qty,
+            "ets": bbo["exchange_ts"], "lts": bbo["local_ts"]
+        })
+
+    async def get_bbo(self, coin: str, max_age_ms: int = None):
+        """
+        Лучший bid/ask: сначала слот процесса, иначе HASH в Dragonfly.
+
+        :param max_age_ms: Если задан — BBO старше считается устаревшим и возвращается None.
+        :return: {"bid", "bid_qty", "ask", "ask_qty", "exchange_ts", "local_ts", "age_ms"} или None.
+        """
+        bbo = _BBO_SLOTS.get((self.exchange, coin))
+        if bbo is None:
+            raw = await self.db.hgetall(self._bbo_key(coin))
+            if not raw:
+                return None
+            bbo = {
+                "bid": float(raw["b"]),
+                "bid_qty": float(raw["bq"]),
+                "ask": float(raw["a"]),
+                "ask_qty": float(raw["aq"]),
+                "exchange_ts": int(raw.get("ets", 0)),
+                "local_ts": int(raw.get("lts", 0)),
+            }
+
+        age_ms = int(time.time() * 1000) - bbo["local_ts"]
+        if max_age_ms is not None and age_ms > max_age_ms:
+            return None
+        return {**bbo, "age_ms": age_ms}
+
+    async def save_funding(self, coin: str, mark: float, funding_rate: float, interval_hours: float,
+                           index_price: float = None, next_funding_ts: int = None, exchange_ts: int = None):
+        """Сохраняет mark price и ставку финансирования (HASH + слот процесса)"""
+        funding = {
+            "mark": mark,
+            "rate": funding_rate,
+            "interval_hours": interval_hours,
+            "index": index_price or 0.0,
+            "next_funding_ts": int(next_funding_ts or 0),
+            "exchange_ts": int(exchange_ts or 0),
+            "local_ts": int(time.time() * 1000),
+        }
+        _FUNDING_SLOTS[(self.exchange, coin)] = funding
+        pipe = self.db.pipeline(transaction=False)
+        pipe.hset(self._funding_key(coin), mapping=funding)
+        pipe.expire(self._funding_key(coin), FUNDING_TTL_SECONDS)
+        await pipe.execute()
+
+    async def get_funding(self, coin: str, max_age_ms: int = FUNDING_MAX_AGE_MS):
+        """
+        Последние mark price и funding: сначала слот процесса, иначе HASH в Dragonfly.
+
+        :param max_age_ms: Запись старше (по local_ts) считается устаревшей и возвращается None; None — без проверки.
+        :return: {"mark", "rate", "interval_hours", "index", "next_funding_ts", "exchange_ts", "local_ts"} или None.
+        """
+        funding = _FUNDING_SLOTS.get((self.exchange, coin))
+        if funding is not None:
+            funding = dict(funding)
+        else:
+            raw = await self.db.hgetall(self._funding_key(coin))
+            if not raw:
+                return None
+            funding = {
+                "mark": float(raw["mark"]),
+                "rate": float(raw["rate"]),
+                "interval_hours": float(raw["interval_hours"]),
+                "index": float(raw.get("index", 0)),
+                "next_funding_ts": int(raw.get("next_funding_ts", 0)),
+                "exchange_ts": int(raw.get("exchange_ts", 0)),
+                "local_ts": int(raw.get("local_ts", 0)),
+            }
+
+        if max_age_ms is not None and int(time.time() * 1000) - funding["local_ts"] > max_age_ms:
+            return None
+        return funding
+
+    async def get_mark(self, coin: str, max_age_ms: int = FUNDING_MAX_AGE_MS):
+        funding = await self.get_funding(coin, max_age_ms)
+        return funding["mark"] if funding else None
+
+    async def get_orderbook(self, coin: str, max_age_ms: int = None):
+        """
+        Получает ордербук из HASH структуры вместе с meta за один round trip.
+
+        :param max_age_ms: Если задан — книга старше (или без meta) считается устаревшей и возвращается None.
+        :return: {"bids", "asks", "seq", "exchange_ts", "local_ts", "age_ms"} или None.
+        """
+        pipe = self.db.pipeline(transaction=False)
+        pipe.hgetall(self._orderbook_bids_key(coin))
+        pipe.hgetall(self._orderbook_asks_key(coin))
+        pipe.hgetall(self._orderbook_meta_key(coin))
+        bids_raw, asks_raw, meta = await pipe.execute()
 
         if not bids_raw or not asks_raw:
             return None
 
+        local_ts = int(meta.get("lts", 0)) if meta else 0
+        age_ms = int(time.time() * 1000) - local_ts if local_ts else None
+        if max_age_ms is not None and (age_ms is None or age_ms > max_age_ms):
+            return None
+
         # Парсим HASH обратно в массивы
         bids = []
         asks = []
@@ -108,5 +672,9 @@ class DragonFlyConnector:
 
         return {
             "bids": bids,
-            "asks": asks
+            "asks": asks,
+            "seq": int(meta.get("seq", 0)) if meta else 0,
+            "exchange_ts": int(meta.get("ets", 0)) if meta else 0,
+            "local_ts": local_ts,
+            "age_ms": age_ms
         }
\ No newline at end of file
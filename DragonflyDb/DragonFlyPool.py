@@ -0,0 +1,135 @@
+import os
+import time
+
+import redis.asyncio as aioredis
+from redis.asyncio.client import Pipeline
+
+from Monitoring.Metrics import LatencyWindow
+
+# Параметры подключения; переменные окружения перекрывают значения по умолчанию.
+# DRAGONFLY_SOCKET задает unix socket (тогда host/port не используются).
+DRAGONFLY_CONFIG = {
+    "host": os.getenv("DRAGONFLY_HOST", "localhost"),
+    "port": int(os.getenv("DRAGONFLY_PORT", "6379")),
+    "password": os.getenv("DRAGONFLY_PASSWORD", "strongpassword"),
+    "unix_socket_path": os.getenv("DRAGONFLY_SOCKET") or None,
+    # Номер логической БД: replay и тесты работают в своей, чтобы не трогать боевые ключи
+    "db": int(os.getenv("DRAGONFLY_DB", "0")),
+    "max_connections": int(os.getenv("DRAGONFLY_MAX_CONNECTIONS", "64")),
+    "protocol": int(os.getenv("DRAGONFLY_PROTOCOL", "3")),
+    "health_check_interval": 15,
+    "socket_connect_timeout": 5,
+    "socket_timeout": 5,
+    # Оповещение об обновлении ордербука: None, "pubsub" или "stream"
+    "book_notify": os.getenv("DRAGONFLY_BOOK_NOTIFY") or None,
+    "book_stream_maxlen": int(os.getenv("DRAGONFLY_BOOK_STREAM_MAXLEN", "1000")),
+}
+
+_shared_client = None
+_command_latency = {}
+_pipeline_latency = LatencyWindow()
+
+
+def _observe_command(name, elapsed_ns: int):
+    window = _command_latency.get(name)
+    if window is None:
+        window = _command_latency[name] = LatencyWindow()
+    window.observe(elapsed_ns)
+
+
+class _InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter_ns()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            _pipeline_latency.observe(time.perf_counter_ns() - start)
+
+
+class _InstrumentedRedis(aioredis.Redis):
+    """Redis клиент с замером времени каждой команды"""
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter_ns()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            _observe_command(str(args[0]).upper(), time.perf_counter_ns() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None):
+        return _InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def configure(**overrides):
+    """Меняет параметры подключения. Вызывать до первого get_shared_client()."""
+    if _shared_client is not None:
+        raise RuntimeError("Dragonfly клиент уже создан, configure() нужно вызывать раньше")
+    DRAGONFLY_CONFIG.update(overrides)
+
+
+def _create_pool() -> aioredis.ConnectionPool:
+    cfg = DRAGONFLY_CONFIG
+    common = {
+        "db": cfg["db"],
+        "password": cfg["password"],
+        "decode_responses": True,
+        "max_connections": cfg["max_connections"],
+        "protocol": cfg["protocol"],
+        "health_check_interval": cfg["health_check_interval"],
+        "socket_connect_timeout": cfg["socket_connect_timeout"],
+        "socket_timeout": cfg["socket_timeout"],
+    }
+
+    if cfg["unix_socket_path"]:
+        return aioredis.ConnectionPool(
+            connection_class=aioredis.UnixDomainSocketConnection,
+            path=cfg["unix_socket_path"],
+            **common
+        )
+
+    return aioredis.ConnectionPool(
+        host=cfg["host"],
+        port=cfg["port"],
+        socket_keepalive=True,
+        **common
+    )
+
+
+def get_shared_client() -> aioredis.Redis:
+    """Возвращает единый на процесс Dragonfly клиент с общим пулом соединений"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = _InstrumentedRedis(connection_pool=_create_pool())
+    return _shared_client
+
+
+async def close_shared_client():
+    """Закрывает общий клиент и пул. Следующий get_shared_client() создаст новый."""
+    global _shared_client
+    client, _shared_client = _shared_client, None
+    if client is not None:
+        await client.connection_pool.disconnect()
+
+
+def get_pool_stats() -> dict:
+    """Загрузка пула и задержки команд (p50/p99/max в мс)"""
+    stats = {
+        "pool": {
+            "max_connections": DRAGONFLY_CONFIG["max_connections"],
+            "in_use": 0,
+            "idle": 0,
+            "utilization": 0.0,
+        },
+        "pipeline": _pipeline_latency.snapshot(),
+        "commands": {name: window.snapshot() for name, window in _command_latency.items()},
+    }
+
+    if _shared_client is not None:
+        pool = _shared_client.connection_pool
+        in_use = len(getattr(pool, "_in_use_connections", ()))
+        idle = len(getattr(pool, "_available_connections", ()))
+        stats["pool"]["in_use"] = in_use
+        stats["pool"]["idle"] = idle
+        stats["pool"]["utilization"] = in_use / pool.max_connections if pool.max_connections else 0.0
+
+    return stats
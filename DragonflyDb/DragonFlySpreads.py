@@ -0,0 +1,126 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from DragonflyDb.DragonFlyPool import get_shared_client
+
+# Биржи, где ордербук хранится под символом с котировкой (ETH -> ETHUSDT)
+_USDT_SYMBOL_EXCHANGES = {"binance", "bybit"}
+
+# Поля ответа на одну монету, в порядке возврата из скрипта
+SPREAD_FIELDS = (
+    "bid1", "bid1_qty", "ask1", "ask1_qty",
+    "bid2", "bid2_qty", "ask2", "ask2_qty",
+    "spread_sell1_buy2", "spread_sell2_buy1",
+)
+
+# KEYS: по 4 ключа на монету — bids1, asks1, bids2, asks2 (HASH уровней "price:qty")
+# Возвращает по 10 строк на монету (см. SPREAD_FIELDS), '' если книги нет.
+# Числа отдаются строками: Lua number при возврате обрезается до целого.
+TOP_OF_BOOK_SPREADS_LUA = """
+local function level(key)
+    local raw = redis.call('HGET', key, '0')
+    if not raw then
+        return nil, nil
+    end
+    local sep = string.find(raw, ':', 1, true)
+    local px = tonumber(string.sub(raw, 1, sep - 1))
+    local qty = tonumber(string.sub(raw, sep + 1))
+    if not px or px <= 0 or not qty or qty <= 0 then
+        return nil, nil
+    end
+    return px, qty
+end
+
+local out = {}
+for i = 1, #KEYS, 4 do
+    local b1, b1q = level(KEYS[i])
+    local a1, a1q = level(KEYS[i + 1])
+    local b2, b2q = level(KEYS[i + 2])
+    local a2, a2q = level(KEYS[i + 3])
+    if b1 and a1 and b2 and a2 then
+        local fmt = '%.12g'
+        table.insert(out, string.format(fmt, b1))
+        table.insert(out, string.format(fmt, b1q))
+        table.insert(out, string.format(fmt, a1))
+        table.insert(out, string.format(fmt, a1q))
+        table.insert(out, string.format(fmt, b2))
+        table.insert(out, string.format(fmt, b2q))
+        table.insert(out, string.format(fmt, a2))
+        table.insert(out, string.format(fmt, a2q))
+        table.insert(out, string.format(fmt, b1 / a2 - 1))
+        table.insert(out, string.format(fmt, b2 / a1 - 1))
+    else
+        for _ = 1, 10 do
+            table.insert(out, '')
+        end
+    end
+end
+return out
+"""
+
+
+def exchange_symbol(exchange: str, coin: str) -> str:
+    """Символ, под которым WS клиент биржи сохраняет ордербук монеты"""
+    coin = coin.upper()
+    if exchange.lower() in _USDT_SYMBOL_EXCHANGES and not coin.endswith("USDT"):
+        return coin + "USDT"
+    return coin
+
+
+class DragonFlySpreads:
+    """
+    Спреды между двумя биржами, посчитанные на стороне Dragonfly.
+    Клиент получает только лучшие уровни и готовые спреды вместо двух полных ордербуков.
+    """
+
+    def __init__(self, exchange1: str, exchange2: str):
+        self.exchange1 = exchange1.lower()
+        self.exchange2 = exchange2.lower()
+        self.db = get_shared_client()
+        self._script = self.db.register_script(TOP_OF_BOOK_SPREADS_LUA)
+
+    def _keys(self, coin: str) -> list:
+        symbol1 = exchange_symbol(self.exchange1, coin)
+        symbol2 = exchange_symbol(self.exchange2, coin)
+        return [
+            f"ob:{self.exchange1}:{symbol1}:bids",
+            f"ob:{self.exchange1}:{symbol1}:asks",
+            f"ob:{self.exchange2}:{symbol2}:bids",
+            f"ob:{self.exchange2}:{symbol2}:asks",
+        ]
+
+    async def get_spread(self, coin: str):
+        """
+        Лучшие цены/объемы обеих бирж и спреды в обе стороны за один вызов.
+
+        :return: Словарь с полями SPREAD_FIELDS или None, если какой-то из книг нет.
+                 spread_sell1_buy2 = bid1 / ask2 - 1, spread_sell2_buy1 = bid2 / ask1 - 1.
+        """
+        spreads = await self.get_spreads([coin])
+        return spreads.get(coin.upper())
+
+    async def get_spreads(self, coins: list) -> dict:
+        """
+        Пакетный вариант: один вызов скрипта на все монеты.
+
+        :return: Словарь {coin: данные}; монеты без полного набора книг пропускаются.
+        """
+        coins = [coin.upper() for coin in coins]
+        keys = []
+        for coin in coins:
+            keys.extend(self._keys(coin))
+
+        raw = await self._script(keys=keys)
+
+        result = {}
+        width = len(SPREAD_FIELDS)
+        for index, coin in enumerate(coins):
+            values = raw[index * width:(index + 1) * width]
+            if not values or values[0] == "":
+                continue
+            entry = {"coin": coin}
+            entry.update({field: float(value) for field, value in zip(SPREAD_FIELDS, values)})
+            result[coin] = entry
+
+        return result
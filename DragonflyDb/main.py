@@ -2,6 +2,7 @@
 import asyncio
 from SubscriptionRouter import SubscriptionRouter
 from config.config import CLIENTS
+from Monitoring.Runtime import run
 
 
 async def main():
@@ -21,4 +22,4 @@ async def main():
 #     )
 #
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main())
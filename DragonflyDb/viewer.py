@@ -1,6 +1,11 @@
 # viewer.py
 import asyncio
-from DragonFlyConnector import DragonFlyConnector
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from DragonflyDb.DragonFlyConnector import DragonFlyConnector
+from DragonflyDb.DragonFlyPool import close_shared_client
 
 async def print_order(exchange: str, order_id: str):
     connector = DragonFlyConnector(exchange)
@@ -9,14 +14,30 @@ async def print_order(exchange: str, order_id: str):
         print(f"[{exchange}] Order {order_id}: {order}")
     else:
         print(f"[{exchange}] Order {order_id} not found.")
+    await close_shared_client()
 
 async def print_orderbook(exchange: str, coin: str):
     connector = DragonFlyConnector(exchange)
     book = await connector.get_orderbook(coin)
     if book:
         print(f"[{exchange}] Orderbook for {coin}:\nBids: {book['bids']}\nAsks: {book['asks']}")
+        print(f"seq={book['seq']} exchange_ts={book['exchange_ts']} age={book['age_ms']}ms")
     else:
         print(f"[{exchange}] No orderbook data for {coin}.")
+    await close_shared_client()
+
+async def watch_orderbook(exchange: str, coin: str, mode: str = "pubsub"):
+    """Печатает лучшие цены при каждом обновлении книги (без опроса)"""
+    connector = DragonFlyConnector(exchange, book_notify=mode)
+    try:
+        if mode == "stream":
+            async for _, stream_id, update in connector.read_orderbook_stream([coin]):
+                print(f"[{exchange}] {coin} {stream_id}: bid={update['bid']} ask={update['ask']}")
+        else:
+            async for _, update in connector.subscribe_orderbook_updates([coin]):
+                print(f"[{exchange}] {coin} @{update['ts']}: bid={update['bid']} ask={update['ask']}")
+    finally:
+        await close_shared_client()
 
 if __name__ == "__main__":
     import sys
@@ -29,7 +50,12 @@ if __name__ == "__main__":
     elif type_ == "orderbook":
         coin = sys.argv[3]
         asyncio.run(print_orderbook(exchange, coin))
+    elif type_ == "watch":
+        coin = sys.argv[3]
+        mode = sys.argv[4] if len(sys.argv) > 4 else "pubsub"
+        asyncio.run(watch_orderbook(exchange, coin, mode))
     else:
         print("Usage:")
         print("  python viewer.py binance order 123456")
         print("  python viewer.py okx orderbook BTCUSDT")
+        print("  python viewer.py binance watch BTCUSDT [pubsub|stream]")
@@ -0,0 +1,341 @@
+import asyncio
+import logging
+import os
+import time
+
+from Execution.FillEvents import FILL_TOLERANCE, bind_order, get_order_fill, track_order
+from Monitoring.Metrics import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+# Настройки через окружение: EXECUTION_MODE=auto (выбор по статистике бирж), simultaneous или sequential
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "auto")
+# Сколько ждать исполнения лимиток, выставленных одновременно
+FILL_TIMEOUT_S = float(os.getenv("EXECUTION_FILL_TIMEOUT_S", "2"))
+# Когда одна нога уже исполнена, вторая ждется не дольше этого — дальше разбираем промах
+HEDGE_GRACE_S = float(os.getenv("EXECUTION_HEDGE_GRACE_S", "0.3"))
+# Последовательный режим, если вероятность промаха хотя бы одной ноги выше порога
+SEQUENCE_MISS_PROBABILITY = float(os.getenv("EXECUTION_SEQUENCE_MISS_PROBABILITY", "0.2"))
+# Пока по бирже меньше попыток, статистике не верим и работаем как раньше — одновременно
+MIN_SAMPLES = 20
+# Вес последнего исхода в скользящей вероятности исполнения
+FILL_PROBABILITY_ALPHA = 0.05
+
+
+class VenueStats:
+    """
+    Скользящая статистика исполнения одной биржи: ack — время ответа на ордер,
+    fill — от отправки лимитки до первого исполнения в user stream, fill_probability —
+    доля ордеров, исполненных полностью (экспоненциальное среднее).
+    """
+
+    def __init__(self, size: int = 512):
+        self.ack = LatencyWindow(size)
+        self.fill = LatencyWindow(size)
+        self.attempts = 0
+        self.fill_probability = 0.5
+
+    def observe_outcome(self, filled: bool):
+        self.attempts += 1
+        # Первые исходы усредняются как есть, дальше — с постоянным весом
+        alpha = max(FILL_PROBABILITY_ALPHA, 1 / self.attempts)
+        self.fill_probability += alpha * ((1.0 if filled else 0.0) - self.fill_probability)
+
+    def snapshot(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "fill_probability": round(self.fill_probability, 4),
+            "ack": self.ack.snapshot(),
+            "fill": self.fill.snapshot(),
+        }
+
+
+_venues = {}
+_exposure = {"simultaneous": LatencyWindow(), "sequential": LatencyWindow()}
+
+
+def get_venue_stats(venue: str) -> VenueStats:
+    stats = _venues.get(venue)
+    if stats is None:
+        stats = _venues[venue] = VenueStats()
+    return stats
+
+
+def get_execution_stats() -> dict:
+    """Статистика бирж и время без хеджа по режимам: {"venues": {...}, "exposure": {...}}"""
+    return {
+        "venues": {venue: stats.snapshot() for venue, stats in _venues.items()},
+        "exposure": {mode: window.snapshot() for mode, window in _exposure.items()},
+    }
+
+
+class Leg:
+    """
+    Одна нога сделки. info — InfoClient той же биржи: по нему дочитывается исполнение,
+    если событий user stream не было. client_order_id заводится до отправки ордера —
+    исполнение отслеживается по нему еще до ответа биржи.
+    """
+
+    __slots__ = ("client", "info", "venue", "symbol", "side", "price", "qty", "client_order_id",
+                 "order_id", "filled", "avg_price", "sent_ns", "filled_ns", "error")
+
+    def __init__(self, client, info, venue: str, symbol: str, side: str, price: float, qty: float):
+        self.client = client
+        self.info = info
+        self.venue = venue.lower()
+        self.symbol = symbol
+        self.side = side
+        self.price = price
+        self.qty = qty
+        self.client_order_id = None
+        self.order_id = None
+        self.filled = 0.0
+        self.avg_price = None
+        self.sent_ns = None
+        self.filled_ns = None
+        self.error = None
+
+    @property
+    def supports_ioc(self) -> bool:
+        return hasattr(self.client, "place_ioc_order")
+
+    @property
+    def is_filled(self) -> bool:
+        return self.filled >= self.qty * FILL_TOLERANCE
+
+    def result(self) -> dict:
+        result = {"filledQty": self.filled, "avgPrice": self.avg_price or self.price, "orderId": self.order_id,
+                  "clientOrderId": self.client_order_id}
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+def _opposite(side: str) -> str:
+    return "short" if side.lower() in ("long", "buy") else "long"
+
+
+class ExecutionCoordinator:
+    """
+    Открытие пары ног с выбором порядка по измеренной статистике бирж.
+
+    simultaneous — обе ноги сразу (лимитки или IOC), исполнение ждется по событиям fill
+    из FillEvents, а не sleep; как только одна нога исполнена, второй дается HEDGE_GRACE_S.
+    sequential — IOC сначала на бирже с меньшей вероятностью исполнения, и сразу по его
+    исполнению IOC хеджа на второй бирже на исполненный объем. Промаха одной ноги
+    в этом режиме почти не бывает, но платим вторым RTT.
+
+    Перекос после исполнения закрывается по on_miss: unwind — лишнее закрывается маркетом
+    на исполненной бирже (как было в dual_open), complete — недостающее добирается маркетом
+    на отставшей (как fillOrdr в Scalper).
+    """
+
+    def __init__(self, mode: str = EXECUTION_MODE, fill_timeout: float = FILL_TIMEOUT_S,
+                 hedge_grace: float = HEDGE_GRACE_S, on_miss: str = "unwind"):
+        if on_miss not in ("unwind", "complete"):
+            raise ValueError(f"Неизвестная политика промаха {on_miss}")
+        self.mode = mode
+        self.fill_timeout = fill_timeout
+        self.hedge_grace = hedge_grace
+        self.on_miss = on_miss
+
+    def choose(self, leg1: Leg, leg2: Leg):
+        """('simultaneous', None) или ('sequential', нога, которая идет первой)"""
+        if self.mode == "simultaneous" or not (leg1.supports_ioc and leg2.supports_ioc):
+            return "simultaneous", None
+
+        stats1, stats2 = get_venue_stats(leg1.venue), get_venue_stats(leg2.venue)
+        # Первой идет менее ликвидная биржа; при равной вероятности — та, что дольше исполняет
+        key1 = (stats1.fill_probability, -stats1.fill.percentile(0.5))
+        key2 = (stats2.fill_probability, -stats2.fill.percentile(0.5))
+        first = leg1 if key1 <= key2 else leg2
+
+        if self.mode == "sequential":
+            return "sequential", first
+        if min(stats1.attempts, stats2.attempts) < MIN_SAMPLES:
+            return "simultaneous", None
+        miss = 1 - stats1.fill_probability * stats2.fill_probability
+        return ("sequential", first) if miss > SEQUENCE_MISS_PROBABILITY else ("simultaneous", None)
+
+    async def open_pair(self, leg1: Leg, leg2: Leg, ioc: bool = False) -> dict:
+        """
+        Открывает обе ноги. ioc=True — в одновременном режиме ноги ставятся IOC (атака по
+        вершине книги), иначе GTC лимитками. Возвращает словарь в формате dual_open
+        (success, both_filled, exchange1_result, exchange2_result, action_taken) + mode и exposure_ms.
+        """
+        mode, first = self.choose(leg1, leg2)
+        # Без IOC на одной из бирж (Bybit, Extended) ставим обычные лимитки
+        ioc = ioc and leg1.supports_ioc and leg2.supports_ioc
+        logger.info(f"🎯 Исполнение {mode}: {leg1.venue} {leg1.side} {leg1.qty}@{leg1.price} | "
+                    f"{leg2.venue} {leg2.side} {leg2.qty}@{leg2.price}")
+
+        if mode == "sequential":
+            await self._sequential(first, leg2 if first is leg1 else leg1)
+        else:
+            await self._simultaneous(leg1, leg2, ioc)
+
+        both_filled = leg1.is_filled and leg2.is_filled
+        action = "both_filled" if both_filled else await self._balance(leg1, leg2)
+
+        exposure_ms = None
+        fill_times = [leg.filled_ns for leg in (leg1, leg2) if leg.filled_ns]
+        if fill_times:
+            hedged_ns = max(fill_times) if both_filled else time.monotonic_ns()
+            exposure_ms = (hedged_ns - min(fill_times)) / 1e6
+            _exposure[mode].observe(hedged_ns - min(fill_times))
+
+        return {
+            "success": both_filled or action.startswith("completed"),
+            "both_filled": both_filled,
+            "exchange1_result": leg1.result(),
+            "exchange2_result": leg2.result(),
+            "action_taken": action,
+            "mode": mode,
+            "exposure_ms": exposure_ms,
+        }
+
+    # ============= РЕЖИМЫ =============
+
+    async def _simultaneous(self, leg1: Leg, leg2: Leg, ioc: bool):
+        if ioc:
+            await asyncio.gather(self._place(leg1, ioc), self._place(leg2, ioc))
+        else:
+            # Ожидание исполнения заводится по клиентскому id до отправки: fill, пришедший
+            # раньше ответа REST, сразу будит ждущего, а ack не стоит на пути к хеджу
+            for leg in (leg1, leg2):
+                leg.client_order_id = track_order(leg.venue)
+            waits = [asyncio.create_task(self._wait_fill(leg)) for leg in (leg1, leg2)]
+            placed = asyncio.gather(self._place(leg1, ioc), self._place(leg2, ioc))
+            pending = set(waits)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Нога не встала (ошибка или отказ биржи) — вторую не держим до fill_timeout,
+                # а сразу снимаем: время без хеджа ограничивается ответом биржи
+                if leg1.error is not None or leg2.error is not None:
+                    break
+                # Одна нога уже в позиции — вторую ждем недолго, дальше время без хеджа дороже
+                if any(task.result() for task in done):
+                    if pending:
+                        await asyncio.wait(pending, timeout=self.hedge_grace)
+                    break
+            for task in waits:
+                task.cancel()
+            # Отмену и дочитывание делаем только по ордерам, на которые биржа уже ответила
+            await placed
+            await asyncio.gather(*(self._settle(leg) for leg in (leg1, leg2) if leg.order_id and not leg.is_filled))
+        for leg in (leg1, leg2):
+            if leg.error is None:
+                get_venue_stats(leg.venue).observe_outcome(leg.is_filled)
+
+    async def _sequential(self, first: Leg, second: Leg):
+        await self._place(first, ioc=True)
+        if first.error is None:
+            get_venue_stats(first.venue).observe_outcome(first.is_filled)
+        if first.filled <= 0:
+            return
+
+        # Хедж сразу по ответу IOC и только на исполненный объем
+        second.qty = first.filled
+        await self._place(second, ioc=True)
+        if second.error is None:
+            get_venue_stats(second.venue).observe_outcome(second.is_filled)
+
+    # ============= НОГИ =============
+
+    async def _place(self, leg: Leg, ioc: bool):
+        stats = get_venue_stats(leg.venue)
+        leg.client_order_id = leg.client_order_id or track_order(leg.venue)
+        state = get_order_fill(leg.venue, leg.client_order_id)
+        leg.sent_ns = time.monotonic_ns()
+        try:
+            if ioc:
+                result = await leg.client.place_ioc_order(leg.symbol, leg.side, leg.price, leg.qty,
+                                                          client_order_id=leg.client_order_id)
+            else:
+                result = await leg.client.place_limit_order(leg.symbol, leg.side, leg.price, leg.qty,
+                                                            client_order_id=leg.client_order_id)
+        except Exception as e:
+            logger.error(f"❌ {leg.venue}: ошибка ордера {leg.side} {leg.qty}@{leg.price}: {e}")
+            leg.error = str(e)
+            # Ждущий исполнения этой ноги не должен досиживать до таймаута
+            state.apply(0.0, "REJECTED")
+            return
+        acked = time.monotonic_ns()
+        stats.ack.observe(acked - leg.sent_ns)
+
+        result = result or {}
+        leg.order_id = str(result["orderId"]) if result.get("orderId") else None
+        if leg.order_id is None and not ioc and result.get("status") != "FILLED":
+            # Биржа ответила, но ордер не принят — как и при исключении, будим ждущего
+            leg.error = result.get("error") or f"нет orderId в ответе: {result}"
+            logger.error(f"❌ {leg.venue}: ордер {leg.side} {leg.qty}@{leg.price} не принят: {leg.error}")
+            state.apply(0.0, "REJECTED")
+            return
+        if leg.order_id:
+            # Клиенты привязывают id сами; повторная привязка подхватывает fill, пришедший без clientOrderId
+            bind_order(leg.venue, leg.client_order_id, leg.order_id)
+        if ioc:
+            leg.filled = float(result.get("filledQty") or 0)
+            leg.avg_price = float(result.get("avgPrice") or 0) or None
+        elif result.get("status") == "FILLED":
+            # Hyperliquid мог исполнить лимитку сразу в ответе REST
+            leg.filled = leg.qty
+        if leg.filled > 0:
+            leg.filled_ns = acked
+            if not ioc:
+                stats.fill.observe(acked - leg.sent_ns)
+                state.apply(0.0, "FILLED")
+
+    async def _wait_fill(self, leg: Leg) -> bool:
+        state = get_order_fill(leg.venue, leg.client_order_id or leg.order_id)
+        filled = leg.is_filled or await state.wait(leg.qty, self.fill_timeout)
+        leg.filled = max(leg.filled, state.filled)
+        if state.first_fill_ns and leg.filled_ns is None:
+            get_venue_stats(leg.venue).fill.observe(max(state.first_fill_ns - leg.sent_ns, 0))
+            leg.filled_ns = time.monotonic_ns()
+        return filled and leg.is_filled
+
+    async def _settle(self, leg: Leg):
+        """Снимает неисполненный остаток лимитки и дочитывает итоговое исполнение"""
+        try:
+            result = await leg.client.cancel_order(leg.symbol, leg.order_id)
+        except Exception as e:
+            logger.warning(f"⚠️ {leg.venue}: отмена {leg.order_id} не прошла: {e}")
+            result = None
+        if isinstance(result, dict) and result.get("executedQty") is not None:
+            leg.filled = max(leg.filled, float(result["executedQty"]))
+        leg.filled = max(leg.filled, get_order_fill(leg.venue, leg.order_id).filled)
+        if leg.info is not None:
+            try:
+                status = await leg.info.get_order_status(leg.order_id)
+            except Exception as e:
+                logger.warning(f"⚠️ {leg.venue}: статус {leg.order_id} не прочитан: {e}")
+                status = None
+            if status and status.get("fillSz"):
+                try:
+                    leg.filled = max(leg.filled, float(status["fillSz"]))
+                except (TypeError, ValueError):
+                    pass
+        if leg.filled > 0 and leg.filled_ns is None:
+            leg.filled_ns = time.monotonic_ns()
+
+    async def _balance(self, leg1: Leg, leg2: Leg) -> str:
+        """Закрывает перекос объемов по on_miss и возвращает action_taken"""
+        imbalance = leg1.filled - leg2.filled
+        if abs(imbalance) <= max(leg1.qty, leg2.qty) * (1 - FILL_TOLERANCE):
+            return "both_rejected" if leg1.filled <= 0 else "partial_balanced"
+
+        ahead, behind = (leg1, leg2) if imbalance > 0 else (leg2, leg1)
+        number = "1" if (ahead if self.on_miss == "unwind" else behind) is leg1 else "2"
+        try:
+            if self.on_miss == "unwind":
+                logger.warning(f"⚠️ {behind.venue} не исполнен — закрываем {abs(imbalance):.6f} на {ahead.venue}")
+                await ahead.client.close_market_order(ahead.symbol, _opposite(ahead.side), abs(imbalance))
+                return f"closed_exchange{number}"
+            logger.warning(f"⚠️ {behind.venue} отстает — добираем {abs(imbalance):.6f} маркетом")
+            await behind.client.place_market_order(behind.symbol, behind.side, abs(imbalance))
+            behind.filled += abs(imbalance)
+            return f"completed_exchange{number}"
+        except Exception as e:
+            logger.error(f"❌ Не удалось закрыть перекос {abs(imbalance):.6f}: {e}")
+            return "close_failed"
@@ -0,0 +1,157 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+
+from Monitoring.FeedLatency import add_event_listener
+
+# Ордера, по которым помним исполнения; старые вытесняются
+TRACKED_ORDERS_LIMIT = 10_000
+# Ордер считается исполненным с этой долей объема (как в dual_open)
+FILL_TOLERANCE = 0.99
+# Биржи, у которых событие fill несет размер одного исполнения, а не накопленный
+INCREMENTAL_FILLS = {"hyperliquid"}
+
+_TERMINAL = {"FILLED", "CANCELED", "CANCELLED", "EXPIRED", "REJECTED"}
+
+
+class OrderFill:
+    """
+    Исполнение одного ордера по событиям user stream. Событие может прийти раньше
+    ответа REST — состояние создается по первому событию, ждущий его просто найдет.
+    Ордер с клиентским id заводится до отправки (track_order), биржевой id привязывается
+    к тому же состоянию по ответу или по первому событию (bind_order).
+    Поштучные исполнения с trade id учитываются один раз — повторная доставка не удваивает filled.
+    """
+
+    __slots__ = ("venue", "order_id", "filled", "status", "first_fill_ns", "trades", "_changed")
+
+    def __init__(self, venue: str, order_id: str):
+        self.venue = venue
+        self.order_id = order_id
+        self.filled = 0.0
+        self.status = None
+        self.first_fill_ns = None
+        # {trade id: размер} учтенных поштучных исполнений
+        self.trades = {}
+        self._changed = None
+
+    @property
+    def done(self) -> bool:
+        status = (self.status or "").upper()
+        return status in _TERMINAL or status.endswith("CANCELED")
+
+    def apply(self, filled: float, status: str = None, cumulative: bool = True, at_ns: int = None,
+              trade_id: str = None):
+        if trade_id and not cumulative:
+            if trade_id in self.trades:
+                return
+            self.trades[trade_id] = filled
+        if filled:
+            self.filled = max(self.filled, filled) if cumulative else self.filled + filled
+            if self.first_fill_ns is None:
+                self.first_fill_ns = at_ns or time.monotonic_ns()
+        if status:
+            self.status = status
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    def merge(self, other: "OrderFill", cumulative: bool = True):
+        """Переносит исполнение, пришедшее под биржевым id до привязки к клиентскому"""
+        if cumulative:
+            self.filled = max(self.filled, other.filled)
+        else:
+            # Исполнения без trade id переносятся целиком, с trade id — только еще не учтенные
+            added = other.filled - sum(other.trades.values())
+            for trade_id, size in other.trades.items():
+                if trade_id not in self.trades:
+                    self.trades[trade_id] = size
+                    added += size
+            self.filled += max(added, 0.0)
+        if other.first_fill_ns is not None:
+            self.first_fill_ns = min(self.first_fill_ns or other.first_fill_ns, other.first_fill_ns)
+        self.apply(0.0, self.status or other.status)
+
+    async def wait(self, qty: float, timeout: float) -> bool:
+        """Ждет исполнения qty (с FILL_TOLERANCE) или финального статуса; False — вышло время"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.filled < qty * FILL_TOLERANCE and not self.done:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            if self._changed is None:
+                self._changed = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+
+_orders = OrderedDict()
+
+
+def get_order_fill(venue: str, order_id) -> OrderFill:
+    """Состояние ордера (создается при первом обращении)"""
+    key = (venue, str(order_id))
+    state = _orders.get(key)
+    if state is None:
+        state = _orders[key] = OrderFill(venue, str(order_id))
+        if len(_orders) > TRACKED_ORDERS_LIMIT:
+            _orders.popitem(last=False)
+    return state
+
+
+def new_client_order_id() -> str:
+    """
+    Клиентский id ордера: 0x и 128 бит в hex (34 символа) — подходит и как newClientOrderId
+    Binance/orderLinkId Bybit (до 36 символов), и как cloid Hyperliquid.
+    """
+    return "0x" + uuid.uuid4().hex
+
+
+def track_order(venue: str, client_order_id: str = None) -> str:
+    """
+    Заводит состояние по клиентскому id до отправки ордера — ждать исполнения можно сразу,
+    не дожидаясь ответа биржи. Без id генерирует новый; возвращает id.
+    """
+    client_order_id = client_order_id or new_client_order_id()
+    get_order_fill(venue, client_order_id)
+    return client_order_id
+
+
+def bind_order(venue: str, client_order_id: str, order_id) -> OrderFill:
+    """
+    Привязывает биржевой id к состоянию клиентского: дальше оба ключа ведут к одному OrderFill.
+    Исполнение, успевшее прийти под биржевым id, переносится.
+    """
+    state = get_order_fill(venue, client_order_id)
+    key = (venue, str(order_id))
+    early = _orders.get(key)
+    if early is not state:
+        if early is not None:
+            state.merge(early, venue not in INCREMENTAL_FILLS)
+        _orders[key] = state
+    return state
+
+
+def _on_event(venue: str, kind: str, event: dict):
+    if kind != "fill":
+        return
+    order_id = event.get("orderId") or event.get("order_id")
+    client_order_id = event.get("clientOrderId") or event.get("cloid")
+    if client_order_id and (venue, str(client_order_id)) in _orders:
+        state = bind_order(venue, client_order_id, order_id) if order_id else get_order_fill(venue, client_order_id)
+    elif order_id:
+        state = get_order_fill(venue, order_id)
+    else:
+        return
+    filled = float(event.get("fillSz", event.get("fill_sz")) or 0)
+    trade_id = event.get("tradeId")
+    state.apply(filled, event.get("status"), venue not in INCREMENTAL_FILLS, event.get("recvNs"),
+                str(trade_id) if trade_id is not None else None)
+
+
+add_event_listener(_on_event)
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+
+from Execution.FillEvents import FILL_TOLERANCE, get_order_fill, track_order
+
+logger = logging.getLogger(__name__)
+
+
+def price_ladder(price: float, side: str, qty: float, parts: int, tick: float, step_ticks: int = 1) -> list:
+    """
+    Лестница из parts частей по qty: первая — по price, каждая следующая на step_ticks
+    тиков пассивнее (покупка ниже, продажа выше). Возвращает [(price, qty), ...].
+    """
+    direction = -1 if side.lower() in ("long", "buy") else 1
+    step = tick * step_ticks * direction
+    return [(price + step * i, qty) for i in range(parts)]
+
+
+class OrderGroup:
+    """
+    Ордера одной лестницы на одной бирже, отслеживаемые вместе: исполнение считается
+    по событиям FillEvents, отмена остатка и дочитывание исполнения — для всей группы.
+    """
+
+    def __init__(self, client, info, venue: str, symbol: str, side: str):
+        self.client = client
+        self.info = info
+        self.venue = venue.lower()
+        self.symbol = symbol
+        self.side = side
+        # order_id -> [заявленный объем, исполнение из ответа REST/статуса]
+        self.orders = {}
+        self.errors = []
+
+    @property
+    def qty(self) -> float:
+        return sum(qty for qty, _ in self.orders.values())
+
+    def order_filled(self, order_id: str) -> float:
+        return max(self.orders[order_id][1], get_order_fill(self.venue, order_id).filled)
+
+    @property
+    def filled(self) -> float:
+        return sum(self.order_filled(order_id) for order_id in self.orders)
+
+    def add(self, level: tuple, result):
+        """Учитывает ответ биржи на одну часть лестницы"""
+        if isinstance(result, Exception) or not result or result.get("error") or not result.get("orderId"):
+            error = result if isinstance(result, Exception) else (result or {}).get("error", result)
+            self.errors.append(str(error))
+            logger.warning(f"⚠️ {self.venue}: часть {level[1]}@{level[0]} не размещена: {error}")
+            return
+        _, qty = level
+        filled = qty if result.get("status") == "FILLED" else float(result.get("filledQty") or 0)
+        self.orders[str(result["orderId"])] = [qty, filled]
+
+    async def wait(self, timeout: float) -> bool:
+        """Ждет исполнения всех частей; False — вышло время"""
+        waits = [get_order_fill(self.venue, order_id).wait(qty, timeout)
+                 for order_id, (qty, filled) in self.orders.items() if filled < qty * FILL_TOLERANCE]
+        return all(await asyncio.gather(*waits))
+
+    async def cancel_remaining(self) -> float:
+        """Снимает неисполненные части и возвращает итоговое исполнение группы"""
+        pending = [order_id for order_id, (qty, _) in self.orders.items()
+                   if self.order_filled(order_id) < qty * FILL_TOLERANCE]
+        if pending:
+            await asyncio.gather(*(self._cancel(order_id) for order_id in pending))
+        return self.filled
+
+    async def _cancel(self, order_id: str):
+        try:
+            result = await self.client.cancel_order(self.symbol, order_id)
+        except Exception as e:
+            logger.warning(f"⚠️ {self.venue}: отмена {order_id} не прошла: {e}")
+            result = None
+        state = self.orders[order_id]
+        if isinstance(result, dict) and result.get("executedQty") is not None:
+            state[1] = max(state[1], float(result["executedQty"]))
+        if self.info is not None:
+            try:
+                status = await self.info.get_order_status(order_id)
+            except Exception as e:
+                logger.warning(f"⚠️ {self.venue}: статус {order_id} не прочитан: {e}")
+                status = None
+            if status and status.get("fillSz"):
+                state[1] = max(state[1], float(status["fillSz"]))
+
+
+async def place_ladder(client, info, venue: str, symbol: str, side: str, levels: list,
+                       reduce_only: bool = False) -> OrderGroup:
+    """
+    Выставляет лестницу одним запросом (place_limit_orders клиента), а у клиентов без
+    пакетного API — отдельными ордерами параллельно. Клиентские id частей заводятся
+    до отправки. Возвращает OrderGroup.
+    """
+    group = OrderGroup(client, info, venue, symbol, side)
+    client_order_ids = [track_order(group.venue) for _ in levels]
+    if hasattr(client, "place_limit_orders"):
+        try:
+            results = await client.place_limit_orders(symbol, side, levels, reduce_only=reduce_only,
+                                                      client_order_ids=client_order_ids)
+        except Exception as e:
+            results = [e] * len(levels)
+    else:
+        place = client.close_limit_order if reduce_only else client.place_limit_order
+        results = await asyncio.gather(*(place(symbol, side, price, qty, client_order_id=client_order_id)
+                                         for (price, qty), client_order_id in zip(levels, client_order_ids)),
+                                       return_exceptions=True)
+    for level, result in zip(levels, results):
+        group.add(level, result)
+    return group
@@ -0,0 +1,75 @@
+import logging
+
+from Execution.FillEvents import FILL_TOLERANCE, get_order_fill
+
+logger = logging.getLogger(__name__)
+
+# amended — перестановка одним modify, replaced — cancel + новый ордер, placed — ордера еще не было
+_stats = {"amended": 0, "replaced": 0, "placed": 0, "done": 0}
+
+
+def get_requote_stats() -> dict:
+    return dict(_stats)
+
+
+async def requote(client, info, venue: str, symbol: str, order_id, side: str, price: float,
+                  remaining: float, filled: float = 0.0, reduce_only: bool = False) -> dict:
+    """
+    Переставляет неисполненный остаток ордера на price.
+
+    Где клиент умеет modify_order (Binance, Hyperliquid) — один запрос, ордер сохраняет id;
+    иначе или при отказе modify — cancel_order, дочитывание исполнения через info и новый
+    лимит на остаток. order_id=None — ордера еще нет, просто ставится новый.
+    filled — сколько ордер уже исполнил по последнему статусу вызывающего.
+
+    Возвращает {"orderId", "amended", "filled", "remaining"}: filled — исполнение старого
+    ордера на момент перестановки, remaining — объем, выставленный по новой цене;
+    orderId None — остатка не осталось.
+    """
+    place = client.close_limit_order if reduce_only else client.place_limit_order
+    venue = venue.lower()
+    total = filled + remaining
+
+    if order_id is None:
+        order = await place(symbol=symbol, side=side, price=price, qty=remaining)
+        _stats["placed"] += 1
+        return {"orderId": order.get("orderId"), "amended": False, "filled": 0.0, "remaining": remaining}
+
+    filled = max(filled, get_order_fill(venue, order_id).filled)
+    if filled >= total * FILL_TOLERANCE:
+        _stats["done"] += 1
+        return {"orderId": None, "amended": False, "filled": filled, "remaining": 0.0}
+
+    if hasattr(client, "modify_order"):
+        try:
+            result = await client.modify_order(symbol, order_id, side, price, total, filled=filled,
+                                               reduce_only=reduce_only)
+        except Exception as e:
+            logger.warning(f"⚠️ {venue}: modify {order_id} не прошел, переставляем отменой: {e}")
+        else:
+            _stats["amended"] += 1
+            filled = max(filled, float(result.get("filledQty") or 0))
+            done = result.get("status") == "FILLED" or filled >= total * FILL_TOLERANCE
+            return {"orderId": None if done else result.get("orderId"), "amended": True, "filled": filled,
+                    "remaining": 0.0 if done else total - filled}
+
+    try:
+        result = await client.cancel_order(symbol, order_id)
+    except Exception as e:
+        logger.warning(f"⚠️ {venue}: отмена {order_id} не прошла: {e}")
+        result = None
+    if isinstance(result, dict) and result.get("executedQty") is not None:
+        filled = max(filled, float(result["executedQty"]))
+    if info is not None:
+        status = await info.get_order_status(order_id)
+        if status and status.get("fillSz"):
+            filled = max(filled, float(status["fillSz"]))
+    filled = max(filled, get_order_fill(venue, order_id).filled)
+
+    remaining = total - filled
+    if remaining <= total * (1 - FILL_TOLERANCE):
+        _stats["done"] += 1
+        return {"orderId": None, "amended": False, "filled": filled, "remaining": 0.0}
+    order = await place(symbol=symbol, side=side, price=price, qty=remaining)
+    _stats["replaced"] += 1
+    return {"orderId": order.get("orderId"), "amended": False, "filled": filled, "remaining": remaining}
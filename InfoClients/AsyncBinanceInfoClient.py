@@ -1,6 +1,3 @@
-import json
-
-
 class AsyncBinanceInfoClient:
     def __init__(self, db):
         """
@@ -10,15 +7,38 @@ class AsyncBinanceInfoClient:
         """
         self._db = db
 
-    async def get_orderbook(self, symbol: str) -> dict:
+    async def get_orderbook(self, symbol: str, max_age_ms: int = None) -> dict:
         full_symbol = symbol if symbol.endswith("USDT") else symbol + "USDT"
         full_symbol = full_symbol.upper()
 
-        orderbook = await self._db.get_orderbook(full_symbol)
+        # Устаревшая книга (старше max_age_ms) отдается как пустая
+        orderbook = await self._db.get_orderbook(full_symbol, max_age_ms=max_age_ms)
         if orderbook:
             return orderbook
         return {"bids": [], "asks": []}
 
+    async def get_bbo(self, symbol: str, max_age_ms: int = None) -> dict:
+        """
+        Лучший bid/ask из bookTicker — самый быстрый путь к вершине книги.
+
+        :return: Словарь bid, bid_qty, ask, ask_qty, exchange_ts, local_ts, age_ms или None.
+        """
+        full_symbol = symbol if symbol.endswith("USDT") else symbol + "USDT"
+        return await self._db.get_bbo(full_symbol.upper(), max_age_ms=max_age_ms)
+
+    async def get_funding(self, symbol: str) -> dict:
+        """
+        Mark price и ставка funding из кеша markPrice@1s (без сетевых запросов к бирже).
+
+        :return: Словарь mark, rate, interval_hours, index, next_funding_ts или None.
+        """
+        full_symbol = symbol if symbol.endswith("USDT") else symbol + "USDT"
+        return await self._db.get_funding(full_symbol.upper())
+
+    async def get_mark(self, symbol: str) -> float:
+        full_symbol = symbol if symbol.endswith("USDT") else symbol + "USDT"
+        return await self._db.get_mark(full_symbol.upper())
+
     async def get_order_status(self, order_id: str) -> dict:
         """
         Получает детали заполнения ордера по его ID.
@@ -30,25 +50,24 @@ class AsyncBinanceInfoClient:
         order_data = await self._db. get_order(str(order_id))
         return order_data
 
-    async def get_all_orders(self) -> dict:
+    async def get_position(self, symbol: str) -> dict:
+        """
+        Последняя позиция по символу из ACCOUNT_UPDATE user stream.
+
+        :param symbol: Монета (ETH) или полный символ (ETHUSDT).
+        :return: Словарь с size, side, avg_price, unrealized_pnl или None, если обновлений не было.
+        """
+        full_symbol = symbol if symbol.endswith("USDT") else symbol + "USDT"
+        return await self._db.get_position(full_symbol.upper())
+
+    async def get_all_orders(self, active_only: bool = False) -> dict:
         """
-        Получает все активные ордера из базы данных.
+        Получает ордера из базы данных через индекс ордеров биржи.
 
+        :param active_only: Вернуть только активные (неисполненные и неотмененные) ордера.
         :return: Словарь с order_id в качестве ключей и данными ордеров в качестве значений.
         """
-        # Получаем все ключи ордеров для данной биржи
-        pattern = f"{self._db.exchange}Orders:*"
-        keys = await self._db.db.keys(pattern)
-
-        orders = {}
-        for key in keys:
-            order_data = await self._db.db.get(key)
-            if order_data:
-                order_info = json.loads(order_data)
-                order_id = order_info.get("orderId")
-                orders[order_id] = order_info
-
-        return orders
+        return await self._db.get_all_orders(active_only=active_only)
 
     async def delete_order(self, order_id: str) -> bool:
         """
@@ -1,6 +1,3 @@
-import json
-
-
 class AsyncExtendedInfoClient:
     def __init__(self, db):
         """
@@ -10,15 +7,16 @@ class AsyncExtendedInfoClient:
         """
         self._db = db
 
-    async def get_orderbook(self, symbol: str) -> dict:
+    async def get_orderbook(self, symbol: str, max_age_ms: int = None) -> dict:
         """
         Получает ордербук для символа из базы данных.
 
         :param symbol: Торговый символ (например, 'BTCUSDT')
-        :return: Словарь с ордербуком или пустой, если не найден
+        :param max_age_ms: Максимальный возраст книги; более старая считается отсутствующей.
+        :return: Словарь с ордербуком или пустой, если не найден или устарел
         """
         symbol = symbol.upper()
-        orderbook = await self._db.get_orderbook(symbol)
+        orderbook = await self._db.get_orderbook(symbol, max_age_ms=max_age_ms)
         if orderbook:
             return orderbook
         return {"bids": [], "asks": []}
@@ -33,24 +31,14 @@ class AsyncExtendedInfoClient:
         order_data = await self._db.get_order(str(order_id))
         return order_data
 
-    async def get_all_orders(self) -> dict:
+    async def get_all_orders(self, active_only: bool = False) -> dict:
         """
-        Получает все активные ордера из базы данных.
+        Получает ордера из базы данных через индекс ордеров биржи.
 
+        :param active_only: Вернуть только активные (неисполненные и неотмененные) ордера.
         :return: Словарь с order_id в качестве ключей и данными ордеров в качестве значений.
         """
-        pattern = f"{self._db.exchange}Orders:*"
-        keys = await self._db.db.keys(pattern)
-
-        orders = {}
-        for key in keys:
-            order_data = await self._db.db.get(key)
-            if order_data:
-                order_info = json.loads(order_data)
-                order_id = order_info.get("orderId")
-                orders[order_id] = order_info
-
-        return orders
+        return await self._db.get_all_orders(active_only=active_only)
 
     async def delete_order(self, order_id: str) -> bool:
         """
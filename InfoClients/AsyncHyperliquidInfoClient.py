@@ -1,41 +1,33 @@
-import asyncio
-import json
-
 class AsyncHyperliquidInfoClient:
     def __init__(self, db):
         self._db = db
 
-    async def get_orderbook(self, symbol: str) -> dict:
+    async def get_orderbook(self, symbol: str, max_age_ms: int = None) -> dict:
         normalized_symbol = symbol.upper()
-        orderbook = await self._db.get_orderbook(normalized_symbol)
+        # Устаревшая книга (старше max_age_ms) отдается как пустая
+        orderbook = await self._db.get_orderbook(normalized_symbol, max_age_ms=max_age_ms)
         if orderbook:
             return orderbook
         return {"bids": [], "asks": []}
 
-    async def get_order_status(self, order_id: str) -> dict:
-        key = f"hyperliquidOrders:{order_id}"
-        order_json = await self._db.get(key)
-        if order_json:
-            return json.loads(order_json)
-        return None
+    async def get_bbo(self, symbol: str, max_age_ms: int = None) -> dict:
+        return await self._db.get_bbo(symbol.upper(), max_age_ms=max_age_ms)
 
-    async def get_all_orders(self) -> dict:
-        pattern = "hyperliquidOrders:*"
-        keys = await self._db.db.keys(pattern)
+    async def get_funding(self, symbol: str) -> dict:
+        return await self._db.get_funding(symbol.upper())
 
-        orders = {}
-        for key in keys:
-            order_data = await self._db.db.get(key)
-            if order_data:
-                order_info = json.loads(order_data)
-                order_id = order_info.get("orderId") or key.split(":")[-1]
-                orders[order_id] = order_info
+    async def get_mark(self, symbol: str) -> float:
+        return await self._db.get_mark(symbol.upper())
+
+    async def get_order_status(self, order_id: str) -> dict:
+        return await self._db.get_order(str(order_id))
 
-        return orders
+    async def get_all_orders(self, active_only: bool = False) -> dict:
+        return await self._db.get_all_orders(active_only=active_only)
 
     async def delete_order(self, order_id: str) -> bool:
         try:
-            await self._db.delete_order(f"hyperliquidOrders:{order_id}")
+            await self._db.delete_order(str(order_id))
             return True
         except Exception as e:
             print(f"Ошибка при удалении ордера {order_id}: {e}")
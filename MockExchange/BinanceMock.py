@@ -0,0 +1,453 @@
+import asyncio
+import secrets
+
+from aiohttp import web
+
+from MockExchange.MatchingEngine import OrderRejected, decimals_of
+from MockExchange.MockServer import MockServer, now_ms
+
+FUNDING_INTERVAL_MS = 8 * 60 * 60 * 1000
+DEPTH_INTERVAL_SECONDS = 0.1
+MARK_PRICE_INTERVAL_SECONDS = 1.0
+
+# Коды ошибок Binance, которыми отвечает заглушка
+_REJECT_CODES = {
+    "unknown_symbol": (-1121, "Invalid symbol."),
+    "invalid_side": (-1117, "Invalid side."),
+    "invalid_tif": (-1115, "Invalid timeInForce."),
+    "invalid_qty": (-4003, "Quantity less than or equal to zero."),
+    "invalid_price": (-4014, "Price not increased by tick size."),
+    "reduce_only": (-2022, "ReduceOnly Order is rejected."),
+    "post_only": (-5022, "Due to the order could not be executed as maker, the Post Only order will be rejected."),
+    "margin": (-2019, "Margin is insufficient."),
+    "unknown_order": (-2013, "Order does not exist."),
+}
+
+
+def _error(code: int, msg: str, status: int = 400) -> web.Response:
+    return web.json_response({"code": code, "msg": msg}, status=status)
+
+
+class BinanceMockServer(MockServer):
+    """
+    Заглушка USDT-M фьючерсов Binance: тот REST/WS набор, которым пользуется AsyncBinanceWSClient.
+
+    REST: listenKey, depth, exchangeInfo, time, order (POST/GET/DELETE), leverage, premiumIndex,
+    v2/positionRisk. WS: /ws/<symbol>@depth10@100ms, @bookTicker, @markPrice@1s и
+    /ws/<listenKey> с ORDER_TRADE_UPDATE и ACCOUNT_UPDATE. Подпись проверяется только
+    на наличие; один аккаунт на сервер.
+    """
+
+    venue = "binance"
+
+    def __init__(self, engine, faults=None, wallet_balance: float = 100_000.0):
+        self.wallet_balance = wallet_balance
+        self.listen_keys = set()
+        self._user_queues = {}
+        super().__init__(engine, faults)
+
+    def setup_routes(self, router):
+        router.add_route("*", "/fapi/v1/listenKey", self.listen_key)
+        router.add_get("/fapi/v1/depth", self.depth)
+        router.add_get("/fapi/v1/exchangeInfo", self.exchange_info)
+        router.add_get("/fapi/v1/time", self.server_time)
+        router.add_post("/fapi/v1/order", self.new_order)
+        router.add_get("/fapi/v1/order", self.query_order)
+        router.add_put("/fapi/v1/order", self.modify_order)
+        router.add_delete("/fapi/v1/order", self.cancel_order)
+        router.add_post("/fapi/v1/leverage", self.leverage)
+        router.add_get("/fapi/v1/premiumIndex", self.premium_index)
+        router.add_get("/fapi/v2/positionRisk", self.position_risk)
+        router.add_get("/ws/{stream}", self.websocket)
+
+    def error_response(self, kind: str) -> web.Response:
+        if kind == "timeout":
+            return _error(-1007, "Timeout waiting for response from backend server. Send status unknown; execution status unknown.", 503)
+        return _error(-1001, "Internal error; unable to process your request. Please try again.", 503)
+
+    # ============= ФОРМАТ =============
+
+    def _book(self, symbol: str):
+        return self.engine.books.get(symbol)
+
+    def _fmt_price(self, symbol: str, value) -> str:
+        return f"{value or 0:.{decimals_of(self._book(symbol).tick_size)}f}"
+
+    def _fmt_qty(self, symbol: str, value) -> str:
+        return f"{value or 0:.{decimals_of(self._book(symbol).step_size)}f}"
+
+    def _order_payload(self, order) -> dict:
+        s = order.symbol
+        return {
+            "orderId": order.order_id,
+            "symbol": s,
+            "status": order.status,
+            "clientOrderId": order.client_order_id or f"mock{order.order_id}",
+            "price": self._fmt_price(s, order.price),
+            "avgPrice": self._fmt_price(s, order.avg_price),
+            "origQty": self._fmt_qty(s, order.qty),
+            "executedQty": self._fmt_qty(s, order.filled),
+            "cumQuote": f"{order.notional:.8f}",
+            "timeInForce": "GTX" if order.tif == "ALO" else order.tif,
+            "type": "MARKET" if order.is_market else "LIMIT",
+            "reduceOnly": order.reduce_only,
+            "side": order.side,
+            "positionSide": "BOTH",
+            "time": order.created_ms,
+            "updateTime": order.updated_ms,
+        }
+
+    @staticmethod
+    async def _params(request) -> dict:
+        params = dict(request.query)
+        if request.can_read_body:
+            params.update(await request.post())
+        return params
+
+    @staticmethod
+    def _check_signed(request, params):
+        if not request.headers.get("X-MBX-APIKEY"):
+            return _error(-2014, "API-key format invalid.", 401)
+        if "signature" not in params:
+            return _error(-1102, "Mandatory parameter 'signature' was not sent, was empty/null, or malformed.")
+        return None
+
+    # ============= REST =============
+
+    async def listen_key(self, request):
+        if not request.headers.get("X-MBX-APIKEY"):
+            return _error(-2014, "API-key format invalid.", 401)
+        if request.method == "POST":
+            key = secrets.token_hex(32)
+            self.listen_keys.add(key)
+            return web.json_response({"listenKey": key})
+        if request.method == "PUT":
+            if not self.listen_keys:
+                return _error(-1125, "This listenKey does not exist.")
+            return web.json_response({})
+        if request.method == "DELETE":
+            self.listen_keys.clear()
+            return web.json_response({})
+        raise web.HTTPMethodNotAllowed(request.method, ["POST", "PUT", "DELETE"])
+
+    async def depth(self, request):
+        symbol = request.query.get("symbol", "").upper()
+        if symbol not in self.engine.books:
+            return _error(-1121, "Invalid symbol.")
+        limit = int(request.query.get("limit", 500))
+        bids, asks = self.engine.depth(symbol, limit)
+        book = self._book(symbol)
+        return web.json_response({
+            "lastUpdateId": book.version,
+            "E": now_ms(),
+            "T": book.ts_ms,
+            "bids": [[self._fmt_price(symbol, p), self._fmt_qty(symbol, q)] for p, q in bids],
+            "asks": [[self._fmt_price(symbol, p), self._fmt_qty(symbol, q)] for p, q in asks],
+        })
+
+    async def server_time(self, request):
+        return web.json_response({"serverTime": now_ms()})
+
+    async def exchange_info(self, request):
+        symbols = []
+        for symbol, book in self.engine.books.items():
+            symbols.append({
+                "symbol": symbol,
+                "status": "TRADING",
+                "contractType": "PERPETUAL",
+                "pricePrecision": decimals_of(book.tick_size),
+                "quantityPrecision": decimals_of(book.step_size),
+                "filters": [
+                    {"filterType": "PRICE_FILTER", "tickSize": format(book.tick_size, "f")},
+                    {"filterType": "LOT_SIZE", "stepSize": format(book.step_size, "f")},
+                ],
+            })
+        return web.json_response({"timezone": "UTC", "serverTime": now_ms(), "symbols": symbols})
+
+    async def new_order(self, request):
+        params = await self._params(request)
+        denied = self._check_signed(request, params)
+        if denied:
+            return denied
+        if self.faults.reject_order():
+            return _error(*_REJECT_CODES["margin"])
+
+        order_type = params.get("type", "").upper()
+        tif = params.get("timeInForce", "GTC").upper()
+        try:
+            order = self.engine.submit(
+                params.get("symbol", "").upper(),
+                params.get("side", ""),
+                float(params.get("quantity", 0)),
+                price=float(params["price"]) if order_type == "LIMIT" else None,
+                tif="ALO" if tif == "GTX" else tif,
+                reduce_only=str(params.get("reduceOnly", "false")).lower() == "true",
+                client_order_id=params.get("newClientOrderId"),
+            )
+        except OrderRejected as e:
+            return _error(*_REJECT_CODES.get(e.reason, (-1102, str(e))))
+        except (KeyError, ValueError) as e:
+            return _error(-1102, f"Mandatory parameter was not sent or malformed: {e}")
+        return web.json_response(self._order_payload(order))
+
+    def _lookup(self, params):
+        if params.get("orderId"):
+            return self.engine.get_order(params["orderId"])
+        if params.get("origClientOrderId"):
+            return self.engine.find_by_client_id(params["origClientOrderId"])
+        return None
+
+    async def query_order(self, request):
+        params = await self._params(request)
+        denied = self._check_signed(request, params)
+        if denied:
+            return denied
+        order = self._lookup(params)
+        if order is None:
+            return _error(-2013, "Order does not exist.")
+        return web.json_response(self._order_payload(order))
+
+    async def modify_order(self, request):
+        params = await self._params(request)
+        denied = self._check_signed(request, params)
+        if denied:
+            return denied
+        order = self._lookup(params)
+        if order is None:
+            return _error(*_REJECT_CODES["unknown_order"])
+        if params.get("side", order.side).upper() != order.side:
+            return _error(-1117, "Invalid side.")
+        try:
+            order = self.engine.amend(order.order_id, float(params["price"]), float(params["quantity"]))
+        except OrderRejected as e:
+            return _error(*_REJECT_CODES.get(e.reason, (-1102, str(e))))
+        except (KeyError, ValueError) as e:
+            return _error(-1102, f"Mandatory parameter was not sent or malformed: {e}")
+        return web.json_response(self._order_payload(order))
+
+    async def cancel_order(self, request):
+        params = await self._params(request)
+        denied = self._check_signed(request, params)
+        if denied:
+            return denied
+        order = self._lookup(params)
+        if order is None or not order.is_open:
+            return _error(-2011, "Unknown order sent.")
+        self.engine.cancel(order.order_id)
+        return web.json_response(self._order_payload(order))
+
+    async def leverage(self, request):
+        params = await self._params(request)
+        denied = self._check_signed(request, params)
+        if denied:
+            return denied
+        symbol = params.get("symbol", "").upper()
+        position = self.engine.position(symbol)
+        position.leverage = int(params.get("leverage", position.leverage))
+        return web.json_response({"leverage": position.leverage, "maxNotionalValue": "1000000", "symbol": symbol})
+
+    async def premium_index(self, request):
+        symbol = request.query.get("symbol", "").upper()
+        if symbol not in self.engine.books:
+            return _error(-1121, "Invalid symbol.")
+        return web.json_response(self._premium(symbol))
+
+    def _premium(self, symbol: str) -> dict:
+        now = now_ms()
+        mark = self.engine.mark_price(symbol)
+        return {
+            "symbol": symbol,
+            "markPrice": self._fmt_price(symbol, mark),
+            "indexPrice": self._fmt_price(symbol, mark),
+            "lastFundingRate": f"{self.engine.funding_rate:.8f}",
+            "nextFundingTime": (now // FUNDING_INTERVAL_MS + 1) * FUNDING_INTERVAL_MS,
+            "time": now,
+        }
+
+    async def position_risk(self, request):
+        params = await self._params(request)
+        denied = self._check_signed(request, params)
+        if denied:
+            return denied
+        wanted = params.get("symbol", "").upper()
+        result = []
+        for symbol in self.engine.books:
+            if wanted and symbol != wanted:
+                continue
+            position = self.engine.position(symbol)
+            mark = self.engine.mark_price(symbol)
+            result.append({
+                "symbol": symbol,
+                "positionAmt": self._fmt_qty(symbol, position.qty),
+                "entryPrice": self._fmt_price(symbol, position.entry_price),
+                "markPrice": self._fmt_price(symbol, mark),
+                "unRealizedProfit": f"{position.unrealized(mark):.8f}",
+                "leverage": str(position.leverage),
+                "marginType": "cross",
+                "positionSide": "BOTH",
+                "updateTime": now_ms(),
+            })
+        return web.json_response(result)
+
+    # ============= WS =============
+
+    async def websocket(self, request):
+        stream = request.match_info["stream"]
+        ws = await self.open_ws(request)
+
+        if stream in self.listen_keys:
+            queue = self._user_queues[ws] = asyncio.Queue()
+            try:
+                return await self.serve_ws(ws, writers=[self._user_writer(ws, queue)])
+            finally:
+                self._user_queues.pop(ws, None)
+
+        symbol, _, kind = stream.partition("@")
+        symbol = symbol.upper()
+        if kind.startswith("depth"):
+            writer = self._book_writer(ws, symbol, self._depth_payload, DEPTH_INTERVAL_SECONDS)
+        elif kind == "bookTicker":
+            writer = self._book_writer(ws, symbol, self._book_ticker_payload, 0)
+        elif kind.startswith("markPrice"):
+            writer = self._mark_price_writer(ws, symbol)
+        else:
+            await ws.close(code=1008, message=b"unknown stream")
+            self.connections.discard(ws)
+            return ws
+        return await self.serve_ws(ws, writers=[writer])
+
+    async def _book_writer(self, ws, symbol, payload, interval: float):
+        queue = self.watch_book(symbol)
+        try:
+            while True:
+                await queue.get()
+                await self.send(ws, payload(symbol))
+                if interval:
+                    await asyncio.sleep(interval)
+        finally:
+            self.unwatch_book(symbol, queue)
+
+    def _depth_payload(self, symbol: str) -> dict:
+        book = self._book(symbol)
+        bids, asks = self.engine.depth(symbol, 10)
+        return {
+            "e": "depthUpdate",
+            "E": now_ms(),
+            "T": book.ts_ms,
+            "s": symbol,
+            "U": book.version,
+            "u": book.version,
+            "pu": book.version - 1,
+            "b": [[self._fmt_price(symbol, p), self._fmt_qty(symbol, q)] for p, q in bids],
+            "a": [[self._fmt_price(symbol, p), self._fmt_qty(symbol, q)] for p, q in asks],
+        }
+
+    def _book_ticker_payload(self, symbol: str) -> dict:
+        book = self._book(symbol)
+        bids, asks = self.engine.depth(symbol, 1)
+        bid, bid_qty = bids[0] if bids else (0.0, 0.0)
+        ask, ask_qty = asks[0] if asks else (0.0, 0.0)
+        return {
+            "e": "bookTicker",
+            "u": book.version,
+            "E": now_ms(),
+            "T": book.ts_ms,
+            "s": symbol,
+            "b": self._fmt_price(symbol, bid),
+            "B": self._fmt_qty(symbol, bid_qty),
+            "a": self._fmt_price(symbol, ask),
+            "A": self._fmt_qty(symbol, ask_qty),
+        }
+
+    async def _mark_price_writer(self, ws, symbol: str):
+        while True:
+            if symbol in self.engine.books:
+                premium = self._premium(symbol)
+                await self.send(ws, {
+                    "e": "markPriceUpdate",
+                    "E": premium["time"],
+                    "s": symbol,
+                    "p": premium["markPrice"],
+                    "i": premium["indexPrice"],
+                    "P": premium["markPrice"],
+                    "r": premium["lastFundingRate"],
+                    "T": premium["nextFundingTime"],
+                })
+            await asyncio.sleep(MARK_PRICE_INTERVAL_SECONDS)
+
+    async def _user_writer(self, ws, queue: asyncio.Queue):
+        while True:
+            payload = await queue.get()
+            await self.send(ws, payload)
+
+    # ============= USER STREAM =============
+
+    def on_order_event(self, event: str, order, fill: dict):
+        if fill:
+            self.wallet_balance += fill["realized_pnl"] - fill["fee"]
+        if not self._user_queues:
+            return
+
+        execution = {"new": "NEW", "amend": "AMENDMENT", "fill": "TRADE", "cancel": "CANCELED",
+                     "expire": "EXPIRED"}[event]
+        now = now_ms()
+        s = order.symbol
+        update = {
+            "e": "ORDER_TRADE_UPDATE",
+            "E": now,
+            "T": now,
+            "o": {
+                "s": s,
+                "c": order.client_order_id or f"mock{order.order_id}",
+                "S": order.side,
+                "o": "MARKET" if order.is_market else "LIMIT",
+                "f": "GTX" if order.tif == "ALO" else order.tif,
+                "q": self._fmt_qty(s, order.qty),
+                "p": self._fmt_price(s, order.price),
+                "ap": self._fmt_price(s, order.avg_price),
+                "sp": "0",
+                "x": execution,
+                "X": order.status,
+                "i": order.order_id,
+                "l": self._fmt_qty(s, fill["qty"] if fill else 0),
+                "z": self._fmt_qty(s, order.filled),
+                "L": self._fmt_price(s, fill["price"] if fill else 0),
+                "n": f"{fill['fee']:.8f}" if fill else "0",
+                "N": "USDT",
+                "T": order.updated_ms,
+                "t": fill["trade_id"] if fill else 0,
+                "m": fill["maker"] if fill else False,
+                "R": order.reduce_only,
+                "ps": "BOTH",
+                "rp": f"{fill['realized_pnl']:.8f}" if fill else "0",
+            },
+        }
+        payloads = [update]
+
+        if fill:
+            position = self.engine.position(s)
+            mark = self.engine.mark_price(s)
+            payloads.append({
+                "e": "ACCOUNT_UPDATE",
+                "E": now,
+                "T": now,
+                "a": {
+                    "m": "ORDER",
+                    "B": [{"a": "USDT", "wb": f"{self.wallet_balance:.8f}",
+                           "cw": f"{self.wallet_balance:.8f}", "bc": "0"}],
+                    "P": [{
+                        "s": s,
+                        "pa": self._fmt_qty(s, position.qty),
+                        "ep": self._fmt_price(s, position.entry_price),
+                        "cr": f"{position.realized_pnl:.8f}",
+                        "up": f"{position.unrealized(mark):.8f}",
+                        "mt": "cross",
+                        "iw": "0",
+                        "ps": "BOTH",
+                    }],
+                },
+            })
+
+        for queue in self._user_queues.values():
+            for payload in payloads:
+                queue.put_nowait(payload)
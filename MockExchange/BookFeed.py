@@ -0,0 +1,88 @@
+import asyncio
+import json
+import random
+import time
+
+from MockExchange.MatchingEngine import decimals_of
+from Replay.FrameCapture import read_frames
+
+
+def recorded_books(path: str):
+    """
+    Снимки книг из файла FrameRecorder: генератор (recv_ns, venue, symbol, bids, asks, ts_ms).
+    Берутся кадры binance:depth:<SYMBOL> и l2Book из потока hyperliquid.
+    """
+    for recv_ns, key, frame in read_frames(path):
+        if key.startswith("binance:depth:"):
+            data = json.loads(frame)
+            bids = [[float(p), float(q)] for p, q in data.get("b", [])]
+            asks = [[float(p), float(q)] for p, q in data.get("a", [])]
+            if bids and asks:
+                yield recv_ns, "binance", key.split(":", 2)[2], bids, asks, data.get("E")
+        elif key == "hyperliquid":
+            data = json.loads(frame)
+            if data.get("channel") != "l2Book":
+                continue
+            book = data.get("data", {})
+            levels = book.get("levels", [[], []])
+            bids = [[float(l["px"]), float(l["sz"])] for l in levels[0]]
+            asks = [[float(l["px"]), float(l["sz"])] for l in levels[1]]
+            if bids and asks:
+                yield recv_ns, "hyperliquid", book.get("coin"), bids, asks, book.get("time")
+
+
+async def play_recorded(path: str, engines: dict, speed: float = 1.0, loop: bool = False,
+                        symbol_map: dict = None):
+    """
+    Подает записанные книги в движки {venue: MatchingEngine} с исходными интервалами
+    (speed — как в ReplayDriver, 0 — без пауз). symbol_map переименовывает символы,
+    например {"BTCUSDT": "BTC"}. loop=True — проигрывать файл по кругу.
+    """
+    symbol_map = symbol_map or {}
+    while True:
+        first_ns = None
+        start = time.monotonic_ns()
+        played = 0
+        for recv_ns, venue, symbol, bids, asks, ts_ms in recorded_books(path):
+            engine = engines.get(venue)
+            if engine is None:
+                continue
+            if speed > 0:
+                if first_ns is None:
+                    first_ns = recv_ns
+                delay_ns = (recv_ns - first_ns) / speed - (time.monotonic_ns() - start)
+                if delay_ns > 0:
+                    await asyncio.sleep(delay_ns / 1e9)
+            else:
+                # Даем серверам разослать кадры между снимками
+                await asyncio.sleep(0)
+            # Время биржи в записи старое — ставим текущее, иначе книги сочтутся устаревшими
+            engine.set_book(symbol_map.get(symbol, symbol), bids, asks)
+            played += 1
+
+        print(f"📼 Проиграно {played} снимков книг из {path}")
+        if not loop or not played:
+            return
+
+
+async def synthetic_books(engine, symbol: str, mid: float, spread_bps: float = 2.0, levels: int = 10,
+                          level_qty: float = 1.0, volatility_bps: float = 1.0, interval: float = 0.1,
+                          seed: int = None):
+    """
+    Книга без записи: случайное блуждание mid с шагом volatility_bps каждые interval секунд.
+    Нужна, когда под рукой нет файла захвата.
+    """
+    rng = random.Random(seed)
+    book = engine.add_symbol(symbol)
+    tick = book.tick_size
+    digits = decimals_of(tick)
+    while True:
+        half_spread = max(mid * spread_bps / 20_000, tick)
+        best_bid = round((mid - half_spread) / tick) * tick
+        best_ask = max(round((mid + half_spread) / tick) * tick, best_bid + tick)
+        bids = [[round(best_bid - i * tick, digits), level_qty * (1 + i * 0.5)] for i in range(levels)]
+        asks = [[round(best_ask + i * tick, digits), level_qty * (1 + i * 0.5)] for i in range(levels)]
+        engine.set_book(symbol, bids, asks)
+
+        await asyncio.sleep(interval)
+        mid *= 1 + rng.gauss(0, volatility_bps / 10_000)
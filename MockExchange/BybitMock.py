@@ -0,0 +1,271 @@
+import asyncio
+import json
+import secrets
+import time
+
+from aiohttp import web
+
+from MockExchange.MatchingEngine import OrderRejected, decimals_of
+from MockExchange.MockServer import MockServer, now_ms
+
+ORDERBOOK_INTERVAL_SECONDS = 0.1
+
+# Коды ошибок Bybit v5, которыми отвечает заглушка
+_REJECT_CODES = {
+    "unknown_symbol": (10001, "params error: symbol invalid"),
+    "invalid_side": (10001, "params error: side invalid"),
+    "invalid_tif": (10001, "params error: timeInForce invalid"),
+    "invalid_qty": (10001, "params error: qty invalid"),
+    "invalid_price": (10001, "params error: price invalid"),
+    "reduce_only": (110017, "current position is zero, cannot fix reduce-only order qty"),
+    "post_only": (110008, "The order will be filled immediately as taker, PostOnly order is rejected"),
+    "margin": (110007, "ab not enough for new order"),
+}
+
+_TIF = {"GTC": "GTC", "IOC": "IOC", "FOK": "FOK", "POSTONLY": "ALO"}
+_STATUS = {"NEW": "New", "PARTIALLY_FILLED": "PartiallyFilled", "FILLED": "Filled",
+           "CANCELED": "Cancelled", "EXPIRED": "Cancelled"}
+
+
+def _reply(ret_code: int = 0, ret_msg: str = "OK", result: dict = None) -> web.Response:
+    # Bybit отвечает HTTP 200 и на ошибки — код ошибки в retCode
+    return web.json_response({"retCode": ret_code, "retMsg": ret_msg, "result": result or {},
+                              "retExtInfo": {}, "time": now_ms()})
+
+
+class BybitMockServer(MockServer):
+    """
+    Заглушка линейных фьючерсов Bybit v5: тот REST/WS набор, которым пользуется AsyncBybitWSClient.
+
+    REST: order/create, order/cancel, position/set-leverage, market/instruments-info, market/time.
+    WS: /v5/public/linear (orderbook.50.<SYMBOL>, всегда снимками) и /v5/private
+    (auth, execution.* с исполнениями ордеров). Подпись проверяется только на наличие.
+    """
+
+    venue = "bybit"
+
+    def __init__(self, engine, faults=None):
+        self._private = {}
+        super().__init__(engine, faults)
+
+    def setup_routes(self, router):
+        router.add_post("/v5/order/create", self.create_order)
+        router.add_post("/v5/order/cancel", self.cancel_order)
+        router.add_post("/v5/position/set-leverage", self.set_leverage)
+        router.add_get("/v5/market/instruments-info", self.instruments_info)
+        router.add_get("/v5/market/time", self.server_time)
+        router.add_get("/v5/public/linear", self.public_ws)
+        router.add_get("/v5/private", self.private_ws)
+
+    def error_response(self, kind: str) -> web.Response:
+        if kind == "timeout":
+            return _reply(10000, "Server Timeout")
+        return _reply(10016, "Server error.")
+
+    # ============= ФОРМАТ =============
+
+    def _fmt_price(self, symbol: str, value) -> str:
+        return f"{value or 0:.{decimals_of(self.engine.books[symbol].tick_size)}f}"
+
+    def _fmt_qty(self, symbol: str, value) -> str:
+        return f"{value or 0:.{decimals_of(self.engine.books[symbol].step_size)}f}"
+
+    @staticmethod
+    def _check_signed(request):
+        if not request.headers.get("X-BAPI-API-KEY") or not request.headers.get("X-BAPI-SIGN"):
+            return _reply(10003, "API key is invalid.")
+        return None
+
+    @staticmethod
+    async def _body(request) -> dict:
+        try:
+            return await request.json() if request.can_read_body else {}
+        except json.JSONDecodeError:
+            return {}
+
+    # ============= REST =============
+
+    async def create_order(self, request):
+        denied = self._check_signed(request)
+        if denied:
+            return denied
+        body = await self._body(request)
+        if self.faults.reject_order():
+            return _reply(*_REJECT_CODES["margin"])
+
+        order_type = str(body.get("orderType", "")).capitalize()
+        try:
+            order = self.engine.submit(
+                str(body.get("symbol", "")).upper(),
+                {"Buy": "BUY", "Sell": "SELL"}.get(body.get("side"), str(body.get("side"))),
+                float(body.get("qty", 0)),
+                price=float(body["price"]) if order_type == "Limit" else None,
+                tif=_TIF.get(str(body.get("timeInForce", "GTC")).upper(), "GTC"),
+                reduce_only=bool(body.get("reduceOnly", False)),
+                client_order_id=body.get("orderLinkId"),
+            )
+        except OrderRejected as e:
+            return _reply(*_REJECT_CODES.get(e.reason, (10001, str(e))))
+        except (KeyError, ValueError) as e:
+            return _reply(10001, f"params error: {e}")
+        return _reply(result={"orderId": str(order.order_id), "orderLinkId": order.client_order_id or ""})
+
+    async def cancel_order(self, request):
+        denied = self._check_signed(request)
+        if denied:
+            return denied
+        body = await self._body(request)
+        try:
+            order = self.engine.get_order(body.get("orderId", 0))
+        except ValueError:
+            order = None
+        if order is None or not order.is_open:
+            return _reply(110001, "Order does not exist.")
+        self.engine.cancel(order.order_id)
+        return _reply(result={"orderId": str(order.order_id), "orderLinkId": order.client_order_id or ""})
+
+    async def set_leverage(self, request):
+        denied = self._check_signed(request)
+        if denied:
+            return denied
+        body = await self._body(request)
+        symbol = str(body.get("symbol", "")).upper()
+        if symbol not in self.engine.books:
+            return _reply(*_REJECT_CODES["unknown_symbol"])
+        position = self.engine.position(symbol)
+        leverage = int(float(body.get("buyLeverage", position.leverage)))
+        if leverage == position.leverage:
+            return _reply(110043, "Set leverage not modified")
+        position.leverage = leverage
+        return _reply()
+
+    async def server_time(self, request):
+        now = time.time_ns()
+        return _reply(result={"timeSecond": str(now // 1_000_000_000), "timeNano": str(now)})
+
+    async def instruments_info(self, request):
+        wanted = request.query.get("symbol", "").upper()
+        instruments = []
+        for symbol, book in self.engine.books.items():
+            if wanted and symbol != wanted:
+                continue
+            instruments.append({
+                "symbol": symbol,
+                "contractType": "LinearPerpetual",
+                "status": "Trading",
+                "priceFilter": {"tickSize": format(book.tick_size, "f")},
+                "lotSizeFilter": {"qtyStep": format(book.step_size, "f"),
+                                  "minOrderQty": format(book.step_size, "f")},
+            })
+        return _reply(result={"category": "linear", "list": instruments})
+
+    # ============= WS =============
+
+    async def public_ws(self, request):
+        ws = await self.open_ws(request)
+        writers = {}
+
+        async def on_text(text):
+            msg = json.loads(text)
+            if msg.get("op") == "ping":
+                await self.send(ws, {"success": True, "ret_msg": "pong", "op": "ping"})
+                return
+            if msg.get("op") != "subscribe":
+                return
+            for topic in msg.get("args", []):
+                symbol = topic.rsplit(".", 1)[-1].upper()
+                if topic.startswith("orderbook.") and topic not in writers:
+                    writers[topic] = asyncio.create_task(self._orderbook_writer(ws, topic, symbol))
+            await self.send(ws, {"success": True, "ret_msg": "", "conn_id": secrets.token_hex(8),
+                                 "op": "subscribe"})
+
+        try:
+            return await self.serve_ws(ws, on_text=on_text)
+        finally:
+            for task in writers.values():
+                task.cancel()
+
+    async def _orderbook_writer(self, ws, topic: str, symbol: str):
+        queue = self.watch_book(symbol)
+        try:
+            while True:
+                await queue.get()
+                book = self.engine.books[symbol]
+                bids, asks = self.engine.depth(symbol, 50)
+                await self.send(ws, {
+                    "topic": topic,
+                    "type": "snapshot",
+                    "ts": now_ms(),
+                    "data": {
+                        "s": symbol,
+                        "b": [[self._fmt_price(symbol, p), self._fmt_qty(symbol, q)] for p, q in bids],
+                        "a": [[self._fmt_price(symbol, p), self._fmt_qty(symbol, q)] for p, q in asks],
+                        "u": book.version,
+                        "seq": book.version,
+                    },
+                    "cts": book.ts_ms,
+                })
+                await asyncio.sleep(ORDERBOOK_INTERVAL_SECONDS)
+        finally:
+            self.unwatch_book(symbol, queue)
+
+    async def private_ws(self, request):
+        ws = await self.open_ws(request)
+        topics = set()
+        queue = asyncio.Queue()
+
+        async def on_text(text):
+            msg = json.loads(text)
+            op = msg.get("op")
+            if op == "auth":
+                await self.send(ws, {"success": len(msg.get("args", [])) == 3, "ret_msg": "", "op": "auth",
+                                     "conn_id": secrets.token_hex(8)})
+            elif op == "subscribe":
+                topics.update(msg.get("args", []))
+                await self.send(ws, {"success": True, "ret_msg": "", "op": "subscribe",
+                                     "conn_id": secrets.token_hex(8)})
+            elif op == "ping":
+                await self.send(ws, {"success": True, "ret_msg": "pong", "op": "ping"})
+
+        async def writer():
+            while True:
+                await self.send(ws, await queue.get())
+
+        self._private[ws] = (topics, queue)
+        try:
+            return await self.serve_ws(ws, on_text=on_text, writers=[writer()])
+        finally:
+            self._private.pop(ws, None)
+
+    # ============= ИСПОЛНЕНИЯ =============
+
+    def on_order_event(self, event: str, order, fill: dict):
+        if not self._private or not fill:
+            return
+        s = order.symbol
+        entry = {
+            "category": "linear",
+            "symbol": s,
+            "orderId": str(order.order_id),
+            "orderLinkId": order.client_order_id or "",
+            "side": "Buy" if order.side == "BUY" else "Sell",
+            "orderType": "Market" if order.is_market else "Limit",
+            "orderStatus": _STATUS.get(order.status, order.status),
+            "price": self._fmt_price(s, order.price),
+            "qty": self._fmt_qty(s, order.qty),
+            "cumExecQty": self._fmt_qty(s, order.filled),
+            "leavesQty": self._fmt_qty(s, order.remaining),
+            "execId": str(fill["trade_id"]),
+            "execPrice": self._fmt_price(s, fill["price"]),
+            "execQty": self._fmt_qty(s, fill["qty"]),
+            "execFee": f"{fill['fee']:.8f}",
+            "execTime": str(order.updated_ms),
+            "isMaker": fill["maker"],
+        }
+        # Поддерживаются и общий топик execution, и execution.<SYMBOL>, на который подписан клиент
+        for topics, queue in self._private.values():
+            for topic in (f"execution.{s}", "execution.linear", "execution"):
+                if topic in topics:
+                    queue.put_nowait({"topic": topic, "id": secrets.token_hex(8),
+                                      "creationTime": now_ms(), "data": [entry]})
+                    break
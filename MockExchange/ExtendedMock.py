@@ -0,0 +1,208 @@
+import asyncio
+import json
+import secrets
+
+from aiohttp import web
+
+from MockExchange.MatchingEngine import OrderRejected, decimals_of
+from MockExchange.MockServer import MockServer, now_ms
+
+DEPTH_INTERVAL_SECONDS = 0.1
+
+# Коды ошибок, которыми отвечает заглушка (формат {"code", "msg"}, как у Binance-подобных API)
+_REJECT_CODES = {
+    "unknown_symbol": (1001, "Unknown market."),
+    "invalid_side": (1002, "Invalid side."),
+    "invalid_tif": (1003, "Invalid timeInForce."),
+    "invalid_qty": (1004, "Invalid quantity."),
+    "invalid_price": (1005, "Invalid price."),
+    "reduce_only": (1006, "Reduce only order would increase position."),
+    "post_only": (1007, "Post only order would be filled immediately."),
+    "margin": (1008, "Insufficient margin."),
+}
+
+_SIDES = {"BUY": "BUY", "LONG": "BUY", "SELL": "SELL", "SHORT": "SELL"}
+
+
+def _error(code: int, msg: str, status: int = 400) -> web.Response:
+    return web.json_response({"code": code, "msg": msg}, status=status)
+
+
+class ExtendedMockServer(MockServer):
+    """
+    Заглушка Extended: тот REST/WS набор, которым пользуется AsyncExtendedWSClient.
+
+    REST: /api/v1/userDataStream, /api/v1/order (POST/DELETE), /api/v1/time. WS: /ws — один сокет
+    и для SUBSCRIBE <market>@depth, и для executionReport (аккаунт один на сервер).
+    Рынки называются как на бирже: BTC-USD. Подпись проверяется только на наличие.
+    """
+
+    venue = "extended"
+
+    def __init__(self, engine, faults=None):
+        self._user_queues = {}
+        super().__init__(engine, faults)
+
+    def setup_routes(self, router):
+        router.add_post("/api/v1/userDataStream", self.user_data_stream)
+        router.add_post("/api/v1/order", self.new_order)
+        router.add_delete("/api/v1/order", self.cancel_order)
+        router.add_get("/api/v1/time", self.server_time)
+        router.add_get("/ws", self.websocket)
+
+    def error_response(self, kind: str) -> web.Response:
+        if kind == "timeout":
+            return _error(1504, "Request timeout.", 504)
+        return _error(1500, "Internal error.", 503)
+
+    # ============= ФОРМАТ =============
+
+    def _fmt_price(self, symbol: str, value) -> str:
+        return f"{value or 0:.{decimals_of(self.engine.books[symbol].tick_size)}f}"
+
+    def _fmt_qty(self, symbol: str, value) -> str:
+        return f"{value or 0:.{decimals_of(self.engine.books[symbol].step_size)}f}"
+
+    def _order_payload(self, order) -> dict:
+        s = order.symbol
+        return {
+            "orderId": str(order.order_id),
+            "symbol": s,
+            "side": order.side,
+            "type": "MARKET" if order.is_market else "LIMIT",
+            "status": order.status,
+            "price": self._fmt_price(s, order.price),
+            "origQty": self._fmt_qty(s, order.qty),
+            "executedQty": self._fmt_qty(s, order.filled),
+            "avgPrice": self._fmt_price(s, order.avg_price),
+            "updateTime": order.updated_ms,
+        }
+
+    @staticmethod
+    def _check_signed(request, params):
+        if not request.headers.get("X-API-KEY"):
+            return _error(1401, "API key is missing.", 401)
+        if params is not None and "signature" not in params:
+            return _error(1402, "Signature is missing.", 401)
+        return None
+
+    # ============= REST =============
+
+    async def server_time(self, request):
+        return web.json_response({"serverTime": now_ms()})
+
+    async def user_data_stream(self, request):
+        denied = self._check_signed(request, None)
+        if denied:
+            return denied
+        return web.json_response({"listenKey": secrets.token_hex(32)})
+
+    async def new_order(self, request):
+        params = dict(request.query)
+        denied = self._check_signed(request, params)
+        if denied:
+            return denied
+        if self.faults.reject_order():
+            return _error(*_REJECT_CODES["margin"])
+
+        order_type = params.get("type", "").upper()
+        try:
+            order = self.engine.submit(
+                params.get("symbol", "").upper(),
+                _SIDES.get(params.get("side", "").upper(), params.get("side", "")),
+                float(params.get("quantity", 0)),
+                price=float(params["price"]) if order_type == "LIMIT" else None,
+                tif=params.get("timeInForce", "GTC"),
+                reduce_only=params.get("reduceOnly", "false").lower() == "true",
+            )
+        except OrderRejected as e:
+            return _error(*_REJECT_CODES.get(e.reason, (1000, str(e))))
+        except (KeyError, ValueError) as e:
+            return _error(1000, f"Malformed parameter: {e}")
+        return web.json_response(self._order_payload(order))
+
+    async def cancel_order(self, request):
+        params = dict(request.query)
+        denied = self._check_signed(request, params)
+        if denied:
+            return denied
+        try:
+            order = self.engine.get_order(params.get("orderId", 0))
+        except ValueError:
+            order = None
+        if order is None or not order.is_open:
+            return _error(1404, "Order not found.", 404)
+        self.engine.cancel(order.order_id)
+        return web.json_response(self._order_payload(order))
+
+    # ============= WS =============
+
+    async def websocket(self, request):
+        ws = await self.open_ws(request)
+        queue = self._user_queues[ws] = asyncio.Queue()
+        writers = {}
+
+        async def on_text(text):
+            msg = json.loads(text)
+            if msg.get("op") == "ping":
+                await self.send(ws, {"op": "pong"})
+                return
+            if msg.get("method") != "SUBSCRIBE":
+                return
+            for stream in msg.get("params", []):
+                market, _, kind = stream.partition("@")
+                if kind == "depth" and stream not in writers:
+                    writers[stream] = asyncio.create_task(self._depth_writer(ws, market.upper()))
+            await self.send(ws, {"result": None, "id": msg.get("id")})
+
+        async def user_writer():
+            while True:
+                await self.send(ws, await queue.get())
+
+        try:
+            return await self.serve_ws(ws, on_text=on_text, writers=[user_writer()])
+        finally:
+            for task in writers.values():
+                task.cancel()
+            self._user_queues.pop(ws, None)
+
+    async def _depth_writer(self, ws, symbol: str):
+        queue = self.watch_book(symbol)
+        try:
+            while True:
+                await queue.get()
+                bids, asks = self.engine.depth(symbol, 10)
+                await self.send(ws, {
+                    "e": "depthUpdate",
+                    "E": now_ms(),
+                    "s": symbol,
+                    "b": [[self._fmt_price(symbol, p), self._fmt_qty(symbol, q)] for p, q in bids],
+                    "a": [[self._fmt_price(symbol, p), self._fmt_qty(symbol, q)] for p, q in asks],
+                })
+                await asyncio.sleep(DEPTH_INTERVAL_SECONDS)
+        finally:
+            self.unwatch_book(symbol, queue)
+
+    # ============= USER STREAM =============
+
+    def on_order_event(self, event: str, order, fill: dict):
+        if not self._user_queues:
+            return
+        s = order.symbol
+        report = {
+            "e": "executionReport",
+            "E": now_ms(),
+            "s": s,
+            "i": str(order.order_id),
+            "S": order.side,
+            "o": "MARKET" if order.is_market else "LIMIT",
+            "X": order.status,
+            "q": self._fmt_qty(s, order.qty),
+            "p": self._fmt_price(s, fill["price"] if fill else order.price),
+            "l": self._fmt_qty(s, fill["qty"] if fill else 0),
+            "z": self._fmt_qty(s, order.filled),
+            "n": f"{fill['fee']:.8f}" if fill else "0",
+            "T": order.updated_ms,
+        }
+        for queue in self._user_queues.values():
+            queue.put_nowait(report)
@@ -0,0 +1,69 @@
+import asyncio
+import random
+
+# Параметры по умолчанию: без задержек и отказов
+FAULT_DEFAULTS = {
+    "latency_ms": 0.0,        # задержка каждого REST ответа
+    "jitter_ms": 0.0,         # случайная добавка к задержке, равномерно [0, jitter_ms]
+    "error_rate": 0.0,        # доля REST запросов, на которые отвечаем ошибкой биржи
+    "timeout_rate": 0.0,      # доля REST запросов, которые зависают на timeout_s
+    "timeout_s": 30.0,
+    "order_reject_rate": 0.0,  # доля новых ордеров, отклоненных как при нехватке маржи
+    "ws_latency_ms": 0.0,     # задержка каждого WS кадра
+    "ws_drop_s": 0.0,         # раз в N секунд сервер рвет все WS соединения (0 — никогда)
+}
+
+
+class FaultInjector:
+    """
+    Задержки и отказы MockExchange. Параметры можно менять на лету (например, из теста
+    или бэктеста): faults.config["error_rate"] = 0.1. Счетчики внесенных отказов — в stats.
+    """
+
+    def __init__(self, seed: int = None, **overrides):
+        unknown = set(overrides) - set(FAULT_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Неизвестные параметры отказов: {', '.join(sorted(unknown))}")
+        self.config = {**FAULT_DEFAULTS, **overrides}
+        self.random = random.Random(seed)
+        self.stats = {"delayed": 0, "errors": 0, "timeouts": 0, "order_rejects": 0, "ws_drops": 0}
+
+    def _roll(self, name: str) -> bool:
+        rate = self.config[name]
+        return rate > 0 and self.random.random() < rate
+
+    async def before_request(self) -> str:
+        """Вызывается перед обработкой REST запроса; возвращает 'error', 'timeout' или None"""
+        delay_ms = self.config["latency_ms"] + self.random.uniform(0, self.config["jitter_ms"])
+        if delay_ms > 0:
+            self.stats["delayed"] += 1
+            await asyncio.sleep(delay_ms / 1000)
+
+        if self._roll("timeout_rate"):
+            self.stats["timeouts"] += 1
+            await asyncio.sleep(self.config["timeout_s"])
+            return "timeout"
+        if self._roll("error_rate"):
+            self.stats["errors"] += 1
+            return "error"
+        return None
+
+    def reject_order(self) -> bool:
+        if self._roll("order_reject_rate"):
+            self.stats["order_rejects"] += 1
+            return True
+        return False
+
+    async def before_ws_send(self):
+        delay_ms = self.config["ws_latency_ms"]
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+
+    async def ws_drop_loop(self, close_all):
+        """Периодически вызывает close_all() — проверка переподключения и восстановления подписок"""
+        while True:
+            interval = self.config["ws_drop_s"]
+            await asyncio.sleep(interval if interval > 0 else 1)
+            if interval > 0:
+                self.stats["ws_drops"] += 1
+                await close_all()
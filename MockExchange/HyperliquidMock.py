@@ -0,0 +1,381 @@
+import asyncio
+import json
+import secrets
+
+from aiohttp import web
+
+from MockExchange.MatchingEngine import BUY, SELL, OrderRejected, decimals_of
+from MockExchange.MockServer import MockServer, now_ms
+
+ASSET_CTX_INTERVAL_SECONDS = 1.0
+
+_TIF = {"Gtc": "GTC", "Ioc": "IOC", "Alo": "ALO"}
+_ORDER_STATUS = {
+    "NEW": "open",
+    "PARTIALLY_FILLED": "open",
+    "FILLED": "filled",
+    "CANCELED": "canceled",
+    "EXPIRED": "canceled",
+}
+_REJECT_MESSAGES = {
+    "unknown_symbol": "Unknown asset.",
+    "invalid_qty": "Order has invalid size.",
+    "invalid_price": "Order has invalid price.",
+    "reduce_only": "Reduce only order would increase position.",
+    "post_only": "Post only order would have immediately matched.",
+    "margin": "Insufficient margin to place order.",
+}
+
+
+def _num(value) -> str:
+    """Числа Hyperliquid передает строками без лишних нулей: 3000.50 -> '3000.5'"""
+    text = f"{value or 0:.8f}".rstrip("0").rstrip(".")
+    return text or "0"
+
+
+class HyperliquidMockServer(MockServer):
+    """
+    Заглушка Hyperliquid для AsyncHyperliquidWSClient и hyperliquid-python-sdk.
+
+    POST /info: meta, spotMeta, allMids, l2Book, orderStatus, clearinghouseState, openOrders.
+    POST /exchange: order, cancel, cancelByCloid, updateLeverage — подпись не проверяется,
+    все действия относятся к одному аккаунту. WS /ws: подписки l2Book, bbo, activeAssetCtx,
+    userFills с subscriptionResponse и ping/pong.
+    """
+
+    venue = "hyperliquid"
+
+    def __init__(self, engine, faults=None):
+        self._fill_queues = {}
+        super().__init__(engine, faults)
+
+    def setup_routes(self, router):
+        router.add_post("/info", self.info)
+        router.add_post("/exchange", self.exchange)
+        router.add_get("/ws", self.websocket)
+
+    def error_response(self, kind: str) -> web.Response:
+        if kind == "timeout":
+            return web.Response(status=504, text="Gateway Timeout")
+        return web.Response(status=500, text="Internal Server Error")
+
+    def _coins(self):
+        return list(self.engine.books)
+
+    def _coin_of(self, asset: int) -> str:
+        coins = self._coins()
+        return coins[asset] if 0 <= asset < len(coins) else None
+
+    def _levels(self, coin: str, limit: int = 20):
+        bids, asks = self.engine.depth(coin, limit)
+        return [
+            [{"px": _num(p), "sz": _num(q), "n": 1} for p, q in bids],
+            [{"px": _num(p), "sz": _num(q), "n": 1} for p, q in asks],
+        ]
+
+    # ============= /info =============
+
+    async def info(self, request):
+        body = await request.json()
+        kind = body.get("type")
+
+        if kind == "meta":
+            return web.json_response({"universe": [
+                {"name": coin, "szDecimals": decimals_of(book.step_size), "maxLeverage": 50}
+                for coin, book in self.engine.books.items()
+            ]})
+        if kind == "spotMeta":
+            return web.json_response({"universe": [], "tokens": []})
+        if kind == "allMids":
+            return web.json_response({coin: _num(self.engine.mark_price(coin)) for coin in self._coins()})
+        if kind == "l2Book":
+            coin = body.get("coin")
+            if coin not in self.engine.books:
+                return web.json_response(None)
+            return web.json_response({"coin": coin, "time": now_ms(), "levels": self._levels(coin)})
+        if kind == "orderStatus":
+            return web.json_response(self._order_status(body.get("oid")))
+        if kind == "clearinghouseState":
+            return web.json_response(self._clearinghouse_state())
+        if kind == "openOrders":
+            return web.json_response([self._order_info(order) for order in self.engine.open_orders()])
+
+        return web.json_response({"error": f"Unsupported info type {kind}"}, status=422)
+
+    def _order_info(self, order) -> dict:
+        return {
+            "coin": order.symbol,
+            "side": "B" if order.side == BUY else "A",
+            "limitPx": _num(order.price),
+            "sz": _num(order.remaining if order.is_open else 0),
+            "oid": order.order_id,
+            "timestamp": order.created_ms,
+            "origSz": _num(order.qty),
+            "cloid": order.client_order_id,
+            "reduceOnly": order.reduce_only,
+            "orderType": "Limit",
+            "tif": {"GTC": "Gtc", "IOC": "Ioc", "ALO": "Alo"}.get(order.tif, order.tif),
+        }
+
+    def _order_status(self, oid) -> dict:
+        if isinstance(oid, str) and oid.startswith("0x"):
+            order = self.engine.find_by_client_id(oid)
+        else:
+            order = self.engine.get_order(oid) if oid is not None else None
+        if order is None:
+            return {"status": "unknownOid"}
+        return {
+            "status": "order",
+            "order": {
+                "order": self._order_info(order),
+                "status": _ORDER_STATUS[order.status],
+                "statusTimestamp": order.updated_ms,
+            },
+        }
+
+    def _clearinghouse_state(self) -> dict:
+        positions = []
+        account_value = 0.0
+        for coin in self._coins():
+            position = self.engine.positions.get(coin)
+            if position is None or not position.qty:
+                continue
+            mark = self.engine.mark_price(coin)
+            unrealized = position.unrealized(mark)
+            account_value += unrealized
+            positions.append({
+                "type": "oneWay",
+                "position": {
+                    "coin": coin,
+                    "szi": _num(position.qty),
+                    "entryPx": _num(position.entry_price),
+                    "positionValue": _num(abs(position.qty) * mark),
+                    "unrealizedPnl": _num(unrealized),
+                    "returnOnEquity": "0",
+                    "liquidationPx": None,
+                    "marginUsed": _num(abs(position.qty) * mark / position.leverage),
+                    "leverage": {"type": "cross", "value": position.leverage},
+                },
+            })
+        return {
+            "assetPositions": positions,
+            "marginSummary": {"accountValue": _num(account_value), "totalNtlPos": "0", "totalRawUsd": "0",
+                              "totalMarginUsed": "0"},
+            "withdrawable": "0",
+            "time": now_ms(),
+        }
+
+    # ============= /exchange =============
+
+    async def exchange(self, request):
+        body = await request.json()
+        action = body.get("action") or {}
+        kind = action.get("type")
+
+        if kind == "order":
+            statuses = [self._place(wire) for wire in action.get("orders", [])]
+            return web.json_response({"status": "ok", "response": {"type": "order", "data": {"statuses": statuses}}})
+        if kind in ("modify", "batchModify"):
+            modifies = action.get("modifies") if kind == "batchModify" else [action]
+            statuses = [self._modify(modify) for modify in modifies or []]
+            return web.json_response({"status": "ok", "response": {"type": "order", "data": {"statuses": statuses}}})
+        if kind in ("cancel", "cancelByCloid"):
+            statuses = [self._cancel(cancel) for cancel in action.get("cancels", [])]
+            return web.json_response({"status": "ok", "response": {"type": "cancel", "data": {"statuses": statuses}}})
+        if kind == "updateLeverage":
+            coin = self._coin_of(int(action.get("asset", -1)))
+            if coin is None:
+                return web.json_response({"status": "err", "response": "Unknown asset."})
+            self.engine.position(coin).leverage = int(action.get("leverage", 20))
+            return web.json_response({"status": "ok", "response": {"type": "default"}})
+
+        return web.json_response({"status": "err", "response": f"Unsupported action {kind}"})
+
+    def _place(self, wire: dict) -> dict:
+        asset = int(wire.get("a", -1))
+        coin = self._coin_of(asset)
+        limit = (wire.get("t") or {}).get("limit")
+        if coin is None:
+            return {"error": f"Unknown asset. asset={asset}"}
+        if limit is None or limit.get("tif") not in _TIF:
+            return {"error": f"Unsupported order type {wire.get('t')}. asset={asset}"}
+        if self.faults.reject_order():
+            return {"error": f"{_REJECT_MESSAGES['margin']} asset={asset}"}
+
+        try:
+            order = self.engine.submit(
+                coin,
+                BUY if wire.get("b") else SELL,
+                float(wire.get("s", 0)),
+                price=float(wire.get("p", 0)),
+                tif=_TIF[limit["tif"]],
+                reduce_only=bool(wire.get("r")),
+                client_order_id=wire.get("c"),
+            )
+        except OrderRejected as e:
+            return {"error": f"{_REJECT_MESSAGES.get(e.reason, str(e))} asset={asset}"}
+
+        if order.is_open:
+            resting = {"oid": order.order_id}
+            if order.client_order_id:
+                resting["cloid"] = order.client_order_id
+            return {"resting": resting}
+        if order.filled > 0:
+            return {"filled": {"totalSz": _num(order.filled), "avgPx": _num(order.avg_price), "oid": order.order_id}}
+        return {"error": f"Order could not immediately match against any resting orders. asset={asset}"}
+
+    def _modify(self, modify: dict) -> dict:
+        wire = modify.get("order") or {}
+        asset = int(wire.get("a", -1))
+        oid = modify.get("oid")
+        # oid может быть и cloid (строка 0x...)
+        order = self.engine.find_by_client_id(oid) if isinstance(oid, str) else self.engine.get_order(oid or 0)
+        if order is None or not order.is_open:
+            return {"error": f"Cannot modify canceled or filled order. asset={asset}"}
+        try:
+            # sz в modify — новый неисполненный остаток
+            order = self.engine.amend(order.order_id, float(wire.get("p", 0)), order.filled + float(wire.get("s", 0)))
+        except OrderRejected as e:
+            return {"error": f"{_REJECT_MESSAGES.get(e.reason, str(e))} asset={asset}"}
+        if order.is_open:
+            return {"resting": {"oid": order.order_id}}
+        if order.status == "FILLED":
+            return {"filled": {"totalSz": _num(order.filled), "avgPx": _num(order.avg_price), "oid": order.order_id}}
+        return {"error": f"Order was canceled by modify. asset={asset}"}
+
+    def _cancel(self, cancel: dict):
+        asset = int(cancel.get("a", cancel.get("asset", -1)))
+        if "cloid" in cancel:
+            order = self.engine.find_by_client_id(cancel["cloid"])
+        else:
+            order = self.engine.get_order(cancel.get("o", cancel.get("oid", 0)))
+        if order is None or not order.is_open:
+            return {"error": f"Order was never placed, already canceled, or filled. asset={asset}"}
+        self.engine.cancel(order.order_id)
+        return "success"
+
+    # ============= WS =============
+
+    async def websocket(self, request):
+        ws = await self.open_ws(request)
+        streams = {}
+
+        async def on_text(text):
+            try:
+                message = json.loads(text)
+            except json.JSONDecodeError:
+                return
+            method = message.get("method")
+            subscription = message.get("subscription") or {}
+
+            if method == "ping":
+                await self.send(ws, {"channel": "pong"})
+            elif method == "subscribe":
+                key = json.dumps(subscription, sort_keys=True)
+                if key not in streams:
+                    streams[key] = self._start_stream(ws, subscription)
+                await self.send(ws, {"channel": "subscriptionResponse",
+                                     "data": {"method": "subscribe", "subscription": subscription}})
+            elif method == "unsubscribe":
+                task = streams.pop(json.dumps(subscription, sort_keys=True), None)
+                if task:
+                    task.cancel()
+                await self.send(ws, {"channel": "subscriptionResponse",
+                                     "data": {"method": "unsubscribe", "subscription": subscription}})
+
+        try:
+            return await self.serve_ws(ws, on_text=on_text)
+        finally:
+            for task in streams.values():
+                task.cancel()
+            self._fill_queues.pop(ws, None)
+
+    def _start_stream(self, ws, subscription: dict) -> asyncio.Task:
+        kind = subscription.get("type")
+        coin = subscription.get("coin")
+        if kind == "l2Book":
+            return asyncio.create_task(self._book_stream(ws, coin, "l2Book", self._l2_payload))
+        if kind == "bbo":
+            return asyncio.create_task(self._book_stream(ws, coin, "bbo", self._bbo_payload))
+        if kind == "activeAssetCtx":
+            return asyncio.create_task(self._asset_ctx_stream(ws, coin))
+        if kind == "userFills":
+            queue = self._fill_queues[ws] = asyncio.Queue()
+            return asyncio.create_task(self._fill_stream(ws, subscription.get("user"), queue))
+        # Остальные подписки принимаются, но данных по ним заглушка не шлет
+        return asyncio.create_task(asyncio.sleep(0))
+
+    async def _book_stream(self, ws, coin: str, channel: str, payload):
+        queue = self.watch_book(coin)
+        try:
+            while True:
+                await queue.get()
+                await self.send(ws, {"channel": channel, "data": payload(coin)})
+        finally:
+            self.unwatch_book(coin, queue)
+
+    def _l2_payload(self, coin: str) -> dict:
+        return {"coin": coin, "time": self.engine.books[coin].ts_ms, "levels": self._levels(coin)}
+
+    def _bbo_payload(self, coin: str) -> dict:
+        bids, asks = self.engine.depth(coin, 1)
+        return {
+            "coin": coin,
+            "time": self.engine.books[coin].ts_ms,
+            "bbo": [
+                {"px": _num(bids[0][0]), "sz": _num(bids[0][1]), "n": 1} if bids else None,
+                {"px": _num(asks[0][0]), "sz": _num(asks[0][1]), "n": 1} if asks else None,
+            ],
+        }
+
+    async def _asset_ctx_stream(self, ws, coin: str):
+        while True:
+            if coin in self.engine.books:
+                mark = self.engine.mark_price(coin)
+                await self.send(ws, {"channel": "activeAssetCtx", "data": {"coin": coin, "ctx": {
+                    "funding": _num(self.engine.funding_rate),
+                    "openInterest": "0",
+                    "oraclePx": _num(mark),
+                    "markPx": _num(mark),
+                    "midPx": _num(mark),
+                    "prevDayPx": _num(mark),
+                    "dayNtlVlm": "0",
+                    "premium": "0",
+                }}})
+            await asyncio.sleep(ASSET_CTX_INTERVAL_SECONDS)
+
+    async def _fill_stream(self, ws, user: str, queue: asyncio.Queue):
+        await self.send(ws, {"channel": "userFills", "data": {"isSnapshot": True, "user": user, "fills": []}})
+        while True:
+            fill = await queue.get()
+            await self.send(ws, {"channel": "userFills", "data": {"user": user, "fills": [fill]}})
+
+    def on_order_event(self, event: str, order, fill: dict):
+        if event != "fill" or not self._fill_queues:
+            return
+
+        start = fill["start_position"]
+        is_buy = order.side == BUY
+        if start == 0 or (start > 0) == is_buy:
+            direction = "Open Long" if is_buy else "Open Short"
+        else:
+            direction = "Close Short" if is_buy else "Close Long"
+
+        payload = {
+            "coin": order.symbol,
+            "px": _num(fill["price"]),
+            "sz": _num(fill["qty"]),
+            "side": "B" if is_buy else "A",
+            "time": fill["time"],
+            "startPosition": _num(start),
+            "dir": direction,
+            "closedPnl": _num(fill["realized_pnl"]),
+            "hash": "0x" + secrets.token_hex(32),
+            "oid": order.order_id,
+            "crossed": not fill["maker"],
+            "fee": _num(fill["fee"]),
+            "tid": fill["trade_id"],
+            "feeToken": "USDC",
+        }
+        for queue in self._fill_queues.values():
+            queue.put_nowait(payload)
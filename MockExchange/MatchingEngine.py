@@ -0,0 +1,422 @@
+import itertools
+import time
+
+BUY = "BUY"
+SELL = "SELL"
+EPS = 1e-12
+
+# Время жизни ордера: GTC — остаток встает в книгу, IOC — остаток снимается,
+# FOK — все или ничего, ALO — только maker (Binance GTX, Hyperliquid Alo)
+TIME_IN_FORCE = ("GTC", "IOC", "FOK", "ALO")
+
+
+def decimals_of(step: float) -> int:
+    """0.001 -> 3, 1 -> 0"""
+    text = format(step, "f").rstrip("0")
+    return len(text.split(".")[1]) if "." in text else 0
+
+
+class OrderRejected(Exception):
+    """Ордер не принят движком; reason — машинный код, сервер переводит его в ошибку биржи"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class MockOrder:
+    def __init__(self, order_id: int, symbol: str, side: str, qty: float, price, tif: str,
+                 reduce_only: bool, client_order_id, seq: int, now_ms: int):
+        self.order_id = order_id
+        self.symbol = symbol
+        self.side = side
+        self.qty = qty
+        self.price = price
+        self.tif = tif
+        self.reduce_only = reduce_only
+        self.client_order_id = client_order_id
+        self.seq = seq
+        self.filled = 0.0
+        self.notional = 0.0
+        self.status = "NEW"
+        self.created_ms = now_ms
+        self.updated_ms = now_ms
+
+    @property
+    def is_market(self) -> bool:
+        return self.price is None
+
+    @property
+    def remaining(self) -> float:
+        return max(self.qty - self.filled, 0.0)
+
+    @property
+    def avg_price(self) -> float:
+        return self.notional / self.filled if self.filled > EPS else 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self.status in ("NEW", "PARTIALLY_FILLED")
+
+
+class MockPosition:
+    """Нетто-позиция (one-way): qty со знаком, средняя цена входа и реализованный PnL"""
+
+    def __init__(self):
+        self.qty = 0.0
+        self.entry_price = 0.0
+        self.realized_pnl = 0.0
+        self.leverage = 20
+
+    def apply(self, side: str, qty: float, price: float) -> float:
+        signed = qty if side == BUY else -qty
+        realized = 0.0
+
+        if abs(self.qty) < EPS or (self.qty > 0) == (signed > 0):
+            new_qty = self.qty + signed
+            self.entry_price = (self.entry_price * abs(self.qty) + price * qty) / abs(new_qty)
+            self.qty = new_qty
+        else:
+            closing = min(qty, abs(self.qty))
+            realized = closing * (price - self.entry_price) * (1 if self.qty > 0 else -1)
+            self.qty += signed
+            if abs(self.qty) < EPS:
+                self.qty = 0.0
+                self.entry_price = 0.0
+            elif (self.qty > 0) == (signed > 0):
+                # Позиция перевернулась — остаток открыт по цене сделки
+                self.entry_price = price
+
+        self.realized_pnl += realized
+        return realized
+
+    def unrealized(self, mark: float) -> float:
+        return self.qty * (mark - self.entry_price) if self.qty else 0.0
+
+
+class _Book:
+    """
+    Книга символа: внешняя ликвидность из записи ([[price, qty]], лучшие уровни первыми)
+    и наши лимитные ордера, стоящие в книге с приоритетом цена-время.
+    """
+
+    def __init__(self, symbol: str, tick_size: float, step_size: float):
+        self.symbol = symbol
+        self.tick_size = tick_size
+        self.step_size = step_size
+        self.bids = []
+        self.asks = []
+        self.resting_bids = []
+        self.resting_asks = []
+        self.ts_ms = 0
+        self.version = 0
+        self.last_price = 0.0
+
+    def mid(self) -> float:
+        if self.bids and self.asks:
+            return (self.bids[0][0] + self.asks[0][0]) / 2
+        return self.last_price
+
+
+class MatchingEngine:
+    """
+    Движок сопоставления одной биржи-заглушки.
+
+    Внешняя книга заменяется целиком на каждом снимке (set_book); все, что забрали наши
+    ордера, до следующего снимка из нее вычитается. Агрессивный ордер снимает лучшую цену,
+    при равной цене сначала внешнюю ликвидность, затем наши стоящие ордера по времени.
+    Стоящий ордер исполняется по своей цене, когда новый снимок пересекает его.
+
+    Слушатели получают listener(event, order, fill) для событий new / amend / fill / cancel / expire;
+    fill — словарь с qty, price, fee, maker, trade_id, realized_pnl, start_position, time.
+    clock — функция текущего времени в мс (бэктест подставляет виртуальные часы).
+    """
+
+    def __init__(self, maker_fee: float = 0.0002, taker_fee: float = 0.0005, funding_rate: float = 0.0001,
+                 clock=None, default_tick_size: float = 0.01, default_step_size: float = 0.001):
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.funding_rate = funding_rate
+        self.clock = clock or (lambda: int(time.time() * 1000))
+        self.default_tick_size = default_tick_size
+        self.default_step_size = default_step_size
+        self.books = {}
+        self.orders = {}
+        self.positions = {}
+        self.listeners = []
+        self.book_listeners = []
+        self._order_ids = itertools.count(1_000_001)
+        self._trade_ids = itertools.count(1)
+        self._seq = itertools.count()
+        self.stats = {"orders": 0, "rejected": 0, "fills": 0, "maker_fills": 0, "volume": 0.0}
+
+    # ============= КНИГИ =============
+
+    def add_symbol(self, symbol: str, tick_size: float = None, step_size: float = None) -> _Book:
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = _Book(
+                symbol, tick_size or self.default_tick_size, step_size or self.default_step_size
+            )
+        else:
+            book.tick_size = tick_size or book.tick_size
+            book.step_size = step_size or book.step_size
+        return book
+
+    def set_book(self, symbol: str, bids, asks, ts_ms: int = None):
+        """Новый снимок внешней книги; стоящие ордера, которые он пересек, исполняются"""
+        book = self.books.get(symbol) or self.add_symbol(symbol)
+        book.bids = sorted(([float(p), float(q)] for p, q in bids if float(q) > 0), key=lambda l: -l[0])
+        book.asks = sorted(([float(p), float(q)] for p, q in asks if float(q) > 0), key=lambda l: l[0])
+        book.ts_ms = ts_ms or self.clock()
+        book.version += 1
+        if book.bids and book.asks:
+            book.last_price = (book.bids[0][0] + book.asks[0][0]) / 2
+
+        self._cross_resting(book, book.resting_bids, book.asks, lambda level, order: level <= order.price + EPS)
+        self._cross_resting(book, book.resting_asks, book.bids, lambda level, order: level >= order.price - EPS)
+
+        for listener in self.book_listeners:
+            listener(symbol)
+
+    def depth(self, symbol: str, limit: int = 10):
+        """Публичная книга: внешние уровни плюс наши стоящие ордера, агрегированные по цене"""
+        book = self.books.get(symbol)
+        if book is None:
+            return [], []
+        return (self._aggregate(book.bids, book.resting_bids, reverse=True)[:limit],
+                self._aggregate(book.asks, book.resting_asks, reverse=False)[:limit])
+
+    @staticmethod
+    def _aggregate(levels, resting, reverse: bool):
+        merged = {}
+        for price, qty in levels:
+            merged[price] = merged.get(price, 0.0) + qty
+        for order in resting:
+            merged[order.price] = merged.get(order.price, 0.0) + order.remaining
+        return [[price, merged[price]] for price in sorted(merged, reverse=reverse)]
+
+    def mark_price(self, symbol: str) -> float:
+        book = self.books.get(symbol)
+        return book.mid() if book else 0.0
+
+    def position(self, symbol: str) -> MockPosition:
+        position = self.positions.get(symbol)
+        if position is None:
+            position = self.positions[symbol] = MockPosition()
+        return position
+
+    # ============= ОРДЕРА =============
+
+    def submit(self, symbol: str, side: str, qty: float, price: float = None, tif: str = "GTC",
+               reduce_only: bool = False, client_order_id: str = None) -> MockOrder:
+        """Принимает ордер (price=None — рыночный) и сразу сопоставляет его с книгой"""
+        side = side.upper()
+        tif = tif.upper()
+        book = self.books.get(symbol)
+        self.stats["orders"] += 1
+
+        try:
+            if book is None:
+                raise OrderRejected("unknown_symbol", f"Unknown symbol {symbol}")
+            if side not in (BUY, SELL):
+                raise OrderRejected("invalid_side", f"Invalid side {side}")
+            if tif not in TIME_IN_FORCE:
+                raise OrderRejected("invalid_tif", f"Invalid time in force {tif}")
+            if qty is None or qty <= EPS:
+                raise OrderRejected("invalid_qty", f"Invalid quantity {qty}")
+            if price is not None and price <= 0:
+                raise OrderRejected("invalid_price", f"Invalid price {price}")
+
+            if reduce_only:
+                position = self.position(symbol)
+                reducible = abs(position.qty) if (position.qty > 0) == (side == SELL) else 0.0
+                if reducible <= EPS:
+                    raise OrderRejected("reduce_only", "ReduceOnly order would increase position")
+                qty = min(qty, reducible)
+
+            if tif == "ALO" and price is not None and self._available(book, side, price) > EPS:
+                raise OrderRejected("post_only", "Post only order would immediately match")
+        except OrderRejected:
+            self.stats["rejected"] += 1
+            raise
+
+        now = self.clock()
+        order = MockOrder(next(self._order_ids), symbol, side, qty, price, tif, reduce_only,
+                          client_order_id, next(self._seq), now)
+        self.orders[order.order_id] = order
+        self._emit("new", order)
+
+        if tif == "FOK" and self._available(book, side, price) < qty - EPS:
+            self._finish(order, "EXPIRED")
+            return order
+
+        self._take(book, order)
+
+        if order.remaining > EPS:
+            if order.is_market or tif in ("IOC", "FOK"):
+                self._finish(order, "EXPIRED")
+            else:
+                self._rest(book, order)
+        return order
+
+    def amend(self, order_id: int, price: float, qty: float) -> MockOrder:
+        """
+        Меняет цену и полный объем (с исполненным) стоящего лимитного ордера, order_id сохраняется.
+        Место в очереди остается только при уменьшении объема по той же цене; объем не больше
+        исполненного снимает ордер. Новая цена, пересекающая книгу, сразу сопоставляется.
+        """
+        order = self.orders.get(int(order_id))
+        if order is None or not order.is_open or order.is_market:
+            raise OrderRejected("unknown_order", f"Order {order_id} is not open")
+        if price is None or price <= 0:
+            raise OrderRejected("invalid_price", f"Invalid price {price}")
+        if qty <= order.filled + EPS:
+            return self.cancel(order.order_id)
+
+        book = self.books[order.symbol]
+        resting = book.resting_bids if order.side == BUY else book.resting_asks
+        if order in resting:
+            resting.remove(order)
+        if abs(price - order.price) > EPS or qty > order.qty + EPS:
+            order.seq = next(self._seq)
+        order.price = price
+        order.qty = qty
+        order.updated_ms = self.clock()
+        self._emit("amend", order)
+
+        self._take(book, order)
+        if order.remaining > EPS:
+            self._rest(book, order)
+        return order
+
+    def cancel(self, order_id: int):
+        """Снимает стоящий ордер; None — ордер неизвестен, иначе ордер в текущем статусе"""
+        order = self.orders.get(int(order_id))
+        if order is None or not order.is_open:
+            return order
+
+        book = self.books[order.symbol]
+        resting = book.resting_bids if order.side == BUY else book.resting_asks
+        if order in resting:
+            resting.remove(order)
+        self._finish(order, "CANCELED")
+        return order
+
+    def get_order(self, order_id: int):
+        return self.orders.get(int(order_id))
+
+    def find_by_client_id(self, client_order_id: str):
+        for order in reversed(list(self.orders.values())):
+            if order.client_order_id == client_order_id:
+                return order
+        return None
+
+    def open_orders(self, symbol: str = None):
+        return [o for o in self.orders.values() if o.is_open and (symbol is None or o.symbol == symbol)]
+
+    # ============= СОПОСТАВЛЕНИЕ =============
+
+    @staticmethod
+    def _crosses(order: MockOrder, level_price: float) -> bool:
+        if order.is_market:
+            return True
+        if order.side == BUY:
+            return level_price <= order.price + EPS
+        return level_price >= order.price - EPS
+
+    def _available(self, book: _Book, side: str, price) -> float:
+        """Объем, который ордер с ценой price может снять прямо сейчас"""
+        probe = MockOrder(0, book.symbol, side, 0.0, price, "IOC", False, None, 0, 0)
+        levels = book.asks if side == BUY else book.bids
+        resting = book.resting_asks if side == BUY else book.resting_bids
+        return (sum(qty for level_price, qty in levels if self._crosses(probe, level_price))
+                + sum(o.remaining for o in resting if self._crosses(probe, o.price)))
+
+    def _take(self, book: _Book, order: MockOrder):
+        levels = book.asks if order.side == BUY else book.bids
+        resting = book.resting_asks if order.side == BUY else book.resting_bids
+        better = (lambda a, b: a <= b) if order.side == BUY else (lambda a, b: a >= b)
+
+        while order.remaining > EPS:
+            level = levels[0] if levels else None
+            maker = resting[0] if resting else None
+            if level is None and maker is None:
+                break
+
+            if level is not None and (maker is None or better(level[0], maker.price)):
+                if not self._crosses(order, level[0]):
+                    break
+                qty = min(order.remaining, level[1])
+                level[1] -= qty
+                if level[1] <= EPS:
+                    levels.pop(0)
+                self._fill(order, qty, level[0], maker=False)
+            else:
+                if not self._crosses(order, maker.price):
+                    break
+                qty = min(order.remaining, maker.remaining)
+                self._fill(maker, qty, maker.price, maker=True)
+                self._fill(order, qty, maker.price, maker=False)
+                if not maker.is_open:
+                    resting.pop(0)
+
+    @staticmethod
+    def _rest(book: _Book, order: MockOrder):
+        resting = book.resting_bids if order.side == BUY else book.resting_asks
+        resting.append(order)
+        if order.side == BUY:
+            resting.sort(key=lambda o: (-o.price, o.seq))
+        else:
+            resting.sort(key=lambda o: (o.price, o.seq))
+
+    def _cross_resting(self, book: _Book, resting, levels, crosses):
+        """Стоящие ордера, которые пересек новый снимок, исполняются по своей цене (maker)"""
+        while resting and levels and crosses(levels[0][0], resting[0]):
+            order = resting[0]
+            level = levels[0]
+            qty = min(order.remaining, level[1])
+            level[1] -= qty
+            if level[1] <= EPS:
+                levels.pop(0)
+            self._fill(order, qty, order.price, maker=True)
+            if not order.is_open:
+                resting.pop(0)
+
+    def _fill(self, order: MockOrder, qty: float, price: float, maker: bool):
+        position = self.position(order.symbol)
+        start_position = position.qty
+        realized = position.apply(order.side, qty, price)
+        fee = qty * price * (self.maker_fee if maker else self.taker_fee)
+
+        order.filled += qty
+        order.notional += qty * price
+        order.updated_ms = self.clock()
+        order.status = "FILLED" if order.remaining <= EPS else "PARTIALLY_FILLED"
+
+        book = self.books[order.symbol]
+        book.last_price = price
+        self.stats["fills"] += 1
+        self.stats["volume"] += qty * price
+        if maker:
+            self.stats["maker_fills"] += 1
+
+        self._emit("fill", order, {
+            "qty": qty,
+            "price": price,
+            "fee": fee,
+            "maker": maker,
+            "trade_id": next(self._trade_ids),
+            "realized_pnl": realized,
+            "start_position": start_position,
+            "time": order.updated_ms,
+        })
+
+    def _finish(self, order: MockOrder, status: str):
+        order.status = status
+        order.updated_ms = self.clock()
+        self._emit("cancel" if status == "CANCELED" else "expire", order)
+
+    def _emit(self, event: str, order: MockOrder, fill: dict = None):
+        for listener in self.listeners:
+            listener(event, order, fill)
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import time
+
+from aiohttp import web
+
+from MockExchange.Faults import FaultInjector
+from MockExchange.MatchingEngine import decimals_of
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class MockServer:
+    """
+    Общая часть серверов-заглушек: aiohttp приложение, внесение задержек/отказов
+    в REST, учет WS соединений и оповещение их об обновлении книги.
+
+    Наследник задает маршруты (setup_routes), формат ошибки биржи (error_response)
+    и реакцию на события ордеров движка (on_order_event).
+    """
+
+    venue = "mock"
+
+    def __init__(self, engine, faults: FaultInjector = None):
+        self.engine = engine
+        self.faults = faults or FaultInjector()
+        self.connections = set()
+        self._book_waiters = {}
+        self._runner = None
+        self._drop_task = None
+        self.url = None
+
+        engine.book_listeners.append(self._on_book)
+        engine.listeners.append(self.on_order_event)
+
+        self.app = web.Application(middlewares=[self._fault_middleware()])
+        self.setup_routes(self.app.router)
+
+    def setup_routes(self, router):
+        raise NotImplementedError
+
+    def error_response(self, kind: str) -> web.Response:
+        """Ответ на внесенный отказ: kind = 'error' или 'timeout'"""
+        raise NotImplementedError
+
+    def on_order_event(self, event: str, order, fill: dict):
+        pass
+
+    def _fault_middleware(self):
+        @web.middleware
+        async def middleware(request, handler):
+            # WS рукопожатие не задерживаем: задержка кадров настраивается отдельно
+            if request.headers.get("Upgrade", "").lower() == "websocket":
+                return await handler(request)
+            fault = await self.faults.before_request()
+            if fault:
+                return self.error_response(fault)
+            return await handler(request)
+
+        return middleware
+
+    # ============= ЖИЗНЕННЫЙ ЦИКЛ =============
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Поднимает сервер; port=0 — свободный порт. Возвращает базовый http адрес."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{bound_port}"
+        self._drop_task = asyncio.create_task(self.faults.ws_drop_loop(self.close_connections))
+        print(f"🧪 {self.venue} mock запущен: {self.url}")
+        return self.url
+
+    async def stop(self):
+        if self._drop_task:
+            self._drop_task.cancel()
+            try:
+                await self._drop_task
+            except asyncio.CancelledError:
+                pass
+        await self.close_connections()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def close_connections(self):
+        for ws in list(self.connections):
+            await ws.close(code=1001, message=b"mock drop")
+
+    @property
+    def ws_url(self) -> str:
+        return self.url.replace("http://", "ws://") if self.url else None
+
+    # ============= WS =============
+
+    async def open_ws(self, request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections.add(ws)
+        return ws
+
+    async def serve_ws(self, ws: web.WebSocketResponse, on_text=None, writers=()):
+        """
+        Читает сокет до закрытия (ping/pong обрабатывает aiohttp), на время жизни
+        сокета держит фоновые writers — корутины, отправляющие поток данных.
+        """
+        tasks = [asyncio.create_task(writer) for writer in writers]
+        try:
+            async for msg in ws:
+                if msg.type == web.WSMsgType.TEXT and on_text is not None:
+                    await on_text(msg.data)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.connections.discard(ws)
+        return ws
+
+    async def send(self, ws: web.WebSocketResponse, payload: dict) -> bool:
+        if ws.closed:
+            return False
+        await self.faults.before_ws_send()
+        try:
+            await ws.send_str(json.dumps(payload))
+            return True
+        except ConnectionResetError:
+            return False
+
+    def watch_book(self, symbol: str) -> asyncio.Queue:
+        """Очередь оповещений об обновлении книги; пачка обновлений сворачивается в одно"""
+        queue = asyncio.Queue(maxsize=1)
+        self._book_waiters.setdefault(symbol, set()).add(queue)
+        if symbol in self.engine.books and self.engine.books[symbol].bids:
+            queue.put_nowait(symbol)
+        return queue
+
+    def unwatch_book(self, symbol: str, queue: asyncio.Queue):
+        self._book_waiters.get(symbol, set()).discard(queue)
+
+    def _on_book(self, symbol: str):
+        for queue in self._book_waiters.get(symbol, ()):
+            if queue.empty():
+                queue.put_nowait(symbol)
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from MockExchange.BinanceMock import BinanceMockServer
+from MockExchange.BookFeed import play_recorded, synthetic_books
+from MockExchange.BybitMock import BybitMockServer
+from MockExchange.ExtendedMock import ExtendedMockServer
+from MockExchange.Faults import FAULT_DEFAULTS, FaultInjector
+from MockExchange.HyperliquidMock import HyperliquidMockServer
+from MockExchange.MatchingEngine import MatchingEngine
+
+BINANCE_PORT = 8810
+HYPERLIQUID_PORT = 8820
+BYBIT_PORT = 8830
+EXTENDED_PORT = 8840
+DEFAULT_SYMBOLS = {"BTC": 50000.0, "ETH": 3000.0}
+
+
+class MockExchanges:
+    """
+    Заглушки бирж с движками и источником книг; start() поднимает все, stop() гасит.
+    Захват содержит только книги Binance и Hyperliquid, поэтому Bybit и Extended
+    всегда получают синтетические книги вокруг mid из symbols.
+    """
+
+    def __init__(self, capture: str = None, symbols: dict = None, speed: float = 1.0, loop: bool = True,
+                 seed: int = None, **fault_options):
+        self.capture = capture
+        self.symbols = symbols or DEFAULT_SYMBOLS
+        self.speed = speed
+        self.loop = loop
+        self.seed = seed
+        self.faults = FaultInjector(seed=seed, **fault_options)
+        self.binance_engine = MatchingEngine()
+        self.hyperliquid_engine = MatchingEngine()
+        self.binance = BinanceMockServer(self.binance_engine, self.faults)
+        self.hyperliquid = HyperliquidMockServer(self.hyperliquid_engine, self.faults)
+        self.bybit_engine = MatchingEngine()
+        self.extended_engine = MatchingEngine()
+        self.bybit = BybitMockServer(self.bybit_engine, self.faults)
+        self.extended = ExtendedMockServer(self.extended_engine, self.faults)
+        self._feed_tasks = []
+
+    async def start(self, host: str = "127.0.0.1", binance_port: int = BINANCE_PORT,
+                    hyperliquid_port: int = HYPERLIQUID_PORT, bybit_port: int = BYBIT_PORT,
+                    extended_port: int = EXTENDED_PORT):
+        await self.binance.start(host, binance_port)
+        await self.hyperliquid.start(host, hyperliquid_port)
+        await self.bybit.start(host, bybit_port)
+        await self.extended.start(host, extended_port)
+
+        if self.capture:
+            engines = {"binance": self.binance_engine, "hyperliquid": self.hyperliquid_engine}
+            self._feed_tasks.append(asyncio.create_task(play_recorded(self.capture, engines, self.speed, self.loop)))
+        else:
+            for coin, mid in self.symbols.items():
+                self._feed_tasks.append(asyncio.create_task(
+                    synthetic_books(self.binance_engine, coin + "USDT", mid, seed=self.seed)))
+                # Разные seed — цены на площадках расходятся, как в жизни
+                self._feed_tasks.append(asyncio.create_task(synthetic_books(
+                    self.hyperliquid_engine, coin, mid, seed=None if self.seed is None else self.seed + 1)))
+
+        for coin, mid in self.symbols.items():
+            self._feed_tasks.append(asyncio.create_task(synthetic_books(
+                self.bybit_engine, coin + "USDT", mid, seed=None if self.seed is None else self.seed + 2)))
+            self._feed_tasks.append(asyncio.create_task(synthetic_books(
+                self.extended_engine, coin + "-USD", mid, seed=None if self.seed is None else self.seed + 3)))
+
+        # Первый снимок книги должен появиться до того, как клиенты начнут запрашивать depth/meta
+        await asyncio.sleep(0.2)
+
+    def client_env(self) -> dict:
+        """Переменные окружения, направляющие WS клиенты бирж на заглушки"""
+        return {
+            "BINANCE_REST_URL": self.binance.url,
+            "BINANCE_WS_URL": self.binance.ws_url,
+            "HYPERLIQUID_API_URL": self.hyperliquid.url,
+            "BYBIT_REST_URL": self.bybit.url,
+            "BYBIT_WS_URL": self.bybit.ws_url,
+            "EXTENDED_API_URL": self.extended.url,
+            "EXTENDED_WS_URL": self.extended.ws_url + "/ws",
+        }
+
+    async def stop(self):
+        for task in self._feed_tasks:
+            task.cancel()
+        await asyncio.gather(*self._feed_tasks, return_exceptions=True)
+        for server in (self.binance, self.hyperliquid, self.bybit, self.extended):
+            await server.stop()
+
+
+def parse_options(args):
+    """key=value аргументы: параметры отказов (см. FAULT_DEFAULTS), speed, seed, symbols=BTC:50000,ETH:3000"""
+    options = {}
+    for arg in args:
+        key, _, value = arg.partition("=")
+        if key in FAULT_DEFAULTS or key == "speed":
+            options[key] = float(value)
+        elif key == "seed":
+            options[key] = int(value)
+        elif key == "symbols":
+            options[key] = {coin: float(mid) for coin, mid in (pair.split(":") for pair in value.split(","))}
+        else:
+            raise ValueError(f"Неизвестный параметр {key}")
+    return options
+
+
+async def main(source: str, options: dict):
+    exchanges = MockExchanges(capture=None if source == "synthetic" else source, **options)
+    await exchanges.start()
+
+    print("🧪 Для клиентов:")
+    for name, value in exchanges.client_env().items():
+        print(f"  export {name}={value}")
+
+    try:
+        while True:
+            await asyncio.sleep(10)
+            for venue, engine in (("binance", exchanges.binance_engine), ("hyperliquid", exchanges.hyperliquid_engine),
+                                  ("bybit", exchanges.bybit_engine), ("extended", exchanges.extended_engine)):
+                print(f"📊 {venue}: {engine.stats}")
+            print(f"📊 отказы: {exchanges.faults.stats}")
+    finally:
+        await exchanges.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage:")
+        print("  python run_mock.py synthetic [symbols=BTC:50000,ETH:3000] [latency_ms=5 jitter_ms=2 ...]")
+        print("  python run_mock.py capture.bin [speed=1] [error_rate=0.01 order_reject_rate=0.05 ws_drop_s=60]")
+        print(f"  Параметры отказов: {', '.join(FAULT_DEFAULTS)}")
+        sys.exit(1)
+
+    try:
+        asyncio.run(main(sys.argv[1], parse_options(sys.argv[2:])))
+    except KeyboardInterrupt:
+        pass
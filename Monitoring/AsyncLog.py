@@ -0,0 +1,269 @@
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+# Настройки через окружение: LOG_JSON=path — дублировать логи и print в JSON lines
+LOG_JSON = os.getenv("LOG_JSON")
+# С одного места вызова (файл:строка) пропускается не больше LOG_SITE_BURST записей за LOG_SITE_INTERVAL_S
+LOG_SITE_BURST = int(os.getenv("LOG_SITE_BURST", "10"))
+LOG_SITE_INTERVAL_S = float(os.getenv("LOG_SITE_INTERVAL_S", "1"))
+# Очередь длиннее этого — писатель не успевает, новые записи отбрасываются
+LOG_QUEUE_LIMIT = 100_000
+
+CONSOLE_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+_FLUSH = object()
+_STOP = object()
+
+
+class SiteLimiter:
+    """
+    Ограничение частоты по месту вызова: не больше burst записей за interval секунд,
+    остальные считаются и дописываются к следующей пропущенной записи как (+N пропущено).
+    """
+
+    __slots__ = ("burst", "interval", "_sites")
+
+    def __init__(self, burst: int = LOG_SITE_BURST, interval: float = LOG_SITE_INTERVAL_S):
+        self.burst = burst
+        self.interval = interval
+        # site -> [начало окна, записей в окне, пропущено, счетчик для sample]
+        self._sites = {}
+
+    def allow(self, site, sample: int = 1):
+        """Возвращает None, если запись отбрасывается, иначе число пропущенных перед ней"""
+        state = self._sites.get(site)
+        now = time.monotonic()
+        if state is None:
+            state = self._sites[site] = [now, 0, 0, 0]
+        elif now - state[0] >= self.interval:
+            state[0] = now
+            state[1] = 0
+
+        state[3] += 1
+        if (sample > 1 and state[3] % sample != 1) or state[1] >= self.burst:
+            state[2] += 1
+            return None
+        state[1] += 1
+        suppressed, state[2] = state[2], 0
+        return suppressed
+
+
+class AsyncLogHandler(logging.Handler):
+    """
+    Обработчик корневого логгера: в цикле событий запись только проходит ограничитель
+    и кладется в очередь, форматирование и запись в консоль/файл делает поток AsyncLogWriter.
+    ERROR и выше не ограничиваются. extra={"sample": N} — писать каждую N-ю запись места.
+    """
+
+    def __init__(self, writer, limiter: SiteLimiter):
+        super().__init__()
+        self.writer = writer
+        self.limiter = limiter
+
+    def emit(self, record):
+        if record.levelno < logging.ERROR:
+            suppressed = self.limiter.allow((record.pathname, record.lineno), getattr(record, "sample", 1))
+            if suppressed is None:
+                return
+            record.suppressed = suppressed
+        self.writer.put(record)
+
+
+class QueuedStdout:
+    """
+    Замена sys.stdout: print кладет текст в очередь писателя вместо записи в терминал.
+    Места вызова print ограничиваются тем же SiteLimiter, что и логи. flush() ждет,
+    пока писатель все выведет (его вызывает input() перед чтением ответа).
+    """
+
+    def __init__(self, writer, limiter: SiteLimiter, stream):
+        self.writer = writer
+        self.limiter = limiter
+        self.stream = stream
+        self._last_site = None
+        self._last_suppressed = None
+        self._line_done = True
+        self._note = 0
+
+    def write(self, text: str) -> int:
+        frame = sys._getframe(1)
+        site = (frame.f_code.co_filename, frame.f_lineno)
+        # print пишет аргументы, sep и end отдельными вызовами — все они следуют решению по первому
+        if site != self._last_site or self._line_done:
+            self._last_suppressed = self.limiter.allow(site)
+            self._note = self._last_suppressed or 0
+        self._last_site = site
+        self._line_done = text.endswith("\n")
+        if self._last_suppressed is not None:
+            if self._note and self._line_done:
+                self.writer.put((f"{text[:-1]} (+{self._note} пропущено)\n", site))
+                self._note = 0
+            else:
+                self.writer.put((text, site))
+        return len(text)
+
+    def flush(self):
+        self.writer.flush()
+
+    def isatty(self) -> bool:
+        return self.stream.isatty()
+
+    def __getattr__(self, name):
+        # fileno, encoding, errors и прочее — от настоящего потока
+        return getattr(self.stream, name)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Одна запись — одна JSON строка: ts, level, logger, site, msg (+ exc, suppressed)"""
+
+    def format(self, record) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "site": f"{record.module}:{record.lineno}",
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class AsyncLogWriter(threading.Thread):
+    """Фоновый поток: разбирает очередь записей и текста print, пишет в консоль и JSON lines"""
+
+    def __init__(self, stream, json_path: str = None):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue = queue.SimpleQueue()
+        self.stream = stream
+        self.console = logging.Formatter(CONSOLE_FORMAT)
+        self.json = JsonLinesFormatter()
+        self.json_file = open(json_path, "a", encoding="utf-8") if json_path else None
+        self.stats = {"written": 0, "dropped": 0}
+        self._flushed = threading.Condition()
+        self._flush_seq = 0
+
+    def put(self, item):
+        if self.queue.qsize() >= LOG_QUEUE_LIMIT:
+            self.stats["dropped"] += 1
+            return
+        self.queue.put(item)
+
+    def flush(self, timeout: float = 1.0):
+        """Блокирует вызывающего, пока все, что было в очереди, не будет выведено"""
+        if threading.current_thread() is self or not self.is_alive():
+            return
+        with self._flushed:
+            target = self._flush_seq + 1
+            self.queue.put(_FLUSH)
+            self._flushed.wait_for(lambda: self._flush_seq >= target, timeout)
+
+    def stop(self):
+        self.queue.put(_STOP)
+        self.join(timeout=5)
+        if self.json_file:
+            self.json_file.close()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                self.stream.flush()
+                return
+            if item is _FLUSH:
+                self.stream.flush()
+                if self.json_file:
+                    self.json_file.flush()
+                with self._flushed:
+                    self._flush_seq += 1
+                    self._flushed.notify_all()
+                continue
+            try:
+                self._write(item)
+            except Exception as e:
+                self.stream.write(f"❌ Ошибка записи лога: {e}\n")
+
+    def _write(self, item):
+        self.stats["written"] += 1
+        if isinstance(item, logging.LogRecord):
+            line = self.console.format(item)
+            if getattr(item, "suppressed", 0):
+                line += f" (+{item.suppressed} пропущено)"
+            self.stream.write(line + "\n")
+            if self.json_file:
+                self.json_file.write(self.json.format(item) + "\n")
+            return
+
+        text, (filename, lineno) = item
+        self.stream.write(text)
+        if self.json_file and text.strip():
+            self.json_file.write(json.dumps({
+                "ts": round(time.time(), 6),
+                "level": "PRINT",
+                "logger": "stdout",
+                "site": f"{os.path.splitext(os.path.basename(filename))[0]}:{lineno}",
+                "msg": text.rstrip("\n"),
+            }, ensure_ascii=False) + "\n")
+
+
+_writer = None
+_original_stdout = None
+
+
+def setup_logging(level: int = None, json_path: str = LOG_JSON, capture_print: bool = True):
+    """
+    Переводит логирование процесса на очередь с фоновым писателем: заменяет обработчики
+    корневого логгера на AsyncLogHandler и (capture_print) sys.stdout на QueuedStdout.
+    Уровень, выставленный модулями при импорте, сохраняется, если level не задан явно.
+    Повторный вызов ничего не делает.
+    """
+    global _writer, _original_stdout
+    if _writer is not None:
+        return _writer
+
+    _original_stdout = sys.stdout
+    _writer = AsyncLogWriter(sys.stdout, json_path)
+    _writer.start()
+    limiter = SiteLimiter()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(AsyncLogHandler(_writer, limiter))
+    if level is not None:
+        root.setLevel(level)
+
+    if capture_print:
+        sys.stdout = QueuedStdout(_writer, limiter, _original_stdout)
+    return _writer
+
+
+def shutdown_logging():
+    """Выводит остаток очереди, возвращает sys.stdout и обычный StreamHandler"""
+    global _writer, _original_stdout
+    if _writer is None:
+        return
+    if _original_stdout is not None:
+        sys.stdout = _original_stdout
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, AsyncLogHandler):
+            root.removeHandler(handler)
+    _writer.stop()
+    root.addHandler(logging.StreamHandler())
+    _writer = None
+    _original_stdout = None
+
+
+def get_log_stats() -> dict:
+    """Записано/отброшено писателем и текущая длина очереди"""
+    if _writer is None:
+        return None
+    return {**_writer.stats, "queued": _writer.queue.qsize()}
@@ -0,0 +1,99 @@
+import time
+
+from Monitoring.Metrics import LatencyWindow
+from Monitoring.Telemetry import TELEMETRY, observe_event
+
+
+class FeedLatency:
+    """
+    Задержки одного потока (биржа + тип события).
+
+    delay — сырая разница локальных настенных часов и времени биржи, в нее входит
+    расхождение часов. Минимум delay по окну принимается за смещение часов
+    (плюс минимальная сетевая задержка); lag = delay - смещение показывает,
+    насколько поток отстает от своего лучшего состояния, независимо от часов.
+    persist — от получения сообщения до записи в Dragonfly (monotonic).
+    """
+
+    def __init__(self, size: int = 2048):
+        self.delay = LatencyWindow(size)
+        self.persist = LatencyWindow(size)
+
+    def observe(self, exchange_ts_ms, recv_wall_ns: int, recv_mono_ns: int, persist_mono_ns: int = None):
+        if exchange_ts_ms:
+            self.delay.observe(recv_wall_ns - int(exchange_ts_ms) * 1_000_000)
+        if persist_mono_ns is not None:
+            self.persist.observe(persist_mono_ns - recv_mono_ns)
+
+    def clock_offset_ms(self) -> float:
+        return self.delay.percentile(0.0) / 1e6
+
+    def snapshot(self) -> dict:
+        offset_ns = self.delay.percentile(0.0)
+        p50 = self.delay.percentile(0.50)
+        p99 = self.delay.percentile(0.99)
+        worst = self.delay.percentile(1.0)
+        return {
+            "count": self.delay.count,
+            "clock_offset_ms": offset_ns / 1e6,
+            "delay_ms": {"p50": p50 / 1e6, "p99": p99 / 1e6, "max": worst / 1e6},
+            "lag_ms": {
+                "p50": (p50 - offset_ns) / 1e6,
+                "p99": (p99 - offset_ns) / 1e6,
+                "max": (worst - offset_ns) / 1e6,
+            },
+            "persist": self.persist.snapshot(),
+        }
+
+
+_feeds = {}
+_listeners = []
+
+
+def receive_time() -> tuple:
+    """Время получения сообщения: (настенные ns для сравнения с биржей, monotonic ns)"""
+    return time.time_ns(), time.monotonic_ns()
+
+
+def observe_feed(venue: str, kind: str, exchange_ts_ms, recv_wall_ns: int, recv_mono_ns: int,
+                 persist_mono_ns: int = None):
+    feed = _feeds.get((venue, kind))
+    if feed is None:
+        feed = _feeds[(venue, kind)] = FeedLatency()
+    feed.observe(exchange_ts_ms, recv_wall_ns, recv_mono_ns, persist_mono_ns)
+
+
+def stamp_event(venue: str, kind: str, event: dict, exchange_ts_ms, received: tuple) -> dict:
+    """
+    Вызывается после записи в Dragonfly: дописывает в нормализованное событие
+    exchangeTs (мс биржи), recvNs и persistNs (monotonic ns) и пишет замер.
+    С телеметрией событие еще считается и открывает трассу книги (см. Telemetry.observe_event).
+    """
+    recv_wall_ns, recv_mono_ns = received
+    persist_mono_ns = time.monotonic_ns()
+    event["exchangeTs"] = int(exchange_ts_ms) if exchange_ts_ms else None
+    event["recvNs"] = recv_mono_ns
+    event["persistNs"] = persist_mono_ns
+    observe_feed(venue, kind, exchange_ts_ms, recv_wall_ns, recv_mono_ns, persist_mono_ns)
+    if TELEMETRY:
+        observe_event(venue, kind, event, recv_mono_ns, persist_mono_ns)
+    for listener in _listeners:
+        listener(venue, kind, event)
+    return event
+
+
+def add_event_listener(callback):
+    """
+    callback(venue, kind, event) вызывается из stamp_event для каждого нормализованного
+    события в цикле событий клиента — без ZMQ и Dragonfly (см. Execution/FillEvents.py).
+    """
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def get_feed_latency_stats() -> dict:
+    """Задержки по биржам: {venue: {kind: snapshot}}"""
+    stats = {}
+    for (venue, kind), feed in _feeds.items():
+        stats.setdefault(venue, {})[kind] = feed.snapshot()
+    return stats
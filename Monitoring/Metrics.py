@@ -0,0 +1,69 @@
+import time
+from collections import deque
+
+
+class LatencyWindow:
+    """
+    Скользящее окно последних замеров задержки (в наносекундах).
+    Запись — O(1) без аллокаций сверх deque, перцентили считаются только при чтении.
+    """
+
+    def __init__(self, size: int = 2048):
+        self._samples = deque(maxlen=size)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def observe(self, value_ns: int):
+        self._samples.append(value_ns)
+        self.count += 1
+        self.total_ns += value_ns
+        if value_ns > self.max_ns:
+            self.max_ns = value_ns
+
+    def percentile(self, q: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return float(ordered[index])
+
+    def snapshot(self) -> dict:
+        """Сводка в миллисекундах"""
+        if not self._samples:
+            return {"count": self.count, "avg_ms": 0.0, "p50_ms": 0.0, "p99_ms": 0.0, "p999_ms": 0.0, "max_ms": 0.0}
+
+        ordered = sorted(self._samples)
+        last = len(ordered) - 1
+        return {
+            "count": self.count,
+            "avg_ms": self.total_ns / self.count / 1e6,
+            "p50_ms": ordered[min(last, int(0.50 * len(ordered)))] / 1e6,
+            "p99_ms": ordered[min(last, int(0.99 * len(ordered)))] / 1e6,
+            "p999_ms": ordered[min(last, int(0.999 * len(ordered)))] / 1e6,
+            "max_ms": self.max_ns / 1e6,
+        }
+
+    def reset(self):
+        self._samples.clear()
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+
+class LatencyTimer:
+    """Контекстный менеджер: замеряет блок и пишет результат в LatencyWindow"""
+
+    __slots__ = ("_window", "_start")
+
+    def __init__(self, window: LatencyWindow):
+        self._window = window
+        self._start = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._window.observe(time.perf_counter_ns() - self._start)
+        return False
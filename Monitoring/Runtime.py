@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from Monitoring.AsyncLog import setup_logging, shutdown_logging
+from Monitoring.Metrics import LatencyWindow
+from Monitoring.Telemetry import METRICS_PORT, start_metrics_server, stop_metrics_server
+
+logger = logging.getLogger(__name__)
+
+# Настройки через окружение: RUNTIME_UVLOOP=0 — стандартный цикл даже при установленном uvloop
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "100"))
+SLOW_CALLBACK_MS = float(os.getenv("SLOW_CALLBACK_MS", "50"))
+
+
+def install_event_loop_policy() -> str:
+    """
+    Ставит политику цикла событий для всех точек входа: uvloop, если он установлен,
+    на Windows — SelectorEventLoop (его требуют aiohttp/zmq). Возвращает имя цикла.
+    """
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        return "selector"
+    if os.getenv("RUNTIME_UVLOOP", "1") != "0":
+        try:
+            import uvloop
+        except ImportError:
+            pass
+        else:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            return "uvloop"
+    return "asyncio"
+
+
+def _describe_task(loop) -> str:
+    """Имя и корутина задачи, которая сейчас выполняется в цикле (читается из чужого потока)"""
+    try:
+        task = asyncio.current_task(loop)
+    except RuntimeError:
+        task = None
+    if task is None:
+        return "callback вне задачи"
+    coro = task.get_coro()
+    return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+
+class LoopMonitor:
+    """
+    Задержка цикла событий и блокирующие вызовы.
+
+    lag: корутина засыпает на interval и меряет, насколько позже проснулась — это время,
+    которое цикл был занят чужой синхронной работой (send_json, print, logging, time.sleep...).
+
+    stalls: сторожевой поток проверяет, что сэмплер просыпается вовремя. Если цикл не
+    отвечает дольше slow_ms, поток снимает стек потока цикла и имя текущей задачи —
+    по ним видно, какая корутина и какая строка держат цикл. Когда цикл освобождается,
+    в лог уходит полная длительность блокировки. Работает и с uvloop.
+    """
+
+    def __init__(self, interval_ms: float = LOOP_LAG_INTERVAL_MS, slow_ms: float = SLOW_CALLBACK_MS,
+                 size: int = 2048, history: int = 20):
+        self.interval = interval_ms / 1000
+        self.slow = slow_ms / 1000
+        self.lag = LatencyWindow(size)
+        self.stalls = 0
+        self.worst_stall_ms = 0.0
+        self.recent = deque(maxlen=history)
+        self._loop = None
+        self._loop_thread = None
+        self._beat = time.monotonic()
+        self._task = None
+        self._watchdog = None
+        self._stop = threading.Event()
+        self._stall = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        # В debug режиме (PYTHONASYNCIODEBUG=1) asyncio сам пишет медленные callback с тем же порогом
+        self._loop.slow_callback_duration = self.slow
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._sample(), name="loop-lag-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+
+    async def _sample(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.lag.observe(max(int((now - start - self.interval) * 1e9), 0))
+            self._beat = now
+
+    def _watch(self):
+        while not self._stop.wait(self.slow / 2):
+            silent = time.monotonic() - self._beat - self.interval
+            if silent > self.slow and self._stall is None:
+                self._stall = self._capture(self._beat + self.interval)
+            elif silent <= self.slow and self._stall is not None:
+                self._finish(self._stall)
+                self._stall = None
+
+    def _capture(self, since: float) -> dict:
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = traceback.format_stack(frame, limit=6) if frame else []
+        return {"since": since, "task": _describe_task(self._loop), "stack": "".join(stack).rstrip()}
+
+    def _finish(self, stall: dict):
+        duration_ms = (self._beat - stall["since"]) * 1000
+        self.stalls += 1
+        self.worst_stall_ms = max(self.worst_stall_ms, duration_ms)
+        self.recent.append({"duration_ms": round(duration_ms, 1), "task": stall["task"],
+                            "at": time.strftime("%H:%M:%S")})
+        logger.warning(f"🐢 Цикл событий заблокирован на {duration_ms:.0f} мс: {stall['task']}\n{stall['stack']}")
+
+    def snapshot(self) -> dict:
+        return {
+            "lag": self.lag.snapshot(),
+            "stalls": self.stalls,
+            "worst_stall_ms": round(self.worst_stall_ms, 1),
+            "recent_stalls": list(self.recent),
+        }
+
+
+_monitor = None
+
+
+def get_loop_stats() -> dict:
+    """Сводка LoopMonitor текущего процесса или None, если процесс запущен не через run()"""
+    return _monitor.snapshot() if _monitor else None
+
+
+def run(main, monitor: bool = True):
+    """
+    asyncio.run для точек входа: ставит uvloop (см. install_event_loop_policy), переводит
+    логи и print на фоновый писатель (см. AsyncLog.setup_logging) и на время работы main
+    держит LoopMonitor; в конце печатает задержки цикла. С METRICS_PORT поднимает /metrics.
+    """
+    global _monitor
+    loop_name = install_event_loop_policy()
+    setup_logging()
+    if METRICS_PORT:
+        start_metrics_server()
+
+    async def runner():
+        global _monitor
+        if not monitor:
+            return await main
+        _monitor = LoopMonitor()
+        _monitor.start()
+        try:
+            return await main
+        finally:
+            await _monitor.stop()
+            stats = _monitor.snapshot()
+            lag = stats["lag"]
+            print(f"⏱️ Цикл {loop_name}: lag p50={lag['p50_ms']:.2f} p99={lag['p99_ms']:.2f} "
+                  f"max={lag['max_ms']:.2f} мс, блокировок >{SLOW_CALLBACK_MS:.0f} мс: {stats['stalls']}")
+
+    try:
+        return asyncio.run(runner())
+    finally:
+        _monitor = None
+        stop_metrics_server()
+        shutdown_logging()
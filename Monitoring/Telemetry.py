@@ -0,0 +1,631 @@
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from zmq import SNDHWM
+except ImportError:
+    SNDHWM = None
+
+logger = logging.getLogger(__name__)
+
+# Настройки через окружение: METRICS_PORT=9108 — включить метрики и трассировку и отдавать их
+# на http://METRICS_HOST:METRICS_PORT/metrics (Prometheus) и /traces (последние спаны, JSON).
+# TELEMETRY=1 — собирать без HTTP (например, для бенчмарков). Решение принимается при импорте:
+# без них декораторы возвращают исходную функцию, а span()/decision() — общий пустой объект.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+TELEMETRY = bool(METRICS_PORT) or os.getenv("TELEMETRY", "0") == "1"
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "2000"))
+# Ордера, ждущие первого исполнения; старые вытесняются (отмененные ордера fill не получат)
+PENDING_ORDERS_LIMIT = 10_000
+
+# Границы гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Разница настенных и monotonic часов — спаны пишутся в monotonic ns, наружу отдаются в unix времени
+_WALL_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+# ============= МЕТРИКИ =============
+
+class Counter:
+    """
+    Счетчик с метками. Метки передаются кортежем значений в порядке labelnames —
+    в горячем пути нет ни dict, ни kwargs.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, labels: tuple = (), value=1):
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def samples(self):
+        for labels, value in list(self.values.items()):
+            yield self.name, dict(zip(self.labelnames, labels)), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, labels: tuple, value):
+        self.values[labels] = value
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами: в observe один bisect и два сложения"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [счетчики по корзинам..., +Inf, сумма]
+        self.values = {}
+
+    def observe(self, labels: tuple, seconds: float):
+        state = self.values.get(labels)
+        if state is None:
+            state = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, seconds)] += 1
+        state[-1] += seconds
+
+    def samples(self):
+        for labels, state in list(self.values.items()):
+            base = dict(zip(self.labelnames, labels))
+            state = list(state)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", {**base, "le": _format_value(float(bound))}, cumulative
+            yield f"{self.name}_count", base, cumulative
+            yield f"{self.name}_sum", base, state[-1]
+
+
+class Registry:
+    """
+    Метрики процесса и сборщики. Сборщик — функция без аргументов, которая при каждом
+    запросе /metrics возвращает семейства (name, kind, help, [(labels, value), ...]);
+    так в экспорт попадают уже существующие окна LatencyWindow без замеров в горячем пути.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def collector(self, func):
+        self._collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for func in self._collectors:
+            try:
+                families = list(func())
+            except Exception as e:
+                lines.append(f"# collector {func.__name__} failed: {_escape(e)}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for sample_name, labels, value in samples:
+                    lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def summary_samples(name: str, snapshot: dict, labels: dict = None) -> list:
+    """Сводка LatencyWindow.snapshot() (мс) как Prometheus summary в секундах"""
+    labels = labels or {}
+    samples = [(name, {**labels, "quantile": q}, snapshot[key] / 1000)
+               for q, key in (("0.5", "p50_ms"), ("0.99", "p99_ms"), ("0.999", "p999_ms"), ("1", "max_ms"))]
+    samples.append((f"{name}_count", labels, snapshot["count"]))
+    samples.append((f"{name}_sum", labels, snapshot["avg_ms"] * snapshot["count"] / 1000))
+    return samples
+
+
+REGISTRY = Registry()
+
+WS_MESSAGES = REGISTRY.counter(
+    "hedger_ws_messages_total", "Нормализованные события WS (после записи в Dragonfly)", ("venue", "kind", "symbol"))
+WS_RECONNECTS = REGISTRY.counter(
+    "hedger_ws_reconnects_total", "Переподключения WS потоков", ("venue", "stream"))
+ORDER_RTT = REGISTRY.histogram(
+    "hedger_order_rtt_seconds", "Время вызова ордерного метода клиента до ответа биржи", ("venue", "method", "outcome"))
+FILL_LATENCY = REGISTRY.histogram(
+    "hedger_fill_latency_seconds", "От отправки ордера до первого исполнения в user stream", ("venue",))
+ZMQ_SENT = REGISTRY.counter(
+    "hedger_zmq_sent_total", "События, отправленные в ZMQ PUSH", ("venue",))
+ZMQ_SEND = REGISTRY.histogram(
+    "hedger_zmq_send_seconds", "Время send_json: растет, когда очередь сокета упирается в SNDHWM", ("venue",),
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.01, 0.1, 1.0))
+ZMQ_HWM = REGISTRY.gauge(
+    "hedger_zmq_sndhwm", "Лимит исходящей очереди ZMQ сокета (SNDHWM)", ("venue",))
+BOOK_TO_DECISION = REGISTRY.histogram(
+    "hedger_book_to_decision_seconds", "От получения книги, на которой принято решение, до начала решения", ("strategy",))
+DECISION = REGISTRY.histogram(
+    "hedger_decision_seconds", "Длительность решения стратегии вместе с выставлением ордеров", ("strategy", "outcome"))
+
+
+# ============= СБОРЩИКИ =============
+# Модули читаются из sys.modules: Telemetry не тянет за собой redis и не создает циклов импорта
+
+@REGISTRY.collector
+def _dragonfly_metrics():
+    pool = sys.modules.get("DragonflyDb.DragonFlyPool")
+    if pool is None:
+        return
+    stats = pool.get_pool_stats()
+    commands = []
+    for command, snapshot in stats["commands"].items():
+        commands.extend(summary_samples("hedger_dragonfly_command_seconds", snapshot, {"command": command}))
+    yield "hedger_dragonfly_command_seconds", "summary", "Задержка команд Dragonfly", commands
+    yield ("hedger_dragonfly_pipeline_seconds", "summary", "Задержка pipeline Dragonfly",
+           summary_samples("hedger_dragonfly_pipeline_seconds", stats["pipeline"]))
+    yield "hedger_dragonfly_pool_connections", "gauge", "Соединения пула Dragonfly", [
+        ("hedger_dragonfly_pool_connections", {"state": "in_use"}, stats["pool"]["in_use"]),
+        ("hedger_dragonfly_pool_connections", {"state": "idle"}, stats["pool"]["idle"]),
+    ]
+
+
+@REGISTRY.collector
+def _feed_metrics():
+    feeds = sys.modules.get("Monitoring.FeedLatency")
+    if feeds is None:
+        return
+    lag, persist, offset = [], [], []
+    for venue, kinds in feeds.get_feed_latency_stats().items():
+        for kind, snapshot in kinds.items():
+            labels = {"venue": venue, "kind": kind}
+            for q, key in (("0.5", "p50"), ("0.99", "p99"), ("1", "max")):
+                lag.append(("hedger_feed_lag_seconds", {**labels, "quantile": q}, snapshot["lag_ms"][key] / 1000))
+            persist.extend(summary_samples("hedger_feed_persist_seconds", snapshot["persist"], labels))
+            offset.append(("hedger_feed_clock_offset_seconds", labels, snapshot["clock_offset_ms"] / 1000))
+    yield "hedger_feed_lag_seconds", "summary", "Отставание потока от его лучшего состояния", lag
+    yield "hedger_feed_persist_seconds", "summary", "От получения сообщения до записи в Dragonfly", persist
+    yield "hedger_feed_clock_offset_seconds", "gauge", "Смещение часов биржи плюс минимальная сетевая задержка", offset
+
+
+@REGISTRY.collector
+def _loop_metrics():
+    runtime = sys.modules.get("Monitoring.Runtime")
+    stats = runtime.get_loop_stats() if runtime else None
+    if stats is None:
+        return
+    yield ("hedger_loop_lag_seconds", "summary", "Задержка цикла событий",
+           summary_samples("hedger_loop_lag_seconds", stats["lag"]))
+    yield "hedger_loop_stalls_total", "counter", "Блокировки цикла дольше SLOW_CALLBACK_MS", [
+        ("hedger_loop_stalls_total", {}, stats["stalls"])]
+
+
+@REGISTRY.collector
+def _log_metrics():
+    log = sys.modules.get("Monitoring.AsyncLog")
+    stats = log.get_log_stats() if log else None
+    if stats is None:
+        return
+    yield "hedger_log_records_total", "counter", "Записи фонового писателя логов", [
+        ("hedger_log_records_total", {"state": "written"}, stats["written"]),
+        ("hedger_log_records_total", {"state": "dropped"}, stats["dropped"]),
+    ]
+    yield "hedger_log_queue", "gauge", "Длина очереди писателя логов", [("hedger_log_queue", {}, stats["queued"])]
+
+
+@REGISTRY.collector
+def _rate_limit_metrics():
+    limits = sys.modules.get("CexWsClients.RateLimitGovernor")
+    stats = limits.get_rate_limit_stats() if limits else None
+    if not stats:
+        return
+    tokens, throttled, waits, rejections = [], [], [], []
+    for venue, snapshot in stats.items():
+        tokens.append(("hedger_rate_limit_tokens", {"venue": venue, "bucket": "weight"}, snapshot["tokens"]))
+        if snapshot["order_tokens"] is not None:
+            tokens.append(("hedger_rate_limit_tokens", {"venue": venue, "bucket": "orders"}, snapshot["order_tokens"]))
+        for priority, count in snapshot["throttled"].items():
+            labels = {"venue": venue, "priority": priority}
+            throttled.append(("hedger_rate_limit_throttled_total", labels, count))
+            waits.extend(summary_samples("hedger_rate_limit_wait_seconds", snapshot["waits"][priority], labels))
+        rejections.append(("hedger_rate_limit_rejections_total", {"venue": venue}, snapshot["rejections"]))
+    yield "hedger_rate_limit_tokens", "gauge", "Свободные токены корзин регулятора запросов", tokens
+    yield "hedger_rate_limit_throttled_total", "counter", "Запросы, ждавшие токенов регулятора", throttled
+    yield "hedger_rate_limit_wait_seconds", "summary", "Ожидание токенов по приоритетам", waits
+    yield "hedger_rate_limit_rejections_total", "counter", "Ответы 429/418 от биржи", rejections
+
+
+@REGISTRY.collector
+def _time_sync_metrics():
+    clocks = sys.modules.get("CexWsClients.ServerTime")
+    stats = clocks.get_time_sync_stats() if clocks else None
+    if not stats:
+        return
+    offset, rtt, window, syncs = [], [], [], []
+    for venue, snapshot in stats.items():
+        labels = {"venue": venue}
+        offset.append(("hedger_server_time_offset_seconds", labels, snapshot["offset_ms"] / 1000))
+        if snapshot["rtt_ms"] is not None:
+            rtt.append(("hedger_server_time_rtt_seconds", labels, snapshot["rtt_ms"] / 1000))
+        window.append(("hedger_recv_window_seconds", labels, snapshot["recv_window_ms"] / 1000))
+        for outcome in ("syncs", "failures", "resyncs"):
+            syncs.append(("hedger_time_sync_total", {**labels, "outcome": outcome}, snapshot[outcome]))
+    yield "hedger_server_time_offset_seconds", "gauge", "Смещение часов биржи относительно локальных", offset
+    yield "hedger_server_time_rtt_seconds", "gauge", "RTT лучшего замера серверного времени", rtt
+    yield "hedger_recv_window_seconds", "gauge", "recvWindow подписанных запросов", window
+    yield "hedger_time_sync_total", "counter", "Сверки часов: замеры, сбои, внеочередные сверки", syncs
+
+
+# ============= ТРАССИРОВКА =============
+
+_current_span = contextvars.ContextVar("hedger_span", default=None)
+_ids = itertools.count(1)
+_trace_prefix = f"{os.getpid():x}"
+_finished = deque(maxlen=TRACE_BUFFER)
+# Последняя книга по (venue, монета) — к ней привязывается следующее решение
+_books = {}
+
+
+def _coin(symbol) -> str:
+    symbol = str(symbol or "").upper()
+    for suffix in ("USDT", "-USD"):
+        if symbol.endswith(suffix):
+            return symbol[:-len(suffix)]
+    return symbol
+
+
+class Span:
+    """
+    Отрезок пути события. Родитель берется из contextvar: ордерные вызовы внутри
+    with decision(...) (и в задачах asyncio.gather, они копируют контекст) становятся его детьми.
+    """
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attrs", "links", "_token")
+
+    def __init__(self, name: str, attrs: dict = None, trace_id: str = None, parent_id: str = None,
+                 start_ns: int = None):
+        parent = _current_span.get() if trace_id is None else None
+        if parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        self.trace_id = trace_id or f"{_trace_prefix}-{next(_ids):x}"
+        self.span_id = f"{next(_ids):x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = start_ns or time.monotonic_ns()
+        self.end_ns = None
+        self.attrs = attrs or {}
+        self.links = ()
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.end_ns = time.monotonic_ns()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _current_span.reset(self._token)
+        _finished.append(self)
+        return False
+
+    def to_dict(self) -> dict:
+        end_ns = self.end_ns or time.monotonic_ns()
+        return {
+            "trace": self.trace_id,
+            "span": self.span_id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "ts": (self.start_ns + _WALL_OFFSET_NS) / 1e9,
+            "duration_ms": (end_ns - self.start_ns) / 1e6,
+            "attrs": self.attrs,
+            "links": list(self.links),
+        }
+
+
+class _DecisionSpan(Span):
+    __slots__ = ("strategy", "book_ns", "books")
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        super().__exit__(exc_type, exc_val, exc_tb)
+        # Книги попадают в буфер только вместе с решением, которое на них опиралось
+        for book in self.books:
+            if book.attrs.pop("_pending", False):
+                _finished.append(book)
+        if self.book_ns:
+            BOOK_TO_DECISION.observe((self.strategy,), (self.start_ns - self.book_ns) / 1e9)
+        DECISION.observe((self.strategy, self.attrs.get("outcome", "error" if exc_type else "done")),
+                         (self.end_ns - self.start_ns) / 1e9)
+        return False
+
+
+class _NoopSpan:
+    """Возвращается, когда телеметрия выключена: with и set() ничего не делают"""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attrs):
+    """with span("name", key=value): — дочерний спан текущего решения/ордера"""
+    if not TELEMETRY:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def decision(strategy: str, coin: str, venues: tuple = ()):
+    """
+    with decision("scalper", "ETH", ("binance", "hyperliquid")) as d: ... d.set(outcome="open")
+    Открывает спан решения в трассе самой свежей книги из venues и связывает его со всеми
+    их книгами; ордера, выставленные внутри, становятся его детьми.
+    """
+    if not TELEMETRY:
+        return _NOOP
+    coin = _coin(coin)
+    books = [book for book in (_books.get((venue, coin)) for venue in venues) if book is not None]
+    newest = max(books, key=lambda book: book.start_ns) if books else None
+    current = _DecisionSpan("decision", {"strategy": strategy, "coin": coin},
+                            trace_id=newest.trace_id if newest else None,
+                            parent_id=newest.span_id if newest else None)
+    current.strategy = strategy
+    current.book_ns = newest.start_ns if newest else None
+    current.books = books
+    current.links = [{"trace": book.trace_id, "span": book.span_id, "venue": book.attrs["venue"]} for book in books]
+    return current
+
+
+def get_recent_spans(limit: int = 200) -> list:
+    spans = list(_finished)[-limit:]
+    return [item.to_dict() for item in spans]
+
+
+# ============= ХУКИ КЛИЕНТОВ =============
+
+# (venue, orderId) -> (monotonic ns отправки, спан ордера); ранние fill — до ответа REST
+_pending_orders = OrderedDict()
+_early_fills = OrderedDict()
+
+
+def _remember(store: OrderedDict, key, value):
+    store[key] = value
+    if len(store) > PENDING_ORDERS_LIMIT:
+        store.popitem(last=False)
+
+
+def _record_fill(venue: str, order_id: str, sent_ns: int, parent: Span, filled_ns: int):
+    FILL_LATENCY.observe((venue,), (filled_ns - sent_ns) / 1e9)
+    if parent is not None:
+        fill = Span("fill", {"venue": venue, "orderId": order_id}, trace_id=parent.trace_id,
+                    parent_id=parent.span_id, start_ns=filled_ns)
+        fill.end_ns = filled_ns
+        _finished.append(fill)
+
+
+def observe_event(venue: str, kind: str, event: dict, recv_mono_ns: int, persist_mono_ns: int):
+    """
+    Вызывается из FeedLatency.stamp_event для каждого нормализованного события: счетчик
+    сообщений, спан книги (его подхватит следующее решение) и латентность первого исполнения.
+    """
+    symbol = event.get("coin") or event.get("symbol") or ""
+    WS_MESSAGES.inc((venue, kind, symbol))
+    if kind == "book" or kind == "bbo":
+        book = Span("book", {"venue": venue, "kind": kind, "coin": _coin(symbol), "_pending": True},
+                    trace_id=f"{_trace_prefix}-{next(_ids):x}", start_ns=recv_mono_ns)
+        book.end_ns = persist_mono_ns
+        _books[(venue, _coin(symbol))] = book
+    elif kind == "fill":
+        if not (event.get("fillSz") or event.get("fill_sz")):
+            return
+        order_id = str(event.get("orderId") or event.get("order_id") or "")
+        placed = _pending_orders.pop((venue, order_id), None)
+        if placed is None:
+            _remember(_early_fills, (venue, order_id), recv_mono_ns)
+            return
+        _record_fill(venue, order_id, placed[0], placed[1], recv_mono_ns)
+
+
+def _order_id(result):
+    if isinstance(result, dict):
+        order_id = result.get("orderId") or result.get("order_id")
+        return str(order_id) if order_id else None
+    return None
+
+
+def traced_order(venue: str):
+    """
+    Декоратор ордерных методов клиента: гистограмма RTT по методу и исходу, дочерний спан
+    текущего решения и регистрация ордера для hedger_fill_latency_seconds.
+    Без телеметрии возвращает метод как есть — никакой обертки в вызове.
+    """
+    def decorate(func):
+        if not TELEMETRY:
+            return func
+        method = func.__name__
+        places = not method.startswith("cancel")
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with Span(method, {"venue": venue}) as order_span:
+                start = order_span.start_ns
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException:
+                    ORDER_RTT.observe((venue, method, "error"), (time.monotonic_ns() - start) / 1e9)
+                    raise
+                acked = time.monotonic_ns()
+                ORDER_RTT.observe((venue, method, "ok" if result else "empty"), (acked - start) / 1e9)
+
+                # Пакетные методы (place_limit_orders) возвращают список — регистрируется каждый ордер
+                order_ids = []
+                for item in (result if isinstance(result, list) else [result]) if places else ():
+                    order_id = _order_id(item)
+                    if not order_id:
+                        continue
+                    order_ids.append(order_id)
+                    early = _early_fills.pop((venue, order_id), None)
+                    if early is not None or item.get("status") == "FILLED":
+                        _record_fill(venue, order_id, start, order_span, early or acked)
+                    else:
+                        _remember(_pending_orders, (venue, order_id), (start, order_span))
+                if order_ids:
+                    order_span.set(orderId=",".join(order_ids))
+                return result
+        return wrapper
+    return decorate
+
+
+def count_reconnect(venue: str, stream: str):
+    if TELEMETRY:
+        WS_RECONNECTS.inc((venue, stream))
+
+
+class _InstrumentedSocket:
+    """Обертка ZMQ PUSH сокета: число отправок и время send_json по бирже"""
+
+    __slots__ = ("_socket", "_labels")
+
+    def __init__(self, socket, venue: str):
+        self._socket = socket
+        self._labels = (venue,)
+
+    def send_json(self, obj, *args, **kwargs):
+        start = time.perf_counter_ns()
+        try:
+            return self._socket.send_json(obj, *args, **kwargs)
+        finally:
+            ZMQ_SEND.observe(self._labels, (time.perf_counter_ns() - start) / 1e9)
+            ZMQ_SENT.inc(self._labels)
+
+    def __getattr__(self, name):
+        return getattr(self._socket, name)
+
+
+def instrument_zmq(socket, venue: str):
+    """
+    libzmq не отдает длину исходящей очереди, поэтому глубина видна косвенно: пока очередь
+    ниже SNDHWM, send_json — микросекунды, при заполнении он блокирует цикл. Без телеметрии
+    возвращает сам сокет.
+    """
+    if not TELEMETRY:
+        return socket
+    ZMQ_HWM.set((venue,), socket.getsockopt(SNDHWM) if SNDHWM is not None else 0)
+    return _InstrumentedSocket(socket, venue)
+
+
+# ============= HTTP =============
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = REGISTRY.render().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/traces":
+            body = json.dumps(get_recent_spans(), ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Каждый scrape в лог не пишем
+        pass
+
+
+_server = None
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = METRICS_HOST):
+    """
+    Поднимает /metrics и /traces в фоновом потоке (stdlib, без зависимостей). Метрики читаются
+    из потока сервера без блокировок: копии словарей и deque под GIL. Повторный вызов ничего не делает.
+    """
+    global _server
+    if _server is not None or not port:
+        return _server
+    _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"📈 Метрики: http://{host}:{_server.server_address[1]}/metrics")
+    return _server
+
+
+def stop_metrics_server():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
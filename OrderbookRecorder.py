@@ -1,5 +1,4 @@
 import asyncio
-import sys
 import time
 import csv
 import json
@@ -10,10 +9,9 @@ from CexWsClients.AsyncHyperliquidWSClient import AsyncHyperliquidWSClient
 from InfoClients.AsyncBinanceInfoClient import AsyncBinanceInfoClient
 from InfoClients.AsyncHyperliquidInfoClient import AsyncHyperliquidInfoClient
 from DragonflyDb.DragonFlyConnector import DragonFlyConnector
+from Monitoring.Runtime import run
 
 logger = logging.getLogger(__name__)
-if sys.platform == "win32":
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 
 class OrderbookRecorder:
@@ -165,4 +163,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run(main())
\ No newline at end of file
@@ -0,0 +1,88 @@
+import atexit
+import os
+import struct
+import time
+
+# Запись в файле: recv_ns (uint64, настенные часы), длина ключа (uint16), длина кадра (uint32),
+# затем ключ потока (utf-8) и сам кадр без изменений
+_HEADER = struct.Struct("<QHI")
+FLUSH_BYTES = 64 * 1024
+
+_env_recorder = None
+
+
+class FrameRecorder:
+    """
+    Пишет сырые WS кадры в append-only файл. Запись копится в буфере и сбрасывается
+    блоками по flush_bytes, чтобы не делать syscall на каждый кадр горячего пути.
+
+    Ключ потока определяет, каким обработчиком кадр будет проигран:
+    binance:depth:<SYMBOL>, binance:bbo:<SYMBOL>, binance:mark:<SYMBOL>, binance:user,
+    hyperliquid, bybit:book:<SYMBOL>, extended.
+    """
+
+    def __init__(self, path: str, flush_bytes: int = FLUSH_BYTES):
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.frames = 0
+        self._file = open(path, "ab")
+        self._buffer = bytearray()
+
+    def record(self, key: str, frame, recv_ns: int = None):
+        if isinstance(frame, str):
+            frame = frame.encode("utf-8")
+        key_bytes = key.encode("utf-8")
+
+        self._buffer += _HEADER.pack(recv_ns or time.time_ns(), len(key_bytes), len(frame))
+        self._buffer += key_bytes
+        self._buffer += frame
+        self.frames += 1
+
+        if len(self._buffer) >= self.flush_bytes:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._file.flush()
+            self._buffer.clear()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def get_env_recorder():
+    """
+    Общий на процесс recorder, если задана переменная WS_CAPTURE_PATH; иначе None.
+    WS клиенты берут его при создании, так что запись включается без правки кода запуска.
+    """
+    global _env_recorder
+    path = os.getenv("WS_CAPTURE_PATH")
+    if path and _env_recorder is None:
+        _env_recorder = FrameRecorder(path)
+        atexit.register(_env_recorder.close)
+    return _env_recorder
+
+
+def read_frames(path: str):
+    """Генератор (recv_ns, key, frame: bytes). Недописанная последняя запись пропускается."""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+
+            recv_ns, key_len, frame_len = _HEADER.unpack(header)
+            body = f.read(key_len + frame_len)
+            if len(body) < key_len + frame_len:
+                return
+
+            yield recv_ns, body[:key_len].decode("utf-8"), body[key_len:]
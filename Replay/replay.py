@@ -0,0 +1,230 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from Monitoring.FeedLatency import get_feed_latency_stats, receive_time
+from Replay.FrameCapture import read_frames
+
+# Боевой сток событий, в который пушат WS клиенты
+LIVE_ZMQ_ENDPOINT = "tcp://127.0.0.1:5555"
+# Replay пишет в свою логическую БД Dragonfly — книги, ордера и позиции из захвата
+# не должны попасть в боевые ключи, которые читают работающие стратегии
+REPLAY_DRAGONFLY_DB = int(os.getenv("REPLAY_DRAGONFLY_DB", "15"))
+# Куда replay пушит события (PUSH); по умолчанию события отбрасываются
+REPLAY_ZMQ_ENDPOINT = os.getenv("REPLAY_ZMQ_ENDPOINT") or None
+# Каналы Hyperliquid с ордерами и исполнениями аккаунта
+HYPERLIQUID_USER_CHANNELS = {"userFills", "orderUpdates", "userEvents"}
+
+
+class NullSink:
+    """Заглушка ZMQ сокета: события replay никуда не уходят"""
+
+    def send_json(self, obj, *args, **kwargs):
+        pass
+
+    def close(self, linger=None):
+        pass
+
+
+class ReplayDriver:
+    """
+    Проигрывает записанные кадры в те же обработчики WS клиентов, что и в живом режиме.
+
+    speed: 1.0 — реальное время, N — в N раз быстрее, 0 — без пауз (максимальная скорость).
+    Время получения ставится в момент проигрывания, поэтому задержка "биржа -> локально"
+    в FeedLatency при replay не имеет смысла; persist (разбор + запись в Dragonfly) — имеет.
+
+    user_frames: проигрывать ли кадры аккаунта (ордера, исполнения). По умолчанию нет —
+    исторические исполнения через общий Dragonfly и ZMQ попадут к работающим стратегиям.
+    Включать только когда клиенты изолированы (см. isolate_client).
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, user_frames: bool = False):
+        self.path = path
+        self.speed = speed
+        self.user_frames = user_frames
+        self._routes = []
+
+    def route(self, prefix: str, handler):
+        """handler(key, frame: str, received) вызывается для кадров, ключ которых начинается с prefix"""
+        self._routes.append((prefix, handler))
+
+    def attach_binance(self, client):
+        def symbol_of(key):
+            return key.split(":", 2)[2]
+
+        async def user_frame(key, frame, received):
+            data = json.loads(frame)
+            if data.get("e") != "listenKeyExpired":
+                await client._handle_user_stream_message(data, received)
+
+        self.route("binance:depth:", lambda key, frame, received:
+                   client._handle_depth_message(symbol_of(key), frame, received))
+        self.route("binance:bbo:", lambda key, frame, received:
+                   client._handle_bbo_message(symbol_of(key), frame, received))
+        self.route("binance:mark:", lambda key, frame, received:
+                   client._handle_mark_price_message(symbol_of(key), frame, received))
+        if self.user_frames:
+            self.route("binance:user", user_frame)
+
+    def attach_hyperliquid(self, client):
+        async def frame_handler(key, frame, received):
+            data = json.loads(frame)
+            if not self.user_frames and data.get("channel") in HYPERLIQUID_USER_CHANNELS:
+                return
+            await client._handle_websocket_message(data, received)
+
+        self.route("hyperliquid", frame_handler)
+
+    def attach_bybit(self, client):
+        self.route("bybit:book:", lambda key, frame, received:
+                   client._handle_orderbook_message(key.split(":", 2)[2], frame, received))
+
+    def attach_extended(self, client):
+        async def frame_handler(key, frame, received):
+            data = json.loads(frame)
+            # Живой клиент принимает depthUpdate только по своим подпискам
+            if data.get("e") == "depthUpdate":
+                client.subscription_handlers.setdefault(f"orderbook_{data.get('s')}", None)
+            await client._handle_websocket_message(data, received)
+
+        self.route("extended", frame_handler)
+
+    def _handler_for(self, key: str):
+        for prefix, handler in self._routes:
+            if key.startswith(prefix):
+                return handler
+        return None
+
+    async def run(self) -> dict:
+        """Проигрывает файл целиком и возвращает пропускную способность по потокам"""
+        by_stream = {}
+        frames = errors = skipped = 0
+        first_ns = None
+        start = time.monotonic_ns()
+
+        for recv_ns, key, frame in read_frames(self.path):
+            if self.speed > 0:
+                if first_ns is None:
+                    first_ns = recv_ns
+                delay_ns = (recv_ns - first_ns) / self.speed - (time.monotonic_ns() - start)
+                if delay_ns > 0:
+                    await asyncio.sleep(delay_ns / 1e9)
+
+            handler = self._handler_for(key)
+            if handler is None:
+                skipped += 1
+                continue
+
+            stream = ":".join(key.split(":")[:2])
+            by_stream[stream] = by_stream.get(stream, 0) + 1
+            frames += 1
+            try:
+                await handler(key, frame.decode("utf-8"), receive_time())
+            except Exception as e:
+                errors += 1
+                print(f"❌ Ошибка обработки кадра {key}: {e}")
+
+        seconds = (time.monotonic_ns() - start) / 1e9
+        return {
+            "frames": frames,
+            "skipped": skipped,
+            "errors": errors,
+            "seconds": seconds,
+            "frames_per_sec": frames / seconds if seconds else 0.0,
+            "by_stream": by_stream,
+        }
+
+
+def isolate_client(client):
+    """Переключает ZMQ клиента с боевого стока на REPLAY_ZMQ_ENDPOINT или на NullSink"""
+    client.zmq_socket.close(linger=0)
+    if REPLAY_ZMQ_ENDPOINT is None:
+        client.zmq_socket = NullSink()
+        return
+    import zmq
+    socket = zmq.Context.instance().socket(zmq.PUSH)
+    socket.connect(REPLAY_ZMQ_ENDPOINT)
+    client.zmq_socket = socket
+
+
+async def main(path: str, speed: float, targets: list):
+    from DragonflyDb.DragonFlyPool import DRAGONFLY_CONFIG, close_shared_client, configure, get_pool_stats
+
+    if REPLAY_DRAGONFLY_DB == DRAGONFLY_CONFIG["db"]:
+        print(f"❌ REPLAY_DRAGONFLY_DB={REPLAY_DRAGONFLY_DB} совпадает с боевой БД Dragonfly — replay не запущен")
+        return
+    if REPLAY_ZMQ_ENDPOINT == LIVE_ZMQ_ENDPOINT:
+        print(f"❌ REPLAY_ZMQ_ENDPOINT совпадает с боевым стоком {LIVE_ZMQ_ENDPOINT} — replay не запущен")
+        return
+    # До создания клиентов: общий пул Dragonfly создается при первом обращении
+    configure(db=REPLAY_DRAGONFLY_DB)
+
+    driver = ReplayDriver(path, speed, user_frames=True)
+    clients = []
+
+    # Клиенты создаются без подключения к биржам — нужны только их обработчики, Dragonfly и ZMQ
+    if "binance" in targets:
+        from CexWsClients.AsyncBinanceWSClient import AsyncBinanceWSClient
+        client = AsyncBinanceWSClient("replay", "replay")
+        driver.attach_binance(client)
+        clients.append(client)
+    if "hyperliquid" in targets:
+        from eth_account import Account
+        from CexWsClients.AsyncHyperliquidWSClient import AsyncHyperliquidWSClient
+        account = Account.create()
+        client = AsyncHyperliquidWSClient(wallet=account, account_address=account.address)
+        driver.attach_hyperliquid(client)
+        clients.append(client)
+    if "bybit" in targets:
+        from CexWsClients.AsyncBybitWSClient import AsyncBybitWSClient
+        client = AsyncBybitWSClient("replay", "replay")
+        driver.attach_bybit(client)
+        clients.append(client)
+    if "extended" in targets:
+        from CexWsClients.AsyncExtendedWSClient import AsyncExtendedWSClient
+        client = AsyncExtendedWSClient("replay", "replay")
+        driver.attach_extended(client)
+        clients.append(client)
+
+    for client in clients:
+        isolate_client(client)
+    print(f"▶️ Replay: Dragonfly db={REPLAY_DRAGONFLY_DB}, ZMQ: {REPLAY_ZMQ_ENDPOINT or 'отключен'}")
+
+    try:
+        result = await driver.run()
+        print(f"▶️ Проиграно {result['frames']} кадров за {result['seconds']:.2f}с "
+              f"({result['frames_per_sec']:.0f} кадров/с), ошибок: {result['errors']}, пропущено: {result['skipped']}")
+        for stream, count in sorted(result["by_stream"].items()):
+            print(f"  {stream}: {count}")
+
+        for venue, kinds in get_feed_latency_stats().items():
+            for kind, snapshot in kinds.items():
+                persist = snapshot["persist"]
+                print(f"  persist {venue}/{kind}: p50={persist['p50_ms']:.3f}мс p99={persist['p99_ms']:.3f}мс")
+
+        pipeline = get_pool_stats()["pipeline"]
+        print(f"  Dragonfly pipeline: p50={pipeline['p50_ms']:.3f}мс p99={pipeline['p99_ms']:.3f}мс")
+    finally:
+        for client in clients:
+            client.zmq_socket.close(linger=0)
+        await close_shared_client()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage:")
+        print("  python replay.py capture.bin [speed|max] [binance,hyperliquid,bybit,extended]")
+        print("  python replay.py capture.bin max binance")
+        print("  REPLAY_DRAGONFLY_DB=15 REPLAY_ZMQ_ENDPOINT=tcp://127.0.0.1:5556 python replay.py capture.bin")
+        sys.exit(1)
+
+    capture_path = sys.argv[1]
+    speed_arg = sys.argv[2] if len(sys.argv) > 2 else "1"
+    replay_speed = 0.0 if speed_arg == "max" else float(speed_arg)
+    replay_targets = sys.argv[3].split(",") if len(sys.argv) > 3 else ["binance", "hyperliquid", "bybit", "extended"]
+
+    asyncio.run(main(capture_path, replay_speed, replay_targets))
@@ -9,9 +9,21 @@ from CexWsClients.AsyncHyperliquidWSClient import AsyncHyperliquidWSClient
 from DragonflyDb.DragonFlyConnector import DragonFlyConnector
 from InfoClients.AsyncBinanceInfoClient import AsyncBinanceInfoClient
 from InfoClients.AsyncHyperliquidInfoClient import AsyncHyperliquidInfoClient
+from Execution.ExecutionCoordinator import ExecutionCoordinator, Leg
+from Execution.Requote import requote
+from Monitoring.Telemetry import decision
 from config.config import ROI
 logger = logging.getLogger(__name__)
 
+# Минимальный спред для входа в FindDeal
+MIN_SPREAD = 0.0026
+
+
+def find_spreads(bid1: float, ask1: float, bid2: float, ask2: float):
+    """Спреды FindDeal: spread1 — лонг на первой бирже / шорт на второй, spread2 — наоборот"""
+    return 1 - ask1 / bid2, 1 - ask2 / bid1
+
+
 async def init_exchange_client(exchange_name: str, config: dict, asset: str, db):
     print(f"🔄 Инициализация {exchange_name}...")
 
@@ -23,6 +35,8 @@ async def init_exchange_client(exchange_name: str, config: dict, asset: str, db)
         info_client = AsyncBinanceInfoClient(db)
         await ws_client.connect_ws()
         await ws_client.subscribe_orderbook(asset)
+        await ws_client.subscribe_bbo(asset)
+        await ws_client.subscribe_mark_price(asset)
 
     elif exchange_name == "Hyperliquid":
         ws_client = AsyncHyperliquidWSClient.from_key(
@@ -31,6 +45,8 @@ async def init_exchange_client(exchange_name: str, config: dict, asset: str, db)
         info_client = AsyncHyperliquidInfoClient(db)
         await ws_client.connect_ws()
         await ws_client.subscribe_orderbook(asset)
+        await ws_client.subscribe_bbo(asset)
+        await ws_client.subscribe_mark_price(asset)
 
     else:
         raise ValueError(f"Неизвестный обменник: {exchange_name}")
@@ -111,11 +127,16 @@ class Scalper:
         self.exchange2_name = 'Hyperliquid'
         self.frstDrctn = None
         self.scndDrctn = None
+        self.coordinator = ExecutionCoordinator(on_miss="complete")
         if not os.path.exists(config_path):
             logger.error(f"Config file {config_path} not found")
             raise FileNotFoundError(f"Config file {config_path} not found")
         with open(config_path, 'r') as config_file:
             self.config = json.load(config_file)
+        # Книги старше этого возраста считаются замершими и не торгуются
+        self.max_book_age_ms = self.config.get('trading_parameters', {}).get('max_book_age_ms', 1000)
+        # Ждать Enter перед закрытием открытой сделки (бэктест выключает)
+        self.confirm_close = self.config.get('trading_parameters', {}).get('confirm_close', True)
 
     async def checkBeforeStart(self):
         """
@@ -163,12 +184,12 @@ class Scalper:
         print("🚀 Все готово!")
 
     async def _wait_for_orderbook(self):
-        """Быстрая проверка что ордербуки не пустые"""
+        """Быстрая проверка что ордербуки не пустые и обновляются"""
         for attempt in range(5):
             try:
                 ob1, ob2 = await asyncio.gather(
-                    self.exchange1Info.get_orderbook(self.asset),
-                    self.exchange2Info.get_orderbook(self.asset)
+                    self.exchange1Info.get_orderbook(self.asset, max_age_ms=self.max_book_age_ms),
+                    self.exchange2Info.get_orderbook(self.asset, max_age_ms=self.max_book_age_ms)
                 )
 
                 if (ob1.get('bids', []) and ob2.get('asks', [])):
@@ -180,7 +201,7 @@ class Scalper:
 
             await asyncio.sleep(1)
 
-        raise Exception("Ордербуки не заполнились за 5 секунд")
+        raise Exception("Ордербуки не заполнились (или не обновляются) за 5 секунд")
 
     async def _setup_trading_parameters(self):
         """Настройка одинаковых торговых параметров для обеих бирж"""
@@ -245,15 +266,13 @@ class Scalper:
             await asyncio.sleep(0.2)
 
         # ЭТАП 2: Тик-сайз лимит (1 попытка)
+        remaining = qty
         try:
             logger.info(f"🎯 {exchange_name}: ордер +1 тик от лучшей цены")
 
-            # Отменяем текущий ордер
-            await self.cancel_order(exchange_client, self.asset, orderId)
-
-            # Получаем остаток
+            # Текущее исполнение ордера
             status = await info_client.get_order_status(order_id=orderId)
-            current_filled = self._extract_fill_size(status, {'qty': qty})
+            current_filled = self._extract_fill_size(status, {'qty': qty}) if status else 0.0
             remaining = qty - current_filled
 
             # Получаем тик-сайз и текущие цены
@@ -269,22 +288,25 @@ class Scalper:
                 best_price = float(orderbook['bids'][0][0])
                 tick_price = best_price - tick_size
 
-            # Размещаем лимит +/- 1 тик
-            tick_order = await exchange_client.place_limit_order(
-                symbol=self.asset,
-                side=direction,
-                price=tick_price,
-                qty=remaining
-            )
+            # Переставляем остаток на +/- 1 тик: amend одним запросом, где биржа умеет, иначе отмена + лимит
+            tick_order = await requote(exchange_client, info_client, exchange_name, self.asset, orderId, direction,
+                                       tick_price, remaining, current_filled)
+            if tick_order['orderId'] is None:
+                logger.info(f"✅ {exchange_name}: ордер исполнен до перестановки")
+                return True
+            remaining = tick_order['remaining']
+            # После amend fillSz ордера включает исполненное до перестановки
+            base_filled = tick_order['filled'] if tick_order['amended'] else 0.0
 
-            logger.info(f"📌 {exchange_name}: лимит по цене {tick_price:.6f} (тик={tick_size})")
+            logger.info(f"📌 {exchange_name}: лимит по цене {tick_price:.6f} (тик={tick_size}, "
+                        f"{'amend' if tick_order['amended'] else 'новый ордер'})")
 
             # Ждем исполнения тик-лимита (2 секунды)
             tick_start = time.time()
             while time.time() - tick_start < 2.0:
                 status = await info_client.get_order_status(tick_order['orderId'])
                 if status:
-                    filled = self._extract_fill_size(status, {'qty': remaining})
+                    filled = self._extract_fill_size(status, {'qty': remaining}) - base_filled
                     if filled >= remaining * 0.99:
                         logger.info(f"✅ {exchange_name}: тик-лимит исполнен")
                         return True
@@ -295,7 +317,7 @@ class Scalper:
 
             # Обновляем остаток после тик-лимита
             status = await info_client.get_order_status(tick_order['orderId'])
-            tick_filled = self._extract_fill_size(status, {'qty': remaining})
+            tick_filled = self._extract_fill_size(status, {'qty': remaining}) - base_filled
             final_remaining = remaining - tick_filled
 
         except Exception as e:
@@ -456,6 +478,9 @@ class Scalper:
         start_time = time.time()
         order1_id = None
         order2_id = None
+        # Исполненную сторону больше не котируем
+        done1 = False
+        done2 = False
 
         logger.info(f"🎯 Старт мониторинга пика на {seconds}с")
 
@@ -463,8 +488,8 @@ class Scalper:
             while time.time() - start_time < seconds:
                 # Получаем ордербуки
                 ob1, ob2 = await asyncio.gather(
-                    self.exchange1Info.get_orderbook(self.asset),
-                    self.exchange2Info.get_orderbook(self.asset),
+                    self.exchange1Info.get_orderbook(self.asset, max_age_ms=self.max_book_age_ms),
+                    self.exchange2Info.get_orderbook(self.asset, max_age_ms=self.max_book_age_ms),
                     return_exceptions=True
                 )
 
@@ -491,50 +516,55 @@ class Scalper:
                     target_price2 = float(ob2['asks'][0][0]) - tick2
 
                 # Проверяем нужно ли обновить ордер на exchange1
-                needs_update1 = True
+                needs_update1 = not done1
+                filled1 = 0.0
                 if order1_id:
                     try:
                         status = await self.exchange1Info.get_order_status(order1_id)
-                        if status and abs(float(status.get('price', 0)) - target_price1) < tick1 / 2:
-                            needs_update1 = False
+                        if status:
+                            filled1 = float(status.get('fillSz', 0))
+                            if abs(float(status.get('price', 0)) - target_price1) < tick1 / 2:
+                                needs_update1 = False
                     except:
                         pass
 
                 # Проверяем нужно ли обновить ордер на exchange2
-                needs_update2 = True
+                needs_update2 = not done2
+                filled2 = 0.0
                 if order2_id:
                     try:
                         status = await self.exchange2Info.get_order_status(order2_id)
-                        if status and abs(float(status.get('price', 0)) - target_price2) < tick2 / 2:
-                            needs_update2 = False
+                        if status:
+                            filled2 = float(status.get('fillSz', 0))
+                            if abs(float(status.get('price', 0)) - target_price2) < tick2 / 2:
+                                needs_update2 = False
                     except:
                         pass
 
-                # Обновляем ордеры если нужно
-                tasks = []
+                # Обновляем ордеры если нужно: amend одним запросом, без ордера — новый лимит
+                tasks = {}
 
                 if needs_update1:
-                    if order1_id:
-                        tasks.append(self.cancel_order(self.exchange1, self.asset, order1_id))
-                    tasks.append(
-                        self.exchange1.place_limit_order(self.asset, self.frstDrctn, target_price1, self.dealqty1))
+                    tasks[1] = requote(self.exchange1, self.exchange1Info, self.exchange1_name, self.asset, order1_id,
+                                       self.frstDrctn, target_price1, self.dealqty1 - filled1, filled1)
 
                 if needs_update2:
-                    if order2_id:
-                        tasks.append(self.cancel_order(self.exchange2, self.asset, order2_id))
-                    tasks.append(
-                        self.exchange2.place_limit_order(self.asset, self.scndDrctn, target_price2, self.dealqty2))
+                    tasks[2] = requote(self.exchange2, self.exchange2Info, self.exchange2_name, self.asset, order2_id,
+                                       self.scndDrctn, target_price2, self.dealqty2 - filled2, filled2)
 
                 if tasks:
-                    results = await asyncio.gather(*tasks, return_exceptions=True)
-
-                    # Обновляем ID ордеров
-                    if needs_update1:
-                        order1_id = results[-2]['orderId'] if len(results) >= 2 and isinstance(results[-2],
-                                                                                               dict) else None
-                    if needs_update2:
-                        order2_id = results[-1]['orderId'] if len(results) >= 1 and isinstance(results[-1],
-                                                                                               dict) else None
+                    results = dict(zip(tasks, await asyncio.gather(*tasks.values(), return_exceptions=True)))
+                    for result in results.values():
+                        if isinstance(result, Exception):
+                            logger.warning(f"⚠️ Перестановка не удалась: {result}")
+
+                    # Обновляем ID ордеров; None — ордер исполнен
+                    if isinstance(results.get(1), dict):
+                        order1_id = results[1]['orderId']
+                        done1 = order1_id is None
+                    if isinstance(results.get(2), dict):
+                        order2_id = results[2]['orderId']
+                        done2 = order2_id is None
 
                     logger.info(f"🔄 Обновлены ордеры: {target_price1:.6f} | {target_price2:.6f}")
 
@@ -578,20 +608,21 @@ class Scalper:
             # 3. ЕСЛИ НЕТ ПОЗИЦИЙ - ИЩЕМ НОВУЮ СДЕЛКУ
         while True:
             try:
-                ob1 = await self.exchange1Info.get_orderbook(self.asset)
-                ob2 = await self.exchange2Info.get_orderbook(self.asset)
+                ob1, ob2 = await asyncio.gather(
+                    self.exchange1Info.get_bbo(self.asset, max_age_ms=self.max_book_age_ms),
+                    self.exchange2Info.get_bbo(self.asset, max_age_ms=self.max_book_age_ms)
+                )
 
-                if not (ob1.get('bids') and ob1.get('asks') and ob2.get('bids') and ob2.get('asks')):
-                    print("⚠️ Пустые ордербуки")
+                if not (ob1 and ob2):
+                    print("⚠️ Нет свежих BBO")
                     await asyncio.sleep(0.1)
                     continue
 
-                bid1, ask1 = float(ob1['bids'][0][0]), float(ob1['asks'][0][0])
-                bid2, ask2 = float(ob2['bids'][0][0]), float(ob2['asks'][0][0])
+                bid1, ask1 = ob1['bid'], ob1['ask']
+                bid2, ask2 = ob2['bid'], ob2['ask']
 
-                spread1 = 1 - ask1 / bid2  # Binance long / Hyperliquid short
-                spread2 = 1 - ask2 / bid1  # Hyperliquid long / Binance short
-                min_spread = 0.0026
+                spread1, spread2 = find_spreads(bid1, ask1, bid2, ask2)
+                min_spread = MIN_SPREAD
 
                 # ПОКАЗЫВАЕМ СПРЕДЫ ПОСТОЯННО
                 print(f"🔍 Поиск: spread1={spread1:.6f} | spread2={spread2:.6f} | мин={min_spread}")
@@ -599,37 +630,43 @@ class Scalper:
                 # 4. ЕСЛИ ХОРОШИЙ СПРЕД - ОТКРЫВАЕМ
                 if spread1 >= min_spread or spread2 >= min_spread:
 
-                    if spread1 >= min_spread:
-                        self.frstDrctn = 'long'
-                        self.scndDrctn = 'short'
-                        logger.info(f'🎯 Открываем spread1: {spread1:.4f}')
+                    # Спан решения связан с книгами, на которых оно принято; ордера внутри — его дети
+                    venues = (self.exchange1_name.lower(), self.exchange2_name.lower())
+                    with decision("scalper", self.asset, venues) as deal:
+                        if spread1 >= min_spread:
+                            self.frstDrctn = 'long'
+                            self.scndDrctn = 'short'
+                            deal.set(outcome="spread1")
+                            price1, price2 = ask1, bid2
+                            logger.info(f'🎯 Открываем spread1: {spread1:.4f}')
+                            print(f"📊 {self.exchange1_name} long@{bid1} | {self.exchange2_name} short@{ask2}")
+                        else:
+                            self.frstDrctn = 'short'
+                            self.scndDrctn = 'long'
+                            deal.set(outcome="spread2")
+                            price1, price2 = bid1, ask2
+                            logger.info(f'🎯 Открываем spread2: {spread2:.4f}')
+                            print(f"📊 {self.exchange1_name} short@{ask1} | {self.exchange2_name} long@{bid2}")
                         print(ob1)
                         print(ob2)
-                        print(f"📊 {self.exchange1_name} long@{bid1} | {self.exchange2_name} short@{ask2}")
 
-                        frstOrdr, scndOrdr = await asyncio.gather(
-                            self.exchange1.place_limit_order(self.asset, self.frstDrctn, ask1, self.dealqty1),
-                            self.exchange2.place_limit_order(self.asset, self.scndDrctn, bid2, self.dealqty2)
+                        # 5. ИСПОЛНЯЕМ СДЕЛКУ: исполнение ждется по событиям fill, отставшая нога
+                        # добирается маркетом (см. ExecutionCoordinator, on_miss="complete")
+                        result = await self.coordinator.open_pair(
+                            Leg(self.exchange1, self.exchange1Info, self.exchange1_name, self.asset,
+                                self.frstDrctn, price1, self.dealqty1),
+                            Leg(self.exchange2, self.exchange2Info, self.exchange2_name, self.asset,
+                                self.scndDrctn, price2, self.dealqty2)
                         )
-                    else:
-                        self.frstDrctn = 'short'
-                        self.scndDrctn = 'long'
-                        logger.info(f'🎯 Открываем spread2: {spread2:.4f}')
-                        print(f"📊 {self.exchange1_name} short@{ask1} | {self.exchange2_name} long@{bid2}")
-                        print(ob1)
-                        print(ob2)
-                        frstOrdr, scndOrdr = await asyncio.gather(
-                            self.exchange1.place_limit_order(self.asset, self.frstDrctn, bid1, self.dealqty1),
-                            self.exchange2.place_limit_order(self.asset, self.scndDrctn, ask2, self.dealqty2)
-                        )
-
-                    # 5. ИСПОЛНЯЕМ СДЕЛКУ
-                    success = await self.fillDeal(frstOrdr, scndOrdr)
+                    success = result["success"]
+                    logger.info(f"📋 Исполнение {result['mode']}: {result['action_taken']}, "
+                                f"без хеджа {result['exposure_ms'] or 0:.1f} мс")
 
                     if success:
                         logger.info("✅ Сделка открыта")
                         await self.verify_positions_after_open()
-                        await asyncio.get_event_loop().run_in_executor(None, input, "Нажмите Enter для продолжения...")
+                        if self.confirm_close:
+                            await asyncio.get_event_loop().run_in_executor(None, input, "Нажмите Enter для продолжения...")
                         await self.closingDeal()
                     else:
                         logger.info("❌ Сделка не открылась")
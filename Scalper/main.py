@@ -2,13 +2,11 @@
 import asyncio
 import json
 import logging
-import sys
 
 from Scalper import Scalper
+from Monitoring.Runtime import run
 
 logger = logging.getLogger(__name__)
-if sys.platform == "win32":
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 async def wait_for_orderbooks(binance_info, hyperliquid_info, symbol):
     for attempt in range(5):
@@ -44,4 +42,4 @@ async def main():
         logger.error(f"❌ Ошибка: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run(main())
\ No newline at end of file
@@ -9,16 +9,14 @@ import os
 from DragonflyDb.DragonFlyConnector import DragonFlyConnector
 from InfoClients.AsyncBinanceInfoClient import AsyncBinanceInfoClient
 from InfoClients.AsyncHyperliquidInfoClient import AsyncHyperliquidInfoClient
-from config.config import CLIENTS as WS_CLIENTS
-from CexClients.AsyncBinanceClient import AsyncBinanceClient
-from CexClients.AsyncOKXClient import AsyncOKXClient
-from CexClients.AsyncBybitClient import AsyncBybitClient
-from CexClients.AsyncHyperliquidClient import AsyncHyperliquidClient
-
-from CexWsClients.AsyncOKXWSClient import AsyncOKXWSClient
 from CexWsClients.AsyncBinanceWSClient import AsyncBinanceWSClient
 from CexWsClients.AsyncBybitWSClient import AsyncBybitWSClient
 from CexWsClients.AsyncHyperliquidWSClient import AsyncHyperliquidWSClient
+from Execution.ExecutionCoordinator import ExecutionCoordinator, Leg
+from Execution.FillEvents import FILL_TOLERANCE
+from Execution.OrderGroup import place_ladder, price_ladder
+from Execution.Requote import requote
+from Monitoring.Telemetry import decision
 from eth_account.signers.local import LocalAccount
 from eth_account.account import Account
 
@@ -69,6 +67,8 @@ async def init_exchange_client(exchange_name: str, config: dict, asset: str, db)
         # Подключаемся и подписываемся
         await ws_client.connect_ws()
         await ws_client.subscribe_orderbook(asset)
+        await ws_client.subscribe_bbo(asset)
+        await ws_client.subscribe_mark_price(asset)
 
     elif exchange_name == "Hyperliquid":
         # Создаем клиентов
@@ -80,6 +80,8 @@ async def init_exchange_client(exchange_name: str, config: dict, asset: str, db)
         # Подключаемся и подписываемся
         await ws_client.connect_ws()
         await ws_client.subscribe_orderbook(asset)
+        await ws_client.subscribe_bbo(asset)
+        await ws_client.subscribe_mark_price(asset)
 
     else:
         raise ValueError(f"Неизвестный обменник: {exchange_name}")
@@ -117,10 +119,19 @@ class LongShort:
                        self.config['trading_parameters']['parts']
         self.credited_tokens1 = 0
         self.credited_tokens2 = 0
+        self.coordinator = ExecutionCoordinator(on_miss="unwind")
+        # ladder: все оставшиеся части одним пакетным запросом на биржу, лестницей через ladder_step_ticks тиков
+        self.ladder = self.config['trading_parameters'].get('ladder', False)
+        self.ladder_step_ticks = self.config['trading_parameters'].get('ladder_step_ticks', 1)
+        self.ladder_timeout = self.config['trading_parameters'].get('ladder_timeout_s', 6.0)
+        self.tickSize1 = None
+        self.tickSize2 = None
 
     async def before_start(self):
         """Инициализация клиентов обменников и настройка торговых параметров"""
-        await self._init_exchange_clients()
+        # Клиенты уже подставлены снаружи (бэктест) — подключать нечего
+        if getattr(self, 'exchange1WebSocket', None) is None or getattr(self, 'exchange2WebSocket', None) is None:
+            await self._init_exchange_clients()
         await self._setup_trading_parameters()
 
     async def _init_exchange_clients(self):
@@ -165,12 +176,6 @@ class LongShort:
 
         raise Exception("Ордербуки не заполнились за 5 секунд")
 
-    def _create_websocket_client(self, exchange_name: str):
-        key = exchange_name.lower()
-        if key not in WS_CLIENTS:
-            raise ValueError(f"WebSocket клиент для '{exchange_name}' не найден в config.py")
-        return WS_CLIENTS[key]
-
     def _create_info_client(self, exchange_name: str):
         """Создание информационного клиента (для работы с БД) для конкретного обменника"""
         db = DragonFlyConnector(exchange="binance")  # Используем одну базу
@@ -372,23 +377,25 @@ class LongShort:
 
     async def findDeal(self):
         await self.before_start()
-        time.sleep(10)
+        # Ждем первые ордербуки, не блокируя цикл: WS клиенты пишут их в Dragonfly в этом же цикле
+        await asyncio.sleep(10)
         step = 0
         logger.info('🔍 Поиск арбитражных возможностей...')
 
         while step < self.config['trading_parameters']['parts']:
             spread_threshold = self.config['trading_parameters']['max_spread_percent']
-            firstOrderbook = await self.exchange1Info.get_orderbook(symbol=self.asset)
-            secondOrderbook = await self.exchange2Info.get_orderbook(symbol=self.asset)
+            firstBbo, secondBbo = await asyncio.gather(
+                self.exchange1Info.get_bbo(symbol=self.asset),
+                self.exchange2Info.get_bbo(symbol=self.asset)
+            )
 
-            if not (firstOrderbook.get('bids') and len(firstOrderbook['bids']) > 0 and
-                    secondOrderbook.get('asks') and len(secondOrderbook['asks']) > 0):
-                logger.warning("⚠️ Пустые ордербуки, ждем...")
+            if not (firstBbo and secondBbo):
+                logger.warning("⚠️ Нет BBO, ждем...")
                 await asyncio.sleep(2)
                 continue
 
-            first_bid, bid_volume = float(firstOrderbook['bids'][0][0]), float(firstOrderbook['bids'][0][1])
-            second_ask, ask_volume = float(secondOrderbook['asks'][0][0]), float(secondOrderbook['asks'][0][1])
+            first_bid, bid_volume = firstBbo['bid'], firstBbo['bid_qty']
+            second_ask, ask_volume = secondBbo['ask'], secondBbo['ask_qty']
 
             self.prcDcmls1, self.qtyDcmls1 = get_decimal_places(first_bid), get_decimal_places(bid_volume)
             self.prcDcmls2, self.qtyDcmls2 = get_decimal_places(second_ask), get_decimal_places(ask_volume)
@@ -399,17 +406,27 @@ class LongShort:
             logger.info(
                 f"💱 {self.exchange1_name} bid={first_bid} | {self.exchange2_name} ask={second_ask} | спред={spread_pct:.4f}%")
 
+            if current_spread < spread_threshold and self.ladder:
+                parts = self.config['trading_parameters']['parts']
+                logger.info(f'🎯 Выгодный спред! Лестница из {parts - step} частей...')
+                step += await self.open_ladder(first_bid, second_ask, parts - step)
+                logger.info(f'✅ Набрано {step}/{parts} частей')
+                await self.verify_and_balance_positions(step)
+                continue
+
             if current_spread < spread_threshold:
                 logger.info('🎯 Выгодный спред! Размещаем ордера...')
-                frstOrdr, scndOrdr = await asyncio.gather(
-                    self.exchange1WebSocket.place_limit_order(
-                        symbol=self.asset, side=self.frstDrctn, price=first_bid, qty=self.dealqty1
-                    ),
-                    self.exchange2WebSocket.place_limit_order(
-                        symbol=self.asset, side=self.scndDrctn, price=second_ask, qty=self.dealqty2
-                    ),
-                    return_exceptions=True
-                )
+                venues = (self.exchange1_name.lower(), self.exchange2_name.lower())
+                with decision("longshort", self.asset, venues):
+                    frstOrdr, scndOrdr = await asyncio.gather(
+                        self.exchange1WebSocket.place_limit_order(
+                            symbol=self.asset, side=self.frstDrctn, price=first_bid, qty=self.dealqty1
+                        ),
+                        self.exchange2WebSocket.place_limit_order(
+                            symbol=self.asset, side=self.scndDrctn, price=second_ask, qty=self.dealqty2
+                        ),
+                        return_exceptions=True
+                    )
 
                 fill_deal = await self.fillDeal(frstOrdr, scndOrdr)
                 if fill_deal:
@@ -425,6 +442,41 @@ class LongShort:
         await self.verify_and_balance_positions(self.config['trading_parameters']['parts'])
         return True
 
+    async def _tick_sizes(self):
+        if self.tickSize1 is None or self.tickSize2 is None:
+            tick1, tick2 = await asyncio.gather(
+                self.exchange1WebSocket.get_tick_size(self.asset),
+                self.exchange2WebSocket.get_tick_size(self.asset)
+            )
+            self.tickSize1, self.tickSize2 = float(tick1), float(tick2)
+        return self.tickSize1, self.tickSize2
+
+    async def _run_ladder(self, price1, side1, qty1, price2, side2, qty2, parts, reduce_only=False):
+        """
+        Лестницы из parts частей на обеих биржах — по одному пакетному запросу на биржу.
+        Ждет исполнения ladder_timeout, снимает остаток и возвращает исполнение (filled1, filled2).
+        """
+        tick1, tick2 = await self._tick_sizes()
+        venues = (self.exchange1_name.lower(), self.exchange2_name.lower())
+        with decision("longshort", self.asset, venues):
+            group1, group2 = await asyncio.gather(
+                place_ladder(self.exchange1WebSocket, self.exchange1Info, self.exchange1_name, self.asset, side1,
+                             price_ladder(price1, side1, qty1, parts, tick1, self.ladder_step_ticks), reduce_only),
+                place_ladder(self.exchange2WebSocket, self.exchange2Info, self.exchange2_name, self.asset, side2,
+                             price_ladder(price2, side2, qty2, parts, tick2, self.ladder_step_ticks), reduce_only)
+            )
+        await asyncio.gather(group1.wait(self.ladder_timeout), group2.wait(self.ladder_timeout))
+        filled1, filled2 = await asyncio.gather(group1.cancel_remaining(), group2.cancel_remaining())
+        logger.info(f"💰 Лестница: {filled1:.6f}/{group1.qty:.6f} | {filled2:.6f}/{group2.qty:.6f}")
+        return filled1, filled2
+
+    async def open_ladder(self, price1, price2, parts):
+        """Набирает до parts частей лестницей; возвращает число частей, исполненных на обеих биржах"""
+        filled1, filled2 = await self._run_ladder(price1, self.frstDrctn, self.dealqty1,
+                                                  price2, self.scndDrctn, self.dealqty2, parts)
+        # Перекос сверх целых частей закроет verify_and_balance_positions
+        return int(min(filled1 / self.dealqty1, filled2 / self.dealqty2) + (1 - FILL_TOLERANCE))
+
     async def fillDeal(self, frstOrdr, scndOrdr):
         """Быстрое заполнение с тайм-аутом"""
         logger.info(f"🎯 Исполнение ордеров: {frstOrdr['orderId']} | {scndOrdr['orderId']}")
@@ -576,15 +628,14 @@ class LongShort:
             await asyncio.sleep(0.2)
 
         # ЭТАП 2: Тик-сайз лимит (1 попытка)
+        remaining = qty
         try:
             logger.info(f"🎯 {exchange_name}: ордер +1 тик от лучшей цены")
 
-            # Отменяем текущий ордер
-            await self.cancel_order(exchange_client, self.asset, orderId)
-
-            # Получаем остаток
-            status = await info_client.get_order_status(order_id=orderId)
-            current_filled = self._extract_fill_size(status, {'qty': qty})
+            # fillDeal уже снял ордер и передает "new_order" — переставлять нечего, ставим новый
+            live_order_id = None if orderId == "new_order" else orderId
+            status = await info_client.get_order_status(order_id=orderId) if live_order_id else None
+            current_filled = self._extract_fill_size(status, {'qty': qty}) if status else 0.0
             remaining = qty - current_filled
 
             if remaining <= 0.001:
@@ -604,22 +655,25 @@ class LongShort:
                 best_price = float(orderbook['bids'][0][0])
                 tick_price = best_price - tick_size
 
-            # Размещаем лимит +/- 1 тик
-            tick_order = await exchange_client.place_limit_order(
-                symbol=self.asset,
-                side=direction,
-                price=tick_price,
-                qty=remaining
-            )
+            # Переставляем остаток на +/- 1 тик: amend одним запросом, где биржа умеет, иначе отмена + лимит
+            tick_order = await requote(exchange_client, info_client, exchange_name, self.asset, live_order_id,
+                                       direction, tick_price, remaining, current_filled)
+            if tick_order['orderId'] is None:
+                logger.info(f"✅ {exchange_name}: ордер исполнен до перестановки")
+                return True
+            remaining = tick_order['remaining']
+            # После amend fillSz ордера включает исполненное до перестановки
+            base_filled = tick_order['filled'] if tick_order['amended'] else 0.0
 
-            logger.info(f"📌 {exchange_name}: лимит по цене {tick_price:.6f} (тик={tick_size})")
+            logger.info(f"📌 {exchange_name}: лимит по цене {tick_price:.6f} (тик={tick_size}, "
+                        f"{'amend' if tick_order['amended'] else 'новый ордер'})")
 
             # Ждем исполнения тик-лимита (2 секунды)
             tick_start = time.time()
             while time.time() - tick_start < 2.0:
                 status = await info_client.get_order_status(tick_order['orderId'])
                 if status:
-                    filled = self._extract_fill_size(status, {'qty': remaining})
+                    filled = self._extract_fill_size(status, {'qty': remaining}) - base_filled
                     if filled >= remaining * 0.99:
                         logger.info(f"✅ {exchange_name}: тик-лимит исполнен")
                         return True
@@ -630,7 +684,7 @@ class LongShort:
 
             # Обновляем остаток после тик-лимита
             status = await info_client.get_order_status(tick_order['orderId'])
-            tick_filled = self._extract_fill_size(status, {'qty': remaining})
+            tick_filled = self._extract_fill_size(status, {'qty': remaining}) - base_filled
             final_remaining = remaining - tick_filled
 
         except Exception as e:
@@ -682,6 +736,18 @@ class LongShort:
             current_spread = second_bid / first_ask
             spread_threshold = self.config['trading_parameters']['max_spread_close_percent']
             logger.info(f'spread - {spread_threshold}')
+            if current_spread < spread_threshold and self.ladder:
+                parts = self.config['trading_parameters']['parts']
+                logger.info(f'spread to close, ladder of {parts - step}')
+                filled1, filled2 = await self._run_ladder(first_ask, "short", qty1, second_bid, "long", qty2,
+                                                          parts - step, reduce_only=True)
+                # Отставшая биржа дозакрывается маркетом до исполненного объема первой
+                if filled1 / qty1 > filled2 / qty2 + (1 - FILL_TOLERANCE):
+                    await self.exchange2WebSocket.close_market_order(self.asset, "long", filled1 / qty1 * qty2 - filled2)
+                elif filled2 / qty2 > filled1 / qty1 + (1 - FILL_TOLERANCE):
+                    await self.exchange1WebSocket.close_market_order(self.asset, "short", filled2 / qty2 * qty1 - filled1)
+                step += int(max(filled1 / qty1, filled2 / qty2) + (1 - FILL_TOLERANCE))
+                continue
             if current_spread < spread_threshold:
                 logger.info('spread to close')
                 step += 1
@@ -799,127 +865,24 @@ class LongShort:
 
     async def dual_open(self, exchange1WebSocket, price1, exchange2WebSocket, price2, qty):
         """
-        Отправляет лимитные ордера на обеих биржах и обрабатывает результаты
-        Использует обычные лимитные ордера вместо FOK
+        Открывает обе ноги лимитками через ExecutionCoordinator: порядок (одновременно или
+        IOC сначала на менее ликвидной бирже) выбирается по статистике бирж, исполнение
+        ждется по событиям fill вместо sleep, перекос закрывается маркетом на исполненной бирже.
         """
         logger.info(f'🎯 DUAL OPEN: qty={qty} prices={price1}/{price2}')
 
-        start_time = time.time()
-
         try:
-            # Одновременная отправка лимитных ордеров
-            results = await asyncio.gather(
-                exchange1WebSocket.place_limit_order(self.asset, self.frstDrctn, price1, qty),
-                exchange2WebSocket.place_limit_order(self.asset, self.scndDrctn, price2, qty),
-                return_exceptions=True
+            result = await self.coordinator.open_pair(
+                Leg(exchange1WebSocket, self.exchange1Info, self.exchange1_name, self.asset, self.frstDrctn, price1, qty),
+                Leg(exchange2WebSocket, self.exchange2Info, self.exchange2_name, self.asset, self.scndDrctn, price2, qty)
             )
-
-            execution_time = (time.time() - start_time) * 1000
-            logger.info(f'⚡ Dual execution time: {execution_time:.1f}ms')
-
-            result1, result2 = results
-
-            # Проверяем исключения
-            if isinstance(result1, Exception):
-                logger.error(f'❌ Exchange1 exception: {result1}')
-                result1 = {"success": False, "error": str(result1)}
-
-            if isinstance(result2, Exception):
-                logger.error(f'❌ Exchange2 exception: {result2}')
-                result2 = {"success": False, "error": str(result2)}
-
-            # Получаем order_id для отслеживания
-            order1_id = result1.get('orderId') if not isinstance(result1, Exception) else None
-            order2_id = result2.get('orderId') if not isinstance(result2, Exception) else None
-
-            # Быстро проверяем статус (2 секунды)
-            await asyncio.sleep(2.0)
-
-            # Проверяем заполнение
-            status1 = await self.exchange1Info.get_order_status(order1_id) if order1_id else None
-            status2 = await self.exchange2Info.get_order_status(order2_id) if order2_id else None
-
-            fill1 = self._extract_fill_size(status1, result1) if status1 else 0
-            fill2 = self._extract_fill_size(status2, result2) if status2 else 0
-
-            # Анализируем результат
-            filled1 = fill1 >= qty * 0.99
-            filled2 = fill2 >= qty * 0.99
-
-            if filled1 and filled2:
-                # ✅ ОБА ИСПОЛНЕНЫ
-                logger.info(f'✅ DUAL SUCCESS!')
-                logger.info(f'   Exchange1: {fill1:.6f}@{price1}')
-                logger.info(f'   Exchange2: {fill2:.6f}@{price2}')
-
-                return {
-                    "success": True,
-                    "both_filled": True,
-                    "exchange1_result": {"filledQty": fill1, "avgPrice": price1, "orderId": order1_id},
-                    "exchange2_result": {"filledQty": fill2, "avgPrice": price2, "orderId": order2_id},
-                    "action_taken": "both_filled"
-                }
-
-            elif filled1 and not filled2:
-                # ⚠️ ТОЛЬКО ПЕРВЫЙ ИСПОЛНЕН - закрываем
-                logger.warning(f'⚠️ Only Exchange1 filled - closing position')
-
-                # Отменяем второй ордер
-                if order2_id:
-                    await self.cancel_order(exchange2WebSocket, self.asset, order2_id)
-
-                # Закрываем первую позицию
-                close_side = "short" if self.frstDrctn == "long" else "long"
-                await exchange1WebSocket.close_market_order(self.asset, close_side, fill1)
-
-                logger.info(f'🚨 Exchange1 position closed via market')
-
-                return {
-                    "success": False,
-                    "both_filled": False,
-                    "exchange1_result": {"filledQty": fill1, "avgPrice": price1},
-                    "exchange2_result": {"filledQty": fill2, "avgPrice": price2},
-                    "action_taken": "closed_exchange1"
-                }
-
-            elif not filled1 and filled2:
-                # ⚠️ ТОЛЬКО ВТОРОЙ ИСПОЛНЕН - закрываем
-                logger.warning(f'⚠️ Only Exchange2 filled - closing position')
-
-                # Отменяем первый ордер
-                if order1_id:
-                    await self.cancel_order(exchange1WebSocket, self.asset, order1_id)
-
-                # Закрываем вторую позицию
-                close_side = "short" if self.scndDrctn == "long" else "long"
-                await exchange2WebSocket.close_market_order(self.asset, close_side, fill2)
-
-                logger.info(f'🚨 Exchange2 position closed via market')
-
-                return {
-                    "success": False,
-                    "both_filled": False,
-                    "exchange1_result": {"filledQty": fill1, "avgPrice": price1},
-                    "exchange2_result": {"filledQty": fill2, "avgPrice": price2},
-                    "action_taken": "closed_exchange2"
-                }
-
+            if result['both_filled']:
+                logger.info(f'✅ DUAL SUCCESS ({result["mode"]})!')
+                logger.info(f'   Exchange1: {result["exchange1_result"]["filledQty"]:.6f}@{price1}')
+                logger.info(f'   Exchange2: {result["exchange2_result"]["filledQty"]:.6f}@{price2}')
             else:
-                # 🔄 ОБА НЕ ИСПОЛНЕНЫ - отменяем
-                logger.info(f'🔄 Both orders not filled - canceling')
-
-                if order1_id:
-                    await self.cancel_order(exchange1WebSocket, self.asset, order1_id)
-                if order2_id:
-                    await self.cancel_order(exchange2WebSocket, self.asset, order2_id)
-
-                return {
-                    "success": False,
-                    "both_filled": False,
-                    "exchange1_result": {"filledQty": fill1, "avgPrice": price1},
-                    "exchange2_result": {"filledQty": fill2, "avgPrice": price2},
-                    "action_taken": "both_rejected"
-                }
+                logger.warning(f'⚠️ DUAL {result["mode"]}: {result["action_taken"]}')
+            return result
 
         except Exception as e:
             logger.error(f'❌ Critical error in dual_open: {e}')
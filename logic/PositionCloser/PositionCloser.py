@@ -4,6 +4,9 @@ import asyncio
 import json
 from typing import Dict, Any, Optional
 
+from Execution.FillEvents import FILL_TOLERANCE
+from Execution.OrderGroup import place_ladder, price_ladder
+
 logger = logging.getLogger(__name__)
 
 
@@ -78,6 +81,11 @@ class PositionCloser:
                 price1 = first_ask if direction1 == "long" else first_bid
                 price2 = second_bid if direction2 == "short" else second_ask
 
+                if self.config.get('trading_parameters', {}).get('ladder', False):
+                    step += await self._close_ladder(price1, price2, qty1, qty2, direction1, direction2, parts - step)
+                    logger.info(f'✅ Закрыто {step}/{parts} частей')
+                    continue
+
                 # Размещаем закрывающие ордера
                 start_time = time.time()
                 frstOrdr, scndOrdr = await asyncio.gather(
@@ -269,6 +277,40 @@ class PositionCloser:
 
     # === ВСПОМОГАТЕЛЬНЫЕ МЕТОДЫ ===
 
+    async def _close_ladder(self, price1: float, price2: float, qty1: float, qty2: float,
+                            direction1: str, direction2: str, parts: int) -> int:
+        """
+        Закрывает до parts частей лестницами — по одному пакетному запросу на биржу.
+        Отставшая биржа дозакрывается маркетом; возвращает число закрытых частей.
+        """
+        trading = self.config.get('trading_parameters', {})
+        step_ticks = trading.get('ladder_step_ticks', 1)
+        timeout = trading.get('ladder_timeout_s', 6.0)
+        tick1, tick2 = await asyncio.gather(
+            self.exchange1_ws.get_tick_size(self.asset),
+            self.exchange2_ws.get_tick_size(self.asset)
+        )
+
+        start_time = time.time()
+        group1, group2 = await asyncio.gather(
+            place_ladder(self.exchange1_ws, self.exchange1_info, self.exchange1_name, self.asset, direction1,
+                         price_ladder(price1, direction1, qty1, parts, float(tick1), step_ticks), reduce_only=True),
+            place_ladder(self.exchange2_ws, self.exchange2_info, self.exchange2_name, self.asset, direction2,
+                         price_ladder(price2, direction2, qty2, parts, float(tick2), step_ticks), reduce_only=True)
+        )
+        logger.info(f'⚡ Закрывающие лестницы: {(time.time() - start_time) * 1000:.1f}ms')
+
+        await asyncio.gather(group1.wait(timeout), group2.wait(timeout))
+        fill1, fill2 = await asyncio.gather(group1.cancel_remaining(), group2.cancel_remaining())
+        parts1, parts2 = fill1 / qty1, fill2 / qty2
+        logger.info(f'💰 Закрыто: {fill1:.6f}/{group1.qty:.6f} | {fill2:.6f}/{group2.qty:.6f}')
+
+        if parts1 > parts2 + (1 - FILL_TOLERANCE):
+            await self.close_single_exchange(self.exchange2_ws, self.exchange2_name, (parts1 - parts2) * qty2, direction2)
+        elif parts2 > parts1 + (1 - FILL_TOLERANCE):
+            await self.close_single_exchange(self.exchange1_ws, self.exchange1_name, (parts2 - parts1) * qty1, direction1)
+        return int(max(parts1, parts2) + (1 - FILL_TOLERANCE))
+
     async def _wait_for_fill(self, order1, order2, target_qty1: float, target_qty2: float):
         """Ожидание исполнения ордеров"""
         start_time = time.time()
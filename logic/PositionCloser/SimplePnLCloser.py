@@ -26,6 +26,11 @@ class SimplePnLCloser:
         """
         logger.info(f"🎯 Запуск PnL мониторинга: цель = {target_pnl_percent}%")
 
+        # Живой поток mark price / funding для учета финансирования в PnL
+        for ws in (self.closer.exchange1_ws, self.closer.exchange2_ws):
+            if hasattr(ws, "subscribe_mark_price"):
+                await ws.subscribe_mark_price(self.closer.asset)
+
         # Получаем данные о входе
         self.entry_data = await self._capture_entry_state()
         if not self.entry_data:
@@ -155,6 +160,11 @@ class SimplePnLCloser:
                 total_pnl_usd += pnl_usd
                 logger.debug(f"Exchange2 Short PnL: {pnl_usd:.4f} USD")
 
+            # Накопленное финансирование по текущим ставкам
+            funding_pnl_usd = await self._estimate_funding_pnl(positions)
+            total_pnl_usd += funding_pnl_usd
+            logger.debug(f"Funding PnL: {funding_pnl_usd:.4f} USD")
+
             # Учитываем комиссии (примерно 0.05% от каждой сделки)
             total_volume = sum(positions.values())
             commission_usd = total_volume * 0.0005 * leverage  # 0.05% комиссии
@@ -174,6 +184,29 @@ class SimplePnLCloser:
             logger.error(f"❌ Ошибка расчета PnL: {e}")
             return -999
 
+    async def _estimate_funding_pnl(self, positions: Dict) -> float:
+        """
+        Оценка funding с момента входа по ставкам из кеша (без запросов к бирже).
+        При положительной ставке лонг платит, шорт получает.
+        """
+        elapsed_hours = (time.time() - self.entry_data["timestamp"]) / 3600
+        total = 0.0
+
+        legs = (
+            (self.closer.exchange1_info, positions["exchange1_long"] - positions["exchange1_short"]),
+            (self.closer.exchange2_info, positions["exchange2_long"] - positions["exchange2_short"]),
+        )
+        for info, net_qty in legs:
+            if not net_qty or not hasattr(info, "get_funding"):
+                continue
+            funding = await info.get_funding(self.closer.asset)
+            if not funding:
+                continue
+            periods = elapsed_hours / funding["interval_hours"]
+            total -= funding["rate"] * funding["mark"] * net_qty * periods
+
+        return total
+
     async def _execute_close(self) -> bool:
         """Исполнение закрытия при достижении цели"""
         try:
@@ -14,6 +14,8 @@ from InfoClients.AsyncBinanceInfoClient import AsyncBinanceInfoClient
 from InfoClients.AsyncHyperliquidInfoClient import AsyncHyperliquidInfoClient
 from CexWsClients.AsyncBinanceWSClient import AsyncBinanceWSClient
 from CexWsClients.AsyncHyperliquidWSClient import AsyncHyperliquidWSClient
+from Execution.ExecutionCoordinator import ExecutionCoordinator, Leg
+from Monitoring.Telemetry import decision
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +38,8 @@ class ScalpStrategy:
         self.exchange2_ws = None
         self.exchange1_info = None
         self.exchange2_info = None
+        # Исполнение пары: промах одной ноги закрывается маркетом на исполненной
+        self.coordinator = ExecutionCoordinator(on_miss="unwind")
 
         # Параметры из конфига
         scalp_params = self.config['scalp_parameters']
@@ -44,6 +48,8 @@ class ScalpStrategy:
         self.max_position_size = scalp_params['max_position_size']
         self.min_quantity = scalp_params['min_quantity']
         self.min_profit_per_unit = scalp_params['min_profit_per_unit']
+        # Книги старше этого возраста пропускаем без REST проверок
+        self.max_book_age_ms = scalp_params.get('max_book_age_ms', 500)
 
         # Статистика
         self.total_profit = 0.0
@@ -53,6 +59,10 @@ class ScalpStrategy:
 
     async def init_clients(self):
         """Быстрая инициализация клиентов"""
+        # Клиенты уже подставлены снаружи (бэктест) — подключать нечего
+        if self.exchange1_ws is not None and self.exchange2_ws is not None:
+            return
+
         logger.info(f"🔄 Initializing {self.exchange1_name} <-> {self.exchange2_name}")
 
         db = DragonFlyConnector(exchange="scalp")
@@ -96,7 +106,9 @@ class ScalpStrategy:
 
         await asyncio.gather(
             self.exchange1_ws.subscribe_orderbook(symbol1),
-            self.exchange2_ws.subscribe_orderbook(symbol2)
+            self.exchange2_ws.subscribe_orderbook(symbol2),
+            self.exchange1_ws.subscribe_bbo(symbol1),
+            self.exchange2_ws.subscribe_bbo(symbol2)
         )
 
         # Ждем стабилизации
@@ -105,7 +117,7 @@ class ScalpStrategy:
 
     async def dual_open(self, exchange1_ws, exchange1_info, price1, exchange2_ws, exchange2_info, price2, qty):
         """
-        Dual FOK attack на обеих биржах
+        Dual IOC attack на обеих биржах через ExecutionCoordinator
 
         Returns:
             {
@@ -117,125 +129,38 @@ class ScalpStrategy:
                 "profit": float
             }
         """
-        logger.debug(f'🎯 DUAL FOK: {qty:.4f} @ {price1:.4f}/{price2:.4f}')
+        logger.debug(f'🎯 DUAL IOC: {qty:.4f} @ {price1:.4f}/{price2:.4f}')
 
         start_time = time.time()
 
-        # Правильные символы для FOK ордеров
-        symbol1 = self.asset + "USDT" if exchange1_ws == self.exchange1_ws and self.exchange1_name == "Binance" else self.asset
-        symbol2 = self.asset + "USDT" if exchange2_ws == self.exchange2_ws and self.exchange2_name == "Binance" else self.asset
-
-        # Одновременная отправка FOK ордеров
-        results = await asyncio.gather(
-            exchange1_ws.place_fok_order(symbol1, "short", price1, qty),  # Продаем дороже
-            exchange2_ws.place_fok_order(symbol2, "long", price2, qty),  # Покупаем дешевле
-            return_exceptions=True
-        )
+        # Ордерные методы клиентов сами добавляют котируемую валюту (Binance: +USDT) — ноги
+        # получают голый актив, иначе выйдет ETHUSDTUSDT
+        # Ноги идут через координатор: IOC одновременно или сначала на менее ликвидной бирже;
+        # спан решения связывает ордера с книгами из fast_scan
+        with decision("scalp", self.asset, (self.exchange1_name.lower(), self.exchange2_name.lower())):
+            result = await self.coordinator.open_pair(
+                Leg(exchange1_ws, exchange1_info, self.exchange1_name, self.asset, "short", price1, qty),  # Продаем дороже
+                Leg(exchange2_ws, exchange2_info, self.exchange2_name, self.asset, "long", price2, qty),  # Покупаем дешевле
+                ioc=True
+            )
 
         execution_time = (time.time() - start_time) * 1000
         self.total_attempts += 1
 
-        result1, result2 = results
-
-        # Обработка исключений
-        if isinstance(result1, Exception):
-            logger.error(f'❌ Exchange1 exception: {result1}')
-            result1 = {"success": False, "error": str(result1)}
-
-        if isinstance(result2, Exception):
-            logger.error(f'❌ Exchange2 exception: {result2}')
-            result2 = {"success": False, "error": str(result2)}
-
-        # Проверяем успешность
-        success1 = result1.get('success', False)
-        success2 = result2.get('success', False)
-
-        if success1 and success2:
+        profit = 0
+        if result['both_filled']:
             # ✅ ОБА ИСПОЛНЕНЫ - ПРОФИТ!
-            profit = (price1 - price2) * qty
+            hedged = min(result['exchange1_result']['filledQty'], result['exchange2_result']['filledQty'])
+            profit = (price1 - price2) * hedged
             self.total_profit += profit
             self.successful_attacks += 1
+            logger.info(f'✅ PROFIT: ${profit:.4f} | Total: ${self.total_profit:.4f} | '
+                        f'Time: {execution_time:.1f}ms ({result["mode"]})')
+        elif result['action_taken'] != 'both_rejected':
+            logger.warning(f'⚠️ {result["action_taken"]} | Time: {execution_time:.1f}ms ({result["mode"]})')
 
-            logger.info(f'✅ PROFIT: ${profit:.4f} | Total: ${self.total_profit:.4f} | Time: {execution_time:.1f}ms')
-
-            return {
-                "success": True,
-                "both_filled": True,
-                "exchange1_result": result1,
-                "exchange2_result": result2,
-                "action_taken": "both_filled",
-                "profit": profit
-            }
-
-        elif success1 and not success2:
-            # ⚠️ ТОЛЬКО ПЕРВЫЙ ИСПОЛНЕН
-            logger.warning(f'⚠️ Only {self.exchange1_name} filled - closing')
-
-            try:
-                filled_qty = result1['filledQty']
-                close_symbol = symbol1  # Используем тот же символ
-                await exchange1_ws.close_market_order(close_symbol, "long", filled_qty)
-
-                return {
-                    "success": False,
-                    "both_filled": False,
-                    "exchange1_result": result1,
-                    "exchange2_result": result2,
-                    "action_taken": "closed_exchange1",
-                    "profit": 0
-                }
-
-            except Exception as e:
-                logger.error(f'❌ Failed to close {self.exchange1_name}: {e}')
-                return {
-                    "success": False,
-                    "both_filled": False,
-                    "exchange1_result": result1,
-                    "exchange2_result": result2,
-                    "action_taken": "close_failed",
-                    "profit": 0,
-                    "error": str(e)
-                }
-
-        elif not success1 and success2:
-            # ⚠️ ТОЛЬКО ВТОРОЙ ИСПОЛНЕН
-            logger.warning(f'⚠️ Only {self.exchange2_name} filled - closing')
-
-            try:
-                filled_qty = result2['filledQty']
-                close_symbol = symbol2  # Используем тот же символ
-                await exchange2_ws.close_market_order(close_symbol, "short", filled_qty)
-
-                return {
-                    "success": False,
-                    "both_filled": False,
-                    "exchange1_result": result1,
-                    "exchange2_result": result2,
-                    "action_taken": "closed_exchange2",
-                    "profit": 0
-                }
-
-            except Exception as e:
-                logger.error(f'❌ Failed to close {self.exchange2_name}: {e}')
-                return {
-                    "success": False,
-                    "both_filled": False,
-                    "exchange1_result": result1,
-                    "exchange2_result": result2,
-                    "action_taken": "close_failed",
-                    "profit": 0,
-                    "error": str(e)
-                }
-        else:
-            # 🔄 ОБА НЕ ИСПОЛНЕНЫ
-            return {
-                "success": False,
-                "both_filled": False,
-                "exchange1_result": result1,
-                "exchange2_result": result2,
-                "action_taken": "both_rejected",
-                "profit": 0
-            }
+        result['profit'] = profit
+        return result
 
     async def fast_scan(self):
         """
@@ -255,22 +180,22 @@ class ScalpStrategy:
             symbol1 = self.asset + "USDT" if self.exchange1_name == "Binance" else self.asset
             symbol2 = self.asset + "USDT" if self.exchange2_name == "Binance" else self.asset
 
-            # Параллельно получаем ордербуки
-            ob1, ob2 = await asyncio.gather(
-                self.exchange1_info.get_orderbook(symbol1),
-                self.exchange2_info.get_orderbook(symbol2)
+            # Решение принимается только по вершине книги — читаем BBO, а не 10 уровней
+            bbo1, bbo2 = await asyncio.gather(
+                self.exchange1_info.get_bbo(symbol1, max_age_ms=self.max_book_age_ms),
+                self.exchange2_info.get_bbo(symbol2, max_age_ms=self.max_book_age_ms)
             )
 
             # Быстрые проверки
-            if not (ob1.get('bids') and ob2.get('asks')):
+            if not (bbo1 and bbo2):
                 return {"found": False}
 
             # Извлекаем данные
-            bid_price = float(ob1['bids'][0][0])  # Продаем сюда (дороже)
-            bid_volume = float(ob1['bids'][0][1])
+            bid_price = bbo1['bid']  # Продаем сюда (дороже)
+            bid_volume = bbo1['bid_qty']
 
-            ask_price = float(ob2['asks'][0][0])  # Покупаем тут (дешевле)
-            ask_volume = float(ob2['asks'][0][1])
+            ask_price = bbo2['ask']  # Покупаем тут (дешевле)
+            ask_volume = bbo2['ask_qty']
 
             # Проверяем профитабельность
             price_diff = bid_price - ask_price
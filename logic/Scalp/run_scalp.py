@@ -1,5 +1,6 @@
 import asyncio
 from logic.LongShort.LongShort import LongShort
+from Monitoring.Runtime import run
 
 
 async def main():
@@ -57,4 +58,5 @@ async def main():
     await strategy.exchange2WebSocket.close()
 
 
-asyncio.run(main())
\ No newline at end of file
+if __name__ == "__main__":
+    run(main())
\ No newline at end of file
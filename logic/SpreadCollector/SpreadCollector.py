@@ -12,7 +12,6 @@ import signal
 import logging
 from datetime import datetime
 from typing import List, Dict, Optional
-import redis.asyncio as aioredis
 
 import sys
 import os
@@ -29,6 +28,9 @@ if root_path not in sys.path:
     sys.path.insert(0, root_path)
     print(f"Добавлен путь: {root_path}")
 
+from DragonflyDb.DragonFlyPool import get_shared_client, close_shared_client
+from DragonflyDb.DragonFlySpreads import DragonFlySpreads
+
 # Проверяем, что папка CexWsClients существует
 cex_path = os.path.join(root_path, "CexWsClients")
 print(f"Папка CexWsClients: {cex_path} - {'существует' if os.path.exists(cex_path) else 'НЕ НАЙДЕНА'}")
@@ -56,6 +58,7 @@ class SpreadCollector:
     def __init__(self, config_path: str = CONFIG_PATH):
         self.config_path = config_path
         self.redis = None
+        self.spreads = None
         self.binance_ws = None
         self.hyper_ws = None
         self.ws_task = None
@@ -63,14 +66,12 @@ class SpreadCollector:
     async def initialize(self):
         """Инициализация подключений"""
         try:
-            # Redis
-            self.redis = aioredis.Redis(
-                host='localhost', port=6379, password='strongpassword',
-                decode_responses=True, socket_connect_timeout=5
-            )
+            # Redis - общий пул процесса, тот же что у WS клиентов
+            self.redis = get_shared_client()
 
             # Проверка подключения к Redis
             await self.redis.ping()
+            self.spreads = DragonFlySpreads("binance", "hyperliquid")
             print("✅ Redis подключен")
 
             # WebSocket клиенты
@@ -133,58 +134,34 @@ class SpreadCollector:
 
         while not stop_flag and (time.time() - start_time) < duration:
             try:
-                # Быстрое чтение всех сторон ордербука
-                keys = [
-                    f"orderbook:binance:{coin}USDT:bids",
-                    f"orderbook:binance:{coin}USDT:asks",
-                    f"orderbook:hyperliquid:{coin}:bids",
-                    f"orderbook:hyperliquid:{coin}:asks"
-                ]
-
-                values = await asyncio.gather(
-                    *[asyncio.wait_for(self.redis.get(k), timeout=0.5) for k in keys],
-                    return_exceptions=True
-                )
-
-                if all(isinstance(v, str) and v for v in values):
-                    try:
-                        # Парсинг цен
-                        bids_b, asks_b, bids_h, asks_h = [json.loads(v) for v in values]
-
-                        if all([bids_b, asks_b, bids_h, asks_h]) and all(
-                                len(x) > 0 for x in [bids_b, asks_b, bids_h, asks_h]):
-                            # Цены
-                            b_bid, b_ask = float(bids_b[0][0]), float(asks_b[0][0])
-                            h_bid, h_ask = float(bids_h[0][0]), float(asks_h[0][0])
-
-                            # Проверяем что цены разумные
-                            if all(price > 0 for price in [b_bid, b_ask, h_bid, h_ask]):
-                                # Спреды в обоих направлениях
-                                spread_b_short = ((b_bid / h_ask) - 1) * 100  # Binance продать, Hyper купить
-                                spread_h_short = ((h_bid / b_ask) - 1) * 100  # Hyper продать, Binance купить
-
-                                best_spread = max(spread_b_short, spread_h_short)
-                                direction = "binance_short" if spread_b_short > spread_h_short else "hyper_short"
-
-                                data.append({
-                                    'time': datetime.now().isoformat(),
-                                    'elapsed': round(time.time() - start_time, 1),
-                                    'coin': coin,
-                                    'b_bid': b_bid, 'b_ask': b_ask,
-                                    'h_bid': h_bid, 'h_ask': h_ask,
-                                    'spread_b_short': round(spread_b_short, 4),
-                                    'spread_h_short': round(spread_h_short, 4),
-                                    'best_spread': round(best_spread, 4),
-                                    'direction': direction
-                                })
-
-                                successful_reads += 1
-                                error_count = max(0, error_count - 1)  # Уменьшаем счетчик ошибок при успехе
-
-                    except (json.JSONDecodeError, IndexError, KeyError, ValueError, TypeError, ZeroDivisionError) as e:
-                        error_count += 1
-                        if error_count % 50 == 0:
-                            print(f"⚠️ {coin}: ошибок парсинга: {error_count} (последняя: {type(e).__name__})")
+                # Лучшие уровни и спреды считаются в Dragonfly одним вызовом
+                top = await asyncio.wait_for(self.spreads.get_spread(coin), timeout=0.5)
+
+                if top:
+                    b_bid, b_ask = top['bid1'], top['ask1']
+                    h_bid, h_ask = top['bid2'], top['ask2']
+
+                    # Спреды в обоих направлениях
+                    spread_b_short = top['spread_sell1_buy2'] * 100  # Binance продать, Hyper купить
+                    spread_h_short = top['spread_sell2_buy1'] * 100  # Hyper продать, Binance купить
+
+                    best_spread = max(spread_b_short, spread_h_short)
+                    direction = "binance_short" if spread_b_short > spread_h_short else "hyper_short"
+
+                    data.append({
+                        'time': datetime.now().isoformat(),
+                        'elapsed': round(time.time() - start_time, 1),
+                        'coin': coin,
+                        'b_bid': b_bid, 'b_ask': b_ask,
+                        'h_bid': h_bid, 'h_ask': h_ask,
+                        'spread_b_short': round(spread_b_short, 4),
+                        'spread_h_short': round(spread_h_short, 4),
+                        'best_spread': round(best_spread, 4),
+                        'direction': direction
+                    })
+
+                    successful_reads += 1
+                    error_count = max(0, error_count - 1)  # Уменьшаем счетчик ошибок при успехе
 
                 else:
                     # Пустые или неполные данные
@@ -338,10 +315,6 @@ class SpreadCollector:
         try:
             print("🧹 Закрытие подключений...")
 
-            if self.redis:
-                await self.redis.close()
-                print("✅ Redis закрыт")
-
             if self.binance_ws:
                 await self.binance_ws.close()
                 print("✅ Binance WS закрыт")
@@ -350,6 +323,10 @@ class SpreadCollector:
                 await self.hyper_ws.close()
                 print("✅ Hyperliquid WS закрыт")
 
+            if self.redis:
+                await close_shared_client()
+                print("✅ Redis закрыт")
+
         except Exception as e:
             print(f"⚠️ Ошибка при закрытии: {e}")
 
@@ -375,9 +352,7 @@ TRENDING_COINS = ["ZRO", "AIXBT", "BERA", "TRUMP"]
 
 if __name__ == "__main__":
     import sys
-
-    if sys.platform == "win32":
-        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    from Monitoring.Runtime import run
 
     print("🚀 УНИВЕРСАЛЬНЫЙ СБОРЩИК СПРЕДОВ v2.0")
     print("=" * 60)
@@ -390,34 +365,34 @@ if __name__ == "__main__":
             coin = sys.argv[2] if len(sys.argv) > 2 else "ETH"
             duration = int(sys.argv[3]) if len(sys.argv) > 3 else 300
             print(f"📊 Сбор для {coin} ({duration}с)")
-            asyncio.run(collect_one(coin, duration))
+            run(collect_one(coin, duration))
 
         elif sys.argv[1] == "popular":
             duration = int(sys.argv[2]) if len(sys.argv) > 2 else 300
             print(f"📊 Сбор для популярных монет ({duration}с)")
-            asyncio.run(collect_many(POPULAR_COINS, duration))
+            run(collect_many(POPULAR_COINS, duration))
 
         elif sys.argv[1] == "altcoins":
             duration = int(sys.argv[2]) if len(sys.argv) > 2 else 300
             print(f"📊 Сбор для альткоинов ({duration}с)")
-            asyncio.run(collect_many(ALTCOINS, duration))
+            run(collect_many(ALTCOINS, duration))
 
         elif sys.argv[1] == "trending":
             duration = int(sys.argv[2]) if len(sys.argv) > 2 else 300
             print(f"📊 Сбор для трендовых монет ({duration}с)")
-            asyncio.run(collect_many(TRENDING_COINS, duration))
+            run(collect_many(TRENDING_COINS, duration))
 
         elif sys.argv[1] == "custom":
             coins = sys.argv[2].split(',')
             duration = int(sys.argv[3]) if len(sys.argv) > 3 else 300
             print(f"📊 Сбор для {coins} ({duration}с)")
-            asyncio.run(collect_many(coins, duration))
+            run(collect_many(coins, duration))
 
         elif sys.argv[1] == "test":
             # Быстрый тест на 1 минуту
             coin = sys.argv[2] if len(sys.argv) > 2 else "ETH"
             print(f"🧪 Быстрый тест для {coin} (60с)")
-            asyncio.run(collect_one(coin, 60))
+            run(collect_one(coin, 60))
 
     else:
         # Интерактивный режим
@@ -429,4 +404,4 @@ if __name__ == "__main__":
         print("  python SpreadCollector.py custom ETH,BTC,SOL 300 # Свой список")
         print("  python SpreadCollector.py test ETH              # Быстрый тест (60с)")
         print("\nЗапуск по умолчанию: ETH на 5 минут")
-        asyncio.run(collect_one("ETH", 300))
\ No newline at end of file
+        run(collect_one("ETH", 300))
\ No newline at end of file
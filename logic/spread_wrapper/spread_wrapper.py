@@ -3,7 +3,8 @@ import json
 import csv
 import time
 from datetime import datetime
-import redis.asyncio as aioredis
+from DragonflyDb.DragonFlyPool import close_shared_client
+from DragonflyDb.DragonFlySpreads import DragonFlySpreads
 
 # Конфиг
 COINS = ["ETH", "BTC", "SOL", "LINK", "AVAX"]  # 5 монет
@@ -12,13 +13,8 @@ INTERVAL = 0.33  # ~3 раза в секунду
 
 
 async def collect_spreads():
-    # Redis
-    redis = aioredis.Redis(
-        host='localhost',
-        port=6379,
-        password='strongpassword',
-        decode_responses=True
-    )
+    # Спреды считаются на стороне Dragonfly (общий пул процесса)
+    spreads = DragonFlySpreads("binance", "hyperliquid")
 
     # WebSockets
     from CexWsClients.AsyncBinanceWSClient import AsyncBinanceWSClient
@@ -54,55 +50,43 @@ async def collect_spreads():
     print("🔄 Начинаем сбор данных...")
 
     while time.time() - start < DURATION:
-        for coin in COINS:
-            try:
-                # Читаем ордербуки
-                b_bids, b_asks, h_bids, h_asks = await asyncio.gather(
-                    redis.get(f"orderbook:binance:{coin}USDT:bids"),
-                    redis.get(f"orderbook:binance:{coin}USDT:asks"),
-                    redis.get(f"orderbook:hyperliquid:{coin}:bids"),
-                    redis.get(f"orderbook:hyperliquid:{coin}:asks")
-                )
-
-                # Отладка для первой итерации
-                if len(data) == 0 and coin == COINS[0]:
-                    print(f"🔍 Проверка Redis для {coin}:")
-                    print(f"   Binance bids: {'✅' if b_bids else '❌'}")
-                    print(f"   Binance asks: {'✅' if b_asks else '❌'}")
-                    print(f"   Hyper bids: {'✅' if h_bids else '❌'}")
-                    print(f"   Hyper asks: {'✅' if h_asks else '❌'}")
-
-                if all([b_bids, b_asks, h_bids, h_asks]):
-                    # Парсим
-                    bb = json.loads(b_bids)[0]  # [price, volume]
-                    ba = json.loads(b_asks)[0]
-                    hb = json.loads(h_bids)[0]
-                    ha = json.loads(h_asks)[0]
-
-                    # Считаем спреды
-                    spread1 = ((float(bb[0]) / float(ha[0])) - 1) * 100
-                    spread2 = ((float(hb[0]) / float(ba[0])) - 1) * 100
-
-                    data.append({
-                        'time': datetime.now().isoformat(),
-                        'coin': coin,
-                        'binance_bid': float(bb[0]),
-                        'binance_bid_vol': float(bb[1]),
-                        'binance_ask': float(ba[0]),
-                        'binance_ask_vol': float(ba[1]),
-                        'hyper_bid': float(hb[0]),
-                        'hyper_bid_vol': float(hb[1]),
-                        'hyper_ask': float(ha[0]),
-                        'hyper_ask_vol': float(ha[1]),
-                        'spread_b2h': round(spread1, 4),  # Binance->Hyper
-                        'spread_h2b': round(spread2, 4),  # Hyper->Binance
-                        'best_spread': round(max(spread1, spread2), 4)
-                    })
-
-            except Exception as e:
-                errors += 1
-                if errors % 50 == 0:  # Каждые 50 ошибок
-                    print(f"⚠️ Ошибки сбора: {errors} | Последняя: {str(e)[:50]}")
+        try:
+            # Все монеты одним вызовом: лучшие уровни и спреды считает Dragonfly
+            tops = await spreads.get_spreads(COINS)
+
+            # Отладка для первой итерации
+            if len(data) == 0:
+                for coin in COINS:
+                    print(f"🔍 Проверка Redis для {coin}: {'✅' if coin in tops else '❌'}")
+
+            for coin in COINS:
+                top = tops.get(coin)
+                if not top:
+                    continue
+
+                spread1 = top['spread_sell1_buy2'] * 100
+                spread2 = top['spread_sell2_buy1'] * 100
+
+                data.append({
+                    'time': datetime.now().isoformat(),
+                    'coin': coin,
+                    'binance_bid': top['bid1'],
+                    'binance_bid_vol': top['bid1_qty'],
+                    'binance_ask': top['ask1'],
+                    'binance_ask_vol': top['ask1_qty'],
+                    'hyper_bid': top['bid2'],
+                    'hyper_bid_vol': top['bid2_qty'],
+                    'hyper_ask': top['ask2'],
+                    'hyper_ask_vol': top['ask2_qty'],
+                    'spread_b2h': round(spread1, 4),  # Binance->Hyper
+                    'spread_h2b': round(spread2, 4),  # Hyper->Binance
+                    'best_spread': round(max(spread1, spread2), 4)
+                })
+
+        except Exception as e:
+            errors += 1
+            if errors % 50 == 0:  # Каждые 50 ошибок
+                print(f"⚠️ Ошибки сбора: {errors} | Последняя: {str(e)[:50]}")
 
         # Прогресс каждые 30 сек
         elapsed = time.time() - start
@@ -132,15 +116,12 @@ async def collect_spreads():
             print(f"{coin}: средний={sum(spreads) / len(spreads):.4f}% макс={max(spreads):.4f}%")
 
     # Закрытие
-    await redis.close()
     await binance.close()
     await hyper.close()
+    await close_shared_client()
 
 
 if __name__ == "__main__":
-    import sys
-
-    if sys.platform == "win32":
-        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    from Monitoring.Runtime import run
 
-    asyncio.run(collect_spreads())
\ No newline at end of file
+    run(collect_spreads())
\ No newline at end of file
@@ -1,15 +1,11 @@
 import asyncio
-import redis.asyncio as aioredis
 import json
 
+from DragonflyDb.DragonFlyPool import get_shared_client, close_shared_client
+
 
 async def test_redis():
-    redis = aioredis.Redis(
-        host='localhost',
-        port=6379,
-        password='strongpassword',
-        decode_responses=True
-    )
+    redis = get_shared_client()
 
     coins = ["ETH", "BTC", "SOL", "LINK", "AVAX"]
 
@@ -44,7 +40,7 @@ async def test_redis():
 
         print()
 
-    await redis.close()
+    await close_shared_client()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули репозитория импортируются от корня, как в скриптах (sys.path.append)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
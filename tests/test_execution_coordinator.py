@@ -0,0 +1,183 @@
+import asyncio
+import time
+
+import pytest
+
+from Execution.ExecutionCoordinator import ExecutionCoordinator, Leg
+from Monitoring.FeedLatency import stamp_event
+
+
+class FakeClient:
+    """
+    Клиент биржи без сети. fill — доля объема, которую биржа исполняет; событие fill
+    приходит через fill_delay после отправки, ответ на ордер — через ack_delay.
+    """
+
+    def __init__(self, venue: str, fill: float = 1.0, fill_delay: float = 0.01, ack_delay: float = 0.0,
+                 ack: dict = None, error: Exception = None):
+        self.venue = venue
+        self.fill = fill
+        self.fill_delay = fill_delay
+        self.ack_delay = ack_delay
+        self.ack = ack
+        self.error = error
+        self.calls = []
+        self._orders = 0
+
+    def _order_id(self) -> str:
+        self._orders += 1
+        return f"{self.venue}-{self._orders}"
+
+    async def place_limit_order(self, symbol, side, price, qty, client_order_id=None):
+        self.calls.append(("limit", side, qty))
+        if self.error is not None:
+            raise self.error
+        order_id = self._order_id()
+        if self.fill:
+            async def fill_later():
+                await asyncio.sleep(self.fill_delay)
+                stamp_event(self.venue, "fill", {"orderId": order_id, "clientOrderId": client_order_id,
+                                                 "fillSz": qty * self.fill, "status": "FILLED"},
+                            None, (time.time_ns(), time.monotonic_ns()))
+            asyncio.create_task(fill_later())
+        await asyncio.sleep(self.ack_delay)
+        return self.ack if self.ack is not None else {"orderId": order_id, "status": "NEW"}
+
+    async def place_ioc_order(self, symbol, side, price, qty, client_order_id=None):
+        self.calls.append(("ioc", side, qty))
+        filled = qty * self.fill
+        return {"success": filled > 0, "orderId": self._order_id(), "filledQty": filled, "avgPrice": price}
+
+    async def cancel_order(self, symbol, order_id):
+        self.calls.append(("cancel", order_id))
+        return {}
+
+    async def close_market_order(self, symbol, side, qty):
+        self.calls.append(("close", side, qty))
+
+    async def place_market_order(self, symbol, side, qty):
+        self.calls.append(("market", side, qty))
+
+
+class LimitOnlyClient(FakeClient):
+    """Биржа без IOC (как Bybit и Extended) — координатор всегда ставит лимитки одновременно"""
+
+    def __getattribute__(self, name):
+        if name == "place_ioc_order":
+            raise AttributeError(name)
+        return super().__getattribute__(name)
+
+
+def legs(client1, client2, qty: float = 1.0):
+    return (Leg(client1, None, client1.venue, "ETH", "long", 100.0, qty),
+            Leg(client2, None, client2.venue, "ETH", "short", 101.0, qty))
+
+
+def open_pair(coordinator, leg1, leg2, **kwargs):
+    return asyncio.run(coordinator.open_pair(leg1, leg2, **kwargs))
+
+
+def test_unknown_miss_policy_rejected():
+    with pytest.raises(ValueError):
+        ExecutionCoordinator(on_miss="hold")
+
+
+def test_simultaneous_both_filled():
+    a, b = FakeClient("sim-a"), FakeClient("sim-b", fill_delay=0.02)
+    result = open_pair(ExecutionCoordinator(mode="simultaneous", fill_timeout=1.0), *legs(a, b))
+
+    assert result["both_filled"] and result["success"]
+    assert result["mode"] == "simultaneous"
+    assert result["action_taken"] == "both_filled"
+    assert result["exposure_ms"] is not None
+    assert not [call for call in a.calls + b.calls if call[0] in ("cancel", "close", "market")]
+
+
+def test_fill_before_ack_does_not_wait_for_ack_or_timeout():
+    # Исполнение приходит в user stream раньше ответа REST на ордер
+    a = FakeClient("early-a", fill_delay=0.0, ack_delay=0.1)
+    b = FakeClient("early-b", fill_delay=0.0, ack_delay=0.1)
+    leg1, leg2 = legs(a, b)
+    started = time.monotonic()
+    result = open_pair(ExecutionCoordinator(mode="simultaneous", fill_timeout=2.0), leg1, leg2)
+
+    assert result["both_filled"]
+    assert time.monotonic() - started < 1.0
+    assert leg1.filled_ns is not None and leg2.filled_ns is not None
+    assert result["exchange1_result"]["orderId"] == "early-a-1"
+
+
+@pytest.mark.parametrize("failing", [
+    FakeClient("fail-b", fill=0.0, error=RuntimeError("connection reset")),
+    FakeClient("reject-b", fill=0.0, ack_delay=0.01,
+               ack={"orderId": None, "status": "REJECTED", "error": "Insufficient margin"}),
+])
+def test_leg_failure_cancels_other_leg_without_waiting_timeout(failing):
+    a = FakeClient(f"{failing.venue}-a", fill=0.0)
+    started = time.monotonic()
+    result = open_pair(ExecutionCoordinator(mode="simultaneous", fill_timeout=2.0), *legs(a, failing))
+
+    assert time.monotonic() - started < 1.0
+    assert not result["success"]
+    assert result["action_taken"] == "both_rejected"
+    assert result["exchange2_result"].get("error")
+    assert ("cancel", f"{a.venue}-1") in a.calls
+
+
+def test_miss_unwinds_filled_leg():
+    a, b = FakeClient("unwind-a"), FakeClient("unwind-b", fill=0.0)
+    result = open_pair(ExecutionCoordinator(mode="simultaneous", fill_timeout=0.5, hedge_grace=0.05), *legs(a, b))
+
+    assert not result["success"]
+    assert result["action_taken"] == "closed_exchange1"
+    assert ("cancel", "unwind-b-1") in b.calls
+    assert ("close", "short", 1.0) in a.calls
+
+
+def test_miss_completes_lagging_leg():
+    a, b = FakeClient("complete-a", fill=0.0), FakeClient("complete-b")
+    leg1, leg2 = legs(a, b)
+    result = open_pair(ExecutionCoordinator(mode="simultaneous", fill_timeout=0.5, hedge_grace=0.05,
+                                            on_miss="complete"), leg1, leg2)
+
+    assert result["success"] and not result["both_filled"]
+    assert result["action_taken"] == "completed_exchange1"
+    assert ("market", "long", 1.0) in a.calls
+    assert leg1.filled == 1.0
+
+
+def test_partial_within_tolerance_is_balanced():
+    a, b = FakeClient("partial-a", fill=0.5), FakeClient("partial-b", fill=0.5)
+    result = open_pair(ExecutionCoordinator(mode="simultaneous", fill_timeout=0.1), *legs(a, b))
+
+    assert result["action_taken"] == "partial_balanced"
+    assert not [call for call in a.calls + b.calls if call[0] in ("close", "market")]
+
+
+def test_sequential_hedges_only_filled_quantity():
+    a, b = FakeClient("seq-a", fill=0.4), FakeClient("seq-b")
+    leg1, leg2 = legs(a, b)
+    result = open_pair(ExecutionCoordinator(mode="sequential"), leg1, leg2)
+
+    assert result["mode"] == "sequential"
+    assert result["action_taken"] == "partial_balanced"
+    assert leg2.filled == 0.4
+    assert a.calls[0] == ("ioc", "long", 1.0)
+    assert b.calls[0] == ("ioc", "short", 0.4)
+
+
+def test_sequential_miss_skips_hedge():
+    a, b = FakeClient("seqmiss-a", fill=0.0), FakeClient("seqmiss-b")
+    result = open_pair(ExecutionCoordinator(mode="sequential"), *legs(a, b))
+
+    assert result["action_taken"] == "both_rejected"
+    assert b.calls == []
+
+
+def test_sequential_falls_back_to_limits_without_ioc():
+    a, b = FakeClient("noioc-a"), LimitOnlyClient("noioc-b")
+    result = open_pair(ExecutionCoordinator(mode="sequential", fill_timeout=1.0), *legs(a, b), ioc=True)
+
+    assert result["mode"] == "simultaneous"
+    assert result["both_filled"]
+    assert a.calls[0][0] == "limit"
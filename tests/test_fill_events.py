@@ -0,0 +1,89 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from Execution import FillEvents
+from Execution.FillEvents import bind_order, get_order_fill, track_order
+from Monitoring.FeedLatency import stamp_event
+
+
+def fill(venue: str, event: dict):
+    """Событие fill так же, как его отдает WS клиент после записи в Dragonfly"""
+    stamp_event(venue, "fill", dict(event), None, (time.time_ns(), time.monotonic_ns()))
+
+
+def test_incremental_fill_counted_once_per_trade_id():
+    fill("hyperliquid", {"orderId": "dedup-1", "fillSz": 0.3, "tradeId": 77})
+    fill("hyperliquid", {"orderId": "dedup-1", "fillSz": 0.3, "tradeId": 77})
+    fill("hyperliquid", {"orderId": "dedup-1", "fillSz": 0.2, "tradeId": 78})
+
+    assert abs(get_order_fill("hyperliquid", "dedup-1").filled - 0.5) < 1e-9
+
+
+def test_cumulative_fill_keeps_maximum():
+    fill("binance", {"orderId": "cum-1", "fillSz": 0.4, "status": "PARTIALLY_FILLED"})
+    fill("binance", {"orderId": "cum-1", "fillSz": 1.0, "status": "FILLED"})
+    # Опоздавшее событие с меньшим накопленным объемом не уменьшает исполнение
+    fill("binance", {"orderId": "cum-1", "fillSz": 0.4, "status": "PARTIALLY_FILLED"})
+
+    state = get_order_fill("binance", "cum-1")
+    assert state.filled == 1.0
+
+
+def test_fill_before_ack_wakes_waiter_by_client_id():
+    async def scenario():
+        client_order_id = track_order("binance")
+        state = get_order_fill("binance", client_order_id)
+        waiter = asyncio.create_task(state.wait(1.0, timeout=1.0))
+        await asyncio.sleep(0)
+        # Ответа REST еще нет: событие несет оба id, биржевой привязывается к клиентскому
+        fill("binance", {"orderId": "ack-1", "clientOrderId": client_order_id, "fillSz": 1.0, "status": "FILLED"})
+        assert await asyncio.wait_for(waiter, 0.5)
+        assert bind_order("binance", client_order_id, "ack-1") is state
+
+    asyncio.run(scenario())
+
+
+def test_bind_merges_early_incremental_fill_without_double_count():
+    fill("hyperliquid", {"orderId": "early-1", "fillSz": 0.1, "tradeId": 9})
+    client_order_id = track_order("hyperliquid")
+    # Тот же trade уже учтен под клиентским id (например, из ответа REST)
+    get_order_fill("hyperliquid", client_order_id).apply(0.1, None, False, None, "9")
+
+    state = bind_order("hyperliquid", client_order_id, "early-1")
+    assert abs(state.filled - 0.1) < 1e-9
+    assert get_order_fill("hyperliquid", "early-1") is state
+
+
+def test_bind_merges_early_fill_and_later_events_share_state():
+    fill("hyperliquid", {"orderId": "early-2", "fillSz": 0.2, "tradeId": 5})
+    client_order_id = track_order("hyperliquid")
+    fill("hyperliquid", {"orderId": "early-2", "clientOrderId": client_order_id, "fillSz": 0.2, "tradeId": 5})
+    fill("hyperliquid", {"orderId": "early-2", "fillSz": 0.3, "tradeId": 6})
+
+    state = get_order_fill("hyperliquid", client_order_id)
+    assert abs(state.filled - 0.5) < 1e-9
+    assert state.first_fill_ns is not None
+
+
+def test_wait_returns_on_terminal_status_and_times_out_without_events():
+    async def scenario():
+        rejected = get_order_fill("bybit", track_order("bybit"))
+        rejected.apply(0.0, "REJECTED")
+        assert await rejected.wait(1.0, timeout=0.5)
+        assert rejected.filled == 0.0
+
+        silent = get_order_fill("bybit", track_order("bybit"))
+        assert not await silent.wait(1.0, timeout=0.05)
+
+    asyncio.run(scenario())
+
+
+def test_tracked_orders_are_bounded(monkeypatch):
+    monkeypatch.setattr(FillEvents, "_orders", OrderedDict())
+    monkeypatch.setattr(FillEvents, "TRACKED_ORDERS_LIMIT", 2)
+    first = track_order("extended")
+    track_order("extended")
+    track_order("extended")
+
+    assert ("extended", first) not in FillEvents._orders
@@ -0,0 +1,151 @@
+import asyncio
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import DragonflyDb.DragonFlyConnector as connector_module
+from DragonflyDb.DragonFlyConnector import ORDER_STORAGE_VERSION, DragonFlyConnector
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    # fakeredis с lupa исполняет Lua скрипты коннектора так же, как Dragonfly
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(connector_module, "get_shared_client", lambda: client)
+    return client
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_new_order_is_active_without_ttl(redis):
+    async def scenario():
+        db = DragonFlyConnector("binance")
+        await db.save_order("1", 0, 100.0, "NEW", 1.0)
+        order = await db.get_order("1")
+        assert order["status"] == "NEW" and order["origSz"] == 1.0
+        assert await redis.sismember(db._orders_active_key(), "1")
+        assert await redis.ttl(db._order_key("1")) == -1
+
+    run(scenario())
+
+
+def test_late_non_terminal_save_keeps_terminal_order(redis):
+    async def scenario():
+        db = DragonFlyConnector("binance", order_ttl=3600)
+        # Исполнение из user stream пришло раньше ответа REST с NEW
+        await db.save_order("1", 1.0, 100.0, "FILLED", 1.0)
+        await db.save_order("1", 0, 100.0, "NEW", 1.0)
+
+        order = await db.get_order("1")
+        assert order["status"] == "FILLED"
+        assert order["fillSz"] == 1.0
+        assert await redis.ttl(db._order_key("1")) > 0
+        assert not await redis.sismember(db._orders_active_key(), "1")
+        assert await db.get_all_orders(active_only=True) == {}
+        assert "1" in await db.get_all_orders()
+
+    run(scenario())
+
+
+def test_fill_size_never_decreases(redis):
+    async def scenario():
+        db = DragonFlyConnector("binance")
+        await db.save_order("1", 0.6, 100.0, "PARTIALLY_FILLED", 1.0)
+        await db.save_order("1", 0.2, 0, "PARTIALLY_FILLED", 1.0)
+        order = await db.get_order("1")
+        assert order["fillSz"] == 0.6 and order["price"] == 100.0
+
+    run(scenario())
+
+
+def test_incremental_fills_dedup_and_vwap(redis):
+    async def scenario():
+        db = DragonFlyConnector("hyperliquid")
+        await db.save_order("1", 0, 0, "NEW", 1.0)
+        await db.update_order_fill("1", 0.25, 100.0, trade_id="a")
+        await db.update_order_fill("1", 0.25, 100.0, trade_id="a")
+        await db.update_order_fill("1", 0.75, 104.0, trade_id="b")
+
+        order = await db.get_order("1")
+        assert order["fillSz"] == 1.0
+        assert order["price"] == pytest.approx(103.0)
+        assert order["status"] == "FILLED"
+        assert await redis.ttl(db._order_key("1")) > 0
+        assert not await redis.sismember(db._orders_active_key(), "1")
+
+    run(scenario())
+
+
+def test_ws_fill_after_rest_cumulative_not_double_counted(redis):
+    async def scenario():
+        db = DragonFlyConnector("hyperliquid")
+        await db.save_order("1", 0.5, 100.0, "PARTIALLY_FILLED", 1.0)
+        # То же исполнение приходит поштучно из user stream
+        await db.update_order_fill("1", 0.3, 100.0, trade_id="a")
+        await db.update_order_fill("1", 0.2, 100.0, trade_id="b")
+
+        order = await db.get_order("1")
+        assert order["fillSz"] == 0.5
+        assert order["status"] == "PARTIALLY_FILLED"
+
+    run(scenario())
+
+
+def test_fill_does_not_downgrade_terminal_status(redis):
+    async def scenario():
+        db = DragonFlyConnector("hyperliquid")
+        await db.save_order("1", 0.4, 100.0, "CANCELED", 1.0)
+        await db.update_order_fill("1", 0.4, 100.0, trade_id="a")
+
+        order = await db.get_order("1")
+        assert order["status"] == "CANCELED"
+        assert not await redis.sismember(db._orders_active_key(), "1")
+
+    run(scenario())
+
+
+def test_fill_for_unknown_order_gets_ttl(redis):
+    async def scenario():
+        db = DragonFlyConnector("hyperliquid", order_ttl=600)
+        await db.update_order_fill("9", 0.1, 100.0, trade_id="a")
+
+        order = await db.get_order("9")
+        assert order["fillSz"] == 0.1
+        assert 0 < await redis.ttl(db._order_key("9")) <= 600
+        assert 0 < await redis.ttl(db._order_trades_key("9")) <= 600
+
+    run(scenario())
+
+
+def test_legacy_json_order_migrated_before_first_write(redis):
+    async def scenario():
+        await redis.set("binanceOrders:7", json.dumps({"orderId": "7", "fillSz": 0.5, "price": 3.0,
+                                                      "status": "PARTIALLY_FILLED"}))
+        db = DragonFlyConnector("binance")
+        # Первым идет запись другого ордера — миграция все равно выполняется до нее
+        await asyncio.gather(db.save_order("8", 0, 1.0, "NEW", 1.0), db.get_order("7"))
+
+        order = await db.get_order("7")
+        assert order["fillSz"] == 0.5 and order["status"] == "PARTIALLY_FILLED"
+        assert await redis.type("binanceOrders:7") == "hash"
+        assert sorted(await db.get_all_orders()) == ["7", "8"]
+        assert await redis.get(db._orders_version_key()) == ORDER_STORAGE_VERSION
+
+    run(scenario())
+
+
+def test_expired_orders_dropped_from_index(redis):
+    async def scenario():
+        db = DragonFlyConnector("binance")
+        await db.save_order("1", 0, 1.0, "NEW", 1.0)
+        await redis.delete(db._order_key("1"))
+
+        assert await db.get_all_orders() == {}
+        assert await redis.zcard(db._orders_index_key()) == 0
+        assert await redis.scard(db._orders_active_key()) == 0
+
+    run(scenario())